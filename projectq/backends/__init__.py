@@ -19,16 +19,28 @@ This includes:
 
 * a debugging tool to print all received commands (CommandPrinter)
 * a circuit drawing engine (which can be used anywhere within the compilation
-  chain)
+  chain) and a variant which streams the drawing to a file, page by page
 * a simulator with emulation capabilities
 * a resource counter (counts gates and keeps track of the maximal width of the
-  circuit)
+  circuit) and a function which counts independent subcircuits in a pool of
+  processes
+* a recorder which writes all commands to a compact binary trace file and a
+  replayer which sends such a trace to any engine
+* an exporter which writes the circuit to an OpenQASM file
 * an interface to the IBM Quantum Experience chip (and simulator).
 * an interface to the Rigetti Forest API (and QVM)
+* futures of jobs submitted asynchronously to these remote devices and a
+  poller which polls their results on one background thread
+* a cache of the results of circuits run on these remote devices
 """
 from ._printer import CommandPrinter
-from ._circuits import CircuitDrawer
+from ._circuits import CircuitDrawer, StreamingCircuitDrawer
 from ._sim import Simulator, ClassicalSimulator
 from ._resource import ResourceCounter
+from ._resource_pool import Subcircuit, estimate_resources
+from ._trace import TraceRecorder, TraceReplayer
+from ._emitters import QASMExporter
+from ._jobs import JobFuture, JobPoller
+from ._result_cache import ResultCache
 from ._ibm import IBMBackend
 from ._rigetti import RigettiBackend
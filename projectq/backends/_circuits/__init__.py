@@ -13,4 +13,4 @@
 #   limitations under the License.
 
 from ._to_latex import to_latex
-from ._drawer import CircuitDrawer
+from ._drawer import CircuitDrawer, StreamingCircuitDrawer
@@ -16,6 +16,7 @@
 Contains a compiler engine which generates TikZ Latex code describing the
 circuit.
 """
+import heapq
 import sys
 
 from builtins import input
@@ -24,6 +25,9 @@ from projectq.cengines import LastEngineException, BasicEngine
 from projectq.ops import FlushGate, Measure, Allocate, Deallocate
 from projectq.meta import get_control_count
 from projectq.backends._circuits import to_latex
+from projectq.backends._circuits._to_latex import (_footer, _header,
+                                                   _load_settings,
+                                                   _StreamingCirc2Tikz)
 
 
 class CircuitItem(object):
@@ -211,14 +215,10 @@ class CircuitDrawer(BasicEngine):
             cmd (Command): Command to add to the circuit diagram.
         """
         if cmd.gate == Allocate:
-            qubit_id = cmd.qubits[0][0].id
-            if qubit_id not in self._map:
-                self._map[qubit_id] = qubit_id
-            self._qubit_lines[qubit_id] = []
+            self._add_qubit_line(cmd.qubits[0][0].id)
 
         if cmd.gate == Deallocate:
-            qubit_id = cmd.qubits[0][0].id
-            self._free_lines.append(qubit_id)
+            self._free_qubit_line(cmd.qubits[0][0].id)
 
         if self.is_last_engine and cmd.gate == Measure:
             assert(get_control_count(cmd) == 0)
@@ -235,13 +235,30 @@ class CircuitDrawer(BasicEngine):
                     m = int(m)
                     self.main_engine.set_measurement_result(qubit, m)
 
-        all_lines = [qb.id for qr in cmd.all_qubits for qb in qr]
-
         gate = cmd.gate
         lines = [qb.id for qr in cmd.qubits for qb in qr]
         ctrl_lines = [qb.id for qb in cmd.control_qubits]
-        item = CircuitItem(gate, lines, ctrl_lines)
-        for l in all_lines:
+        self._add_item(CircuitItem(gate, lines, ctrl_lines))
+
+    def _add_qubit_line(self, qubit_id):
+        """
+        Add the line of a newly allocated qubit to the circuit.
+        """
+        if qubit_id not in self._map:
+            self._map[qubit_id] = qubit_id
+        self._qubit_lines[qubit_id] = []
+
+    def _free_qubit_line(self, qubit_id):
+        """
+        Mark the line of a deallocated qubit as free.
+        """
+        self._free_lines.append(qubit_id)
+
+    def _add_item(self, item):
+        """
+        Add a circuit item (with qubit ids as lines) to the circuit.
+        """
+        for l in item.ctrl_lines + item.lines:
             self._qubit_lines[l].append(item)
 
     def get_latex(self):
@@ -291,3 +308,120 @@ class CircuitDrawer(BasicEngine):
             # (try to) send on
             if not self.is_last_engine:
                 self.send([cmd])
+
+
+class StreamingCircuitDrawer(CircuitDrawer):
+    """
+    StreamingCircuitDrawer is a compiler engine which writes the TikZ code
+    of the circuit to a file while the circuit is running.
+
+    Every gate is drawn as soon as it is received, i.e., neither the circuit
+    nor its TikZ code is kept in memory. Long circuits are split into pages
+    (one tikzpicture per page of the standalone document) of a given width.
+    The lines of deallocated qubits are reused by newly allocated qubits,
+    hence the pages are only as tall as the largest number of qubits which
+    are allocated at the same time. The settings (see CircuitDrawer) are
+    read from settings.json.
+
+    Example:
+        .. code-block:: python
+
+            drawer = StreamingCircuitDrawer("circuit.tex", page_width=30.)
+            eng = MainEngine(drawer, [])
+            ... # run quantum algorithm on this main engine
+            eng.flush()
+            drawer.close()
+    """
+    def __init__(self, filename, page_width=20., accept_input=False,
+                 default_measure=0):
+        """
+        Initialize a streaming circuit drawing engine.
+
+        Args:
+            filename (str or file object): Name of the LaTeX file to write
+                (or a file object opened in text mode).
+            page_width (float): Width (in cm, before scaling) after which a
+                new page is started.
+            accept_input (bool): See CircuitDrawer.
+            default_measure (bool): See CircuitDrawer.
+        """
+        CircuitDrawer.__init__(self, accept_input, default_measure)
+        if hasattr(filename, 'write'):
+            self._file = filename
+        else:
+            self._file = open(filename, 'w')
+        self._close_file = self._file is not filename
+        # number of lines which have been used (the free ones among them are
+        # in self._free_lines)
+        self._num_lines = 0
+        self._settings = _load_settings()
+        self._converter = _StreamingCirc2Tikz(self._settings, page_width)
+        self._file.write(_header(self._settings, pages=True))
+
+    @property
+    def num_pages(self):
+        """
+        Number of pages which have been started.
+        """
+        return self._converter.num_pages
+
+    def get_latex(self):
+        """
+        Not available: the LaTeX code is written to the file instead.
+
+        Raises:
+            RuntimeError
+        """
+        raise RuntimeError("The StreamingCircuitDrawer writes the circuit to "
+                           "a file, see close().")
+
+    def close(self):
+        """
+        Finish the LaTeX document (and close the file if it was opened by the
+        StreamingCircuitDrawer).
+        """
+        if self._file is None:
+            return
+        self._file.write(_footer(self._settings))
+        if self._close_file:
+            self._file.close()
+        else:
+            self._file.flush()
+        self._file = None
+
+    def _print_cmd(self, cmd):
+        if self._file is None:
+            if cmd.gate == Deallocate:
+                return
+            raise ValueError("The LaTeX file has already been written.")
+        CircuitDrawer._print_cmd(self, cmd)
+
+    def set_qubit_locations(self, id_to_loc):
+        CircuitDrawer.set_qubit_locations(self, id_to_loc)
+        # the lines of the other qubits follow the given ones
+        self._num_lines = max(id_to_loc.values()) + 1
+
+    def _add_qubit_line(self, qubit_id):
+        # the gates are written to the file right away (see _add_item), hence
+        # only the lines of the allocated qubits are kept in memory. A new
+        # qubit gets the lowest free line, such that there are only as many
+        # lines as qubits which are allocated at the same time.
+        if qubit_id not in self._map:
+            if len(self._free_lines) > 0:
+                self._map[qubit_id] = heapq.heappop(self._free_lines)
+            else:
+                self._map[qubit_id] = self._num_lines
+                self._num_lines += 1
+
+    def _free_qubit_line(self, qubit_id):
+        heapq.heappush(self._free_lines, self._map[qubit_id])
+
+    def _add_item(self, item):
+        lines = [self._map[qb_id] for qb_id in item.lines]
+        ctrl_lines = [self._map[qb_id] for qb_id in item.ctrl_lines]
+        new_item = CircuitItem(item.gate, lines, ctrl_lines)
+        if item.gate == Allocate:
+            new_item.id = item.lines[0]
+        self._file.write(self._converter.draw(new_item))
+        if item.gate == Deallocate:
+            del self._map[item.lines[0]]
@@ -16,18 +16,24 @@
 Tests for projectq.backends.circuits._drawer.py.
 """
 
+import re
+
 import pytest
 
 from projectq import MainEngine
 from projectq.cengines import LastEngineException
-from projectq.ops import (H,
+from projectq.ops import (Command,
+                          H,
                           X,
                           CNOT,
-                          Measure)
+                          Measure,
+                          Swap)
 from projectq.meta import Control
+from projectq.types import WeakQubitRef
 
 import projectq.backends._circuits._drawer as _drawer
-from projectq.backends._circuits._drawer import CircuitItem, CircuitDrawer
+from projectq.backends._circuits._drawer import (CircuitItem, CircuitDrawer,
+                                                 StreamingCircuitDrawer)
 
 
 def test_drawer_getlatex():
@@ -161,3 +167,106 @@ def test_drawer_circuititem():
     circuit_item2.lines = 2
     assert circuit_item2 == circuit_item
     assert not circuit_item2 != circuit_item
+
+
+def _run_circuit(drawer):
+    eng = MainEngine(drawer, [])
+    qureg = eng.allocate_qureg(3)
+    for _ in range(10):
+        H | qureg[1]
+        CNOT | (qureg[1], qureg[0])
+        Swap | (qureg[1], qureg[2])
+    Measure | qureg[0]
+    X | qureg[0]
+    del qureg
+    eng.flush()
+
+
+def test_streaming_drawer(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    filename = str(tmpdir.join("circuit.tex"))
+    drawer = StreamingCircuitDrawer(filename, page_width=5.)
+    drawer.set_qubit_locations({0: 2, 1: 1, 2: 0})
+    _run_circuit(drawer)
+    with pytest.raises(RuntimeError):
+        drawer.get_latex()
+    drawer.close()
+    drawer.close()
+    with pytest.raises(ValueError):
+        drawer.receive([Command(None, H, ([WeakQubitRef(None, 0)],))])
+    assert drawer.num_pages > 2
+
+    with open(filename) as tex_file:
+        latex = tex_file.read()
+    assert latex.startswith("\\documentclass[tikz]{standalone}")
+    assert latex.endswith("\\end{tikzpicture}\n\\end{document}")
+    assert latex.count("\\begin{tikzpicture}") == drawer.num_pages
+    assert latex.count("\\end{tikzpicture}") == drawer.num_pages
+    # the qubits are drawn in reversed order
+    assert "\\node[measure,edgestyle] (line2_gate" in latex
+
+
+def test_streaming_drawer_bounded_memory(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    tex_file = tmpdir.join("circuit.tex").open("w+")
+    drawer = StreamingCircuitDrawer(tex_file)
+    eng = MainEngine(drawer, [])
+    for _ in range(20):
+        qubit = eng.allocate_qubit()
+        H | qubit
+        del qubit
+    kept = eng.allocate_qubit()
+    X | kept
+    eng.flush()
+    # nothing is stored for the deallocated qubits
+    assert drawer._map == {kept[0].id: 0}
+    assert drawer._qubit_lines == {}
+    assert drawer._free_lines == []
+    drawer.close()
+
+
+def test_streaming_drawer_reuses_lines(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    tex_file = tmpdir.join("circuit.tex").open("w+")
+    drawer = StreamingCircuitDrawer(tex_file, page_width=50.)
+    eng = MainEngine(drawer, [])
+    qubit = eng.allocate_qubit()
+    for _ in range(500):
+        ancilla = eng.allocate_qubit()
+        CNOT | (qubit, ancilla)
+        del ancilla
+    eng.flush()
+    drawer.close()
+    assert drawer.num_pages > 1
+    assert len(drawer._converter.pos) == 2
+    assert len(drawer._converter.op_count) == 2
+    tex_file.seek(0)
+    latex = tex_file.read()
+    assert set(re.findall(r"\) at \([^,]+,-(\d+)\)", latex)) == {"0", "1"}
+
+
+def test_streaming_drawer_single_page(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    tex_file = tmpdir.join("circuit.tex").open("w+")
+    drawer = StreamingCircuitDrawer(tex_file, page_width=1000.)
+    eng = MainEngine(drawer, [])
+    qubit = eng.allocate_qubit()
+    H | qubit
+    X | qubit
+    Measure | qubit
+    eng.flush()
+    drawer.close()
+    assert drawer.num_pages == 1
+    # files which have been passed as file objects are not closed
+    tex_file.seek(0)
+    streamed = tex_file.read()
+
+    drawer = CircuitDrawer()
+    eng = MainEngine(drawer, [])
+    qubit = eng.allocate_qubit()
+    H | qubit
+    X | qubit
+    Measure | qubit
+    latex = drawer.get_latex()
+    assert latex[latex.index("\n\\node"):] == \
+        streamed[streamed.index("\n\\node"):]
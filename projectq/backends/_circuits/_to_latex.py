@@ -45,6 +45,18 @@ def to_latex(circuit):
         tex_doc_str (string): Latex document string which can be compiled
             using, e.g., pdflatex.
     """
+    settings = _load_settings()
+    text = _header(settings)
+    text += _body(circuit, settings)
+    text += _footer(settings)
+    return text
+
+
+def _load_settings():
+    """
+    Return the settings of settings.json (which is created with the default
+    settings if it does not exist).
+    """
     try:
         FileNotFoundError
     except NameError:
@@ -52,14 +64,9 @@ def to_latex(circuit):
 
     try:
         with open('settings.json') as settings_file:
-            settings = json.load(settings_file)
+            return json.load(settings_file)
     except FileNotFoundError:
-        settings = write_settings(get_default_settings())
-
-    text = _header(settings)
-    text += _body(circuit, settings)
-    text += _footer(settings)
-    return text
+        return write_settings(get_default_settings())
 
 
 def write_settings(settings):
@@ -120,24 +127,33 @@ def get_default_settings():
     return settings
 
 
-def _header(settings):
+_PICTURE = "\\begin{tikzpicture}[scale=0.8, transform shape]\n\n"
+
+
+def _header(settings, pages=False):
     """
     Writes the Latex header using the settings file.
 
     The header includes all packages and defines all tikz styles.
 
+    Args:
+        settings (dict): Settings of the circuit.
+        pages (bool): If True, the document consists of several pages (one
+            per tikzpicture, see _StreamingCirc2Tikz) and the styles are
+            defined before the first picture.
+
     Returns:
         header (string): Header of the Latex document.
     """
-    packages = ("\\documentclass{standalone}\n\\usepackage[margin=1in]"
+    document_class = "\\documentclass{standalone}"
+    if pages:
+        document_class = "\\documentclass[tikz]{standalone}"
+    packages = (document_class + "\n\\usepackage[margin=1in]"
                 "{geometry}\n\\usepackage[hang,small,bf]{caption}\n"
                 "\\usepackage{tikz}\n"
                 "\\usepackage{braket}\n\\usetikzlibrary{backgrounds,shadows."
                 "blur,fit,decorations.pathreplacing,shapes}\n\n")
 
-    init = ("\\begin{document}\n"
-            "\\begin{tikzpicture}[scale=0.8, transform shape]\n\n")
-
     gate_style = ("\\tikzstyle{basicshadow}=[blur shadow={shadow blur steps=8,"
                   " shadow xshift=0.7pt, shadow yshift=-0.7pt, shadow scale="
                   "1.02}]")
@@ -179,7 +195,11 @@ def _header(settings):
     edge_style = ("\\tikzstyle{edgestyle}=[" + settings['lines']['style'] +
                   "]\n")
 
-    return packages + init + gate_style + edge_style
+    if pages:
+        return (packages + "\\begin{document}\n" + gate_style + edge_style +
+                "\n" + _PICTURE)
+    return (packages + "\\begin{document}\n" + _PICTURE + gate_style +
+            edge_style)
 
 
 def _body(circuit, settings):
@@ -260,7 +280,6 @@ class _Circ2Tikz(object):
 
         cmds = circuit[line]
         for i in range(0, end):
-            gate = cmds[i].gate
             lines = cmds[i].lines
             ctrl_lines = cmds[i].ctrl_lines
 
@@ -275,104 +294,122 @@ class _Circ2Tikz(object):
                 # we are taking care of gate 0 (the current one)
                 circuit[l] = circuit[l][1:]
 
-            all_lines = lines + ctrl_lines
-            pos = max([self.pos[l] for l in range(min(all_lines),
-                                                  max(all_lines) + 1)])
-            for l in range(min(all_lines), max(all_lines) + 1):
-                self.pos[l] = pos + self._gate_pre_offset(gate)
-
-            connections = ""
-            for l in all_lines:
-                connections += self._line(self.op_count[l] - 1,
-                                          self.op_count[l], line=l)
-            add_str = ""
-            if gate == X:
-                # draw NOT-gate with controls
-                add_str = self._x_gate(lines, ctrl_lines)
-                # and make the target qubit quantum if one of the controls is
-                if not self.is_quantum[lines[0]]:
-                    if sum([self.is_quantum[i] for i in ctrl_lines]) > 0:
-                        self.is_quantum[lines[0]] = True
-            elif gate == Z and len(ctrl_lines) > 0:
-                add_str = self._cz_gate(lines + ctrl_lines)
-            elif gate == Swap:
-                add_str = self._swap_gate(lines, ctrl_lines)
-            elif gate == SqrtSwap:
-                add_str = self._sqrtswap_gate(lines, ctrl_lines,
-                                              daggered=False)
-            elif gate == get_inverse(SqrtSwap):
-                add_str = self._sqrtswap_gate(lines, ctrl_lines, daggered=True)
-            elif gate == Measure:
-                # draw measurement gate
-                for l in lines:
-                    op = self._op(l)
-                    width = self._gate_width(Measure)
-                    height = self._gate_height(Measure)
-                    shift0 = .07 * height
-                    shift1 = .36 * height
-                    shift2 = .1 * width
-                    add_str += ("\n\\node[measure,edgestyle] ({op}) at ({pos}"
-                                ",-{line}) {{}};\n\\draw[edgestyle] ([yshift="
-                                "-{shift1}cm,xshift={shift2}cm]{op}.west) to "
-                                "[out=60,in=180] ([yshift={shift0}cm]{op}."
-                                "center) to [out=0, in=120] ([yshift=-{shift1}"
-                                "cm,xshift=-{shift2}cm]{op}.east);\n"
-                                "\\draw[edgestyle] ([yshift=-{shift1}cm]{op}."
-                                "center) to ([yshift=-{shift2}cm,xshift=-"
-                                "{shift1}cm]{op}.north east);"
-                                ).format(op=op, pos=self.pos[l], line=l,
-                                         shift0=shift0, shift1=shift1,
-                                         shift2=shift2)
-                    self.op_count[l] += 1
-                    self.pos[l] += (self._gate_width(gate) +
-                                    self._gate_offset(gate))
-                    self.is_quantum[l] = False
-            elif gate == Allocate:
-                # draw 'begin line'
-                add_str = "\n\\node[none] ({}) at ({},-{}) {{$\\Ket{{0}}{}$}};"
-                id_str = ""
-                if self.settings['gates']['AllocateQubitGate']['draw_id']:
-                    id_str = "^{{\\textcolor{{red}}{{{}}}}}".format(cmds[i].id)
-                xpos = self.pos[line]
-                try:
-                    if (self.settings['gates']['AllocateQubitGate']
-                                     ['allocate_at_zero']):
-                        self.pos[line] -= self._gate_pre_offset(gate)
-                        xpos = self._gate_pre_offset(gate)
-                except KeyError:
-                    pass
-                self.pos[line] = max(xpos + self._gate_offset(gate) +
-                                     self._gate_width(gate), self.pos[line])
-                add_str = add_str.format(self._op(line), xpos, line,
-                                         id_str)
-                self.op_count[line] += 1
-                self.is_quantum[line] = self.settings['lines']['init_quantum']
-            elif gate == Deallocate:
-                # draw 'end of line'
-                op = self._op(line)
-                add_str = "\n\\node[none] ({}) at ({},-{}) {{}};"
-                add_str = add_str.format(op, self.pos[line], line)
-                yshift = str(self._gate_height(gate)) + "cm]"
-                add_str += ("\n\\draw ([yshift={yshift}{op}.center) edge "
-                            "[edgestyle] ([yshift=-{yshift}{op}.center);"
-                            ).format(op=op, yshift=yshift)
-                self.op_count[line] += 1
-                self.pos[line] += (self._gate_width(gate) +
-                                   self._gate_offset(gate))
-            else:
-                # regular gate must draw the lines it does not act upon
-                # if it spans multiple qubits
-                add_str = self._regular_gate(gate, lines, ctrl_lines)
-                for l in lines:
-                    self.is_quantum[l] = True
-
-            tikz_code.append(add_str)
-            if not gate == Allocate:
-                tikz_code.append(connections)
+            tikz_code.append(self._draw_item(line, cmds[i]))
 
         circuit[line] = circuit[line][end:]
         return "".join(tikz_code)
 
+    def _draw_item(self, line, item):
+        """
+        Generate the TikZ code for one gate (assuming that all previous gates
+        acting on its lines have been drawn).
+
+        Args:
+            line (int): Line on which the gate has been encountered.
+            item (CircuitItem): Gate to draw.
+
+        Returns:
+            tikz_code (string): TikZ code representing the gate.
+        """
+        gate = item.gate
+        lines = item.lines
+        ctrl_lines = item.ctrl_lines
+
+        all_lines = lines + ctrl_lines
+        pos = max([self.pos[l] for l in range(min(all_lines),
+                                              max(all_lines) + 1)])
+        for l in range(min(all_lines), max(all_lines) + 1):
+            self.pos[l] = pos + self._gate_pre_offset(gate)
+
+        connections = ""
+        for l in all_lines:
+            connections += self._line(self.op_count[l] - 1,
+                                      self.op_count[l], line=l)
+        add_str = ""
+        if gate == X:
+            # draw NOT-gate with controls
+            add_str = self._x_gate(lines, ctrl_lines)
+            # and make the target qubit quantum if one of the controls is
+            if not self.is_quantum[lines[0]]:
+                if sum([self.is_quantum[i] for i in ctrl_lines]) > 0:
+                    self.is_quantum[lines[0]] = True
+        elif gate == Z and len(ctrl_lines) > 0:
+            add_str = self._cz_gate(lines + ctrl_lines)
+        elif gate == Swap:
+            add_str = self._swap_gate(lines, ctrl_lines)
+        elif gate == SqrtSwap:
+            add_str = self._sqrtswap_gate(lines, ctrl_lines,
+                                          daggered=False)
+        elif gate == get_inverse(SqrtSwap):
+            add_str = self._sqrtswap_gate(lines, ctrl_lines, daggered=True)
+        elif gate == Measure:
+            # draw measurement gate
+            for l in lines:
+                op = self._op(l)
+                width = self._gate_width(Measure)
+                height = self._gate_height(Measure)
+                shift0 = .07 * height
+                shift1 = .36 * height
+                shift2 = .1 * width
+                add_str += ("\n\\node[measure,edgestyle] ({op}) at ({pos}"
+                            ",-{line}) {{}};\n\\draw[edgestyle] ([yshift="
+                            "-{shift1}cm,xshift={shift2}cm]{op}.west) to "
+                            "[out=60,in=180] ([yshift={shift0}cm]{op}."
+                            "center) to [out=0, in=120] ([yshift=-{shift1}"
+                            "cm,xshift=-{shift2}cm]{op}.east);\n"
+                            "\\draw[edgestyle] ([yshift=-{shift1}cm]{op}."
+                            "center) to ([yshift=-{shift2}cm,xshift=-"
+                            "{shift1}cm]{op}.north east);"
+                            ).format(op=op, pos=self.pos[l], line=l,
+                                     shift0=shift0, shift1=shift1,
+                                     shift2=shift2)
+                self.op_count[l] += 1
+                self.pos[l] += (self._gate_width(gate) +
+                                self._gate_offset(gate))
+                self.is_quantum[l] = False
+        elif gate == Allocate:
+            # draw 'begin line'
+            add_str = "\n\\node[none] ({}) at ({},-{}) {{$\\Ket{{0}}{}$}};"
+            id_str = ""
+            if self.settings['gates']['AllocateQubitGate']['draw_id']:
+                id_str = "^{{\\textcolor{{red}}{{{}}}}}".format(item.id)
+            xpos = self.pos[line]
+            try:
+                if (self.settings['gates']['AllocateQubitGate']
+                                 ['allocate_at_zero']):
+                    self.pos[line] -= self._gate_pre_offset(gate)
+                    xpos = self._gate_pre_offset(gate)
+            except KeyError:
+                pass
+            self.pos[line] = max(xpos + self._gate_offset(gate) +
+                                 self._gate_width(gate), self.pos[line])
+            add_str = add_str.format(self._op(line), xpos, line,
+                                     id_str)
+            self.op_count[line] += 1
+            self.is_quantum[line] = self.settings['lines']['init_quantum']
+        elif gate == Deallocate:
+            # draw 'end of line'
+            op = self._op(line)
+            add_str = "\n\\node[none] ({}) at ({},-{}) {{}};"
+            add_str = add_str.format(op, self.pos[line], line)
+            yshift = str(self._gate_height(gate)) + "cm]"
+            add_str += ("\n\\draw ([yshift={yshift}{op}.center) edge "
+                        "[edgestyle] ([yshift=-{yshift}{op}.center);"
+                        ).format(op=op, yshift=yshift)
+            self.op_count[line] += 1
+            self.pos[line] += (self._gate_width(gate) +
+                               self._gate_offset(gate))
+        else:
+            # regular gate must draw the lines it does not act upon
+            # if it spans multiple qubits
+            add_str = self._regular_gate(gate, lines, ctrl_lines)
+            for l in lines:
+                self.is_quantum[l] = True
+
+        if not gate == Allocate:
+            add_str += connections
+        return add_str
+
     def _gate_name(self, gate):
         """
         Return the string representation of the gate.
@@ -782,3 +819,76 @@ class _Circ2Tikz(object):
         for l in range(min(ctrl_lines + lines), max(ctrl_lines + lines) + 1):
             self.pos[l] = pos + delta_pos + gate_width
         return tex_str
+
+
+class _StreamingCirc2Tikz(_Circ2Tikz):
+    """
+    Converts the gates of a circuit to TikZ code one at a time (in the order
+    in which they are applied), such that the circuit does not have to be
+    kept in memory.
+
+    Once the gates reach the page width, the current tikzpicture is ended
+    and the circuit continues on a new one (i.e., on a new page of a
+    document with the header _header(settings, pages=True)).
+    """
+    def __init__(self, settings, page_width):
+        """
+        Initialize a streaming converter.
+
+        Args:
+            settings (dict): Dictionary of settings to use for the TikZ image.
+            page_width (float): Width after which a new page is started.
+        """
+        _Circ2Tikz.__init__(self, settings, 0)
+        self.page_width = page_width
+        self.num_pages = 1
+        # lines with an allocated qubit
+        self._active_lines = set()
+
+    def _add_lines(self, num_lines):
+        while len(self.pos) < num_lines:
+            self.pos.append(0.)
+            self.op_count.append(0)
+            self.is_quantum.append(self.settings['lines']['init_quantum'])
+
+    def draw(self, item):
+        """
+        Return the TikZ code for a gate (and for a page break, if the gate
+        reaches the page width).
+
+        Args:
+            item (CircuitItem): Gate to draw.
+        """
+        all_lines = item.lines + item.ctrl_lines
+        self._add_lines(max(all_lines) + 1)
+        if item.gate == Allocate:
+            self._active_lines.add(item.lines[0])
+        elif item.gate == Deallocate:
+            self._active_lines.discard(item.lines[0])
+        tikz_code = self._draw_item(item.lines[0], item)
+        if max(self.pos[l] for l in range(min(all_lines),
+                                          max(all_lines) + 1)) >= \
+                self.page_width:
+            tikz_code += self._new_page()
+        return tikz_code
+
+    def _new_page(self):
+        """
+        Return the TikZ code which ends all active lines at the end of the
+        current page and continues them at the start of the next one.
+        """
+        end = max(self.pos)
+        node_str = "\n\\node[none] ({}) at ({},-{}) {{}};"
+        tikz_code = []
+        for line in sorted(self._active_lines):
+            tikz_code.append(node_str.format(self._op(line), end, line))
+            tikz_code.append(self._line(self.op_count[line] - 1,
+                                        self.op_count[line], line=line))
+            self.op_count[line] += 1
+        tikz_code.append("\n\n\\end{tikzpicture}\n" + _PICTURE)
+        for line in sorted(self._active_lines):
+            tikz_code.append(node_str.format(self._op(line), 0., line))
+            self.op_count[line] += 1
+        self.pos = [0.] * len(self.pos)
+        self.num_pages += 1
+        return "".join(tikz_code)
@@ -41,6 +41,12 @@ import projectq.backends._circuits._to_latex as _to_latex
 import projectq.backends._circuits._drawer as _drawer
 
 
+# The default settings are written to settings.json in the working directory
+@pytest.fixture(autouse=True)
+def settings_in_tmpdir(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+
+
 def test_tolatex():
     old_header = _to_latex._header
     old_body = _to_latex._body
@@ -99,6 +105,11 @@ def test_header():
     assert 'minimum height=1cm' in header
     assert 'minimum height=0cm' in header
 
+    # with pages, the styles are defined outside of the pictures
+    header = _to_latex._header(settings, pages=True)
+    assert header.startswith("\\documentclass[tikz]{standalone}")
+    assert header.index("tikzstyle") < header.index("begin{tikzpicture}")
+
 
 def test_large_gates():
     drawer = _drawer.CircuitDrawer()
@@ -0,0 +1,306 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Contains the CloudBackend, the base class of the back-ends which run circuits
+on a remote device (IBM and Rigetti).
+"""
+
+import random
+
+from projectq.cengines import BasicEngine
+from projectq.backends._jobs import default_poller, JobFuture
+from projectq.backends._result_cache import ResultCache
+
+
+class CloudBackend(BasicEngine):
+    """
+    Base class of the back-ends which run circuits on a remote device.
+
+    Runs the compiled circuit (program) of each call to eng.flush(), either
+    synchronously, asynchronously or in batches, looks up and stores the
+    results in the result cache and registers the measurement results in the
+    main engine.
+
+    Derived classes call _run_program with the program of a circuit and
+    implement _send, _retrieve, _submit and _get_counts.
+
+    Attributes:
+        futures (list<JobFuture>): Futures of all circuits which have been
+            submitted asynchronously or in a batch (in the order of
+            submission). Their results are the probabilities of the circuits.
+            The measurement results of a circuit are registered in the main
+            engine once the result of its future is retrieved (in the calling
+            thread). The job_id of circuits whose result has been found in
+            the result cache is None.
+    """
+    def __init__(self, num_runs, verbose, retrieve_execution, asynchronous,
+                 poller, batch_size, result_cache):
+        """
+        Initialize the CloudBackend (see the derived classes for the
+        arguments).
+
+        Raises:
+            ValueError: If retrieve_execution is used with batch_size > 1
+                (all circuits of a batch would get the result of one job).
+        """
+        BasicEngine.__init__(self)
+        if retrieve_execution is not None and batch_size > 1:
+            raise ValueError("retrieve_execution cannot be used with "
+                             "batch_size > 1.")
+        self._num_runs = num_runs
+        self._verbose = verbose
+        self._probabilities = dict()
+        # key: logical id of a measured qubit, value: its physical location
+        # in the circuit whose probabilities are stored
+        self._locations = dict()
+        self._retrieve_execution = retrieve_execution
+        self._asynchronous = asynchronous
+        self._poller = poller if poller is not None else default_poller
+        self._batch_size = batch_size
+        # (program, locations of the measured qubits) of the circuits which
+        # have not been submitted yet
+        self._pending_circuits = []
+        self._result_cache = result_cache
+        self.futures = []
+
+    def _run_program(self, program, locations):
+        """
+        Run the program of a circuit (or add it to the pending batch).
+
+        Args:
+            program (str): Compiled circuit (e.g., QASM or Quil).
+            locations (dict): Key is the logical id of a measured qubit,
+                value is its physical location. (The mapping may change
+                before the result of an asynchronous or batched job is
+                received.)
+        """
+        if self._asynchronous or self._batch_size > 1:
+            self._pending_circuits.append((program, locations))
+            if len(self._pending_circuits) >= self._batch_size:
+                self.submit_batch()
+            return
+
+        res = self._cached_result(program)
+        cached = res is not None
+        try:
+            if cached:
+                pass
+            elif self._retrieve_execution is None:
+                res = self._send(program)
+            else:
+                res = self._retrieve(self._retrieve_execution)
+
+            self._register_result(self._get_probabilities(res), locations)
+            if not cached:
+                self._cache_result(program, res)
+        except TypeError:
+            raise Exception("Failed to run the circuit. Aborting.")
+
+    def submit_batch(self):
+        """
+        Submit all circuits which have been flushed but not submitted yet and
+        add their futures to self.futures.
+
+        Circuits whose result is found in the result cache are not
+        submitted; their futures are resolved right away.
+
+        If the back-end is not run asynchronously, this waits for the results
+        and registers the measurement results of all circuits of the batch.
+
+        Returns:
+            List of the futures (JobFuture) of the submitted circuits.
+        """
+        circuits = self._pending_circuits
+        self._pending_circuits = []
+        cached = [self._cached_result(program) for program, _ in circuits]
+        submitted = [program for (program, _), res in zip(circuits, cached)
+                     if res is None]
+        job_ids = []
+        add_to_poller = None
+        if len(submitted) > 0:
+            job_ids, add_to_poller = self._submit(submitted)
+
+        futures = []
+        job_ids = iter(job_ids)
+        for (program, locations), res in zip(circuits, cached):
+            if res is None:
+                future = JobFuture(next(job_ids),
+                                   self._result_processor(program),
+                                   self._result_registrar(locations))
+            else:
+                future = JobFuture(None, self._result_processor(),
+                                   self._result_registrar(locations))
+            futures.append(future)
+        self.futures.extend(futures)
+        if add_to_poller is not None:
+            add_to_poller([future for future, res in zip(futures, cached)
+                           if res is None])
+        for future, res in zip(futures, cached):
+            if res is not None:
+                future.set_result(res)
+        if not self._asynchronous:
+            for future in futures:
+                future.result()
+        return futures
+
+    def _result_processor(self, program=None):
+        """
+        Return a function which determines the probabilities from the result
+        of a circuit. It is called in the thread of the poller, hence it does
+        not access the main engine or the state of the back-end.
+
+        Args:
+            program (str): Program of the circuit if its result has to be
+                stored in the result cache.
+        """
+        def process(res):
+            probabilities = self._get_probabilities(res)
+            if program is not None:
+                self._cache_result(program, res)
+            return probabilities
+        return process
+
+    def _result_registrar(self, locations):
+        """
+        Return a function which registers the probabilities of a circuit
+        whose measured qubits are at the given physical locations. It is
+        called in the thread which retrieves the result of the future.
+
+        Args:
+            locations (dict): Key is the logical id of a measured qubit,
+                value is its physical location.
+        """
+        return lambda probabilities: self._register_result(probabilities,
+                                                           locations)
+
+    def _cached_result(self, program):
+        """
+        Return the result of the circuit stored in the result cache (or
+        None).
+        """
+        if self._result_cache is None:
+            return None
+        return self._result_cache.get(ResultCache.key(self.device, program,
+                                                      self._num_runs))
+
+    def _cache_result(self, program, res):
+        """
+        Store the result of the circuit in the result cache.
+        """
+        if self._result_cache is not None:
+            self._result_cache.set(ResultCache.key(self.device, program,
+                                                   self._num_runs), res)
+
+    def _get_probabilities(self, res):
+        """
+        Return the probabilities (dict, see get_probabilities) of the
+        measured states in the result of a job.
+
+        Args:
+            res: Result of the job received from the remote device.
+        """
+        counts = self._get_counts(res)
+        probabilities = dict()
+        for state in counts:
+            probability = counts[state] * 1. / self._num_runs
+            state = list(reversed(state))
+            state = "".join(state)
+            probabilities[state] = probability
+        return probabilities
+
+    def _register_result(self, probabilities, locations):
+        """
+        Register a random measurement outcome in the main engine.
+
+        Args:
+            probabilities (dict): Probabilities of the measured states of the
+                circuit, see get_probabilities.
+            locations (dict): Key is the logical id of a measured qubit,
+                value is its physical location.
+        """
+        # Determine random outcome
+        P = random.random()
+        p_sum = 0.
+        measured = ""
+        for state in probabilities:
+            probability = probabilities[state]
+            p_sum += probability
+            star = ""
+            if p_sum >= P and measured == "":
+                measured = state
+                star = "*"
+            if self._verbose and probability > 0:
+                print(str(state) + " with p = " + str(probability) +
+                      star)
+        self._probabilities = probabilities
+        self._locations = locations
+
+        class QB():
+            def __init__(self, ID):
+                self.id = ID
+
+        # register measurement result
+        for ID, location in locations.items():
+            result = int(measured[location])
+            self.main_engine.set_measurement_result(QB(ID), result)
+
+    def _measured_location(self, qb_id):
+        """
+        Return the physical location of a qubit in the circuit whose
+        probabilities are stored (the mapping may have changed since the
+        circuit has been run, e.g., for asynchronous jobs).
+
+        Args:
+            qb_id (int): Logical id of a measured qubit.
+
+        Raises:
+            RuntimeError: If the qubit has not been measured in the circuit.
+        """
+        if qb_id not in self._locations:
+            raise RuntimeError("Unknown qubit id {}. Please make sure "
+                               "eng.flush() was called and that the qubit "
+                               "was measured in the circuit."
+                               .format(qb_id))
+        return self._locations[qb_id]
+
+    def _send(self, program):
+        """
+        Run the program on the remote device and return its result.
+        """
+        raise NotImplementedError
+
+    def _retrieve(self, job_id):
+        """
+        Return the result of a job which has been run before.
+        """
+        raise NotImplementedError
+
+    def _submit(self, programs):
+        """
+        Submit the programs without waiting for their results.
+
+        Returns:
+            Tuple of the list of the job ids of the programs and a function
+            which adds the futures of the programs (list<JobFuture>, in the
+            same order) to the poller.
+        """
+        raise NotImplementedError
+
+    def _get_counts(self, res):
+        """
+        Return the counts (dict) of the measured states in the result of a
+        job.
+        """
+        raise NotImplementedError
@@ -0,0 +1,209 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Tests for projectq.backends._cloud.py (run by the Rigetti back-end)."""
+
+import re
+import threading
+
+import pytest
+
+from projectq import MainEngine
+from projectq.backends import (IBMBackend, JobPoller, ResultCache,
+                               RigettiBackend)
+from projectq.backends._rigetti import _rigetti
+from projectq.cengines import LinearMapper
+from projectq.ops import Measure, X, Z
+from projectq.types import WeakQubitRef
+
+
+# Insure that no HTTP request can be made in all tests in this module
+@pytest.fixture(autouse=True)
+def no_requests(monkeypatch):
+    monkeypatch.delattr("requests.sessions.Session.request")
+
+
+class _FakeForestClient(object):
+    """
+    Stand-in of the functions of the Rigetti HTTP client. The results of all
+    submitted jobs are held back until release() is called. Each program
+    applies X gates to the all-0 state.
+    """
+    def __init__(self, monkeypatch):
+        self.jobs = []
+        self.num_sent = 0
+        self.released = threading.Event()
+        monkeypatch.setattr(_rigetti, "send", self.send)
+        monkeypatch.setattr(_rigetti, "submit_batch", self.submit_batch)
+        monkeypatch.setattr(_rigetti, "poll_result", self.poll_result)
+
+    def release(self):
+        self.released.set()
+
+    def send(self, info, shots=1, **kwargs):
+        self.num_sent += 1
+        return self._run(info['quils'][0]['quil'], shots)
+
+    def submit_batch(self, info, shots=1, **kwargs):
+        execution_ids = []
+        for quil in info['quils']:
+            self.jobs.append((quil['quil'], shots))
+            execution_ids.append(str(len(self.jobs) - 1))
+        return execution_ids
+
+    def poll_result(self, execution_id, user_id, api_key):
+        if not self.released.is_set():
+            return None
+        return self._run(*self.jobs[int(execution_id)])
+
+    @staticmethod
+    def _run(quil, shots):
+        flipped = [int(qubit) for qubit in re.findall(r"(?m)^X (\d+)", quil)]
+        measured = [int(qubit) for qubit in
+                    re.findall(r"(?m)^MEASURE (\d+)", quil)]
+        # one bit per location, the last location first
+        bits = [int(location in flipped)
+                for location in range(max(measured), -1, -1)]
+        return [bits] * shots
+
+
+@pytest.fixture
+def forest(monkeypatch):
+    return _FakeForestClient(monkeypatch)
+
+
+def _run_circuits(backend, flips):
+    eng = MainEngine(backend=backend, engine_list=[LinearMapper(num_qubits=4)])
+    qubits = []
+    for flip in flips:
+        qubit = eng.allocate_qubit()
+        # (circuits without gates are not run by the Rigetti back-end)
+        if flip:
+            X | qubit
+        else:
+            Z | qubit
+        Measure | qubit
+        eng.flush()
+        qubits.append(qubit)
+    return eng, qubits
+
+
+def test_rigetti_synchronous(forest):
+    backend = RigettiBackend(num_runs=10)
+    eng, qubits = _run_circuits(backend, [True])
+    assert forest.num_sent == 1
+    assert int(qubits[0]) == 1
+    assert backend.get_probabilities(qubits[0]) == {'1': 1.}
+    assert backend.futures == []
+
+
+def test_rigetti_asynchronous(forest):
+    poller = JobPoller(interval=0.01)
+    backend = RigettiBackend(asynchronous=True, poller=poller, num_runs=10)
+    eng, qubits = _run_circuits(backend, [False, True, True])
+    # flush returns as soon as the job has been submitted
+    assert [future.job_id for future in backend.futures] == ["0", "1", "2"]
+    assert not any(future.done() for future in backend.futures)
+    assert poller.num_pending == 3
+    registering_threads = set()
+    set_measurement_result = eng.set_measurement_result
+
+    def record_thread(qubit, value):
+        registering_threads.add(threading.current_thread())
+        set_measurement_result(qubit, value)
+    eng.set_measurement_result = record_thread
+    forest.release()
+    for future in backend.futures:
+        assert sorted(future.result(timeout=10).values()) == [1.]
+    assert poller.num_pending == 0
+    assert [int(qubit) for qubit in qubits] == [0, 1, 1]
+    assert forest.num_sent == 0
+    # the results are registered in the calling thread, not in the poller
+    assert registering_threads == set([threading.current_thread()])
+
+
+def test_rigetti_asynchronous_probabilities(forest):
+    poller = JobPoller(interval=0.01)
+    backend = RigettiBackend(asynchronous=True, poller=poller, num_runs=10)
+    eng, qubits = _run_circuits(backend, [True])
+    qubit_id = qubits[0][0].id
+    # the mapping changes before the result is retrieved
+    del qubits[:]
+    eng.flush()
+    assert qubit_id not in eng.mapper.current_mapping
+    forest.release()
+    backend.futures[0].result(timeout=10)
+    assert backend.get_probabilities([WeakQubitRef(eng, qubit_id)]) == {
+        '1': 1.}
+    with pytest.raises(RuntimeError):
+        backend.get_probabilities(eng.allocate_qubit())
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_rigetti_batch(forest, asynchronous):
+    poller = JobPoller(interval=0.01)
+    backend = RigettiBackend(asynchronous=asynchronous, poller=poller,
+                             batch_size=2, num_runs=10)
+    if not asynchronous:
+        forest.release()
+    eng, qubits = _run_circuits(backend, [True, False, True])
+    # the first two circuits are submitted at once (one job each)
+    assert len(backend.futures) == 2
+    assert len(forest.jobs) == 2
+    assert backend.submit_batch()[0] is backend.futures[2]
+    assert backend.submit_batch() == []
+    assert [future.job_id for future in backend.futures] == ["0", "1", "2"]
+    forest.release()
+    for future in backend.futures:
+        assert sorted(future.result(timeout=10).values()) == [1.]
+    assert [int(qubit) for qubit in qubits] == [1, 0, 1]
+
+
+def test_rigetti_result_cache(forest):
+    cache = ResultCache()
+    eng, qubits = _run_circuits(RigettiBackend(result_cache=cache), [True])
+    assert int(qubits[0]) == 1
+    # the same compiled circuit is not sent again
+    eng, qubits = _run_circuits(RigettiBackend(result_cache=cache), [True])
+    assert int(qubits[0]) == 1
+    assert forest.num_sent == 1
+    assert (cache.num_hits, cache.num_misses) == (1, 1)
+    _run_circuits(RigettiBackend(result_cache=cache, num_runs=100), [True])
+    assert forest.num_sent == 2
+
+
+def test_rigetti_batch_result_cache(forest):
+    cache = ResultCache()
+    forest.release()
+
+    def run(flips):
+        backend = RigettiBackend(poller=JobPoller(interval=0.01),
+                                 batch_size=len(flips), result_cache=cache)
+        eng, qubits = _run_circuits(backend, flips)
+        return backend, [int(qubit) for qubit in qubits]
+
+    run([False, True])
+    backend, results = run([False, True, False])
+    assert results == [0, 1, 0]
+    # only the new circuit is submitted
+    assert len(forest.jobs) == 3
+    assert [future.job_id for future in backend.futures] == [None, None, "2"]
+    assert len(cache) == 3
+
+
+@pytest.mark.parametrize("backend_class", [IBMBackend, RigettiBackend])
+def test_retrieve_execution_with_batch(backend_class):
+    with pytest.raises(ValueError):
+        backend_class(retrieve_execution="ab1s2", batch_size=2)
+    backend_class(retrieve_execution="ab1s2", asynchronous=True)
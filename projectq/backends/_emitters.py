@@ -0,0 +1,371 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Contains the emitters which translate commands into OpenQASM (QASMEmitter,
+used by the IBM back-end) and Quil (QuilEmitter, used by the Rigetti
+back-end), and a compiler engine which exports a circuit as OpenQASM
+(QASMExporter).
+
+The emitters append the text of each gate to a list (or write it to a
+stream), i.e., the program is only joined once when it is requested. The
+format templates of the gates are computed once per gate class.
+"""
+
+import shutil
+import tempfile
+
+from projectq.cengines import BasicEngine, LastEngineException
+from projectq.meta import get_control_count, LogicalQubitIDTag
+from projectq.ops import (AllocateQubitGate,
+                          BarrierGate,
+                          DaggeredGate,
+                          DeallocateQubitGate,
+                          FlushGate,
+                          HGate,
+                          MeasureGate,
+                          Ph,
+                          Rx,
+                          Ry,
+                          Rz,
+                          SGate,
+                          Sdag,
+                          TGate,
+                          Tdag,
+                          XGate,
+                          YGate,
+                          ZGate)
+from projectq.types import WeakQubitRef
+
+
+def _gate_key(gate, num_controls):
+    """
+    Return the key of the format template of a gate.
+
+    The text of gates with the same key only differs in the qubits (and the
+    angle of rotation gates).
+    """
+    if isinstance(gate, DaggeredGate):
+        return (DaggeredGate, type(gate._gate), num_controls)
+    return (type(gate), None, num_controls)
+
+
+class _ProgramEmitter(object):
+    """
+    Base class of the emitters: translates commands into the text of a
+    program.
+
+    Subclasses define the format templates of the gates and handle all
+    other gates in _emit_other.
+    """
+    # templates of gates without parameters (per gate key, see _gate_key);
+    # the arguments are the ids of the control qubits and of the qubits
+    _templates = dict()
+    # templates of rotation gates; the first argument is the angle
+    _rotation_templates = dict()
+    _measure_template = ""
+
+    def __init__(self, stream=None):
+        """
+        Initialize an emitter.
+
+        Args:
+            stream (file object): Stream to which the program is written.
+                Default is to keep the program in memory (see getvalue).
+        """
+        self._stream = stream
+        self._tokens = []
+        self._empty = True
+
+    def _write(self, text):
+        self._empty = False
+        if self._stream is None:
+            self._tokens.append(text)
+        else:
+            self._stream.write(text)
+
+    def is_empty(self):
+        """
+        Return True if nothing has been emitted (since the last clear).
+        """
+        return self._empty
+
+    def getvalue(self):
+        """
+        Return the program emitted so far (if no stream is used).
+        """
+        if len(self._tokens) > 1:
+            self._tokens = ["".join(self._tokens)]
+        return "".join(self._tokens)
+
+    def clear(self):
+        """
+        Remove the program emitted so far (if no stream is used).
+        """
+        self._tokens = []
+        self._empty = True
+
+    @staticmethod
+    def _format_angle(angle):
+        return str(angle)
+
+    def emit(self, cmd):
+        """
+        Translate a gate (i.e., a command which is neither an allocation nor
+        a measurement) and append it to the program.
+        """
+        gate = cmd.gate
+        ids = [qb.id for qb in cmd.control_qubits]
+        ids.extend(qb.id for qureg in cmd.qubits for qb in qureg)
+        key = _gate_key(gate, len(cmd.control_qubits))
+        template = self._templates.get(key)
+        if template is not None:
+            self._write(template.format(*ids))
+            return
+        template = self._rotation_templates.get(key)
+        if template is not None:
+            self._write(template.format(self._format_angle(gate.angle),
+                                        *ids))
+            return
+        self._emit_other(cmd, ids)
+
+    def measure(self, qb_pos):
+        """
+        Append the measurement of a qubit into the classical bit of the same
+        index.
+        """
+        self._write(self._measure_template.format(qb_pos))
+
+    def _emit_other(self, cmd, ids):
+        raise NotImplementedError
+
+
+class QASMEmitter(_ProgramEmitter):
+    """
+    Translates commands into OpenQASM (without header) using the gate set of
+    the IBM Quantum Experience.
+    """
+    _templates = {(XGate, None, 1): "\ncx q[{}], q[{}];",
+                  (HGate, None, 0): "\nh q[{}];",
+                  (XGate, None, 0): "\nx q[{}];",
+                  (YGate, None, 0): "\ny q[{}];",
+                  (ZGate, None, 0): "\nz q[{}];",
+                  (SGate, None, 0): "\ns q[{}];",
+                  (TGate, None, 0): "\nt q[{}];",
+                  (DaggeredGate, SGate, 0): "\nsdg q[{}];",
+                  (DaggeredGate, TGate, 0): "\ntdg q[{}];"}
+    _rotation_templates = {(Rx, None, 0): "\nu3({}, -pi/2, pi/2) q[{}];",
+                           (Ry, None, 0): "\nu3({}, 0, 0) q[{}];",
+                           (Rz, None, 0): "\nu1({}) q[{}];"}
+    _measure_template = "\nmeasure q[{0}] -> c[{0}];"
+
+    @staticmethod
+    def is_available(cmd):
+        """
+        Return True if the command can be translated, i.e., if it is an X,
+        Y, Z, T, Tdag, S, Sdag, H, rotation gate, barrier, CNOT, measurement,
+        allocation or deallocation.
+        """
+        g = cmd.gate
+        if isinstance(g, XGate) and get_control_count(cmd) <= 1:
+            return True
+        if get_control_count(cmd) == 0:
+            if _gate_key(g, 0) in QASMEmitter._templates:
+                return True
+            if isinstance(g, (Rx, Ry, Rz)):
+                return True
+        if isinstance(g, (MeasureGate, AllocateQubitGate, DeallocateQubitGate,
+                          BarrierGate)):
+            return True
+        return False
+
+    def _emit_other(self, cmd, ids):
+        gate = cmd.gate
+        if isinstance(gate, BarrierGate):
+            self._write("\nbarrier " +
+                        ", ".join("q[{}]".format(qb_id) for qb_id in ids) +
+                        ";")
+            return
+        # rotations, Sdag and Tdag are emitted using the templates
+        assert get_control_count(cmd) == 0
+        self._write("\n{} q[{}];".format(str(gate).lower(), ids[0]))
+
+
+def _quil_templates():
+    """
+    Return the format templates of the gates without parameters and of the
+    rotation gates in Quil (see _ProgramEmitter).
+    """
+    templates = {(XGate, None, 1): "\nCNOT {} {}",
+                 (XGate, None, 2): "\nCCNOT {} {} {}"}
+    for gate_class, inner_class, name in [(HGate, None, "H"),
+                                          (XGate, None, "X"),
+                                          (YGate, None, "Y"),
+                                          (ZGate, None, "Z"),
+                                          (SGate, None, "S"),
+                                          (TGate, None, "T"),
+                                          (DaggeredGate, SGate, "DAGGER S"),
+                                          (DaggeredGate, TGate, "DAGGER T")]:
+        templates.setdefault((gate_class, inner_class, 0),
+                             "\n" + name + " {}")
+        templates.setdefault((gate_class, inner_class, 1),
+                             "\nCONTROLLED " + name + " {} {}")
+    rotation_templates = dict()
+    for gate_class, name in [(Rx, "RX"), (Ry, "RY"), (Rz, "RZ"),
+                             (Ph, "PHASE")]:
+        rotation_templates[(gate_class, None, 0)] = "\n" + name + "({}) {}"
+        rotation_templates[(gate_class, None, 1)] = ("\nCONTROLLED " + name +
+                                                     "({}) {} {}")
+    return templates, rotation_templates
+
+
+class QuilEmitter(_ProgramEmitter):
+    """
+    Translates commands into Quil using the gate set of the Rigetti Forest
+    API.
+    """
+    _templates, _rotation_templates = _quil_templates()
+    _measure_template = "\nMEASURE {0} [{0}]"
+
+    @staticmethod
+    def _format_angle(angle):
+        return str(angle).upper()
+
+    def _emit_other(self, cmd, ids):
+        gate = cmd.gate
+        assert get_control_count(cmd) < 2
+        if isinstance(gate, (Rx, Ry, Rz, Ph)):
+            gate_str = str(gate).upper().replace('PH(', 'PHASE(')
+        elif str(gate) in self._gate_names:
+            gate_str = self._gate_names[str(gate)]
+        else:
+            gate_str = str(gate).upper()
+        if get_control_count(cmd) == 1:
+            self._write("\nCONTROLLED {} {} {}".format(gate_str, ids[0],
+                                                       ids[1]))
+        else:
+            self._write("\n{} {}".format(gate_str, ids[0]))
+
+    _gate_names = {str(Tdag): "DAGGER T",
+                   str(Sdag): "DAGGER S",
+                   str(Ph): "PHASE"}
+
+
+class QASMExporter(BasicEngine):
+    """
+    QASMExporter is a compiler engine which writes the circuit it receives
+    as OpenQASM 2.0 (using the gate set of the IBM Quantum Experience) prior
+    to sending it on to the next compiler engine.
+
+    The gates are written to a temporary file while the circuit is running,
+    i.e., the whole circuit is never kept in memory. The program (with the
+    register declarations for all allocated qubits) is written when the
+    exporter is closed.
+
+    Example:
+        .. code-block:: python
+
+            exporter = QASMExporter("circuit.qasm")
+            eng = MainEngine(exporter, get_engine_list())
+            ...
+            eng.flush()
+            exporter.close()
+    """
+    def __init__(self, filename):
+        """
+        Initialize a QASMExporter.
+
+        Args:
+            filename (str or file object): Name of the file to write (or a
+                file object opened in text mode).
+        """
+        BasicEngine.__init__(self)
+        self._filename = filename
+        self._body = tempfile.TemporaryFile(mode='w+')
+        self._emitter = QASMEmitter(stream=self._body)
+        self.num_qubits = 0
+
+    def is_available(self, cmd):
+        """
+        Specialized implementation of is_available: Returns True if the
+        QASMExporter is the last engine and the command can be translated
+        to OpenQASM (see QASMEmitter.is_available).
+
+        Args:
+            cmd (Command): Command of which to check availability.
+        Returns:
+            availability (bool): True if the next engine can handle the
+                Command (if there is a next engine).
+        """
+        try:
+            return BasicEngine.is_available(self, cmd)
+        except LastEngineException:
+            return QASMEmitter.is_available(cmd)
+
+    def close(self):
+        """
+        Write the program to the file (and close the file if it was opened by
+        the QASMExporter).
+        """
+        if self._body is None:
+            return
+        if hasattr(self._filename, 'write'):
+            qasm_file = self._filename
+        else:
+            qasm_file = open(self._filename, 'w')
+        qasm_file.write("OPENQASM 2.0;\ninclude \"qelib1.inc\";\n"
+                        "qreg q[{nq}];\ncreg c[{nq}];"
+                        .format(nq=self.num_qubits))
+        self._body.seek(0)
+        shutil.copyfileobj(self._body, qasm_file)
+        qasm_file.write("\n")
+        if qasm_file is not self._filename:
+            qasm_file.close()
+        self._body.close()
+        self._body = None
+
+    def _export_cmd(self, cmd):
+        gate = cmd.gate
+        if isinstance(gate, (DeallocateQubitGate, FlushGate)):
+            return
+        if self._body is None:
+            raise ValueError("The QASM file has already been written.")
+        if isinstance(gate, AllocateQubitGate):
+            self.num_qubits = max(self.num_qubits, cmd.qubits[0][0].id + 1)
+        elif isinstance(gate, MeasureGate):
+            for qureg in cmd.qubits:
+                for qubit in qureg:
+                    self._emitter.measure(qubit.id)
+                    if self.is_last_engine:
+                        # There is no back-end, all measurements yield 0
+                        for tag in cmd.tags:
+                            if isinstance(tag, LogicalQubitIDTag):
+                                qubit = WeakQubitRef(qubit.engine,
+                                                     tag.logical_qubit_id)
+                        self.main_engine.set_measurement_result(qubit, 0)
+        else:
+            self._emitter.emit(cmd)
+
+    def receive(self, command_list):
+        """
+        Receive a list of commands from the previous engine, write them to
+        the QASM file, and then send them on to the next engine.
+
+        Args:
+            command_list (list<Command>): List of commands to export.
+        """
+        for cmd in command_list:
+            self._export_cmd(cmd)
+        if not self.is_last_engine:
+            self.send(command_list)
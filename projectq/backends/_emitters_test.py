@@ -0,0 +1,125 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Tests for projectq.backends._emitters.py.
+"""
+
+import pytest
+
+from projectq import MainEngine
+from projectq.cengines import DummyEngine
+from projectq.ops import (All, Barrier, CNOT, Command, Entangle, H, Measure,
+                          Ph, Rx, Ry, Rz, Sdag, T, Tdag, X, Y)
+from projectq.types import WeakQubitRef
+
+from projectq.backends import QASMExporter
+from projectq.backends._emitters import QASMEmitter, QuilEmitter
+
+
+def _cmd(gate, qubit_ids, control_ids=()):
+    qubits = tuple([WeakQubitRef(None, qb_id)] for qb_id in qubit_ids)
+    controls = [WeakQubitRef(None, qb_id) for qb_id in control_ids]
+    return Command(None, gate, qubits, controls)
+
+
+def test_qasm_emitter():
+    emitter = QASMEmitter()
+    assert emitter.is_empty()
+    for cmd in [_cmd(H, [0]), _cmd(X, [1], [0]), _cmd(Tdag, [1]),
+                _cmd(Sdag, [0]), _cmd(Rx(0.5), [0]), _cmd(Ry(0.5), [1]),
+                _cmd(Rz(0.5), [0]), _cmd(Barrier, [0, 1])]:
+        assert QASMEmitter.is_available(cmd)
+        emitter.emit(cmd)
+    emitter.measure(1)
+    assert not emitter.is_empty()
+    assert emitter.getvalue() == ("\nh q[0];\ncx q[0], q[1];\ntdg q[1];"
+                                  "\nsdg q[0];\nu3(0.5, -pi/2, pi/2) q[0];"
+                                  "\nu3(0.5, 0, 0) q[1];\nu1(0.5) q[0];"
+                                  "\nbarrier q[0], q[1];"
+                                  "\nmeasure q[1] -> c[1];")
+    assert emitter.getvalue() == emitter.getvalue()
+    emitter.clear()
+    assert emitter.is_empty() and emitter.getvalue() == ""
+    assert not QASMEmitter.is_available(_cmd(Y, [1], [0]))
+    assert not QASMEmitter.is_available(_cmd(Ph(0.5), [0]))
+
+
+def test_quil_emitter(tmpdir):
+    stream = tmpdir.join("program.quil").open("w+")
+    emitter = QuilEmitter(stream=stream)
+    for cmd in [_cmd(X, [1], [0]), _cmd(X, [2], [0, 1]), _cmd(T, [0]),
+                _cmd(Tdag, [1], [0]), _cmd(Y, [1], [0]),
+                _cmd(Rx(0.5), [0]), _cmd(Rz(0.5), [1], [0]),
+                _cmd(Ph(0.5), [2])]:
+        emitter.emit(cmd)
+    emitter.measure(2)
+    stream.seek(0)
+    assert stream.read() == ("\nCNOT 0 1\nCCNOT 0 1 2\nT 0"
+                             "\nCONTROLLED DAGGER T 0 1"
+                             "\nCONTROLLED Y 0 1\nRX(0.5) 0"
+                             "\nCONTROLLED RZ(0.5) 0 1\nPHASE(0.5) 2"
+                             "\nMEASURE 2 [2]")
+    assert emitter.getvalue() == ""
+    # gates which have no template
+    emitter = QuilEmitter()
+    emitter.emit(_cmd(Entangle, [0]))
+    assert emitter.getvalue() == "\nENTANGLE 0"
+    with pytest.raises(AssertionError):
+        emitter.emit(_cmd(Entangle, [0], [1, 2]))
+
+
+def test_qasm_exporter_last_engine(tmpdir):
+    filename = str(tmpdir.join("circuit.qasm"))
+    exporter = QASMExporter(filename)
+    eng = MainEngine(exporter, [])
+    qureg = eng.allocate_qureg(2)
+    H | qureg[0]
+    CNOT | (qureg[0], qureg[1])
+    Rz(0.5) | qureg[1]
+    All(Measure) | qureg
+    assert [int(qubit) for qubit in qureg] == [0, 0]
+    eng.flush()
+    assert not exporter.is_available(Command(eng, Y, ([qureg[0]],),
+                                             [qureg[1]]))
+    exporter.close()
+    exporter.close()
+    with open(filename) as qasm_file:
+        assert qasm_file.read() == ("OPENQASM 2.0;\ninclude \"qelib1.inc\";"
+                                    "\nqreg q[2];\ncreg c[2];\nh q[0];"
+                                    "\ncx q[0], q[1];\nu1(0.5) q[1];"
+                                    "\nmeasure q[0] -> c[0];"
+                                    "\nmeasure q[1] -> c[1];\n")
+    with pytest.raises(ValueError):
+        H | qureg[0]
+
+
+def test_qasm_exporter_forwards_commands(tmpdir):
+    qasm_file = tmpdir.join("circuit.qasm").open("w+")
+    exporter = QASMExporter(qasm_file)
+    backend = DummyEngine(save_commands=True)
+    backend.is_last_engine = True
+    eng = MainEngine(backend, [exporter])
+    qubit = eng.allocate_qubit()
+    X | qubit
+    # availability is decided by the next engine
+    assert exporter.is_available(Command(eng, Y, ([qubit[0]],), [qubit[0]]))
+    del qubit
+    eng.flush(deallocate_qubits=True)
+    exporter.close()
+    # files which have been passed as file objects are not closed
+    qasm_file.seek(0)
+    assert qasm_file.read() == ("OPENQASM 2.0;\ninclude \"qelib1.inc\";"
+                                "\nqreg q[1];\ncreg c[1];\nx q[0];\n")
+    assert len(backend.received_commands) == 4
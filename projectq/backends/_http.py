@@ -0,0 +1,139 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Contains the HTTP helpers shared by the clients of the cloud back-ends (IBM
+and Rigetti): a pooled requests.Session, a cache of authentication tokens and
+the backoff between two polls of a job.
+"""
+
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+try:
+    from urllib3.util.retry import Retry
+except ImportError:  # pragma: no cover
+    from requests.packages.urllib3.util.retry import Retry
+
+
+_timer = getattr(time, 'monotonic', time.time)
+
+
+def make_session(pool_maxsize=10, num_retries=3, backoff_factor=0.5):
+    """
+    Return a requests.Session which keeps its connections alive (such that
+    polling a job does not open a new TCP/TLS connection per request).
+
+    Idempotent requests (e.g., GET) are retried with exponential backoff on
+    connection errors and if the server is busy (status 429, 500, 502, 503 or
+    504). POST requests (e.g., job submissions) are never retried since this
+    could submit a job twice.
+
+    Args:
+        pool_maxsize (int): Number of connections kept alive per host.
+        num_retries (int): Maximal number of retries of a request.
+        backoff_factor (float): The n-th retry waits backoff_factor *
+            2 ** (n - 1) seconds.
+    """
+    retry = Retry(total=num_retries, backoff_factor=backoff_factor,
+                  status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# session shared by the clients of all cloud back-ends
+session = make_session()
+
+
+def backoff(interval, max_interval, factor=2., jitter=0.5):
+    """
+    Generate the times to wait between two polls of a job.
+
+    The times grow exponentially from interval up to max_interval. Each time
+    is shortened by a random fraction (of at most jitter) such that jobs
+    which have been submitted at the same time are not polled in lockstep.
+
+    Args:
+        interval (float): Time to wait before the second poll (in seconds).
+        max_interval (float): Maximal time to wait (in seconds).
+        factor (float): Growth of the time to wait per poll.
+        jitter (float): Maximal fraction by which a time is shortened.
+    """
+    delay = interval
+    while True:
+        yield delay * (1. - jitter * random.random())
+        delay = min(delay * factor, max_interval)
+
+
+class TokenCache(object):
+    """
+    Thread-safe cache of authentication tokens which expire.
+
+    Tokens are considered expired margin seconds before their actual expiry
+    such that they do not expire while a request is sent.
+    """
+    def __init__(self, margin=60):
+        """
+        Initialize a TokenCache.
+
+        Args:
+            margin (float): Safety margin before the expiry (in seconds).
+        """
+        self.margin = margin
+        # key -> (token, expiry)
+        self._tokens = dict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the token stored for key or None if there is no such token or
+        if it has expired.
+        """
+        with self._lock:
+            if key not in self._tokens:
+                return None
+            token, expiry = self._tokens[key]
+            if _timer() >= expiry - self.margin:
+                del self._tokens[key]
+                return None
+            return token
+
+    def set(self, key, token, ttl):
+        """
+        Store a token which expires in ttl seconds.
+        """
+        with self._lock:
+            self._tokens[key] = (token, _timer() + ttl)
+
+    def discard(self, token):
+        """
+        Remove a token (e.g., if it has been rejected by the server).
+        """
+        with self._lock:
+            for key in [key for key, (stored, _) in self._tokens.items()
+                        if stored == token]:
+                del self._tokens[key]
+
+    def clear(self):
+        """
+        Remove all tokens.
+        """
+        with self._lock:
+            self._tokens.clear()
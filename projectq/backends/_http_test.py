@@ -0,0 +1,98 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Tests for projectq.backends._http.py."""
+
+import threading
+
+import pytest
+
+from projectq.backends import _http
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+
+def test_backoff():
+    delays = _http.backoff(1., 8., jitter=0.5)
+    maxima = [1., 2., 4., 8., 8., 8.]
+    for maximum in maxima:
+        delay = next(delays)
+        assert 0.5 * maximum <= delay <= maximum
+    delays = _http.backoff(1., 8., factor=3., jitter=0.)
+    assert [next(delays) for _ in range(4)] == [1., 3., 8., 8.]
+
+
+def test_token_cache(monkeypatch):
+    now = [100.]
+    monkeypatch.setattr(_http, "_timer", lambda: now[0])
+    cache = _http.TokenCache(margin=10)
+    assert cache.get("user") is None
+    cache.set("user", "token", 60)
+    cache.set("other", "token2", 60)
+    now[0] = 149.
+    assert cache.get("user") == "token"
+    # expires margin seconds before its actual expiry
+    now[0] = 150.
+    assert cache.get("user") is None
+    now[0] = 100.
+    assert cache.get("user") is None
+    cache.set("user", "token", 60)
+    cache.discard("token")
+    assert cache.get("user") is None
+    assert cache.get("other") == "token2"
+    cache.clear()
+    assert cache.get("other") is None
+
+
+def test_session_retries_busy_server(monkeypatch):
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    monkeypatch.setenv("no_proxy", "127.0.0.1")
+    requests_per_method = {"GET": 0, "POST": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, method):
+            requests_per_method[method] += 1
+            # the server is busy at the first request
+            status = 503 if requests_per_method[method] == 1 else 200
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            self._reply("GET")
+
+        def do_POST(self):
+            self._reply("POST")
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = "http://127.0.0.1:{}/".format(server.server_address[1])
+    try:
+        session = _http.make_session(backoff_factor=0)
+        assert session.get(url).status_code == 200
+        assert requests_per_method["GET"] == 2
+        # job submissions are not retried
+        assert session.post(url).status_code == 503
+        assert requests_per_method["POST"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
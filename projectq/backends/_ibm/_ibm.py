@@ -14,39 +14,52 @@
 
 """ Back-end to run quantum program on IBM's Quantum Experience."""
 
-import random
 import json
 
-from projectq.cengines import BasicEngine
-from projectq.meta import get_control_count, LogicalQubitIDTag
-from projectq.ops import (NOT,
-                          Y,
-                          Z,
-                          T,
-                          Tdag,
-                          S,
-                          Sdag,
-                          H,
-                          Rx,
-                          Ry,
-                          Rz,
-                          Measure,
+from projectq.meta import LogicalQubitIDTag
+from projectq.ops import (Measure,
                           Allocate,
                           Deallocate,
-                          Barrier,
                           FlushGate)
 
-from ._ibm_http_client import send, retrieve
+from projectq.backends._cloud import CloudBackend
+from projectq.backends._emitters import QASMEmitter
+from ._ibm_http_client import (send, retrieve, submit, poll_results,
+                               _authenticate)
 
 
-class IBMBackend(BasicEngine):
+class IBMBackend(CloudBackend):
     """
     The IBM Backend class, which stores the circuit, transforms it to JSON
     QASM, and sends the circuit through the IBM API.
+
+    Several circuits (i.e., the circuits of several calls to eng.flush()) can
+    be sent as one job, such that authentication, submission and queueing
+    are only paid once, e.g., for parameter sweeps:
+
+    .. code-block:: python
+
+        backend = IBMBackend(batch_size=10)
+        eng = MainEngine(backend, ...)
+        for angle in angles:
+            ...  # run the circuit for this angle
+            eng.flush()  # submits the job every 10 circuits
+        backend.submit_batch()  # submits the remaining circuits
+        results = [future.result() for future in backend.futures]
+
+    Attributes:
+        futures (list<JobFuture>): Futures of all circuits which have been
+            submitted asynchronously or in a batch (in the order of
+            submission). Their results are the probabilities of the circuits.
+            The measurement results of a circuit are registered in the main
+            engine once the result of its future is retrieved (in the calling
+            thread). The job_id of circuits whose result has been found in
+            the result cache is None.
     """
     def __init__(self, use_hardware=False, num_runs=1024, verbose=False,
                  user=None, password=None, device='ibmqx4',
-                 retrieve_execution=None):
+                 retrieve_execution=None, asynchronous=False, poller=None,
+                 batch_size=1, result_cache=None):
         """
         Initialize the Backend object.
 
@@ -64,22 +77,36 @@ class IBMBackend(BasicEngine):
                 if use_hardware is set to True. Default is ibmqx4.
             retrieve_execution (int): Job ID to retrieve instead of re-
                 running the circuit (e.g., if previous run timed out).
+                Cannot be used with batch_size > 1.
+            asynchronous (bool): If True, eng.flush() only submits the job
+                and returns immediately. The measurement results are
+                registered once the result of the future of the circuit has
+                been retrieved (see futures).
+            poller (JobPoller): Poller of the results of asynchronous jobs.
+                Default is a poller shared by all back-ends.
+            batch_size (int): Number of circuits which are sent as one job.
+                The measurement results of a circuit are only registered
+                once its batch has been run. Use submit_batch() to submit an
+                incomplete batch.
+            result_cache (ResultCache): Cache of the results of circuits
+                which have been run before. Circuits whose result is found
+                are not sent to the IBM API.
+
+        Raises:
+            ValueError: If retrieve_execution is used with batch_size > 1.
         """
-        BasicEngine.__init__(self)
+        CloudBackend.__init__(self, num_runs, verbose, retrieve_execution,
+                              asynchronous, poller, batch_size, result_cache)
         self._reset()
         if use_hardware:
             self.device = device
         else:
             self.device = 'simulator'
-        self._num_runs = num_runs
-        self._verbose = verbose
         self._user = user
         self._password = password
-        self._probabilities = dict()
-        self.qasm = ""
+        self._emitter = QASMEmitter()
         self._measured_ids = []
         self._allocated_qubits = set()
-        self._retrieve_execution = retrieve_execution
 
     def is_available(self, cmd):
         """
@@ -91,17 +118,15 @@ class IBMBackend(BasicEngine):
         Args:
             cmd (Command): Command for which to check availability
         """
-        g = cmd.gate
-        if g == NOT and get_control_count(cmd) <= 1:
-            return True
-        if get_control_count(cmd) == 0:
-            if g in (T, Tdag, S, Sdag, H, Y, Z):
-                return True
-            if isinstance(g, (Rx, Ry, Rz)):
-                return True
-        if g in (Measure, Allocate, Deallocate, Barrier):
-            return True
-        return False
+        return QASMEmitter.is_available(cmd)
+
+    @property
+    def qasm(self):
+        """
+        QASM of the gates stored since the last flush (without header and
+        measurements).
+        """
+        return self._emitter.getvalue()
 
     def _reset(self):
         """ Reset all temporary variables (after flush gate). """
@@ -112,7 +137,8 @@ class IBMBackend(BasicEngine):
         """
         Temporarily store the command cmd.
 
-        Translates the command and stores it in a local variable (self._cmds).
+        Translates the command and appends it to the QASM of the circuit
+        (see QASMEmitter).
 
         Args:
             cmd: Command to store
@@ -120,7 +146,7 @@ class IBMBackend(BasicEngine):
         if self._clear:
             self._probabilities = dict()
             self._clear = False
-            self.qasm = ""
+            self._emitter.clear()
             self._allocated_qubits = set()
 
         gate = cmd.gate
@@ -142,33 +168,8 @@ class IBMBackend(BasicEngine):
                     break
             assert logical_id is not None
             self._measured_ids += [logical_id]
-        elif gate == NOT and get_control_count(cmd) == 1:
-            ctrl_pos = cmd.control_qubits[0].id
-            qb_pos = cmd.qubits[0][0].id
-            self.qasm += "\ncx q[{}], q[{}];".format(ctrl_pos, qb_pos)
-        elif gate == Barrier:
-            qb_pos = [qb.id for qr in cmd.qubits for qb in qr]
-            self.qasm += "\nbarrier "
-            qb_str = ""
-            for pos in qb_pos:
-                qb_str += "q[{}], ".format(pos)
-            self.qasm += qb_str[:-2] + ";"
-        elif isinstance(gate, (Rx, Ry, Rz)):
-            assert get_control_count(cmd) == 0
-            qb_pos = cmd.qubits[0][0].id
-            u_strs = {'Rx': 'u3({}, -pi/2, pi/2)', 'Ry': 'u3({}, 0, 0)',
-                      'Rz': 'u1({})'}
-            gate = u_strs[str(gate)[0:2]].format(gate.angle)
-            self.qasm += "\n{} q[{}];".format(gate, qb_pos)
         else:
-            assert get_control_count(cmd) == 0
-            if str(gate) in self._gate_names:
-                gate_str = self._gate_names[str(gate)]
-            else:
-                gate_str = str(gate).lower()
-
-            qb_pos = cmd.qubits[0][0].id
-            self.qasm += "\n{} q[{}];".format(gate_str, qb_pos)
+            self._emitter.emit(cmd)
 
     def _logical_to_physical(self, qb_id):
         """
@@ -209,7 +210,7 @@ class IBMBackend(BasicEngine):
         Raises:
             RuntimeError: If no data is available (i.e., if the circuit has
                 not been executed). Or if a qubit was supplied which was not
-                present in the circuit (might have gotten optimized away).
+                measured in the circuit (might have gotten optimized away).
         """
         if len(self._probabilities) == 0:
             raise RuntimeError("Please, run the circuit first!")
@@ -219,7 +220,7 @@ class IBMBackend(BasicEngine):
         for state in self._probabilities:
             mapped_state = ['0'] * len(qureg)
             for i in range(len(qureg)):
-                mapped_state[i] = state[self._logical_to_physical(qureg[i].id)]
+                mapped_state[i] = state[self._measured_location(qureg[i].id)]
             probability = self._probabilities[state]
             probability_dict["".join(mapped_state)] = probability
 
@@ -235,64 +236,66 @@ class IBMBackend(BasicEngine):
         # finally: add measurements (no intermediate measurements are allowed)
         for measured_id in self._measured_ids:
             qb_loc = self.main_engine.mapper.current_mapping[measured_id]
-            self.qasm += "\nmeasure q[{}] -> c[{}];".format(qb_loc,
-                                                            qb_loc)
+            self._emitter.measure(qb_loc)
 
         # return if no operations / measurements have been performed.
-        if self.qasm == "":
+        if self._emitter.is_empty():
             return
 
         max_qubit_id = max(self._allocated_qubits)
-        qasm = ("\ninclude \"qelib1.inc\";\nqreg q[{nq}];\ncreg c[{nq}];" +
-                self.qasm).format(nq=max_qubit_id + 1)
+        qasm = ("\ninclude \"qelib1.inc\";\nqreg q[{nq}];\ncreg c[{nq}];"
+                .format(nq=max_qubit_id + 1) + self._emitter.getvalue())
+
+        locations = dict((measured_id, self._logical_to_physical(measured_id))
+                         for measured_id in self._measured_ids)
+        self._run_program(qasm, locations)
+
+    def _job_info(self, qasms):
+        """
+        Return the JSON QASM of a job which runs the given circuits.
+        """
         info = {}
-        info['qasms'] = [{'qasm': qasm}]
+        info['qasms'] = [{'qasm': qasm} for qasm in qasms]
         info['shots'] = self._num_runs
         info['maxCredits'] = 5
         info['backend'] = {'name': self.device}
-        info = json.dumps(info)
+        return json.dumps(info)
 
-        try:
-            if self._retrieve_execution is None:
-                res = send(info, device=self.device,
-                           user=self._user, password=self._password,
-                           shots=self._num_runs, verbose=self._verbose)
-            else:
-                res = retrieve(device=self.device, user=self._user,
-                               password=self._password,
-                               jobid=self._retrieve_execution)
-
-            counts = res['data']['counts']
-            # Determine random outcome
-            P = random.random()
-            p_sum = 0.
-            measured = ""
-            for state in counts:
-                probability = counts[state] * 1. / self._num_runs
-                state = list(reversed(state))
-                state = "".join(state)
-                p_sum += probability
-                star = ""
-                if p_sum >= P and measured == "":
-                    measured = state
-                    star = "*"
-                self._probabilities[state] = probability
-                if self._verbose and probability > 0:
-                    print(str(state) + " with p = " + str(probability) +
-                          star)
-
-            class QB():
-                def __init__(self, ID):
-                    self.id = ID
-
-            # register measurement result
-            for ID in self._measured_ids:
-                location = self._logical_to_physical(ID)
-                result = int(measured[location])
-                self.main_engine.set_measurement_result(QB(ID), result)
-            self._reset()
-        except TypeError:
-            raise Exception("Failed to run the circuit. Aborting.")
+    def _send(self, qasm):
+        """ Run the circuit via the IBM API and return its result. """
+        return send(self._job_info([qasm]), device=self.device,
+                    user=self._user, password=self._password,
+                    shots=self._num_runs, verbose=self._verbose)
+
+    def _retrieve(self, job_id):
+        """ Return the result of the job with the given id. """
+        return retrieve(device=self.device, user=self._user,
+                        password=self._password, jobid=job_id)
+
+    def _submit(self, qasms):
+        """
+        Submit the circuits as one job (see CloudBackend._submit).
+        """
+        if self._retrieve_execution is None:
+            execution_id, access_token = submit(
+                self._job_info(qasms), device=self.device, user=self._user,
+                password=self._password, shots=self._num_runs,
+                verbose=self._verbose)
+        else:
+            execution_id = self._retrieve_execution
+            access_token = _authenticate(self._user, self._password)[1]
+        if self._verbose:
+            print("- Submitted job with {} circuit(s). [Job ID: {}]"
+                  .format(len(qasms), execution_id))
+
+        def add_to_poller(futures):
+            self._poller.add_batch(
+                futures, lambda: poll_results(execution_id, access_token))
+        return [execution_id] * len(qasms), add_to_poller
+
+    def _get_counts(self, res):
+        """ Return the counts of the measured states in the result. """
+        return res['data']['counts']
 
     def receive(self, command_list):
         """
@@ -308,9 +311,3 @@ class IBMBackend(BasicEngine):
             else:
                 self._run()
                 self._reset()
-
-    """
-    Mapping of gate names from our gate objects to the IBM QASM representation.
-    """
-    _gate_names = {str(Tdag): "tdg",
-                   str(Sdag): "sdg"}
@@ -16,13 +16,25 @@
 # api documentation is at https://qcwi-staging.mybluemix.net/explorer/
 import requests
 import getpass
+import hashlib
+import hmac
 import json
+import os
 import sys
 import time
 from requests.compat import urljoin
 
+from projectq.backends._http import backoff, session as _session, TokenCache
+
 
 _api_url = 'https://quantumexperience.ng.bluemix.net/api/'
+# lifetime of an access token if the server does not specify it
+_default_ttl = 3600
+# access tokens per credentials (see _credentials_key)
+_tokens = TokenCache()
+# random key of this process such that the cache keys cannot be used to
+# recover the passwords
+_credentials_salt = os.urandom(16)
 
 
 class DeviceOfflineError(Exception):
@@ -31,7 +43,7 @@ class DeviceOfflineError(Exception):
 
 def is_online(device):
     url = 'Backends/{}/queue/status'.format(device)
-    r = requests.get(urljoin(_api_url, url))
+    r = _session.get(urljoin(_api_url, url))
     return r.json()['state']
 
 
@@ -66,22 +78,9 @@ def send(info, device='sim_trivial_2', user=None, password=None,
             one measurement result (same behavior as the projectq Simulator).
     """
     try:
-        # check if the device is online
-        if device in ['ibmqx4', 'ibmqx5']:
-            online = is_online(device)
-
-            if not online:
-                print("The device is offline (for maintenance?). Use the "
-                      "simulator instead or try again later.")
-                raise DeviceOfflineError("Device is offline.")
-
-        if verbose:
-            print("- Authenticating...")
-        user_id, access_token = _authenticate(user, password)
-        if verbose:
-            print("- Running code: {}".format(
-                json.loads(info)['qasms'][0]['qasm']))
-        execution_id = _run(info, device, user_id, access_token, shots)
+        execution_id, access_token = submit(info, device=device, user=user,
+                                            password=password, shots=shots,
+                                            verbose=verbose)
         if verbose:
             print("- Waiting for results...")
         res = _get_result(device, execution_id, access_token)
@@ -99,11 +98,107 @@ def send(info, device='sim_trivial_2', user=None, password=None,
         print(err)
 
 
+def submit(info, device='sim_trivial_2', user=None, password=None,
+           shots=1, verbose=False):
+    """
+    Sends QASM through the IBM API without waiting for the results.
+
+    Args:
+        info: Contains QASM representation of the circuit to run.
+        device (str): Either 'simulator', 'ibmqx4', or 'ibmqx5'.
+        user (str): IBM quantum experience user.
+        password (str): IBM quantum experience user password.
+        shots (int): Number of runs of the same circuit to collect statistics.
+        verbose (bool): If True, additional information is printed.
+
+    Returns:
+        Tuple (execution_id, access_token) to poll the results (see
+        poll_result and poll_results).
+    """
+    # check if the device is online
+    if device in ['ibmqx4', 'ibmqx5']:
+        online = is_online(device)
+
+        if not online:
+            print("The device is offline (for maintenance?). Use the "
+                  "simulator instead or try again later.")
+            raise DeviceOfflineError("Device is offline.")
+
+    if verbose:
+        print("- Authenticating...")
+    user_id, access_token = _authenticate(user, password)
+    if verbose:
+        for qasm in json.loads(info)['qasms']:
+            print("- Running code: {}".format(qasm['qasm']))
+    try:
+        execution_id = _run(info, device, user_id, access_token, shots)
+    except requests.exceptions.HTTPError as err:
+        if err.response is None or err.response.status_code != 401:
+            raise
+        # the cached access token has been revoked, log in again
+        _tokens.discard((user_id, access_token))
+        user_id, access_token = _authenticate(user, password)
+        execution_id = _run(info, device, user_id, access_token, shots)
+    return execution_id, access_token
+
+
+def poll_result(execution_id, access_token):
+    """
+    Returns the result of a job or None if it has not finished yet.
+
+    Sends exactly one request to the IBM API.
+
+    Args:
+        execution_id (str): Id of the job (see submit).
+        access_token (str): Access token (see submit).
+    """
+    results = poll_results(execution_id, access_token)
+    if results is None:
+        return None
+    return results[0]
+
+
+def poll_results(execution_id, access_token):
+    """
+    Returns the results of all circuits of a job (in the order in which the
+    circuits were submitted) or None if the job has not finished yet.
+
+    Sends exactly one request to the IBM API.
+
+    Args:
+        execution_id (str): Id of the job (see submit).
+        access_token (str): Access token (see submit).
+    """
+    suffix = 'Jobs/{execution_id}'.format(execution_id=execution_id)
+    r = _session.get(urljoin(_api_url, suffix),
+                     params={"access_token": access_token})
+    r.raise_for_status()
+
+    r_json = r.json()
+    if 'qasms' not in r_json or len(r_json['qasms']) == 0:
+        return None
+    results = [qasm.get('result') for qasm in r_json['qasms']]
+    if any(result is None for result in results):
+        return None
+    return results
+
+
+def _credentials_key(email, password):
+    """
+    Return the key of the credentials in the token cache (the credentials
+    themselves are not stored).
+    """
+    message = u"{}\0{}".format(email, password).encode('utf-8')
+    return hmac.new(_credentials_salt, message, hashlib.sha256).hexdigest()
+
+
 def _authenticate(email=None, password=None):
     """
+    Log in (or reuse the cached access token of the user).
+
     :param email:
     :param password:
-    :return:
+    :return: Tuple (user_id, access_token)
     """
     if email is None:
         try:
@@ -114,13 +209,19 @@ def _authenticate(email=None, password=None):
     if password is None:
         password = getpass.getpass(prompt='IBM QE password > ')
 
-    r = requests.post(urljoin(_api_url, 'users/login'),
+    cached = _tokens.get(_credentials_key(email, password))
+    if cached is not None:
+        return cached
+
+    r = _session.post(urljoin(_api_url, 'users/login'),
                       data={"email": email, "password": password})
     r.raise_for_status()
 
     json_data = r.json()
     user_id = json_data['userId']
     access_token = json_data['id']
+    _tokens.set(_credentials_key(email, password), (user_id, access_token),
+                json_data.get('ttl', _default_ttl))
 
     return user_id, access_token
 
@@ -128,7 +229,7 @@ def _authenticate(email=None, password=None):
 def _run(qasm, device, user_id, access_token, shots):
     suffix = 'Jobs'
 
-    r = requests.post(urljoin(_api_url, suffix),
+    r = _session.post(urljoin(_api_url, suffix),
                       data=qasm,
                       params={"access_token": access_token,
                               "deviceRunType": device,
@@ -143,25 +244,19 @@ def _run(qasm, device, user_id, access_token, shots):
 
 
 def _get_result(device, execution_id, access_token, num_retries=3000,
-                interval=1):
-    suffix = 'Jobs/{execution_id}'.format(execution_id=execution_id)
+                interval=1, max_interval=10):
     status_url = urljoin(_api_url, 'Backends/{}/queue/status'.format(device))
 
     print("Waiting for results. [Job ID: {}]".format(execution_id))
 
+    delays = backoff(interval, max_interval)
     for retries in range(num_retries):
-        r = requests.get(urljoin(_api_url, suffix),
-                         params={"access_token": access_token})
-        r.raise_for_status()
-
-        r_json = r.json()
-        if 'qasms' in r_json:
-            qasm = r_json['qasms'][0]
-            if 'result' in qasm and qasm['result'] is not None:
-                return qasm['result']
-        time.sleep(interval)
+        result = poll_result(execution_id, access_token)
+        if result is not None:
+            return result
+        time.sleep(next(delays))
         if device in ['ibmqx4', 'ibmqx5'] and retries % 60 == 0:
-            r = requests.get(status_url)
+            r = _session.get(status_url)
             r_json = r.json()
             if 'state' in r_json and not r_json['state']:
                 raise DeviceOfflineError("Device went offline. The ID of your "
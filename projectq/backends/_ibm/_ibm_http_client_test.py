@@ -28,6 +28,12 @@ def no_requests(monkeypatch):
     monkeypatch.delattr("requests.sessions.Session.request")
 
 
+# Log in again in every test
+@pytest.fixture(autouse=True)
+def no_cached_tokens():
+    _ibm_http_client._tokens.clear()
+
+
 _api_url = 'https://quantumexperience.ng.bluemix.net/api/'
 _api_url_status = 'https://quantumexperience.ng.bluemix.net/api/'
 
@@ -126,8 +132,10 @@ def test_send_real_device_online_verbose(monkeypatch):
             request_num[0] += 1
             return MockPostResponse({"id": execution_id})
 
-    monkeypatch.setattr("requests.get", mocked_requests_get)
-    monkeypatch.setattr("requests.post", mocked_requests_post)
+    monkeypatch.setattr(_ibm_http_client._session, "get",
+                        mocked_requests_get)
+    monkeypatch.setattr(_ibm_http_client._session, "post",
+                        mocked_requests_post)
     # Patch login data
     password = 12345
     email = "test@projectq.ch"
@@ -163,7 +171,8 @@ def test_send_real_device_offline(monkeypatch):
         status_url = 'Backends/ibmqx4/queue/status'
         if args[0] == urljoin(_api_url_status, status_url):
             return MockResponse({"state": False}, 200)
-    monkeypatch.setattr("requests.get", mocked_requests_get)
+    monkeypatch.setattr(_ibm_http_client._session, "get",
+                        mocked_requests_get)
     shots = 1
     json_qasm = "my_json_qasm"
     name = 'projectq_test'
@@ -193,8 +202,10 @@ def test_send_that_errors_are_caught(monkeypatch):
         # Test that this error gets caught
         raise requests.exceptions.HTTPError
 
-    monkeypatch.setattr("requests.get", mocked_requests_get)
-    monkeypatch.setattr("requests.post", mocked_requests_post)
+    monkeypatch.setattr(_ibm_http_client._session, "get",
+                        mocked_requests_get)
+    monkeypatch.setattr(_ibm_http_client._session, "post",
+                        mocked_requests_post)
     # Patch login data
     password = 12345
     email = "test@projectq.ch"
@@ -234,8 +245,10 @@ def test_send_that_errors_are_caught2(monkeypatch):
         # Test that this error gets caught
         raise requests.exceptions.RequestException
 
-    monkeypatch.setattr("requests.get", mocked_requests_get)
-    monkeypatch.setattr("requests.post", mocked_requests_post)
+    monkeypatch.setattr(_ibm_http_client._session, "get",
+                        mocked_requests_get)
+    monkeypatch.setattr(_ibm_http_client._session, "post",
+                        mocked_requests_post)
     # Patch login data
     password = 12345
     email = "test@projectq.ch"
@@ -275,8 +288,10 @@ def test_send_that_errors_are_caught3(monkeypatch):
         # Test that this error gets caught
         raise KeyError
 
-    monkeypatch.setattr("requests.get", mocked_requests_get)
-    monkeypatch.setattr("requests.post", mocked_requests_post)
+    monkeypatch.setattr(_ibm_http_client._session, "get",
+                        mocked_requests_get)
+    monkeypatch.setattr(_ibm_http_client._session, "post",
+                        mocked_requests_post)
     # Patch login data
     password = 12345
     email = "test@projectq.ch"
@@ -346,8 +361,10 @@ def test_timeout_exception(monkeypatch):
         if args[0] == urljoin(_api_url, 'Jobs'):
             return MockPostResponse({"id": "123e"})
 
-    monkeypatch.setattr("requests.get", mocked_requests_get)
-    monkeypatch.setattr("requests.post", mocked_requests_post)
+    monkeypatch.setattr(_ibm_http_client._session, "get",
+                        mocked_requests_get)
+    monkeypatch.setattr(_ibm_http_client._session, "post",
+                        mocked_requests_post)
     _ibm_http_client.time.sleep = lambda x: x
     with pytest.raises(Exception) as excinfo:
         _ibm_http_client.send(json_qasm,
@@ -407,8 +424,10 @@ def test_retrieve_and_device_offline_exception(monkeypatch):
         if args[0] == urljoin(_api_url, login_url):
             return MockPostResponse({"userId": "1", "id": "12"})
 
-    monkeypatch.setattr("requests.get", mocked_requests_get)
-    monkeypatch.setattr("requests.post", mocked_requests_post)
+    monkeypatch.setattr(_ibm_http_client._session, "get",
+                        mocked_requests_get)
+    monkeypatch.setattr(_ibm_http_client._session, "post",
+                        mocked_requests_post)
     _ibm_http_client.time.sleep = lambda x: x
     with pytest.raises(_ibm_http_client.DeviceOfflineError):
         _ibm_http_client.retrieve(device="ibmqx4",
@@ -466,10 +485,55 @@ def test_retrieve(monkeypatch):
         if args[0] == urljoin(_api_url, login_url):
             return MockPostResponse({"userId": "1", "id": "12"})
 
-    monkeypatch.setattr("requests.get", mocked_requests_get)
-    monkeypatch.setattr("requests.post", mocked_requests_post)
+    monkeypatch.setattr(_ibm_http_client._session, "get",
+                        mocked_requests_get)
+    monkeypatch.setattr(_ibm_http_client._session, "post",
+                        mocked_requests_post)
     _ibm_http_client.time.sleep = lambda x: x
     res = _ibm_http_client.retrieve(device="ibmqx4",
                                     user="test", password="test",
                                     jobid="123e")
     assert res == 'correct'
+
+
+def test_submit_renews_revoked_token(monkeypatch):
+    info = json.dumps({'qasms': [{'qasm': 'my qasm'}]})
+    logins = []
+
+    class MockPostResponse:
+        def __init__(self, json_data, status_code=200):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+        def raise_for_status(self):
+            if self.status_code != 200:
+                raise requests.exceptions.HTTPError(response=self)
+
+    def mocked_requests_post(*args, **kwargs):
+        if args[0] == urljoin(_api_url, "users/login"):
+            logins.append(kwargs["data"]["email"])
+            return MockPostResponse({"userId": "1",
+                                     "id": "token{}".format(len(logins) + 1)})
+        if args[0] == urljoin(_api_url, "Jobs"):
+            if kwargs["params"]["access_token"] == "token1":
+                return MockPostResponse({}, 401)
+            return MockPostResponse({"id": "123e"})
+
+    monkeypatch.setattr(_ibm_http_client._session, "post",
+                        mocked_requests_post)
+    _ibm_http_client._tokens.set(
+        _ibm_http_client._credentials_key("test", "test"), ("1", "token1"),
+        100)
+    assert _ibm_http_client.submit(info, device="simulator", user="test",
+                                   password="test") == ("123e", "token2")
+    assert logins == ["test"]
+    # the new token is cached
+    assert _ibm_http_client._authenticate("test", "test") == ("1", "token2")
+    # the cache is keyed on the credentials without storing the password
+    assert all("test" not in key for key in _ibm_http_client._tokens._tokens)
+    # a different password does not reuse the cached token
+    assert _ibm_http_client._authenticate("test", "other") == ("1", "token3")
+    assert logins == ["test", "test"]
@@ -16,10 +16,15 @@
 
 import pytest
 import json
+import re
+import threading
+
+import requests
 
 import projectq.setups.decompositions
 from projectq import MainEngine
-from projectq.backends._ibm import _ibm
+from projectq.backends import JobPoller, ResultCache, _http
+from projectq.backends._ibm import _ibm, _ibm_http_client
 from projectq.cengines import (TagRemover,
                                LocalOptimizer,
                                AutoReplacer,
@@ -33,6 +38,16 @@ from projectq.ops import (All, Allocate, Barrier, Command, Deallocate,
 
 from projectq.setups.ibm import ibmqx4_connections
 
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+# used by the tests which run against a local stand-in of the IBM API
+_session_request = requests.sessions.Session.request
+
 
 # Insure that no HTTP request can be made in all tests in this module
 @pytest.fixture(autouse=True)
@@ -190,3 +205,258 @@ def test_ibm_backend_functional_test(monkeypatch):
 
     with pytest.raises(RuntimeError):
         eng.backend.get_probabilities(eng.allocate_qubit())
+
+
+class _StandInIBMServer(object):
+    """
+    Local stand-in of the IBM API. The results of all jobs are held back
+    until release() is called. Each circuit of a job applies x gates to the
+    all-0 state. Connections are kept alive.
+    """
+    def __init__(self):
+        self.jobs = []
+        self.released = threading.Event()
+        self.num_logins = 0
+        self.num_connections = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                BaseHTTPRequestHandler.setup(self)
+                server.num_connections += 1
+
+            def _reply(self, data):
+                body = json.dumps(data).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                body = self.rfile.read(length).decode()
+                if self.path.startswith("/api/users/login"):
+                    server.num_logins += 1
+                    self._reply({"userId": "user", "id": "token"})
+                elif self.path.startswith("/api/Jobs"):
+                    server.jobs.append(json.loads(body))
+                    self._reply({"id": str(len(server.jobs) - 1)})
+
+            def do_GET(self):
+                job_id = int(re.match(r"/api/Jobs/(\d+)", self.path).group(1))
+                if not server.released.is_set():
+                    self._reply({"qasms": [{"result": None}]})
+                    return
+                qasms = []
+                for qasm in server.jobs[job_id]['qasms']:
+                    num_qubits = int(re.search(r"qreg q\[(\d+)\]",
+                                               qasm['qasm']).group(1))
+                    bits = ['0'] * num_qubits
+                    for qubit in re.findall(r"\nx q\[(\d+)\];",
+                                            qasm['qasm']):
+                        bits[int(qubit)] = '1'
+                    state = "".join(reversed(bits))
+                    qasms.append({"result": {"data": {"counts": {
+                        state: server.jobs[job_id]['shots']}}}})
+                self._reply({"qasms": qasms})
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        self._server = Server(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{}/api/".format(
+            self._server.server_address[1])
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def release(self):
+        self.released.set()
+
+    def shutdown(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stand_in_server(monkeypatch):
+    # undo no_requests
+    monkeypatch.setattr(requests.sessions.Session, "request",
+                        _session_request, raising=False)
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    monkeypatch.setenv("no_proxy", "127.0.0.1")
+    server = _StandInIBMServer()
+    monkeypatch.setattr(_ibm_http_client, "_api_url", server.url)
+    _ibm_http_client._tokens.clear()
+    yield server
+    server.shutdown()
+
+
+def test_ibm_asynchronous(stand_in_server):
+    poller = JobPoller(interval=0.01)
+    backend = _ibm.IBMBackend(asynchronous=True, poller=poller, user="user",
+                              password="password")
+    eng = MainEngine(backend=backend,
+                     engine_list=[IBM5QubitMapper(),
+                                  SwapAndCNOTFlipper(ibmqx4_connections)])
+    qubits = []
+    for i in range(5):
+        qubit = eng.allocate_qubit()
+        if i % 2 == 1:
+            X | qubit
+        Measure | qubit
+        # returns as soon as the job has been submitted
+        eng.flush()
+        qubits.append(qubit)
+    assert len(stand_in_server.jobs) == 5
+    assert [future.job_id for future in backend.futures] == [
+        "0", "1", "2", "3", "4"]
+    assert not any(future.done() for future in backend.futures)
+    assert poller.num_pending == 5
+    stand_in_server.release()
+    for future in backend.futures:
+        probabilities = future.result(timeout=10)
+        assert sorted(probabilities.values()) == [1.]
+    assert poller.num_pending == 0
+    assert [int(qubit) for qubit in qubits] == [0, 1, 0, 1, 0]
+
+
+def test_ibm_http_client_submit_and_poll(stand_in_server):
+    info = json.dumps({'qasms': [{'qasm': '\nqreg q[2];\nx q[1];'}],
+                       'shots': 10})
+    execution_id, access_token = _ibm_http_client.submit(
+        info, device='simulator', user='user', password='password')
+    assert access_token == "token"
+    assert _ibm_http_client.poll_result(execution_id, access_token) is None
+    stand_in_server.release()
+    assert _ibm_http_client.poll_result(execution_id, access_token) == {
+        'data': {'counts': {'10': 10}}}
+    info = json.dumps({'qasms': [{'qasm': '\nqreg q[2];\nx q[1];'},
+                                 {'qasm': '\nqreg q[2];\nx q[0];'}],
+                       'shots': 10})
+    execution_id, access_token = _ibm_http_client.submit(
+        info, device='simulator', user='user', password='password')
+    assert _ibm_http_client.poll_results(execution_id, access_token) == [
+        {'data': {'counts': {'10': 10}}}, {'data': {'counts': {'01': 10}}}]
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_ibm_batch(stand_in_server, asynchronous):
+    poller = JobPoller(interval=0.01)
+    backend = _ibm.IBMBackend(asynchronous=asynchronous, poller=poller,
+                              batch_size=3, user="user", password="password")
+    eng = MainEngine(backend=backend,
+                     engine_list=[IBM5QubitMapper(),
+                                  SwapAndCNOTFlipper(ibmqx4_connections)])
+    if not asynchronous:
+        stand_in_server.release()
+    qubits = []
+    for i in range(4):
+        qubit = eng.allocate_qubit()
+        if i % 2 == 1:
+            X | qubit
+        Measure | qubit
+        eng.flush()
+        qubits.append(qubit)
+    # the first three circuits are sent as one job
+    assert len(stand_in_server.jobs) == 1
+    assert len(stand_in_server.jobs[0]['qasms']) == 3
+    assert len(backend.futures) == 3
+    assert backend.submit_batch()[0] is backend.futures[3]
+    assert backend.submit_batch() == []
+    assert [len(job['qasms']) for job in stand_in_server.jobs] == [3, 1]
+    assert [future.job_id for future in backend.futures] == [
+        "0", "0", "0", "1"]
+    stand_in_server.release()
+    for future in backend.futures:
+        assert sorted(future.result(timeout=10).values()) == [1.]
+    assert [int(qubit) for qubit in qubits] == [0, 1, 0, 1]
+
+
+def test_ibm_http_client_reuses_connection_and_token(stand_in_server,
+                                                     monkeypatch):
+    info = json.dumps({'qasms': [{'qasm': '\nqreg q[1];\nx q[0];'}],
+                       'shots': 10})
+    # use a session of its own such that no connection is reused from
+    # another test
+    monkeypatch.setattr(_ibm_http_client, "_session", _http.make_session())
+    execution_ids = []
+    for _ in range(3):
+        execution_id, access_token = _ibm_http_client.submit(
+            info, device='simulator', user='user', password='password')
+        assert _ibm_http_client.poll_result(execution_id,
+                                            access_token) is None
+        execution_ids.append(execution_id)
+    stand_in_server.release()
+    assert _ibm_http_client.retrieve('simulator', 'user', 'password',
+                                     execution_ids[-1]) == {
+        'data': {'counts': {'1': 10}}}
+    # all requests are sent over one connection and the access token of the
+    # first login is reused
+    assert stand_in_server.num_logins == 1
+    assert stand_in_server.num_connections == 1
+
+
+def test_ibm_result_cache(monkeypatch):
+    sent = []
+
+    def mock_send(*args, **kwargs):
+        sent.append(json.loads(args[0])['qasms'][0]['qasm'])
+        return {'data': {'counts': {'01': 1024}}}
+    monkeypatch.setattr(_ibm, "send", mock_send)
+    cache = ResultCache()
+
+    def run(num_runs=1024):
+        backend = _ibm.IBMBackend(result_cache=cache, num_runs=num_runs)
+        eng = MainEngine(backend=backend,
+                         engine_list=[IBM5QubitMapper(),
+                                      SwapAndCNOTFlipper(ibmqx4_connections)])
+        qureg = eng.allocate_qureg(2)
+        X | qureg[0]
+        All(Measure) | qureg
+        eng.flush()
+        return [int(qubit) for qubit in qureg]
+
+    assert run() == [1, 0]
+    # the same compiled circuit is not sent again
+    assert run() == [1, 0]
+    assert len(sent) == 1
+    assert (cache.num_hits, cache.num_misses) == (1, 1)
+    run(num_runs=100)
+    assert len(sent) == 2
+
+
+def test_ibm_batch_result_cache(stand_in_server):
+    cache = ResultCache()
+    stand_in_server.release()
+
+    def run(flips):
+        backend = _ibm.IBMBackend(poller=JobPoller(interval=0.01),
+                                  batch_size=len(flips), result_cache=cache,
+                                  user="user", password="password")
+        eng = MainEngine(backend=backend,
+                         engine_list=[IBM5QubitMapper(),
+                                      SwapAndCNOTFlipper(ibmqx4_connections)])
+        qubits = []
+        for flip in flips:
+            qubit = eng.allocate_qubit()
+            if flip:
+                X | qubit
+            Measure | qubit
+            eng.flush()
+            qubits.append(qubit)
+        return backend, [int(qubit) for qubit in qubits]
+
+    run([False, True])
+    backend, results = run([False, True, False])
+    assert results == [0, 1, 0]
+    # only the new circuit is submitted
+    assert [len(job['qasms']) for job in stand_in_server.jobs] == [2, 1]
+    assert [future.job_id for future in backend.futures] == [None, None, "1"]
+    assert len(cache) == 3
@@ -0,0 +1,304 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Contains the JobFuture, which represents the result of a job which has been
+submitted to a remote device, and the JobPoller, which polls the results of
+all outstanding jobs on one background thread.
+
+Used by the IBM and Rigetti back-ends if they are run asynchronously, i.e.,
+if eng.flush() only submits the job and returns immediately, or if several
+circuits are submitted as one batch.
+"""
+
+import threading
+
+from projectq.backends._http import _timer, backoff
+
+
+class JobFuture(object):
+    """
+    Result of a job which has been submitted to a remote device.
+
+    The future is resolved by a JobPoller once the result is available.
+
+    Example:
+        .. code-block:: python
+
+            backend = IBMBackend(asynchronous=True)
+            eng = MainEngine(backend, ...)
+            ...  # run the circuit
+            eng.flush()  # returns as soon as the job has been submitted
+            future = backend.futures[-1]
+            probabilities = future.result()  # waits for the result
+            print(probabilities)
+
+    Attributes:
+        job_id: Id of the job on the remote device.
+    """
+    def __init__(self, job_id, process=None, register=None):
+        """
+        Initialize a JobFuture.
+
+        Args:
+            job_id: Id of the job on the remote device.
+            process (function): Called with the result received from the
+                remote device (in the thread of the poller) before the future
+                is resolved. Its return value is the result of the future.
+            register (function): Called once with the result of the future
+                in the thread which calls result() first, e.g., to register
+                measurement results in the main engine (which must not be
+                accessed from the thread of the poller).
+        """
+        self.job_id = job_id
+        self._process = process
+        self._register = register
+        self._register_lock = threading.Lock()
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+
+    def done(self):
+        """
+        Return True if the job has finished (or failed).
+        """
+        return self._event.is_set()
+
+    def result(self, timeout=None):
+        """
+        Wait for the job to finish and return its result.
+
+        Args:
+            timeout (float): Maximal time to wait (in seconds). Default is to
+                wait until the job has finished.
+
+        Raises:
+            RuntimeError: If the job has not finished within timeout seconds.
+            Exception: The exception raised while polling or processing the
+                result of the job.
+        """
+        exception = self.exception(timeout)
+        if exception is not None:
+            raise exception
+        with self._register_lock:
+            register = self._register
+            self._register = None
+            if register is not None:
+                register(self._result)
+        return self._result
+
+    def exception(self, timeout=None):
+        """
+        Wait for the job to finish and return the exception raised while
+        polling or processing its result (or None).
+
+        Args:
+            timeout (float): Maximal time to wait (in seconds). Default is to
+                wait until the job has finished.
+
+        Raises:
+            RuntimeError: If the job has not finished within timeout seconds.
+        """
+        if not self._event.wait(timeout):
+            raise RuntimeError("Timeout. The job {} has not finished yet."
+                               .format(self.job_id))
+        return self._exception
+
+    def add_done_callback(self, callback):
+        """
+        Call callback with the future as its only argument once the job has
+        finished (immediately if it has already finished).
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def set_result(self, result):
+        """
+        Resolve the future with the result received from the remote device.
+        """
+        try:
+            if self._process is not None:
+                result = self._process(result)
+        except Exception as err:
+            self.set_exception(err)
+            return
+        self._result = result
+        self._resolve()
+
+    def set_exception(self, exception):
+        """
+        Resolve the future with an exception.
+        """
+        self._exception = exception
+        self._resolve()
+
+    def _resolve(self):
+        with self._lock:
+            self._event.set()
+            callbacks = self._callbacks
+            self._callbacks = []
+        for callback in callbacks:
+            callback(self)
+
+
+class _PendingJob(object):
+    """
+    Job which is polled by a JobPoller.
+    """
+    def __init__(self, futures, poll, batch, delays):
+        self.futures = futures
+        self.poll = poll
+        self.batch = batch
+        self.num_polls = 0
+        # times to wait between two polls and time of the next poll
+        self.delays = delays
+        self.next_poll = _timer()
+
+
+class JobPoller(object):
+    """
+    Polls the results of many outstanding jobs on one background thread.
+
+    The thread is started when a job is added and stops once all jobs have
+    finished. Each job is polled right after it has been added. The time
+    between two polls of a job grows exponentially (with random jitter) from
+    interval to max_interval, i.e., long running jobs cause few requests.
+    """
+    def __init__(self, interval=1, num_retries=3000, max_interval=None):
+        """
+        Initialize a JobPoller.
+
+        Args:
+            interval (float): Time between the first two polls of a job (in
+                seconds).
+            num_retries (int): Number of times a job is polled before its
+                future is resolved with a timeout exception.
+            max_interval (float): Maximal time between two polls of a job (in
+                seconds). Default is 10 * interval.
+        """
+        self.interval = interval
+        self.num_retries = num_retries
+        if max_interval is None:
+            max_interval = 10 * interval
+        self.max_interval = max_interval
+        self._jobs = []
+        self._lock = threading.Lock()
+        # set if a job has been added while the thread is waiting
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @property
+    def num_pending(self):
+        """
+        Number of jobs which have not finished yet.
+        """
+        with self._lock:
+            return len(self._jobs)
+
+    def add(self, future, poll):
+        """
+        Poll the result of a job until it is available and resolve its future.
+
+        Args:
+            future (JobFuture): Future of the job.
+            poll (function): Returns the result of the job (one request to the
+                remote device) or None if it has not finished yet.
+        """
+        self._add([future], poll, False)
+
+    def add_batch(self, futures, poll):
+        """
+        Poll the results of a job which contains several circuits until they
+        are available and resolve the future of each circuit.
+
+        Args:
+            futures (list<JobFuture>): Futures of the circuits of the job.
+            poll (function): Returns the list of results of the job (one per
+                future, in the same order) or None if it has not finished
+                yet.
+        """
+        self._add(list(futures), poll, True)
+
+    def _add(self, futures, poll, batch):
+        job = _PendingJob(futures, poll, batch,
+                          backoff(self.interval, self.max_interval))
+        with self._lock:
+            self._jobs.append(job)
+            self._wakeup.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                if len(self._jobs) == 0:
+                    self._thread = None
+                    return
+                self._wakeup.clear()
+                now = _timer()
+                jobs = [job for job in self._jobs if job.next_poll <= now]
+            # (job, result, exception) of all finished jobs
+            finished = []
+            for job in jobs:
+                try:
+                    result = job.poll()
+                except Exception as err:
+                    finished.append((job, None, err))
+                    continue
+                job.num_polls += 1
+                if result is not None:
+                    finished.append((job, result, None))
+                elif job.num_polls >= self.num_retries:
+                    finished.append((job, None, Exception(
+                        "Timeout. The ID of your submitted job is {}."
+                        .format(job.futures[0].job_id))))
+                else:
+                    job.next_poll = _timer() + next(job.delays)
+            with self._lock:
+                for job, _, _ in finished:
+                    self._jobs.remove(job)
+                next_poll = min([job.next_poll for job in self._jobs] or
+                                [_timer()])
+            # resolve the futures after removing the jobs such that
+            # num_pending is up to date in callbacks and waiting threads
+            for job, result, exception in finished:
+                self._resolve(job, result, exception)
+            # wait for the next poll (or for a new job)
+            self._wakeup.wait(max(0., next_poll - _timer()))
+
+    def _resolve(self, job, result, exception):
+        if exception is None and job.batch:
+            if len(result) != len(job.futures):
+                exception = Exception("Received {} results for {} circuits."
+                                      .format(len(result), len(job.futures)))
+            else:
+                for future, circuit_result in zip(job.futures, result):
+                    future.set_result(circuit_result)
+                return
+        if exception is None:
+            job.futures[0].set_result(result)
+        else:
+            for future in job.futures:
+                future.set_exception(exception)
+
+
+# poller shared by all back-ends which are run asynchronously
+default_poller = JobPoller()
@@ -0,0 +1,169 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Tests for projectq.backends._jobs.py."""
+
+import threading
+
+import pytest
+
+from projectq.backends import _jobs
+
+
+def test_job_future_result():
+    future = _jobs.JobFuture("job0", process=lambda res: res * 2)
+    assert not future.done()
+    with pytest.raises(RuntimeError):
+        future.result(timeout=0.01)
+    called = []
+    future.add_done_callback(lambda fut: called.append(fut.result()))
+    future.set_result(21)
+    assert future.done()
+    assert future.result() == 42
+    assert future.exception() is None
+    assert called == [42]
+    # callbacks added after the job finished are called immediately
+    future.add_done_callback(lambda fut: called.append(fut.job_id))
+    assert called == [42, "job0"]
+
+
+def test_job_future_exception():
+    def process(res):
+        raise ValueError("Invalid result")
+
+    future = _jobs.JobFuture("job1", process=process)
+    future.set_result(1)
+    assert future.done()
+    assert isinstance(future.exception(), ValueError)
+    with pytest.raises(ValueError):
+        future.result()
+
+
+def test_job_future_register_in_calling_thread():
+    poller = _jobs.JobPoller(interval=0.001)
+    threads = []
+
+    def process(res):
+        threads.append(("process", threading.current_thread()))
+        return res + 1
+
+    def register(res):
+        threads.append(("register", threading.current_thread(), res))
+
+    future = _jobs.JobFuture("job6", process=process, register=register)
+    poller.add(future, lambda: 1)
+    assert future.exception(timeout=10) is None
+    # the result is only registered once it is retrieved
+    assert [entry[0] for entry in threads] == ["process"]
+    assert threads[0][1] is not threading.current_thread()
+    assert future.result() == 2
+    assert future.result() == 2
+    assert threads[1:] == [("register", threading.current_thread(), 2)]
+
+
+def test_job_poller_multiplexes_jobs():
+    poller = _jobs.JobPoller(interval=0.001)
+    finished = threading.Event()
+    thread_ids = set()
+
+    def make_poll(job_index):
+        def poll():
+            thread_ids.add(threading.current_thread().ident)
+            if finished.is_set():
+                return job_index
+            return None
+        return poll
+
+    futures = [_jobs.JobFuture(i) for i in range(50)]
+    for i, future in enumerate(futures):
+        poller.add(future, make_poll(i))
+    assert poller.num_pending == 50
+    assert not any(future.done() for future in futures)
+    finished.set()
+    assert [future.result(timeout=10) for future in futures] == list(
+        range(50))
+    # all jobs are polled on one background thread
+    assert len(thread_ids) == 1
+    assert threading.current_thread().ident not in thread_ids
+    assert poller.num_pending == 0
+    # the thread is restarted for new jobs
+    future = _jobs.JobFuture("new")
+    poller.add(future, lambda: "done")
+    assert future.result(timeout=10) == "done"
+
+
+def test_job_poller_errors_and_timeout():
+    poller = _jobs.JobPoller(interval=0.001, num_retries=3)
+    num_polls = [0]
+
+    def poll_never():
+        num_polls[0] += 1
+        return None
+
+    def poll_error():
+        raise IOError("Server not reachable")
+
+    timeout_future = _jobs.JobFuture("job2")
+    error_future = _jobs.JobFuture("job3")
+    poller.add(timeout_future, poll_never)
+    poller.add(error_future, poll_error)
+    with pytest.raises(Exception) as excinfo:
+        timeout_future.result(timeout=10)
+    assert "job2" in str(excinfo.value)
+    assert num_polls[0] == 3
+    assert isinstance(error_future.exception(timeout=10), IOError)
+
+
+def test_job_poller_batch():
+    poller = _jobs.JobPoller(interval=0.001)
+    futures = [_jobs.JobFuture("job4", process=lambda res: res + 1)
+               for _ in range(3)]
+    poller.add_batch(futures, lambda: [10, 20, 30])
+    assert [future.result(timeout=10) for future in futures] == [11, 21, 31]
+    # the results have to match the circuits of the batch
+    futures = [_jobs.JobFuture("job5") for _ in range(2)]
+    poller.add_batch(futures, lambda: [10])
+    for future in futures:
+        assert "1 results for 2 circuits" in str(
+            future.exception(timeout=10))
+
+
+def test_job_poller_backoff():
+    poller = _jobs.JobPoller(interval=0.01, max_interval=0.04)
+    assert _jobs.JobPoller(interval=0.5).max_interval == 5
+    poll_times = []
+
+    def poll():
+        poll_times.append(_jobs._timer())
+        if len(poll_times) == 6:
+            return "done"
+        return None
+
+    future = _jobs.JobFuture("job6")
+    poller.add(future, poll)
+    assert future.result(timeout=10) == "done"
+    gaps = [later - earlier for earlier, later in
+            zip(poll_times[:-1], poll_times[1:])]
+    # the gaps grow from interval to max_interval (shortened by the jitter)
+    assert gaps[0] >= 0.005
+    assert all(gap >= 0.02 for gap in gaps[3:])
+    # new jobs are polled right away (even if the thread waits for the next
+    # poll of another job)
+    poller = _jobs.JobPoller(interval=5, num_retries=2)
+    waiting = _jobs.JobFuture("job7")
+    poller.add(waiting, lambda: None)
+    future = _jobs.JobFuture("job8")
+    poller.add(future, lambda: "done")
+    assert future.result(timeout=1) == "done"
+    assert not waiting.done()
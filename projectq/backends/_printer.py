@@ -16,6 +16,8 @@
 Contains a compiler engine which prints commands to stdout prior to sending
 them on to the next engines (see CommandPrinter).
 """
+import csv
+import json
 import sys
 
 from builtins import input
@@ -26,13 +28,45 @@ from projectq.meta import get_control_count, LogicalQubitIDTag
 from projectq.types import WeakQubitRef
 
 
+class _ListWriter(object):
+    """
+    File-like object which appends everything written to it to a list.
+    """
+    def __init__(self, chunks):
+        self.write = chunks.append
+
+
 class CommandPrinter(BasicEngine):
     """
     CommandPrinter is a compiler engine which prints commands to stdout prior
     to sending them on to the next compiler engine.
+
+    The commands can also be written to any other file-like object, in one
+    of the following formats:
+
+    * 'text': str(cmd), one command per line (default)
+    * 'json': JSON lines with the keys gate, gate_class, targets (list of
+      lists of qubit ids), controls (list of qubit ids) and tags (list of
+      strings)
+    * 'csv': comma-separated values with the columns gate, targets,
+      controls and tags (and a header row); qubit ids are separated by
+      spaces and quantum registers by semicolons
+
+    With buffer_size > 0, the output is collected and written in chunks of
+    (at least) buffer_size characters, as well as whenever the engine is
+    flushed.
+
+    Example:
+        .. code-block:: python
+
+            printer = CommandPrinter(stream=open("trace.jsonl", "w"),
+                                     output_format='json',
+                                     buffer_size=1 << 16,
+                                     gate_classes=(MeasureGate,))
     """
-    def __init__(self, accept_input=True, default_measure=False,
-                 in_place=False):
+    def __init__(self, accept_input=None, default_measure=False,
+                 in_place=False, stream=None, output_format='text',
+                 buffer_size=0, gate_classes=None, sample_every=1):
         """
         Initialize a CommandPrinter.
 
@@ -40,16 +74,45 @@ class CommandPrinter(BasicEngine):
             accept_input (bool): If accept_input is true, the printer queries
                 the user to input measurement results if the CommandPrinter is
                 the last engine. Otherwise, all measurements yield
-                default_measure.
+                default_measure. By default, the user is only queried if the
+                commands are printed to stdout (i.e., if stream is None).
             default_measure (bool): Default measurement result (if
                 accept_input is False).
             in_place (bool): If in_place is true, all output is written on the
                 same line of the terminal.
+            stream (file object): File-like object to write the commands to
+                (default: sys.stdout).
+            output_format (str): 'text', 'json' or 'csv' (see above).
+            buffer_size (int): Number of characters to collect before they
+                are written to the stream.
+            gate_classes (tuple): If given, only commands whose gate is an
+                instance of one of these classes are printed.
+            sample_every (int): Only print every sample_every-th command
+                (of the ones which pass the gate class filter).
         """
         BasicEngine.__init__(self)
+        if output_format not in ('text', 'json', 'csv'):
+            raise ValueError("Unknown output format '{}'."
+                             .format(output_format))
+        if accept_input is None:
+            accept_input = stream is None
         self._accept_input = accept_input
         self._default_measure = default_measure
         self._in_place = in_place
+        self._stream = stream
+        self._format = output_format
+        self._buffer_size = buffer_size
+        self._gate_classes = gate_classes
+        self._sample_every = sample_every
+        self._num_candidates = 0
+        self._chunks = []
+        self._buffered = 0
+        self._csv_rows = []
+        self._csv_writer = csv.writer(_ListWriter(self._csv_rows),
+                                      lineterminator="\n")
+        if output_format == 'csv':
+            self._chunks.append(self._csv_row(["gate", "targets", "controls",
+                                               "tags"]))
 
     def is_available(self, cmd):
         """
@@ -80,10 +143,11 @@ class CommandPrinter(BasicEngine):
         """
         if self.is_last_engine and cmd.gate == Measure:
             assert(get_control_count(cmd) == 0)
-            print(cmd)
+            self._write_cmd(cmd)
             for qureg in cmd.qubits:
                 for qubit in qureg:
                     if self._accept_input:
+                        self.flush()
                         m = None
                         while m != '0' and m != '1' and m != 1 and m != 0:
                             prompt = ("Input measurement result (0 or 1) for"
@@ -102,10 +166,68 @@ class CommandPrinter(BasicEngine):
                                              logical_id_tag.logical_qubit_id)
                     self.main_engine.set_measurement_result(qubit, m)
         else:
+            self._write_cmd(cmd)
+
+    def _format_cmd(self, cmd):
+        """
+        Return the line(s) representing a command in the output format.
+        """
+        if self._format == 'text':
             if self._in_place:
-                sys.stdout.write("\0\r\t\x1b[K" + str(cmd) + "\r")
-            else:
-                print(cmd)
+                return "\0\r\t\x1b[K" + str(cmd) + "\r"
+            return str(cmd) + "\n"
+        targets = [[qubit.id for qubit in qureg] for qureg in cmd.qubits]
+        controls = [qubit.id for qubit in cmd.control_qubits]
+        tags = [str(tag) for tag in cmd.tags]
+        if self._format == 'json':
+            return json.dumps({'gate': str(cmd.gate),
+                               'gate_class': cmd.gate.__class__.__name__,
+                               'targets': targets,
+                               'controls': controls,
+                               'tags': tags}) + "\n"
+        return self._csv_row([str(cmd.gate),
+                              ";".join(" ".join(str(qb_id) for qb_id in qureg)
+                                       for qureg in targets),
+                              " ".join(str(qb_id) for qb_id in controls),
+                              " ".join(tags)])
+
+    def _csv_row(self, values):
+        self._csv_writer.writerow(values)
+        row = "".join(self._csv_rows)
+        del self._csv_rows[:]
+        return row
+
+    def _write_cmd(self, cmd):
+        """
+        Write a command to the output (if it passes the gate class filter and
+        the sampling).
+        """
+        if (self._gate_classes is not None and
+                not isinstance(cmd.gate, self._gate_classes)):
+            return
+        self._num_candidates += 1
+        if (self._num_candidates - 1) % self._sample_every != 0:
+            return
+        line = self._format_cmd(cmd)
+        self._chunks.append(line)
+        self._buffered += len(line)
+        if self._buffered >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write all buffered output to the stream.
+        """
+        if len(self._chunks) == 0:
+            return
+        stream = self._stream
+        if stream is None:
+            stream = sys.stdout
+        stream.write("".join(self._chunks))
+        del self._chunks[:]
+        self._buffered = 0
+        if self._buffer_size > 0:
+            stream.flush()
 
     def receive(self, command_list):
         """
@@ -119,6 +241,8 @@ class CommandPrinter(BasicEngine):
         for cmd in command_list:
             if not cmd.gate == FlushGate():
                 self._print_cmd(cmd)
+            else:
+                self.flush()
             # (try to) send on
             if not self.is_last_engine:
                 self.send([cmd])
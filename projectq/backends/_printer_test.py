@@ -16,6 +16,9 @@
 Tests for projectq.backends._printer.py.
 """
 
+import csv
+import json
+
 import pytest
 
 from projectq import MainEngine
@@ -23,7 +26,8 @@ from projectq.cengines import (DummyEngine,
                                InstructionFilter,
                                NotYetMeasuredError)
 from projectq.meta import LogicalQubitIDTag
-from projectq.ops import Allocate, Command, H, Measure, NOT, T
+from projectq.ops import (Allocate, CNOT, Command, H, HGate, Measure,
+                          MeasureGate, NOT, T)
 from projectq.types import WeakQubitRef
 
 from projectq.backends import _printer
@@ -86,3 +90,78 @@ def test_command_printer_measure_mapped_qubit():
     with pytest.raises(NotYetMeasuredError):
         int(qb1)
     assert int(qb2) == 0
+
+
+class _Stream(object):
+    def __init__(self):
+        self.writes = []
+
+    def write(self, text):
+        self.writes.append(text)
+
+    def flush(self):
+        pass
+
+
+def _run_printer(**kwargs):
+    stream = _Stream()
+    printer = _printer.CommandPrinter(stream=stream, **kwargs)
+    eng = MainEngine(backend=printer, engine_list=[])
+    qureg = eng.allocate_qureg(2)
+    H | qureg[0]
+    CNOT | (qureg[0], qureg[1])
+    H | qureg[1]
+    Measure | qureg[1]
+    return eng, stream, qureg
+
+
+def test_command_printer_buffered(monkeypatch):
+    def no_input(prompt):
+        raise AssertionError("Unexpected prompt")
+    monkeypatch.setattr(_printer, "input", no_input)
+    eng, stream, qureg = _run_printer(buffer_size=1 << 16)
+    # measurement results are not queried if printing to a stream
+    assert stream.writes == []
+    eng.flush()
+    assert len(stream.writes) == 1
+    lines = stream.writes[0].splitlines()
+    assert lines[0] == "Allocate | Qureg[0]"
+    assert lines[3] == "CX | ( Qureg[0], Qureg[1] )"
+    assert lines[5] == "Measure | Qureg[1]"
+    eng.flush()
+    assert len(stream.writes) == 1
+
+    eng, stream, qureg = _run_printer(buffer_size=60)
+    # the rest is written when the engine is flushed
+    assert [len(chunk) >= 60 for chunk in stream.writes] == [True]
+    eng.flush()
+    assert len(stream.writes) == 2
+
+
+def test_command_printer_json():
+    eng, stream, qureg = _run_printer(output_format='json', default_measure=1)
+    records = [json.loads(line)
+               for line in "".join(stream.writes).splitlines()]
+    assert len(records) == 6
+    assert records[3] == {'gate': 'X', 'gate_class': 'XGate',
+                          'targets': [[1]], 'controls': [0], 'tags': []}
+    assert records[5]['gate_class'] == 'MeasureGate'
+    assert int(qureg[1]) == 1
+
+
+def test_command_printer_csv_filter_and_sampling():
+    eng, stream, qureg = _run_printer(output_format='csv',
+                                      gate_classes=(HGate,), sample_every=2)
+    rows = list(csv.reader("".join(stream.writes).splitlines()))
+    assert rows == [["gate", "targets", "controls", "tags"],
+                    ["H", "0", "", ""]]
+
+    eng, stream, qureg = _run_printer(output_format='csv',
+                                      gate_classes=(MeasureGate,))
+    rows = list(csv.reader("".join(stream.writes).splitlines()))
+    assert rows[1][:3] == ["Measure", "1", ""]
+
+
+def test_command_printer_invalid_format():
+    with pytest.raises(ValueError):
+        _printer.CommandPrinter(output_format='xml')
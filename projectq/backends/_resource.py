@@ -17,12 +17,406 @@ Contains a compiler engine which counts the number of calls for each type of
 gate used in a circuit, in addition to the max. number of active qubits.
 """
 
+import math
+
 from projectq.cengines import BasicEngine, LastEngineException
-from projectq.meta import get_control_count, LogicalQubitIDTag
-from projectq.ops import FlushGate, Deallocate, Allocate, Measure
+from projectq.meta import get_control_count, LogicalQubitIDTag, LoopTag
+from projectq.ops import (FlushGate, Deallocate, Allocate, Measure, R, Rx,
+                          Ry, Rz, T, Tdag, XGate)
 from projectq.types import WeakQubitRef
 
 
+def _shift(expr, length):
+    return dict((source, depth + length) for source, depth in expr.items())
+
+
+def _difference(start, end):
+    """
+    Return k if end is start shifted by k (i.e., if end - start is the same
+    for all depths at the start of the body) and None otherwise.
+    """
+    if len(start) == 0 or set(start) != set(end):
+        return None
+    differences = set(end[source] - start[source] for source in start)
+    if len(differences) != 1:
+        return None
+    return differences.pop()
+
+
+def _simplify(expr):
+    """
+    Return expr without its constant term (id None) if a depth of a qubit
+    dominates it (depths are non-negative).
+    """
+    if None in expr and any(depth >= expr[None]
+                            for source, depth in expr.items()
+                            if source is not None):
+        expr = dict(expr)
+        del expr[None]
+    return expr
+
+
+def _merge(target, expr):
+    """
+    Update target to the maximum of target and expr (see _LoopBody).
+    """
+    for source, depth in expr.items():
+        if depth > target.get(source, -1):
+            target[source] = depth
+
+
+class _LoopBody(object):
+    """
+    Effect of the commands of a loop body (which have been received so far)
+    on the depths of the qubits.
+
+    The depth of a qubit is stored as a function of the depths of the qubits
+    at the start of the body: a dict which maps the ids of the qubits to the
+    length of the longest path (of the DAG) from them to the qubit. Qubits
+    allocated in the body are represented by the id None (depth 0).
+    """
+    def __init__(self, tag):
+        self.tag = tag
+        # key: qubit id, value: depth of this qubit (see above)
+        self.depths = dict()
+        # maximal depth of the qubits deallocated in the body
+        self.peak = dict()
+        # key: qubit id, value: depth at which the first gate acting on the
+        # qubit in the body starts
+        self.starts = dict()
+        # sum of the lifetimes of the qubits allocated and deallocated in the
+        # body which do not depend on the depths at the start of the body
+        self.volume = 0
+        # key: (start, end) of the lifetimes of the other qubits allocated and
+        # deallocated in the body (as frozensets of items), value: count
+        self.lifetimes = dict()
+
+    def copy(self):
+        body = _LoopBody(self.tag)
+        body.depths = dict(self.depths)
+        body.peak = dict(self.peak)
+        body.starts = dict(self.starts)
+        body.volume = self.volume
+        body.lifetimes = dict(self.lifetimes)
+        return body
+
+    def add_lifetime(self, count, start, end):
+        start = _simplify(start)
+        end = _simplify(end)
+        difference = _difference(start, end)
+        if difference is not None:
+            self.volume += count * difference
+        else:
+            # shifting both start and end does not change the lifetime, such
+            # that the lifetimes of later iterations share their keys
+            offset = min(min(start.values()), min(end.values()))
+            key = (frozenset(_shift(start, -offset).items()),
+                   frozenset(_shift(end, -offset).items()))
+            self.lifetimes[key] = self.lifetimes.get(key, 0) + count
+
+    def get(self, qubit_id):
+        return self.depths.get(qubit_id, {qubit_id: 0})
+
+    def substitute(self, expr):
+        """
+        Return a function of the depths at the end of the body as a function
+        of the depths at its start.
+        """
+        result = dict()
+        for source, length in expr.items():
+            if source is None:
+                _merge(result, {None: length})
+            else:
+                _merge(result, _shift(self.get(source), length))
+        return result
+
+    def then(self, other):
+        """
+        Return the effect of this body followed by the body other (on the
+        depths).
+        """
+        body = _LoopBody(self.tag)
+        body.depths = dict(self.depths)
+        for qubit_id, expr in other.depths.items():
+            body.depths[qubit_id] = self.substitute(expr)
+        body.peak = dict(self.peak)
+        _merge(body.peak, self.substitute(other.peak))
+        body.volume = self.volume + other.volume
+        body.lifetimes = dict(self.lifetimes)
+        for (start, end), count in other.lifetimes.items():
+            body.add_lifetime(count, self.substitute(dict(start)),
+                              self.substitute(dict(end)))
+        return body
+
+    def power(self, num):
+        """
+        Return the effect of running the body num times (using repeated
+        squaring, i.e., O(log(num)) compositions).
+
+        The lifetimes of the qubits allocated in the body are composed as
+        well, such that they are exact for every iteration. Lifetimes which
+        depend on the depths at the start of an iteration are stored up to
+        a common shift, such that iterations with the same lifetime share
+        one entry.
+        """
+        result = _LoopBody(self.tag)
+        base = self
+        while num > 0:
+            if num & 1:
+                result = result.then(base)
+            num >>= 1
+            if num > 0:
+                base = base.then(base)
+        return result
+
+
+class _DepthTracker(object):
+    """
+    Determines the longest path in the DAG of the program, where each gate
+    has a weight (1 for the depth, the number of T gates for the T-depth,
+    ...), and the qubit-time volume.
+
+    The volume is the sum of the lifetimes of all qubits, where the lifetime
+    of a qubit is the number of layers from the start of the first gate which
+    acts on the qubit to the end of its last gate (if all gates are applied
+    as soon as possible, i.e., in the layers which determine the depth). The
+    lifetimes of qubits which are allocated and deallocated in a loop body
+    are determined for each iteration (see _LoopBody.power).
+    """
+    def __init__(self, track_volume=False):
+        # key: qubit id, depth of this qubit
+        self._depth_of_qubit = dict()
+        self._previous_max_depth = 0
+        # loops whose body is being received (outermost first)
+        self._loops = []
+        self._track_volume = track_volume
+        # key: qubit id, depth at which the first gate acting on it starts
+        self._start_of_qubit = dict()
+        self._volume = 0
+
+    def _closed(self):
+        """
+        Return a copy of this tracker in which all open loops have ended.
+        """
+        tracker = _DepthTracker(self._track_volume)
+        tracker._depth_of_qubit = dict(self._depth_of_qubit)
+        tracker._previous_max_depth = self._previous_max_depth
+        tracker._loops = [body.copy() for body in self._loops]
+        tracker._start_of_qubit = dict(self._start_of_qubit)
+        tracker._volume = self._volume
+        tracker.end_loops(0)
+        return tracker
+
+    @property
+    def depth(self):
+        if len(self._loops) > 0:
+            return self._closed().depth
+        if self._depth_of_qubit:
+            current_max = max(self._depth_of_qubit.values())
+            return max(current_max, self._previous_max_depth)
+        else:
+            return self._previous_max_depth
+
+    @property
+    def volume(self):
+        if len(self._loops) > 0:
+            return self._closed().volume
+        return self._volume + sum(self._depth_of_qubit[qubit_id] - start
+                                  for qubit_id, start
+                                  in self._start_of_qubit.items())
+
+    def _get(self, qubit_id):
+        """
+        Return the depth of a qubit (as a function of the depths at the start
+        of the innermost loop body, see _LoopBody).
+        """
+        if len(self._loops) > 0:
+            return self._loops[-1].get(qubit_id)
+        return {None: self._depth_of_qubit[qubit_id]}
+
+    def _set(self, qubit_id, expr):
+        if len(self._loops) > 0:
+            self._loops[-1].depths[qubit_id] = expr
+        else:
+            self._depth_of_qubit[qubit_id] = expr[None]
+
+    def _substitute(self, expr):
+        """
+        Return a function of the depths at the end of a loop body as a
+        function of the depths in the enclosing scope.
+        """
+        if len(self._loops) > 0:
+            return self._loops[-1].substitute(expr)
+        if len(expr) == 0:
+            return dict()
+        depths = []
+        for source, length in expr.items():
+            source_depth = (0 if source is None else
+                            self._depth_of_qubit[source])
+            depths.append(source_depth + length)
+        return {None: max(depths)}
+
+    def _add_peak(self, expr):
+        if len(self._loops) > 0:
+            _merge(self._loops[-1].peak, expr)
+        elif len(expr) > 0:
+            self._previous_max_depth = max(self._previous_max_depth,
+                                           expr[None])
+
+    def _starts(self):
+        if len(self._loops) > 0:
+            return self._loops[-1].starts
+        return self._start_of_qubit
+
+    def _add_lifetime(self, count, start, end):
+        if len(self._loops) > 0:
+            self._loops[-1].add_lifetime(count, start, end)
+        else:
+            self._volume += count * (end[None] - start[None])
+
+    def _add_volume(self, volume):
+        if len(self._loops) > 0:
+            self._loops[-1].volume += volume
+        else:
+            self._volume += volume
+
+    def end_loops(self, num_loops):
+        """
+        End all loops except for the num_loops outermost ones and apply the
+        depths of their bodies (repeated by the number of iterations).
+        """
+        while len(self._loops) > num_loops:
+            body = self._loops.pop()
+            loop = body.power(body.tag.num)
+            # substitute all depths before any of them is updated
+            depths = [(qubit_id, self._substitute(expr))
+                      for qubit_id, expr in loop.depths.items()]
+            starts = [(qubit_id, self._substitute(expr))
+                      for qubit_id, expr in body.starts.items()]
+            lifetimes = [(count, self._substitute(dict(start)),
+                          self._substitute(dict(end)))
+                         for (start, end), count in loop.lifetimes.items()]
+            self._add_peak(self._substitute(loop.peak))
+            for qubit_id, expr in depths:
+                self._set(qubit_id, expr)
+            enclosing_starts = self._starts()
+            for qubit_id, expr in starts:
+                if qubit_id not in enclosing_starts:
+                    if len(self._loops) > 0:
+                        enclosing_starts[qubit_id] = expr
+                    else:
+                        enclosing_starts[qubit_id] = expr[None]
+            self._add_volume(loop.volume)
+            for lifetime in lifetimes:
+                self._add_lifetime(*lifetime)
+
+    def enter_loops(self, tags):
+        """
+        Update the open loops according to the loop tags (outermost first) of
+        a command.
+        """
+        num_loops = 0
+        while (num_loops < min(len(tags), len(self._loops)) and
+               self._loops[num_loops].tag == tags[num_loops]):
+            num_loops += 1
+        self.end_loops(num_loops)
+        for tag in tags[num_loops:]:
+            self._loops.append(_LoopBody(tag))
+
+    def allocate(self, qubit_id):
+        self._set(qubit_id, {None: 0})
+
+    def deallocate(self, qubit_id):
+        end = self._get(qubit_id)
+        self._add_peak(end)
+        if self._track_volume:
+            start = self._starts().pop(qubit_id, None)
+            if start is not None:
+                if len(self._loops) > 0:
+                    self._add_lifetime(1, start, end)
+                else:
+                    self._add_lifetime(1, {None: start}, end)
+        if len(self._loops) > 0:
+            self._loops[-1].depths.pop(qubit_id, None)
+        else:
+            self._depth_of_qubit.pop(qubit_id)
+
+    def apply(self, qubit_ids, weight):
+        """
+        Apply a gate of the given weight to the qubits with the given ids.
+        """
+        if weight == 0 and len(qubit_ids) == 1:
+            return
+        if len(self._loops) > 0:
+            depth = dict()
+            for qubit_id in qubit_ids:
+                _merge(depth, self._get(qubit_id))
+            if self._track_volume:
+                starts = self._loops[-1].starts
+                for qubit_id in qubit_ids:
+                    if qubit_id not in starts:
+                        starts[qubit_id] = depth
+            depth = _shift(depth, weight)
+            for qubit_id in qubit_ids:
+                self._set(qubit_id, depth)
+            return
+        max_depth = 0
+        for qubit_id in qubit_ids:
+            max_depth = max(max_depth, self._depth_of_qubit[qubit_id])
+        if self._track_volume:
+            for qubit_id in qubit_ids:
+                if qubit_id not in self._start_of_qubit:
+                    self._start_of_qubit[qubit_id] = max_depth
+        for qubit_id in qubit_ids:
+            self._depth_of_qubit[qubit_id] = max_depth + weight
+
+    def merge(self, other, sequential, count=1):
+        """
+        Add the program of the tracker other (count times) after (if
+        sequential) or in parallel to the program of this tracker.
+        """
+        if len(self._loops) > 0:
+            raise RuntimeError("Cannot merge resource counts while a loop "
+                               "body is being counted.")
+        self._volume += count * other.volume
+        if sequential:
+            depth = self.depth + count * other.depth
+            for qubit_id in self._depth_of_qubit:
+                self._depth_of_qubit[qubit_id] = depth
+            self._previous_max_depth = depth
+        else:
+            self._previous_max_depth = max(self._previous_max_depth,
+                                           other.depth)
+
+
+def _rotation_costs(gate, precision):
+    """
+    Return the costs of a rotation gate in the Clifford+T gate set.
+
+    Rotation angles which are multiples of pi/4 are implemented exactly with
+    (at most one) T gate. All other rotations have to be synthesized to
+    within the given precision, which takes about 3 * log2(1 / precision) T
+    gates (see Ross and Selinger, arXiv:1403.2975).
+    """
+    multiple = gate.angle / (math.pi / 4)
+    if abs(multiple - round(multiple)) < 1e-9:
+        return {'t_count': int(round(multiple)) % 2}
+    return {'rotation_count': 1,
+            'rotation_t_count': int(math.ceil(3.02 * math.log(1. / precision,
+                                                              2) + 1.77))}
+
+
+def _default_cost_table():
+    return {(T, 0): {'t_count': 1},
+            (Tdag, 0): {'t_count': 1},
+            (XGate, 1): {'cnot_count': 1},
+            (XGate, 2): {'toffoli_count': 1},
+            (Rx, 0): _rotation_costs,
+            (Ry, 0): _rotation_costs,
+            (Rz, 0): _rotation_costs,
+            (R, 0): _rotation_costs}
+
+
 class ResourceCounter(BasicEngine):
     """
     ResourceCounter is a compiler engine which counts the number of gates and
@@ -35,26 +429,70 @@ class ResourceCounter(BasicEngine):
         gate_class_counts (dict): Dictionary of gate class counts.
             The keys are tuples of the form (cmd.gate.__class__, ctrl_cnt),
             where ctrl_cnt is the number of control qubits.
+        cost_counts (dict): Sum of the costs (see cost_table) of all gates,
+            e.g., cost_counts['t_count'] is the T-count.
         max_width (int): Maximal width (=max. number of active qubits at any
             given point).
     Properties:
         depth_of_dag (int): It is the longest path in the directed
                             acyclic graph (DAG) of the program.
+        t_depth (int): Longest path in the DAG, where each gate counts with
+            its number of T gates (t_count + rotation_t_count).
+        cnot_depth (int): Longest path in the DAG, where each gate counts
+            with its number of CNOT gates (cnot_count).
+        qubit_time_volume (int): Sum of the lifetimes (number of layers from
+            the first to the last gate) of all qubits.
+
+    The costs of the gates are looked up in a cost table, which maps
+    (gate, ctrl_cnt) or (gate class, ctrl_cnt) to a dict of costs (or to a
+    function which returns this dict for a given gate and synthesis
+    precision). By default, the table contains the T-count of T and Tdag,
+    the CNOT-count of CNOT, the Toffoli-count of Toffoli gates, as well as
+    the rotation count and the estimated number of T gates required to
+    synthesize the (uncontrolled) rotations Rx, Ry, Rz and R. Controlled
+    rotations should be decomposed before they are counted.
+
+    If the ResourceCounter is the last engine, loops (see projectq.meta.Loop)
+    are not unrolled: the commands of a loop body are counted once and their
+    counts are multiplied by the number of iterations (of all enclosing
+    loops). The depth of a loop body is determined symbolically, such that
+    the depth of the whole loop is exact and is computed in time logarithmic
+    in the number of iterations.
+
+    Example:
+        .. code-block:: python
+
+            resource_counter = ResourceCounter(synthesis_precision=1e-12)
+            # ... run the program ...
+            json.dumps(resource_counter.to_dict())
     """
-    def __init__(self):
+    def __init__(self, cost_table=None, synthesis_precision=1e-10):
         """
         Initialize a resource counter engine.
 
         Sets all statistics to zero.
+
+        Args:
+            cost_table (dict): Costs which are added to (or replace) the
+                default costs (see above).
+            synthesis_precision (float): Precision to which rotations are
+                synthesized.
         """
         BasicEngine.__init__(self)
         self.gate_counts = {}
         self.gate_class_counts = {}
+        self.cost_counts = {}
         self._active_qubits = 0
         self.max_width = 0
-        # key: qubit id, depth of this qubit
-        self._depth_of_qubit = dict()
-        self._previous_max_depth = 0
+        self._depth = _DepthTracker(track_volume=True)
+        self._t_depth = _DepthTracker()
+        self._cnot_depth = _DepthTracker()
+        self._cost_table = _default_cost_table()
+        if cost_table is not None:
+            self._cost_table.update(cost_table)
+        self._synthesis_precision = synthesis_precision
+        # key: (gate, ctrl_cnt), value: (costs, T weight, CNOT weight)
+        self._costs = dict()
 
     def is_available(self, cmd):
         """
@@ -74,30 +512,94 @@ class ResourceCounter(BasicEngine):
         except LastEngineException:
             return True
 
+    def is_meta_tag_handler(self, tag):
+        """
+        Return True for LoopTag if the ResourceCounter is the last engine
+        (such that loops do not have to be unrolled).
+        """
+        return tag == LoopTag and self.is_last_engine
+
     @property
     def depth_of_dag(self):
-        if self._depth_of_qubit:
-            current_max = max(self._depth_of_qubit.values())
-            return max(current_max, self._previous_max_depth)
-        else:
-            return self._previous_max_depth
+        return self._depth.depth
+
+    @property
+    def t_depth(self):
+        return self._t_depth.depth
+
+    @property
+    def cnot_depth(self):
+        return self._cnot_depth.depth
+
+    @property
+    def qubit_time_volume(self):
+        return self._depth.volume
+
+    def _trackers(self):
+        return (self._depth, self._t_depth, self._cnot_depth)
+
+    def _get_costs(self, gate_description, gate_class_description):
+        """
+        Return the costs of a gate, and its weights for the T-depth and the
+        CNOT-depth.
+        """
+        try:
+            return self._costs[gate_description]
+        except KeyError:
+            pass
+        costs = self._cost_table.get(gate_description)
+        if costs is None:
+            costs = self._cost_table.get(gate_class_description, dict())
+        if callable(costs):
+            costs = costs(gate_description[0], self._synthesis_precision)
+        result = (costs,
+                  costs.get('t_count', 0) + costs.get('rotation_t_count', 0),
+                  costs.get('cnot_count', 0))
+        self._costs[gate_description] = result
+        return result
+
+    def _enter_loops(self, cmd):
+        """
+        Update the open loops according to the loop tags of the command.
+
+        Returns:
+            Number of times the command is executed.
+        """
+        # loop tags are appended by the loop engines, i.e., the tag of the
+        # innermost loop comes first
+        tags = [tag for tag in reversed(cmd.tags) if isinstance(tag, LoopTag)]
+        for tracker in self._trackers():
+            tracker.enter_loops(tags)
+        multiplicity = 1
+        for tag in tags:
+            multiplicity *= tag.num
+        return multiplicity
 
     def _add_cmd(self, cmd):
         """
         Add a gate to the count.
         """
+        multiplicity = self._enter_loops(cmd)
+        ctrl_cnt = get_control_count(cmd)
+        gate_description = (cmd.gate, ctrl_cnt)
+        gate_class_description = (cmd.gate.__class__, ctrl_cnt)
+        costs, t_weight, cnot_weight = self._get_costs(gate_description,
+                                                       gate_class_description)
+
         if cmd.gate == Allocate:
             self._active_qubits += 1
-            self._depth_of_qubit[cmd.qubits[0][0].id] = 0
+            for tracker in self._trackers():
+                tracker.allocate(cmd.qubits[0][0].id)
         elif cmd.gate == Deallocate:
             self._active_qubits -= 1
-            depth = self._depth_of_qubit[cmd.qubits[0][0].id]
-            self._previous_max_depth = max(self._previous_max_depth, depth)
-            self._depth_of_qubit.pop(cmd.qubits[0][0].id)
+            for tracker in self._trackers():
+                tracker.deallocate(cmd.qubits[0][0].id)
         elif self.is_last_engine and cmd.gate == Measure:
             for qureg in cmd.qubits:
                 for qubit in qureg:
-                    self._depth_of_qubit[qubit.id] += 1
+                    self._depth.apply([qubit.id], 1)
+                    self._t_depth.apply([qubit.id], t_weight)
+                    self._cnot_depth.apply([qubit.id], cnot_weight)
                     # Check if a mapper assigned a different logical id
                     logical_id_tag = None
                     for tag in cmd.tags:
@@ -112,30 +614,96 @@ class ResourceCounter(BasicEngine):
             for qureg in cmd.all_qubits:
                 for qubit in qureg:
                     qubit_ids.add(qubit.id)
-            if len(qubit_ids) == 1:
-                self._depth_of_qubit[list(qubit_ids)[0]] += 1
-            else:
-                max_depth = 0
-                for qubit_id in qubit_ids:
-                    max_depth = max(max_depth, self._depth_of_qubit[qubit_id])
-                for qubit_id in qubit_ids:
-                    self._depth_of_qubit[qubit_id] = max_depth + 1
+            self._depth.apply(qubit_ids, 1)
+            self._t_depth.apply(qubit_ids, t_weight)
+            self._cnot_depth.apply(qubit_ids, cnot_weight)
 
         self.max_width = max(self.max_width, self._active_qubits)
 
-        ctrl_cnt = get_control_count(cmd)
-        gate_description = (cmd.gate, ctrl_cnt)
-        gate_class_description = (cmd.gate.__class__, ctrl_cnt)
-
         try:
-            self.gate_counts[gate_description] += 1
+            self.gate_counts[gate_description] += multiplicity
         except KeyError:
-            self.gate_counts[gate_description] = 1
+            self.gate_counts[gate_description] = multiplicity
 
         try:
-            self.gate_class_counts[gate_class_description] += 1
+            self.gate_class_counts[gate_class_description] += multiplicity
         except KeyError:
-            self.gate_class_counts[gate_class_description] = 1
+            self.gate_class_counts[gate_class_description] = multiplicity
+
+        for name, cost in costs.items():
+            self.cost_counts[name] = (self.cost_counts.get(name, 0) +
+                                      cost * multiplicity)
+
+    def merge(self, other, sequential=True, count=1):
+        """
+        Add the resources counted by another ResourceCounter (e.g., for a
+        subroutine which has been compiled independently).
+
+        Args:
+            other (ResourceCounter): Resource counter to add.
+            sequential (bool): If True, the program of other is run after the
+                program counted so far (the depths add up). Otherwise, it is
+                run in parallel (on other qubits, the widths add up).
+            count (int): Number of times the program of other is run (the
+                result is the same as for count calls to merge, but takes
+                constant time).
+
+        Raises:
+            RuntimeError: If a loop body is being counted (nothing is added).
+            ValueError: If count is negative.
+        """
+        if len(self._depth._loops) > 0:
+            raise RuntimeError("Cannot merge resource counts while a loop "
+                               "body is being counted.")
+        if count < 0:
+            raise ValueError("The count has to be non-negative.")
+        if count == 0:
+            return
+        for counts, other_counts in [
+                (self.gate_counts, other.gate_counts),
+                (self.gate_class_counts, other.gate_class_counts),
+                (self.cost_counts, other.cost_counts)]:
+            for key, num in other_counts.items():
+                counts[key] = counts.get(key, 0) + count * num
+        if sequential:
+            self.max_width = max(self.max_width,
+                                 self._active_qubits + other.max_width)
+        else:
+            self.max_width += count * other.max_width
+        for tracker, other_tracker in zip(self._trackers(),
+                                          other._trackers()):
+            tracker.merge(other_tracker, sequential, count)
+
+    def to_dict(self):
+        """
+        Return a report of the counted resources (which can be serialized to
+        JSON).
+
+        Returns:
+            Dict with the gate (class) counts (gate names as keys), the
+            cost counts (T-count, ...), the width, the depths and the
+            qubit-time volume.
+        """
+        report = {'gate_class_counts': dict(), 'gate_counts': dict()}
+        # different gates (classes) may have the same name
+        for (gate_class, ctrl_cnt), num in self.gate_class_counts.items():
+            name = ctrl_cnt * "C" + gate_class.__name__
+            class_counts = report['gate_class_counts']
+            class_counts[name] = class_counts.get(name, 0) + num
+        for (gate, ctrl_cnt), num in self.gate_counts.items():
+            name = ctrl_cnt * "C" + str(gate)
+            gate_counts = report['gate_counts']
+            gate_counts[name] = gate_counts.get(name, 0) + num
+        for name in ['t_count', 'rotation_count', 'rotation_t_count',
+                     'cnot_count', 'toffoli_count']:
+            report[name] = 0
+        report.update(self.cost_counts)
+        report.update(max_width=self.max_width,
+                      depth=self.depth_of_dag,
+                      t_depth=self.t_depth,
+                      cnot_depth=self.cnot_depth,
+                      qubit_time_volume=self.qubit_time_volume)
+        return report
 
     def __str__(self):
         """
@@ -180,6 +748,8 @@ class ResourceCounter(BasicEngine):
         for cmd in command_list:
             if not cmd.gate == FlushGate():
                 self._add_cmd(cmd)
+            else:
+                self._enter_loops(cmd)
 
             # (try to) send on
             if not self.is_last_engine:
@@ -0,0 +1,153 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Contains a function which estimates the resources of a program consisting of
+independent subcircuits by counting them in a pool of processes.
+
+Example:
+    .. code-block:: python
+
+        def multiply(eng, n, a):
+            ctrl = eng.allocate_qubit()
+            x = eng.allocate_qureg(n)
+            with Control(eng, ctrl):
+                MultiplyByConstantModN(a, n) | x
+
+        subcircuits = [Subcircuit(multiply, (n, pow(a, 2 ** i, n)))
+                       for i in range(2 * n)]
+        resource_counter = estimate_resources(
+            subcircuits, engine_list=projectq.setups.default.get_engine_list)
+"""
+
+import hashlib
+import pickle
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:  # pragma: no cover
+    # Python 2 without the futures backport
+    ProcessPoolExecutor = None
+
+from ._resource import ResourceCounter
+
+
+class Subcircuit(object):
+    """
+    A subcircuit of a program, which is run count times.
+
+    The subcircuit is given by a function which is called with a MainEngine
+    and the arguments args, and which allocates its own qubits. Both the
+    function (which has to be defined at the top level of a module) and its
+    arguments have to be picklable, such that the subcircuit can be counted
+    in another process.
+    """
+    def __init__(self, function, args=(), count=1):
+        """
+        Initialize a subcircuit.
+
+        Args:
+            function (callable): Function which runs the subcircuit on the
+                engine it is called with.
+            args (tuple): Further arguments of the function.
+            count (int): Number of times the subcircuit is run.
+        """
+        self.function = function
+        self.args = tuple(args)
+        self.count = count
+
+    @property
+    def fingerprint(self):
+        """
+        Fingerprint of the function and its arguments. Subcircuits with the
+        same fingerprint are counted only once.
+        """
+        data = pickle.dumps((self.function, self.args), protocol=2)
+        return hashlib.sha1(data).hexdigest()
+
+
+def _count_subcircuit(function, args, engine_list, counter_args):
+    """
+    Count the resources of a subcircuit (in a worker process).
+
+    Returns:
+        A ResourceCounter, which is not connected to any engine.
+    """
+    from projectq.cengines import MainEngine
+    resource_counter = ResourceCounter(**counter_args)
+    engines = [] if engine_list is None else engine_list()
+    eng = MainEngine(backend=resource_counter, engine_list=engines)
+    function(eng, *args)
+    eng.flush(deallocate_qubits=True)
+    result = ResourceCounter(**counter_args)
+    result.merge(resource_counter)
+    return result
+
+
+def estimate_resources(subcircuits, engine_list=None, max_workers=None,
+                       sequential=True, cost_table=None,
+                       synthesis_precision=1e-10):
+    """
+    Count the resources of a program consisting of subcircuits.
+
+    Every distinct subcircuit (see Subcircuit.fingerprint) is compiled and
+    counted once in a pool of processes. The counts are then merged (see
+    ResourceCounter.merge), multiplied by the number of times a subcircuit
+    is run.
+
+    Args:
+        subcircuits (list<Subcircuit>): Subcircuits of the program (in the
+            order in which they are run).
+        engine_list (callable): Function which returns the list of compiler
+            engines used to compile the subcircuits (e.g.,
+            projectq.setups.default.get_engine_list). It has to be picklable.
+            By default, the subcircuits are counted without compilation.
+        max_workers (int): Number of processes. If it is 1 (or if
+            concurrent.futures is not available), the subcircuits are
+            counted in this process.
+        sequential (bool): If True, the subcircuits are run one after the
+            other (their depths add up). Otherwise, they are run in parallel
+            on distinct qubits (their widths add up).
+        cost_table (dict): Cost table of the resource counters (see
+            ResourceCounter).
+        synthesis_precision (float): Precision to which rotations are
+            synthesized (see ResourceCounter).
+
+    Returns:
+        A ResourceCounter with the resources of the whole program.
+    """
+    counter_args = dict(cost_table=cost_table,
+                        synthesis_precision=synthesis_precision)
+    unique = dict()
+    for subcircuit in subcircuits:
+        unique.setdefault(subcircuit.fingerprint, subcircuit)
+
+    if max_workers == 1 or ProcessPoolExecutor is None:
+        counts = dict((fingerprint, _count_subcircuit(
+            subcircuit.function, subcircuit.args, engine_list, counter_args))
+            for fingerprint, subcircuit in unique.items())
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = dict((fingerprint, executor.submit(
+                _count_subcircuit, subcircuit.function, subcircuit.args,
+                engine_list, counter_args))
+                for fingerprint, subcircuit in unique.items())
+            counts = dict((fingerprint, future.result())
+                          for fingerprint, future in futures.items())
+
+    resource_counter = ResourceCounter(**counter_args)
+    for subcircuit in subcircuits:
+        resource_counter.merge(counts[subcircuit.fingerprint],
+                               sequential=sequential, count=subcircuit.count)
+    return resource_counter
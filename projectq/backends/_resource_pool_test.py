@@ -0,0 +1,98 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Tests for projectq.backends._resource_pool.py.
+"""
+
+from projectq.cengines import MainEngine
+from projectq.meta import Control
+from projectq.ops import CNOT, H, QFT, T
+from projectq.setups.default import get_engine_list
+
+from projectq.backends import ResourceCounter, Subcircuit, estimate_resources
+
+_calls = []
+
+
+def _subroutine(eng, num_qubits, num_t):
+    _calls.append((num_qubits, num_t))
+    ctrl = eng.allocate_qubit()
+    qureg = eng.allocate_qureg(num_qubits)
+    H | ctrl
+    for _ in range(num_t):
+        T | qureg[0]
+    with Control(eng, ctrl):
+        QFT | qureg
+    CNOT | (ctrl, qureg[-1])
+
+
+def _subcircuits():
+    return [Subcircuit(_subroutine, (3, 1), count=2),
+            Subcircuit(_subroutine, (2, 4)),
+            Subcircuit(_subroutine, (3, 1))]
+
+
+def _count_directly(programs):
+    resource_counter = ResourceCounter()
+    eng = MainEngine(resource_counter, get_engine_list())
+    for args in programs:
+        _subroutine(eng, *args)
+        # the qubits of the subroutines are not reused
+        eng.flush(deallocate_qubits=True)
+    return resource_counter
+
+
+def test_subcircuit_fingerprint():
+    fingerprints = [subcircuit.fingerprint for subcircuit in _subcircuits()]
+    assert fingerprints[0] == fingerprints[2] != fingerprints[1]
+    assert Subcircuit(_subroutine, [3, 1]).fingerprint == fingerprints[0]
+
+
+def test_estimate_resources_in_process():
+    del _calls[:]
+    resource_counter = estimate_resources(_subcircuits(),
+                                          engine_list=get_engine_list,
+                                          max_workers=1)
+    # identical subcircuits are counted once
+    assert sorted(_calls) == [(2, 4), (3, 1)]
+    # the subroutines do not overlap in time, i.e., the depths add up
+    programs = [(3, 1), (3, 1), (2, 4), (3, 1)]
+    expected = _count_directly(programs)
+    assert resource_counter.gate_counts == expected.gate_counts
+    assert resource_counter.cost_counts == expected.cost_counts
+    assert resource_counter.max_width == expected.max_width == 4
+    assert (resource_counter.qubit_time_volume ==
+            expected.qubit_time_volume)
+    separate = [_count_directly([args]) for args in programs]
+    assert (resource_counter.depth_of_dag ==
+            sum(counter.depth_of_dag for counter in separate))
+    assert (resource_counter.t_depth ==
+            sum(counter.t_depth for counter in separate))
+
+
+def test_estimate_resources_process_pool():
+    resource_counter = estimate_resources(_subcircuits(),
+                                          engine_list=get_engine_list,
+                                          max_workers=2, sequential=False)
+    expected = _count_directly([(3, 1), (3, 1), (2, 4), (3, 1)]).to_dict()
+    # on distinct qubits, the subroutines are run in parallel
+    assert expected.pop("max_width") == 4
+    report = resource_counter.to_dict()
+    assert report.pop("max_width") == 3 * 4 + 3
+    assert report == expected
+
+    resource_counter = estimate_resources(_subcircuits(), max_workers=2)
+    assert resource_counter.cost_counts["t_count"] == 3 * 1 + 4
+    assert resource_counter.t_depth == 3 * 1 + 4
@@ -16,11 +16,15 @@
 Tests for projectq.backends._resource.py.
 """
 
+import json
+import math
+
 import pytest
 
 from projectq.cengines import DummyEngine, MainEngine, NotYetMeasuredError
-from projectq.meta import LogicalQubitIDTag
-from projectq.ops import All, Allocate, CNOT, Command, H, Measure, QFT, Rz, X
+from projectq.meta import LogicalQubitIDTag, Loop, LoopTag
+from projectq.ops import (All, Allocate, BasicGate, CNOT, Command, H, HGate,
+                          Measure, QFT, Rz, T, Tdag, Toffoli, X, XGate)
 from projectq.types import WeakQubitRef
 
 from projectq.backends import ResourceCounter
@@ -135,3 +139,217 @@ def test_resource_counter_depth_of_dag():
     assert resource_counter.depth_of_dag == 9
     qb0[0].__del__()
     assert resource_counter.depth_of_dag == 9
+
+
+def _count_loops(looped):
+    resource_counter = ResourceCounter()
+    if looped:
+        eng = MainEngine(resource_counter, [])
+    else:
+        # loops are unrolled if no engine after the LoopEngine handles them
+        eng = MainEngine(DummyEngine(), [resource_counter])
+    qb0 = eng.allocate_qubit()
+    qb1 = eng.allocate_qubit()
+    with Loop(eng, 3):
+        H | qb0
+        with Loop(eng, 4):
+            ancilla = eng.allocate_qubit()
+            CNOT | (qb1, ancilla)
+            X | ancilla
+            X | ancilla
+            del ancilla
+            # does not change the result
+            resource_counter.depth_of_dag
+        CNOT | (qb0, qb1)
+    Measure | qb1
+    eng.flush()
+    return resource_counter
+
+
+def test_resource_counter_loop():
+    resource_counter = _count_loops(looped=True)
+    unrolled = _count_loops(looped=False)
+    assert resource_counter.is_meta_tag_handler(LoopTag)
+    assert not unrolled.is_meta_tag_handler(LoopTag)
+    assert resource_counter.gate_class_counts[(XGate, 1)] == 15
+    assert resource_counter.gate_class_counts[(XGate, 0)] == 24
+    assert resource_counter.gate_class_counts[(HGate, 0)] == 3
+    assert resource_counter.gate_counts == unrolled.gate_counts
+    assert resource_counter.max_width == unrolled.max_width == 3
+    # depth of the last ancilla
+    assert resource_counter.depth_of_dag == unrolled.depth_of_dag == 16
+    assert resource_counter.t_depth == unrolled.t_depth == 0
+    assert resource_counter.cnot_depth == unrolled.cnot_depth == 15
+    assert resource_counter.cost_counts == unrolled.cost_counts
+    assert (resource_counter.qubit_time_volume ==
+            unrolled.qubit_time_volume)
+    assert resource_counter._depth._loops == []
+
+
+def test_resource_counter_loop_many_iterations():
+    resource_counter = ResourceCounter()
+    eng = MainEngine(resource_counter, [])
+    qureg = eng.allocate_qureg(2)
+    with Loop(eng, 10 ** 6):
+        H | qureg[0]
+        with Loop(eng, 10 ** 6):
+            CNOT | (qureg[0], qureg[1])
+        Rz(0.5) | qureg[1]
+    eng.flush()
+    assert resource_counter.gate_counts[(X, 1)] == 10 ** 12
+    assert resource_counter.gate_counts[(H, 0)] == 10 ** 6
+    assert resource_counter.depth_of_dag == 10 ** 6 * (10 ** 6 + 1) + 1
+
+
+def _count_ancilla_loop(num, looped=True):
+    resource_counter = ResourceCounter()
+    if looped:
+        eng = MainEngine(resource_counter, [])
+    else:
+        eng = MainEngine(DummyEngine(), [resource_counter])
+    qureg = eng.allocate_qureg(2)
+    H | qureg[0]
+    H | qureg[0]
+    with Loop(eng, num):
+        H | qureg[0]
+        H | qureg[0]
+        ancilla = eng.allocate_qubit()
+        CNOT | (qureg[1], ancilla)
+        CNOT | (qureg[0], ancilla)
+        del ancilla
+        CNOT | (qureg[0], qureg[1])
+    eng.flush()
+    return resource_counter
+
+
+def test_resource_counter_loop_ancilla_volume():
+    # the ancilla lives for 6 layers in the first iteration and for 3 layers
+    # in all later ones
+    resource_counter = _count_ancilla_loop(5)
+    unrolled = _count_ancilla_loop(5, looped=False)
+    assert resource_counter.depth_of_dag == unrolled.depth_of_dag == 22
+    assert (resource_counter.qubit_time_volume ==
+            unrolled.qubit_time_volume == 61)
+    resource_counter = _count_ancilla_loop(10 ** 9)
+    assert resource_counter.depth_of_dag == 4 * 10 ** 9 + 2
+    assert resource_counter.qubit_time_volume == 11 * 10 ** 9 + 6
+
+
+def _count_ft_program(resource_counter):
+    eng = MainEngine(resource_counter, [])
+    qureg = eng.allocate_qureg(3)
+    T | qureg[0]
+    Tdag | qureg[1]
+    CNOT | (qureg[0], qureg[1])
+    Toffoli | (qureg[0], qureg[1], qureg[2])
+    Rz(0.3) | qureg[0]
+    Rz(math.pi / 4) | qureg[2]
+    Rz(math.pi / 2) | qureg[1]
+    H | qureg[2]
+    All(Measure) | qureg
+    eng.flush(deallocate_qubits=True)
+    return resource_counter
+
+
+def test_resource_counter_ft_metrics():
+    resource_counter = _count_ft_program(ResourceCounter())
+    report = resource_counter.to_dict()
+    # 3.02 * log2(1e10) + 1.77 T gates to synthesize Rz(0.3)
+    assert report["rotation_t_count"] == 103
+    assert report["t_count"] == 3
+    assert report["rotation_count"] == 1
+    assert report["cnot_count"] == 1
+    assert report["toffoli_count"] == 1
+    assert report["depth"] == resource_counter.depth_of_dag == 6
+    assert report["t_depth"] == 1 + 103
+    assert report["cnot_depth"] == 1
+    # the last qubit is used from layer 3 on
+    assert report["qubit_time_volume"] == 5 + 5 + 4
+    assert report["max_width"] == 3
+    assert report["gate_counts"]["CCX"] == 1
+    assert report["gate_class_counts"]["CXGate"] == 1
+    assert report["gate_counts"][str(Tdag)] == 1
+    assert json.loads(json.dumps(report)) == report
+
+    resource_counter = _count_ft_program(ResourceCounter(
+        cost_table={(HGate, 0): {"clifford_count": 1},
+                    (XGate, 2): {"t_count": 7}},
+        synthesis_precision=1e-3))
+    report = resource_counter.to_dict()
+    assert report["clifford_count"] == 1
+    assert report["t_count"] == 3 + 7
+    assert report["toffoli_count"] == 0
+    assert report["rotation_t_count"] == 32
+    assert report["t_depth"] == 8 + 32
+
+
+def test_resource_counter_report_adds_counts_of_same_name():
+    def make_gate_class():
+        class NamedGate(BasicGate):
+            def __str__(self):
+                return "NamedGate"
+        return NamedGate
+
+    resource_counter = ResourceCounter()
+    eng = MainEngine(resource_counter, [])
+    qubit = eng.allocate_qubit()
+    first_class, second_class = make_gate_class(), make_gate_class()
+    first_class() | qubit
+    second_class() | qubit
+    second_class() | qubit
+    # one count per gate (class) and one for the allocation
+    assert sorted(resource_counter.gate_counts.values()) == [1, 1, 2]
+    report = resource_counter.to_dict()
+    assert report["gate_counts"]["NamedGate"] == 3
+    assert report["gate_class_counts"]["NamedGate"] == 3
+
+
+def test_resource_counter_merge():
+    resource_counter = _count_ft_program(ResourceCounter())
+    resource_counter.merge(_count_ft_program(ResourceCounter()))
+    assert resource_counter.gate_counts[(X, 2)] == 2
+    assert resource_counter.cost_counts["t_count"] == 6
+    assert resource_counter.depth_of_dag == 12
+    assert resource_counter.t_depth == 208
+    assert resource_counter.qubit_time_volume == 28
+    assert resource_counter.max_width == 3
+
+    resource_counter.merge(_count_ft_program(ResourceCounter()),
+                           sequential=False)
+    assert resource_counter.cost_counts["t_count"] == 9
+    assert resource_counter.depth_of_dag == 12
+    assert resource_counter.max_width == 6
+
+    # merging with a count is the same as merging count times
+    repeated = _count_ft_program(ResourceCounter())
+    merged = _count_ft_program(ResourceCounter())
+    for _ in range(3):
+        repeated.merge(_count_ft_program(ResourceCounter()))
+        repeated.merge(_count_ft_program(ResourceCounter()), sequential=False)
+    merged.merge(_count_ft_program(ResourceCounter()), count=3)
+    merged.merge(_count_ft_program(ResourceCounter()), sequential=False,
+                 count=3)
+    merged.merge(_count_ft_program(ResourceCounter()), count=0)
+    assert merged.to_dict() == repeated.to_dict()
+    with pytest.raises(ValueError):
+        merged.merge(_count_ft_program(ResourceCounter()), count=-1)
+
+    # qubits which are alive wait for the subroutine
+    resource_counter = ResourceCounter()
+    eng = MainEngine(resource_counter, [])
+    qubit = eng.allocate_qubit()
+    H | qubit
+    resource_counter.merge(_count_ft_program(ResourceCounter()))
+    H | qubit
+    assert resource_counter.depth_of_dag == 8
+    assert resource_counter.qubit_time_volume == 8 + 14
+    assert resource_counter.max_width == 4
+
+    with Loop(eng, 2):
+        H | qubit
+        gate_counts = dict(resource_counter.gate_counts)
+        with pytest.raises(RuntimeError):
+            resource_counter.merge(_count_ft_program(ResourceCounter()))
+        # nothing has been added
+        assert resource_counter.gate_counts == gate_counts
+        assert resource_counter.max_width == 4
@@ -0,0 +1,182 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Contains the ResultCache, which stores the results of circuits run on a remote
+device such that re-running the same compiled circuit does not submit it (and
+wait in the queue) again.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# os.replace is not available in Python 2.7
+_replace = getattr(os, 'replace', os.rename)
+
+
+class ResultCache(object):
+    """
+    Cache of the results of circuits run by the IBM and Rigetti back-ends.
+
+    A result is stored per device, compiled program (QASM or Quil) and number
+    of shots. The measurement outcome which is registered in the main engine
+    is still sampled anew from the cached statistics on every run.
+
+    If a directory is given, the results are stored in one JSON file per
+    circuit and loaded again by ResultCache instances created later (e.g., in
+    a new notebook session).
+
+    Example:
+        .. code-block:: python
+
+            cache = ResultCache(directory=".projectq_results", ttl=86400)
+            eng = MainEngine(IBMBackend(result_cache=cache), ...)
+
+    Attributes:
+        num_hits (int): Number of results which have been found.
+        num_misses (int): Number of results which have not been found.
+    """
+    def __init__(self, directory=None, ttl=None, max_entries=1000):
+        """
+        Initialize a ResultCache.
+
+        Args:
+            directory (str): Directory in which the results are stored.
+                Default is to keep the results in memory only.
+            ttl (float): Time (in seconds) after which a result expires.
+                Default is to keep results until they are evicted.
+            max_entries (int): Maximal number of results. If it is exceeded,
+                the least recently used result is removed.
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.num_hits = 0
+        self.num_misses = 0
+        # key -> (time at which the result was stored, result), least
+        # recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            self._load()
+
+    @staticmethod
+    def key(device, program, shots):
+        """
+        Return the key of the result of a compiled circuit.
+
+        Args:
+            device (str): Device on which the circuit is run.
+            program (str): Compiled circuit (QASM or Quil).
+            shots (int): Number of runs of the circuit.
+        """
+        text = json.dumps([device, program, shots])
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key):
+        """
+        Return the stored result or None if there is no (unexpired) result.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and self._expired(entry[0]):
+                self._remove_file(key)
+                entry = None
+            if entry is None:
+                self.num_misses += 1
+                return None
+            self._entries[key] = entry
+            self.num_hits += 1
+            return entry[1]
+
+    def set(self, key, result):
+        """
+        Store the result (which has to be serializable as JSON).
+        """
+        entry = (time.time(), result)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            if self.directory is not None:
+                self._write_file(key, entry)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._remove_file(old_key)
+
+    def clear(self):
+        """
+        Remove all results (including the files in the directory).
+        """
+        with self._lock:
+            for key in self._entries:
+                self._remove_file(key)
+            self._entries.clear()
+
+    def _expired(self, stored):
+        return self.ttl is not None and time.time() - stored >= self.ttl
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def _load(self):
+        """
+        Load all unexpired results from the directory (oldest first).
+        """
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        entries = []
+        for name in os.listdir(self.directory):
+            key, extension = os.path.splitext(name)
+            if extension != ".json":
+                continue
+            try:
+                with open(self._path(key)) as result_file:
+                    data = json.load(result_file)
+                entries.append((data['stored'], key, data['result']))
+            except (IOError, ValueError, KeyError):
+                # incomplete or foreign file
+                continue
+        for stored, key, result in sorted(entries):
+            if self._expired(stored):
+                self._remove_file(key)
+            else:
+                self._entries[key] = (stored, result)
+        while len(self._entries) > self.max_entries:
+            old_key, _ = self._entries.popitem(last=False)
+            self._remove_file(old_key)
+
+    def _write_file(self, key, entry):
+        # write to a temporary file first such that no incomplete result is
+        # loaded if the process is interrupted
+        path = self._path(key)
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, "w") as result_file:
+            json.dump({'stored': entry[0], 'result': entry[1]}, result_file)
+        _replace(tmp_path, path)
+
+    def _remove_file(self, key):
+        if self.directory is None:
+            return
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
@@ -0,0 +1,100 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Tests for projectq.backends._result_cache.py."""
+
+import os
+
+import pytest
+
+from projectq.backends import _result_cache
+from projectq.backends._result_cache import ResultCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.]
+    monkeypatch.setattr(_result_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_result_cache_key():
+    key = ResultCache.key("ibmqx4", "qreg q[1];", 1024)
+    assert key == ResultCache.key("ibmqx4", "qreg q[1];", 1024)
+    assert len(set([key,
+                    ResultCache.key("simulator", "qreg q[1];", 1024),
+                    ResultCache.key("ibmqx4", "qreg q[2];", 1024),
+                    ResultCache.key("ibmqx4", "qreg q[1];", 1000)])) == 4
+
+
+def test_result_cache_lru_and_ttl(clock):
+    cache = ResultCache(ttl=60, max_entries=2)
+    assert cache.get("a") is None
+    cache.set("a", {"counts": 1})
+    cache.set("b", 2)
+    assert cache.get("a") == {"counts": 1}
+    # "b" is the least recently used result
+    cache.set("c", 3)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert (cache.num_hits, cache.num_misses) == (1, 2)
+    clock[0] += 60
+    assert cache.get("a") is None
+    assert len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_result_cache_persistent(tmpdir, clock):
+    directory = str(tmpdir.join("results"))
+    cache = ResultCache(directory=directory, ttl=100)
+    cache.set("a", {"data": {"counts": {"01": 3}}})
+    clock[0] += 10
+    cache.set("b", [[0, 1]])
+    cache.set("b", [[1, 1]])
+    assert sorted(os.listdir(directory)) == ["a.json", "b.json"]
+    # incomplete and foreign files are ignored
+    tmpdir.join("results", "c.json").write("{")
+    tmpdir.join("results", "notes.txt").write("")
+
+    loaded = ResultCache(directory=directory, ttl=100)
+    assert loaded.get("a") == {"data": {"counts": {"01": 3}}}
+    assert loaded.get("b") == [[1, 1]]
+    assert loaded.get("c") is None
+    # the oldest result is evicted
+    small = ResultCache(directory=directory, ttl=100, max_entries=1)
+    assert small.get("a") is None
+    assert not os.path.exists(os.path.join(directory, "a.json"))
+    # expired results are removed when the cache is loaded
+    clock[0] += 100
+    assert len(ResultCache(directory=directory, ttl=100)) == 0
+    assert not os.path.exists(os.path.join(directory, "b.json"))
+
+    cache.set("d", 4)
+    cache.clear()
+    assert not os.path.exists(os.path.join(directory, "d.json"))
+
+
+def test_result_cache_replaces_file_atomically(tmpdir, monkeypatch):
+    directory = str(tmpdir.join("results"))
+    cache = ResultCache(directory=directory)
+    cache.set("a", 1)
+
+    # the stored result must not be removed before the new one is in place
+    def fail_remove(path):
+        raise AssertionError("removed {}".format(path))
+    monkeypatch.setattr(os, "remove", fail_remove)
+    cache.set("a", 2)
+    assert os.listdir(directory) == ["a.json"]
+    assert ResultCache(directory=directory).get("a") == 2
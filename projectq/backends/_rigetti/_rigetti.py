@@ -14,10 +14,6 @@
 
 """ Back-end to run quantum program on Rigetti's Forest API."""
 
-import random
-import json
-
-from projectq.cengines import BasicEngine
 from projectq.meta import get_control_count, LogicalQubitIDTag
 from projectq.ops import (NOT,
                           Y,
@@ -38,18 +34,36 @@ from projectq.ops import (NOT,
                           Barrier,
                           FlushGate)
 
-from ._rigetti_http_client import send, retrieve
+from projectq.backends._cloud import CloudBackend
+from projectq.backends._emitters import QuilEmitter
+from ._rigetti_http_client import send, retrieve, submit_batch, poll_result
 
 RIGETTI_DEVICES = ["8Q-Agave", "19Q-Acorn"]
 
-class RigettiBackend(BasicEngine):
+class RigettiBackend(CloudBackend):
     """
     The Rigetti Backend class, which stores the circuit, transforms it to JSON
     Quil, and sends the circuit through the Rigetti Forest API.
+
+
+    Several circuits (i.e., the circuits of several calls to eng.flush())
+    can be submitted as one batch (see batch_size and submit_batch). The
+    Forest API runs one program per job, hence the jobs of a batch share the
+    device status check and authentication only.
+
+    Attributes:
+        futures (list<JobFuture>): Futures of all circuits which have been
+            submitted asynchronously or in a batch (in the order of
+            submission). Their results are the probabilities of the circuits.
+            The measurement results of a circuit are registered in the main
+            engine once the result of its future is retrieved (in the calling
+            thread). The job_id of circuits whose result has been found in
+            the result cache is None.
     """
     def __init__(self, use_hardware=False, num_runs=1024, verbose=False,
                  user_id=None, api_key=None, device=RIGETTI_DEVICES[0],
-                 retrieve_execution=None):
+                 retrieve_execution=None, asynchronous=False,
+                 poller=None, batch_size=1, result_cache=None):
         """
         Initialize the Backend object.
 
@@ -67,22 +81,36 @@ class RigettiBackend(BasicEngine):
                 if use_hardware is set to True. Default is 8Q-Agave.
             retrieve_execution (int): Job ID to retrieve instead of re-
                 running the circuit (e.g., if previous run timed out).
+                Cannot be used with batch_size > 1.
+            asynchronous (bool): If True, eng.flush() only submits the job
+                and returns immediately. The measurement results are
+                registered once the result of the future of the circuit has
+                been retrieved (see futures).
+            poller (JobPoller): Poller of the results of asynchronous jobs.
+                Default is a poller shared by all back-ends.
+            batch_size (int): Number of circuits which are submitted at once.
+                The measurement results of a circuit are only registered
+                once its batch has been run. Use submit_batch() to submit an
+                incomplete batch.
+            result_cache (ResultCache): Cache of the results of circuits
+                which have been run before. Circuits whose result is found
+                are not sent to the Forest API.
+
+        Raises:
+            ValueError: If retrieve_execution is used with batch_size > 1.
         """
-        BasicEngine.__init__(self)
+        CloudBackend.__init__(self, num_runs, verbose, retrieve_execution,
+                              asynchronous, poller, batch_size, result_cache)
         self._reset()
         if use_hardware:
             self.device = device
         else:
             self.device = 'QVM'
-        self._num_runs = num_runs
-        self._verbose = verbose
         self._user_id = user_id
         self._api_key = api_key
-        self._probabilities = dict()
-        self.quil = ""
+        self._emitter = QuilEmitter()
         self._measured_ids = []
         self._allocated_qubits = set()
-        self._retrieve_execution = retrieve_execution
 
     def is_available(self, cmd):
         """
@@ -107,6 +135,14 @@ class RigettiBackend(BasicEngine):
             return True
         return False
 
+    @property
+    def quil(self):
+        """
+        Quil of the gates stored since the last flush (without
+        measurements).
+        """
+        return self._emitter.getvalue()
+
     def _reset(self):
         """ Reset all temporary variables (after flush gate). """
         self._clear = True
@@ -116,7 +152,8 @@ class RigettiBackend(BasicEngine):
         """
         Temporarily store the command cmd.
 
-        Translates the command and stores it in a local variable (self._cmds).
+        Translates the command and appends it to the Quil of the circuit (see
+        QuilEmitter).
 
         Args:
             cmd: Command to store
@@ -124,7 +161,7 @@ class RigettiBackend(BasicEngine):
         if self._clear:
             self._probabilities = dict()
             self._clear = False
-            self.quil = ""
+            self._emitter.clear()
             self._allocated_qubits = set()
 
         gate = cmd.gate
@@ -146,40 +183,8 @@ class RigettiBackend(BasicEngine):
                     break
             assert logical_id is not None
             self._measured_ids += [logical_id]
-        elif gate == NOT and get_control_count(cmd) == 1:
-            ctrl_pos = cmd.control_qubits[0].id
-            qb_pos = cmd.qubits[0][0].id
-            self.quil += "\nCNOT {} {}".format(ctrl_pos, qb_pos)
-        elif gate == NOT and get_control_count(cmd) == 2:
-            ctrl_pos = cmd.control_qubits[0].id
-            ctrl2_pos = cmd.control_qubits[1].id
-            qb_pos = cmd.qubits[0][0].id
-            self.quil += "\nCCNOT {} {} {}".format(ctrl_pos, ctrl2_pos, qb_pos)
-        elif isinstance(gate, (Rx, Ry, Rz, Ph)):
-            assert get_control_count(cmd) < 2
-            qb_pos = cmd.qubits[0][0].id
-
-            gate_str = str(gate).upper().replace('PH(', 'PHASE(')
-
-            if (get_control_count(cmd) == 1):
-                ctrl_pos = cmd.control_qubits[0].id
-                self.quil += "\nCONTROLLED {} {} {}".format(gate_str, ctrl_pos, qb_pos)
-            else:
-                self.quil += "\n{} {}".format(gate_str, qb_pos)
         else:
-            assert get_control_count(cmd) < 2
-            if str(gate) in self._gate_names:
-                gate_str = self._gate_names[str(gate)]
-            else:
-                gate_str = str(gate).upper()
-
-            qb_pos = cmd.qubits[0][0].id
-
-            if (get_control_count(cmd) == 1):
-                ctrl_pos = cmd.control_qubits[0].id
-                self.quil += "\nCONTROLLED {} {} {}".format(gate_str, ctrl_pos, qb_pos)
-            else:
-                self.quil += "\n{} {}".format(gate_str, qb_pos)
+            self._emitter.emit(cmd)
 
     def _logical_to_physical(self, qb_id):
         """
@@ -220,7 +225,7 @@ class RigettiBackend(BasicEngine):
         Raises:
             RuntimeError: If no data is available (i.e., if the circuit has
                 not been executed). Or if a qubit was supplied which was not
-                present in the circuit (might have gotten optimized away).
+                measured in the circuit (might have gotten optimized away).
         """
         if len(self._probabilities) == 0:
             raise RuntimeError("Please, run the circuit first!")
@@ -230,7 +235,7 @@ class RigettiBackend(BasicEngine):
         for state in self._probabilities:
             mapped_state = ['0'] * len(qureg)
             for i in range(len(qureg)):
-                mapped_state[i] = state[self._logical_to_physical(qureg[i].id)]
+                mapped_state[i] = state[self._measured_location(qureg[i].id)]
             probability = self._probabilities[state]
             probability_dict["".join(mapped_state)] = probability
 
@@ -243,72 +248,87 @@ class RigettiBackend(BasicEngine):
         Send the circuit via the Rigetti Forest API (JSON Quil) using the provided user
         data / ask for user id & api key.
         """
-        if self.quil == "":
+        if self._emitter.is_empty():
             return
         # finally: add measurements (no intermediate measurements are allowed)
         for measured_id in self._measured_ids:
             qb_loc = self.main_engine.mapper.current_mapping[measured_id]
-            self.quil += "\nMEASURE {} [{}]".format(qb_loc, qb_loc)
+            self._emitter.measure(qb_loc)
 
         max_qubit_id = max(self._allocated_qubits)
         # todo: establish max qubits
-        quil = self.quil
+        quil = self._emitter.getvalue().strip()
+
+        locations = dict((measured_id, self._logical_to_physical(measured_id))
+                         for measured_id in self._measured_ids)
+        self._run_program(quil, locations)
+
+    def _job_info(self, quils):
+        """
+        Return the JSON Quil of the given circuits.
+        """
         info = {}
-        info['quils'] = [{'quil': quil.strip()}]
+        info['quils'] = [{'quil': quil} for quil in quils]
         info['shots'] = self._num_runs
         info['maxCredits'] = 5
         info['backend'] = {'name': self.device}
+        return info
+
+    def _send(self, quil):
+        """ Run the circuit via the Forest API and return its result. """
+        return send(self._job_info([quil]), device=self.device,
+                    user_id=self._user_id, api_key=self._api_key,
+                    shots=self._num_runs, verbose=self._verbose)
+
+    def _retrieve(self, job_id):
+        """ Return the result of the job with the given id. """
+        return retrieve(device=self.device, user_id=self._user_id,
+                        api_key=self._api_key, jobid=job_id)
 
-        try:
-            if self._retrieve_execution is None:
-                res = send(info, device=self.device,
-                           user_id=self._user_id, api_key=self._api_key,
-                           shots=self._num_runs, verbose=self._verbose)
+    def _submit(self, quils):
+        """
+        Submit one job per circuit (see CloudBackend._submit).
+        """
+        if self._retrieve_execution is None:
+            execution_ids = submit_batch(
+                self._job_info(quils), device=self.device,
+                user_id=self._user_id, api_key=self._api_key,
+                shots=self._num_runs, verbose=self._verbose)
+        else:
+            execution_ids = [self._retrieve_execution]
+        if self._verbose:
+            print("- Submitted {} job(s). [Job IDs: {}]".format(
+                len(quils), ", ".join(str(execution_id) for
+                                      execution_id in execution_ids)))
+
+        def add_to_poller(futures):
+            for future in futures:
+                self._poller.add(future, self._result_poll(future.job_id))
+        return execution_ids, add_to_poller
+
+    def _result_poll(self, execution_id):
+        """
+        Return a function which polls the result of a job once.
+        """
+        user_id = self._user_id
+        api_key = self._api_key
+        return lambda: poll_result(execution_id, user_id, api_key)
+
+    def _get_counts(self, res):
+        """
+        Return the counts of the measured states in the result (one list of
+        measured bits per run).
+        """
+        counts = {}
+        for result in res:
+            combined = ''
+            for val in result:
+                combined += str(val)
+            if combined not in counts:
+                counts[combined] = 1
             else:
-                res = retrieve(device=self.device, user_id=self._user_id,
-                               api_key=self._api_key,
-                               jobid=self._retrieve_execution)
-
-            counts = {}
-            for result in res:
-                combined = ''
-                for val in result:
-                    combined += str(val)
-                if combined not in counts:
-                    counts[combined] = 1
-                else:
-                    counts[combined] += 1
-
-            # Determine random outcome
-            P = random.random()
-            p_sum = 0.
-            measured = ""
-            for state in counts:
-                probability = counts[state] * 1. / self._num_runs
-                state = list(reversed(state))
-                state = "".join(state)
-                p_sum += probability
-                star = ""
-                if p_sum >= P and measured == "":
-                    measured = state
-                    star = "*"
-                self._probabilities[state] = probability
-                if self._verbose and probability > 0:
-                    print(str(state) + " with p = " + str(probability) +
-                          star)
-
-            class QB():
-                def __init__(self, ID):
-                    self.id = ID
-
-            # register measurement result
-            for ID in self._measured_ids:
-                location = self._logical_to_physical(ID)
-                result = int(measured[location])
-                self.main_engine.set_measurement_result(QB(ID), result)
-            self._reset()
-        except TypeError:
-            raise Exception("Failed to run the circuit. Aborting.")
+                counts[combined] += 1
+        return counts
 
     def receive(self, command_list):
         """
@@ -324,10 +344,3 @@ class RigettiBackend(BasicEngine):
             else:
                 self._run()
                 self._reset()
-
-    """
-    Mapping of gate names from our gate objects to the Rigetti Quil representation.
-    """
-    _gate_names = {str(Tdag): "DAGGER T",
-                   str(Sdag): "DAGGER S",
-                   str(Ph): "PHASE"}
@@ -21,6 +21,8 @@ import time
 import re
 from requests.compat import urljoin
 
+from projectq.backends._http import backoff, session as _session
+
 
 _api_url = 'https://job.rigetti.com/beta/'
 _old_api_url = 'https://api.rigetti.com/qvm'
@@ -30,7 +32,7 @@ class DeviceOfflineError(Exception):
     pass
 
 def is_online(device, user_id, api_key):
-    r = requests.get(urljoin(_api_url, "devices"), headers={
+    r = _session.get(urljoin(_api_url, "devices"), headers={
         "X-Api-Key": api_key,
         "X-User-Id": user_id,
         "Accept": "application/octet-stream"
@@ -72,22 +74,8 @@ def send(info, device=RIGETTI_DEVICES[0], user_id=None, api_key=None,
             one measurement result.
     """
     try:
-        # check if the device is online
-        if device in RIGETTI_DEVICES:
-            online = is_online(device, user_id, api_key)
-
-            if not online:
-                print("The device is offline (for maintenance?). Use the "
-                      "QVM instead or try again later.")
-                raise DeviceOfflineError("Device is offline.")
-
-        if verbose:
-            print("- Authenticating...")
-        _authenticate(user_id, api_key)
-        if verbose:
-            print("- Running code: {}".format(
-                info['quils'][0]['quil']))
-        execution_id = _run(info, device, user_id, api_key, shots)
+        execution_id = submit(info, device=device, user_id=user_id,
+                              api_key=api_key, shots=shots, verbose=verbose)
         if verbose:
             print("- Waiting for results...")
         res = _get_result(device, execution_id, user_id, api_key)
@@ -105,6 +93,96 @@ def send(info, device=RIGETTI_DEVICES[0], user_id=None, api_key=None,
         print(err)
 
 
+def submit(info, device=RIGETTI_DEVICES[0], user_id=None, api_key=None,
+           shots=1, verbose=False):
+    """
+    Sends Quil through the Rigetti Forest/API without waiting for the
+    results.
+
+    Args:
+        info: Contains Quil representation of the circuit to run.
+        device (str): 'QVM', '8Q-Agave', or '19Q-Acorn'
+        user_id (str): Rigetti User ID
+        api_key (str): Rigetti API Key
+        shots (int): Number of runs of the same circuit to collect statistics.
+        verbose (bool): If True, additional information is printed.
+
+    Returns:
+        Id of the job to poll the results (see poll_result).
+    """
+    info = dict(info, quils=info['quils'][:1])
+    return submit_batch(info, device=device, user_id=user_id,
+                        api_key=api_key, shots=shots, verbose=verbose)[0]
+
+
+def submit_batch(info, device=RIGETTI_DEVICES[0], user_id=None, api_key=None,
+                 shots=1, verbose=False):
+    """
+    Sends several Quil programs through the Rigetti Forest/API without
+    waiting for the results.
+
+    The Forest API runs one program per job, hence one job is submitted per
+    program. The device status is checked and the user is authenticated only
+    once for all programs.
+
+    Args:
+        info: Contains the Quil representations of the circuits to run.
+        device (str): 'QVM', '8Q-Agave', or '19Q-Acorn'
+        user_id (str): Rigetti User ID
+        api_key (str): Rigetti API Key
+        shots (int): Number of runs of the same circuit to collect statistics.
+        verbose (bool): If True, additional information is printed.
+
+    Returns:
+        List of the ids of the jobs (one per program, see poll_result).
+    """
+    # check if the device is online
+    if device in RIGETTI_DEVICES:
+        online = is_online(device, user_id, api_key)
+
+        if not online:
+            print("The device is offline (for maintenance?). Use the "
+                  "QVM instead or try again later.")
+            raise DeviceOfflineError("Device is offline.")
+
+    if verbose:
+        print("- Authenticating...")
+    _authenticate(user_id, api_key)
+    execution_ids = []
+    for quil in info['quils']:
+        if verbose:
+            print("- Running code: {}".format(quil['quil']))
+        execution_ids.append(_run(dict(info, quils=[quil]), device, user_id,
+                                  api_key, shots))
+    return execution_ids
+
+
+def poll_result(execution_id, user_id, api_key):
+    """
+    Returns the result of a job or None if it has not finished yet.
+
+    Sends exactly one request to the Rigetti Forest API.
+
+    Args:
+        execution_id (str): Id of the job (see submit).
+        user_id (str): Rigetti User ID
+        api_key (str): Rigetti API Key
+    """
+    suffix = 'job/{execution_id}'.format(execution_id=execution_id)
+    r = _session.get(urljoin(_api_url, suffix),
+        headers={
+          "Content-Type": "application/json",
+          "X-Api-Key": api_key,
+          "X-User-Id": user_id
+        })
+    r.raise_for_status()
+
+    r_json = r.json()
+    if 'result' in r_json and 'status' in r_json and r_json['status'] != 'RUNNING':
+        return r_json['result']
+    return None
+
+
 def _authenticate(user_id=None, api_key=None):
     """
     :param user_id:
@@ -148,7 +226,7 @@ def _run(runcodes, device, user_id, api_key, shots):
     #   execution_id = -1
 
     suffix = 'job'
-    r = requests.post(urljoin(_api_url, suffix),
+    r = _session.post(urljoin(_api_url, suffix),
                       json={
                         "machine": device,
                         "program": {
@@ -170,27 +248,19 @@ def _run(runcodes, device, user_id, api_key, shots):
 
 
 def _get_result(device, execution_id, user_id, api_key, num_retries=3000,
-                interval=1):
-    suffix = 'job/{execution_id}'.format(execution_id=execution_id)
+                interval=1, max_interval=10):
     status_url = urljoin(_api_url, 'devices')
 
     print("Waiting for results. [Job ID: {}]".format(execution_id))
 
+    delays = backoff(interval, max_interval)
     for retries in range(num_retries):
-        r = requests.get(urljoin(_api_url, suffix),
-            headers={
-              "Content-Type": "application/json",
-              "X-Api-Key": api_key,
-              "X-User-Id": user_id
-            })
-        r.raise_for_status()
-
-        r_json = r.json()
-        if 'result' in r_json and 'status' in r_json and r_json['status'] != 'RUNNING':
-            return r_json['result']
-        time.sleep(interval)
+        result = poll_result(execution_id, user_id, api_key)
+        if result is not None:
+            return result
+        time.sleep(next(delays))
         if device in RIGETTI_DEVICES and retries % 60 == 0:
-            r = requests.get(status_url, headers={
+            r = _session.get(status_url, headers={
                 "X-Api-Key": api_key,
                 "X-User-Id": user_id,
                 "Accept": "application/octet-stream"
@@ -203,5 +273,5 @@ def _get_result(device, execution_id, user_id, api_key, num_retries=3000,
     #         if 'lengthQueue' in r_json:
     #             print("Currently there are {} jobs queued for execution on {}."
     #                   .format(r_json['lengthQueue'], device))
-    # raise Exception("Timeout. The ID of your submitted job is {}."
-    #                 .format(execution_id))
+    raise Exception("Timeout. The ID of your submitted job is {}."
+                    .format(execution_id))
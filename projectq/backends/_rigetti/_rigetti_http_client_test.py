@@ -15,12 +15,22 @@
 """Tests for projectq.backends._rigetti_http_client._rigetti.py."""
 
 import json
+import threading
 import pytest
 import requests
 from requests.compat import urljoin
 
+from projectq.backends import JobFuture, JobPoller
 from projectq.backends._rigetti import _rigetti_http_client
 
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+# used by the tests which run against a local stand-in of the Forest API
+_session_request = requests.sessions.Session.request
+
 
 # Insure that no HTTP request can be made in all tests in this module
 @pytest.fixture(autouse=True)
@@ -29,436 +39,278 @@ def no_requests(monkeypatch):
 
 
 _api_url = "https://job.rigetti.com/beta/"
-_api_url_status = "https://job.rigetti.com/beta/devices"
-
-
-def test_send_real_device_online_verbose(monkeypatch):
-    quils = {'quils': [{'quil': 'my quil'}]}
-    json_quil = json.dumps(quils)
-    name = 'projectq_test'
-    access_token = "access"
-    user_id = 2016
-    code_id = 11
-    name_item = '"name":"{name}", "jsonquil":'.format(name=name)
-    json_body = ''.join([name_item, json_quil])
-    json_data = ''.join(['{', json_body, '}'])
-    shots = 1
-    device = "8Q-Agave"
-    json_data_run = ''.join(['{"quil":', json_quil, '}'])
-    execution_id = 3
-    result_ready = [False]
-    result = "my_result"
-    request_num = [0]  # To assert correct order of calls
 
-    # Mock of Rigetti server:
-    def mocked_requests_get(*args, **kwargs):
-        class MockRequest:
-            def __init__(self, url=""):
-                self.url = url
 
-        class MockResponse:
-            def __init__(self, json_data, status_code):
-                self.json_data = json_data
-                self.status_code = status_code
-                self.request = MockRequest()
-                self.text = ""
+class _MockResponse(object):
+    def __init__(self, json_data):
+        self.json_data = json_data
 
-            def json(self):
-                return self.json_data
+    def json(self):
+        return self.json_data
 
-            def raise_for_status(self):
-                pass
+    def raise_for_status(self):
+        pass
 
-        # Accessing status of device. Return online.
-        status_url = '/devices'
-        if (args[0] == urljoin(_api_url_status, status_url) and
-                (request_num[0] == 0 or request_num[0] == 3)):
-            request_num[0] += 1
-            return MockResponse({"state": True}, 200)
-        # Getting result
-        elif (args[0] == urljoin(_api_url,
-              "Jobs/{execution_id}".format(execution_id=execution_id)) and
-              kwargs["params"]["access_token"] == access_token and not
-              result_ready[0] and request_num[0] == 3):
-            result_ready[0] = True
-            return MockResponse({"status": {"id": "NotDone"}}, 200)
-        elif (args[0] == urljoin(_api_url,
-              "Jobs/{execution_id}".format(execution_id=execution_id)) and
-              kwargs["params"]["access_token"] == access_token and
-              result_ready[0] and request_num[0] == 4):
-            print("state ok")
-            return MockResponse({"quils": [{"result": result}]}, 200)
 
-    def mocked_requests_post(*args, **kwargs):
-        class MockRequest:
-            def __init__(self, body="", url=""):
-                self.body = body
-                self.url = url
+def _devices(online=True):
+    return _MockResponse({"devices": {"8Q-Agave": {"is_online": online}}})
 
-        class MockPostResponse:
-            def __init__(self, json_data, text=" "):
-                self.json_data = json_data
-                self.text = text
-                self.request = MockRequest()
 
-            def json(self):
-                return self.json_data
+def _headers_ok(kwargs):
+    return (kwargs["headers"]["X-User-Id"] == "user" and
+            kwargs["headers"]["X-Api-Key"] == "key")
 
-            def raise_for_status(self):
-                pass
 
-        # Run code
-        if (args[0] == urljoin(_api_url, "Jobs") and
-                kwargs["data"] == json_quil and
-                kwargs["params"]["access_token"] == access_token and
-                kwargs["params"]["deviceRunType"] == device and
-                kwargs["params"]["fromCache"] == "false" and
-                kwargs["params"]["shots"] == shots and
-                kwargs["headers"]["Content-Type"] == "application/json" and
-                request_num[0] == 2):
-            request_num[0] += 1
-            return MockPostResponse({"id": execution_id})
+@pytest.fixture
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(_rigetti_http_client.time, "sleep", lambda x: x)
 
-    monkeypatch.setattr("requests.get", mocked_requests_get)
-    monkeypatch.setattr("requests.post", mocked_requests_post)
-    # Patch login data
-    api_key = "test"
-    user_id = "test@projectq.ch"
-    monkeypatch.setitem(__builtins__, "input", lambda x: user_id)
-    monkeypatch.setitem(__builtins__, "raw_input", lambda x: user_id)
 
-    def user_api_key_input(prompt):
-        if prompt == "Rigetti Forest API Key > ":
-            return api_key
+def test_send_real_device_online_verbose(monkeypatch, no_sleep):
+    info = {'quils': [{'quil': 'X 0\nMEASURE 0 [0]'}], 'shots': 3}
+    execution_id = "3"
+    result = [[1]] * 3
+    num_polls = [0]
+    posted = []
+
+    # Mock of Rigetti server:
+    def mocked_requests_get(*args, **kwargs):
+        assert _headers_ok(kwargs)
+        # Accessing status of device. Return online.
+        if args[0] == urljoin(_api_url, "devices"):
+            return _devices()
+        # Getting result
+        if args[0] == urljoin(_api_url, "job/" + execution_id):
+            num_polls[0] += 1
+            if num_polls[0] == 1:
+                return _MockResponse({"status": "RUNNING"})
+            return _MockResponse({"status": "FINISHED", "result": result})
+
+    def mocked_requests_post(*args, **kwargs):
+        # Run code
+        assert args[0] == urljoin(_api_url, "job")
+        assert _headers_ok(kwargs)
+        posted.append(kwargs["json"])
+        return _MockResponse({"jobId": execution_id})
 
-    monkeypatch.setattr("getpass.getpass", user_api_key_input)
+    monkeypatch.setattr(_rigetti_http_client._session, "get",
+                        mocked_requests_get)
+    monkeypatch.setattr(_rigetti_http_client._session, "post",
+                        mocked_requests_post)
 
     # Code to test:
-    res = _rigetti_http_client.send(json_quil,
-                                device="8Q-Agave",
-                                user=None, password=None,
-                                shots=shots, verbose=True)
-    print(res)
+    res = _rigetti_http_client.send(info, device="8Q-Agave",
+                                    user_id="user", api_key="key",
+                                    shots=3, verbose=True)
     assert res == result
+    assert num_polls[0] == 2
+    assert posted == [{"machine": "8Q-Agave",
+                       "program": {"type": "multishot-measure",
+                                   "qubits": [0],
+                                   "trials": 3,
+                                   "compiled-quil": "X 0\nMEASURE 0 [0]\n"}}]
 
 
 def test_send_real_device_offline(monkeypatch):
     def mocked_requests_get(*args, **kwargs):
-        class MockResponse:
-            def __init__(self, json_data, status_code):
-                self.json_data = json_data
-                self.status_code = status_code
+        # Accessing status of device. Return offline.
+        if args[0] == urljoin(_api_url, "devices"):
+            return _devices(online=False)
 
-            def json(self):
-                return self.json_data
+    def mocked_requests_post(*args, **kwargs):
+        raise AssertionError("No job may be submitted.")
 
-        # Accessing status of device. Return online.
-        status_url = 'devices'
-        if args[0] == urljoin(_api_url_status, status_url):
-            return MockResponse({"state": False}, 200)
-    monkeypatch.setattr("requests.get", mocked_requests_get)
-    shots = 1
-    json_quil = "my_json_quil"
-    name = 'projectq_test'
+    monkeypatch.setattr(_rigetti_http_client._session, "get",
+                        mocked_requests_get)
+    monkeypatch.setattr(_rigetti_http_client._session, "post",
+                        mocked_requests_post)
+    info = {'quils': [{'quil': 'X 0\nMEASURE 0 [0]'}], 'shots': 1}
     with pytest.raises(_rigetti_http_client.DeviceOfflineError):
-        _rigetti_http_client.send(json_quil,
-                              device="8Q-Agave",
-                              user=None, password=None,
-                              shots=shots, verbose=True)
+        _rigetti_http_client.send(info, device="8Q-Agave",
+                                  user_id="user", api_key="key",
+                                  shots=1, verbose=True)
 
 
-def test_send_that_errors_are_caught(monkeypatch):
-    class MockResponse:
-        def __init__(self, json_data, status_code):
-            self.json_data = json_data
-            self.status_code = status_code
-
-        def json(self):
-            return self.json_data
-
+def _send_with_failing_post(monkeypatch, error):
     def mocked_requests_get(*args, **kwargs):
         # Accessing status of device. Return online.
-        status_url = 'devices'
-        if args[0] == urljoin(_api_url_status, status_url):
-            return MockResponse({"state": True}, 200)
+        if args[0] == urljoin(_api_url, "devices"):
+            return _devices()
 
     def mocked_requests_post(*args, **kwargs):
         # Test that this error gets caught
-        raise requests.exceptions.HTTPError
+        raise error
 
-    monkeypatch.setattr("requests.get", mocked_requests_get)
-    monkeypatch.setattr("requests.post", mocked_requests_post)
+    monkeypatch.setattr(_rigetti_http_client._session, "get",
+                        mocked_requests_get)
+    monkeypatch.setattr(_rigetti_http_client._session, "post",
+                        mocked_requests_post)
     # Patch login data
-    api_key = "test"
-    user_id = "test@projectq.ch"
-    monkeypatch.setitem(__builtins__, "input", lambda x: user_id)
-    monkeypatch.setitem(__builtins__, "raw_input", lambda x: user_id)
+    monkeypatch.setitem(__builtins__, "input", lambda x: "user")
+    monkeypatch.setitem(__builtins__, "raw_input", lambda x: "user")
+    monkeypatch.setattr("getpass.getpass", lambda prompt: "key")
+    info = {'quils': [{'quil': 'X 0\nMEASURE 0 [0]'}], 'shots': 1}
+    return _rigetti_http_client.send(info, device="8Q-Agave",
+                                     user_id=None, api_key=None,
+                                     shots=1, verbose=True)
 
-    def user_api_key_input(prompt):
-        if prompt == "Rigetti Forest API Key > ":
-            return api_key
 
-    monkeypatch.setattr("getpass.getpass", user_api_key_input)
-    shots = 1
-    json_quil = "my_json_quil"
-    name = 'projectq_test'
-    _rigetti_http_client.send(json_quil,
-                          device="8Q-Agave",
-                          user=None, password=None,
-                          shots=shots, verbose=True)
+def test_send_that_errors_are_caught(monkeypatch):
+    assert _send_with_failing_post(
+        monkeypatch, requests.exceptions.HTTPError) is None
 
 
 def test_send_that_errors_are_caught2(monkeypatch):
-    def mocked_requests_get(*args, **kwargs):
-        class MockResponse:
-            def __init__(self, json_data, status_code):
-                self.json_data = json_data
-                self.status_code = status_code
-
-            def json(self):
-                return self.json_data
-
-        # Accessing status of device. Return online.
-        status_url = 'devices'
-        if args[0] == urljoin(_api_url_status, status_url):
-            return MockResponse({"state": True}, 200)
-
-    def mocked_requests_post(*args, **kwargs):
-        # Test that this error gets caught
-        raise requests.exceptions.RequestException
-
-    monkeypatch.setattr("requests.get", mocked_requests_get)
-    monkeypatch.setattr("requests.post", mocked_requests_post)
-    # Patch login data
-    api_key = "test"
-    user_id = "test@projectq.ch"
-    monkeypatch.setitem(__builtins__, "input", lambda x: user_id)
-    monkeypatch.setitem(__builtins__, "raw_input", lambda x: user_id)
-
-    def user_api_key_input(prompt):
-        if prompt == "Rigetti Forest API Key > ":
-            return api_key
-
-    monkeypatch.setattr("getpass.getpass", user_api_key_input)
-    shots = 1
-    json_quil = "my_json_quil"
-    name = 'projectq_test'
-    _rigetti_http_client.send(json_quil,
-                          device="8Q-Agave",
-                          user=None, password=None,
-                          shots=shots, verbose=True)
+    assert _send_with_failing_post(
+        monkeypatch, requests.exceptions.RequestException) is None
 
 
 def test_send_that_errors_are_caught3(monkeypatch):
-    def mocked_requests_get(*args, **kwargs):
-        class MockResponse:
-            def __init__(self, json_data, status_code):
-                self.json_data = json_data
-                self.status_code = status_code
+    assert _send_with_failing_post(monkeypatch, KeyError) is None
 
-            def json(self):
-                return self.json_data
-
-        # Accessing status of device. Return online.
-        status_url = 'devices'
-        if args[0] == urljoin(_api_url_status, status_url):
-            return MockResponse({"state": True}, 200)
 
-    def mocked_requests_post(*args, **kwargs):
-        # Test that this error gets caught
-        raise KeyError
-
-    monkeypatch.setattr("requests.get", mocked_requests_get)
-    monkeypatch.setattr("requests.post", mocked_requests_post)
-    # Patch login data
-    api_key = "test"
-    user_id = "test@projectq.ch"
-    monkeypatch.setitem(__builtins__, "input", lambda x: user_id)
-    monkeypatch.setitem(__builtins__, "raw_input", lambda x: user_id)
-
-    def user_api_key_input(prompt):
-        if prompt == "Rigetti Forest API Key > ":
-            return api_key
-
-    monkeypatch.setattr("getpass.getpass", user_api_key_input)
-    shots = 1
-    json_quil = "my_json_quil"
-    name = 'projectq_test'
-    _rigetti_http_client.send(json_quil,
-                          device="8Q-Agave",
-                          user=None, password=None,
-                          shots=shots, verbose=True)
-
-
-def test_timeout_exception(monkeypatch):
-    quils = {'quils': [{'quil': 'my quil'}]}
-    json_quil = json.dumps(quils)
+def test_timeout_exception(monkeypatch, no_sleep):
+    info = {'quils': [{'quil': 'X 0\nMEASURE 0 [0]'}], 'shots': 1}
     tries = [0]
 
     def mocked_requests_get(*args, **kwargs):
-        class MockResponse:
-            def __init__(self, json_data, status_code):
-                self.json_data = json_data
-                self.status_code = status_code
-
-            def json(self):
-                return self.json_data
-
-            def raise_for_status(self):
-                pass
-
         # Accessing status of device. Return online.
-        status_url = 'devices'
-        if args[0] == urljoin(_api_url, status_url):
-            return MockResponse({"state": True}, 200)
-        job_url = 'Jobs/{}'.format("123e")
-        if args[0] == urljoin(_api_url, job_url):
+        if args[0] == urljoin(_api_url, "devices"):
+            return _devices()
+        if args[0] == urljoin(_api_url, "job/123e"):
             tries[0] += 1
-            return MockResponse({"noquils": "not done"}, 200)
+            return _MockResponse({"status": "RUNNING"})
 
     def mocked_requests_post(*args, **kwargs):
-        class MockRequest:
-            def __init__(self, url=""):
-                self.url = url
-
-        class MockPostResponse:
-            def __init__(self, json_data, text=" "):
-                self.json_data = json_data
-                self.text = text
-                self.request = MockRequest()
-
-            def json(self):
-                return self.json_data
-
-            def raise_for_status(self):
-                pass
-
-        login_url = 'users/login'
-        if args[0] == urljoin(_api_url, login_url):
-            return MockPostResponse({"userId": "1", "id": "12"})
-        if args[0] == urljoin(_api_url, 'Jobs'):
-            return MockPostResponse({"id": "123e"})
-
-    monkeypatch.setattr("requests.get", mocked_requests_get)
-    monkeypatch.setattr("requests.post", mocked_requests_post)
-    _rigetti_http_client.time.sleep = lambda x: x
+        if args[0] == urljoin(_api_url, "job"):
+            return _MockResponse({"jobId": "123e"})
+
+    monkeypatch.setattr(_rigetti_http_client._session, "get",
+                        mocked_requests_get)
+    monkeypatch.setattr(_rigetti_http_client._session, "post",
+                        mocked_requests_post)
     with pytest.raises(Exception) as excinfo:
-        _rigetti_http_client.send(json_quil,
-                              device="8Q-Agave",
-                              user="test", password="test",
-                              shots=1, verbose=False)
+        _rigetti_http_client.send(info, device="8Q-Agave",
+                                  user_id="user", api_key="key",
+                                  shots=1, verbose=False)
     assert "123e" in str(excinfo.value)  # check that job id is in exception
-    assert tries[0] > 0
+    assert tries[0] == 3000
 
 
-def test_retrieve_and_device_offline_exception(monkeypatch):
-    quils = {'quils': [{'quil': 'my quil'}]}
-    json_quil = json.dumps(quils)
+def test_retrieve_and_device_offline_exception(monkeypatch, no_sleep):
     request_num = [0]
 
     def mocked_requests_get(*args, **kwargs):
-        class MockResponse:
-            def __init__(self, json_data, status_code):
-                self.json_data = json_data
-                self.status_code = status_code
-
-            def json(self):
-                return self.json_data
-
-            def raise_for_status(self):
-                pass
-
-        # Accessing status of device. Return online.
-        status_url = 'devices'
-        if args[0] == urljoin(_api_url, status_url) and request_num[0] < 2:
-            return MockResponse({"state": True, "lengthQueue": 10}, 200)
-        elif args[0] == urljoin(_api_url, status_url):
-            return MockResponse({"state": False}, 200)
-        job_url = 'Jobs/{}'.format("123e")
-        if args[0] == urljoin(_api_url, job_url):
+        # Accessing status of device. Online for the first check only.
+        if args[0] == urljoin(_api_url, "devices") and request_num[0] < 2:
+            return _devices()
+        elif args[0] == urljoin(_api_url, "devices"):
+            return _MockResponse({"devices": {}})
+        if args[0] == urljoin(_api_url, "job/123e"):
             request_num[0] += 1
-            return MockResponse({"noquils": "not done"}, 200)
+            return _MockResponse({"status": "RUNNING"})
 
-    def mocked_requests_post(*args, **kwargs):
-        class MockRequest:
-            def __init__(self, url=""):
-                self.url = url
-
-        class MockPostResponse:
-            def __init__(self, json_data, text=" "):
-                self.json_data = json_data
-                self.text = text
-                self.request = MockRequest()
-
-            def json(self):
-                return self.json_data
-
-            def raise_for_status(self):
-                pass
-
-        login_url = 'users/login'
-        if args[0] == urljoin(_api_url, login_url):
-            return MockPostResponse({"userId": "1", "id": "12"})
-
-    monkeypatch.setattr("requests.get", mocked_requests_get)
-    monkeypatch.setattr("requests.post", mocked_requests_post)
-    _rigetti_http_client.time.sleep = lambda x: x
-    with pytest.raises(_rigetti_http_client.DeviceOfflineError):
+    monkeypatch.setattr(_rigetti_http_client._session, "get",
+                        mocked_requests_get)
+    with pytest.raises(_rigetti_http_client.DeviceOfflineError) as excinfo:
         _rigetti_http_client.retrieve(device="8Q-Agave",
-                                  user="test", password="test",
-                                  jobid="123e")
+                                      user_id="user", api_key="key",
+                                      jobid="123e")
+    assert "123e" in str(excinfo.value)
+    # the device status is checked every 60 polls
+    assert request_num[0] == 61
 
 
-def test_retrieve(monkeypatch):
-    quils = {'quils': [{'quil': 'my quil'}]}
-    json_quil = json.dumps(quils)
+def test_retrieve(monkeypatch, no_sleep):
     request_num = [0]
 
     def mocked_requests_get(*args, **kwargs):
-        class MockResponse:
-            def __init__(self, json_data, status_code):
-                self.json_data = json_data
-                self.status_code = status_code
-
-            def json(self):
-                return self.json_data
-
-            def raise_for_status(self):
-                pass
-
+        assert _headers_ok(kwargs)
         # Accessing status of device. Return online.
-        status_url = 'devices'
-        if args[0] == urljoin(_api_url, status_url):
-            return MockResponse({"state": True}, 200)
-        job_url = 'Jobs/{}'.format("123e")
-        if args[0] == urljoin(_api_url, job_url) and request_num[0] < 1:
+        if args[0] == urljoin(_api_url, "devices"):
+            return _devices()
+        if args[0] == urljoin(_api_url, "job/123e") and request_num[0] < 1:
             request_num[0] += 1
-            return MockResponse({"noquils": "not done"}, 200)
-        elif args[0] == urljoin(_api_url, job_url):
-            return MockResponse({"quils": [{'quil': 'quil',
-                                            'result': 'correct'}]}, 200)
-
-    def mocked_requests_post(*args, **kwargs):
-        class MockRequest:
-            def __init__(self, url=""):
-                self.url = url
-
-        class MockPostResponse:
-            def __init__(self, json_data, text=" "):
-                self.json_data = json_data
-                self.text = text
-                self.request = MockRequest()
+            return _MockResponse({"status": "RUNNING"})
+        elif args[0] == urljoin(_api_url, "job/123e"):
+            return _MockResponse({"status": "FINISHED",
+                                  "result": "correct"})
 
-            def json(self):
-                return self.json_data
-
-            def raise_for_status(self):
-                pass
-
-    monkeypatch.setattr("requests.get", mocked_requests_get)
-    monkeypatch.setattr("requests.post", mocked_requests_post)
-    _rigetti_http_client.time.sleep = lambda x: x
+    monkeypatch.setattr(_rigetti_http_client._session, "get",
+                        mocked_requests_get)
     res = _rigetti_http_client.retrieve(device="8Q-Agave",
-                                    user_id="test", api_key="test",
-                                    jobid="123e")
+                                        user_id="user", api_key="key",
+                                        jobid="123e")
     assert res == 'correct'
+
+
+def test_submit_and_poll_stand_in_server(monkeypatch):
+    # undo no_requests
+    monkeypatch.setattr(requests.sessions.Session, "request",
+                        _session_request, raising=False)
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    monkeypatch.setenv("no_proxy", "127.0.0.1")
+    jobs = []
+    released = threading.Event()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, data):
+            body = json.dumps(data).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers["Content-Length"])
+            jobs.append(json.loads(self.rfile.read(length).decode()))
+            self._reply({"jobId": str(len(jobs) - 1)})
+
+        def do_GET(self):
+            job = jobs[int(self.path.split("/")[-1])]
+            if not released.is_set():
+                self._reply({"status": "RUNNING"})
+                return
+            trials = job["program"]["trials"]
+            self._reply({"status": "FINISHED",
+                         "result": [[1, 0]] * trials})
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    monkeypatch.setattr(_rigetti_http_client, "_api_url",
+                        "http://127.0.0.1:{}/".format(
+                            server.server_address[1]))
+    try:
+        poller = JobPoller(interval=0.01)
+        futures = []
+        for i in range(3):
+            info = {'quils': [{'quil': 'X 0\nMEASURE 0 [0]'}],
+                    'shots': i + 1}
+            execution_id = _rigetti_http_client.submit(
+                info, device='QVM', user_id='user', api_key='key')
+            future = JobFuture(execution_id)
+            poller.add(future, lambda execution_id=execution_id: (
+                _rigetti_http_client.poll_result(execution_id, 'user',
+                                                 'key')))
+            futures.append(future)
+        assert [future.job_id for future in futures] == ["0", "1", "2"]
+        assert not any(future.done() for future in futures)
+        released.set()
+        assert [future.result(timeout=10) for future in futures] == [
+            [[1, 0]] * (i + 1) for i in range(3)]
+        # one job per program of a batch
+        info = {'quils': [{'quil': 'X 0\nMEASURE 0 [0]'},
+                          {'quil': 'X 1\nMEASURE 1 [1]'}], 'shots': 5}
+        assert _rigetti_http_client.submit_batch(
+            info, device='QVM', user_id='user', api_key='key') == ["3", "4"]
+        assert [job["program"]["compiled-quil"] for job in jobs[3:]] == [
+            'X 0\nMEASURE 0 [0]\n', 'X 1\nMEASURE 1 [1]\n']
+    finally:
+        server.shutdown()
+        server.server_close()
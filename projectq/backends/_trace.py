@@ -0,0 +1,716 @@
+#   Copyright 2017 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Contains a compiler engine which records all commands to a binary trace file
+(TraceRecorder) and a class which replays such a trace file to any engine
+(TraceReplayer).
+
+A trace file starts with a short header followed by a sequence of chunks
+(each with a CRC-32 checksum). Each command chunk stores the commands in
+columns: an index into a table of gate keys (new table entries are stored in
+the chunk in which they first appear), an array of gate parameters (the
+angles of rotation gates, such that all Rz gates share one table entry), an
+index into a table of tag lists, and arrays containing the register sizes,
+qubit ids and control qubit ids.
+
+Predefined gate instances (e.g., Swap) are stored by name, all other gates
+and tags by the import path of their class and their attributes. These
+tables and the metadata are stored as JSON, i.e., reading a trace file never
+executes code from the file (unlike unpickling). Only objects of gate classes,
+of the meta tag classes and of QubitOperator (e.g., the Hamiltonian of a
+TimeEvolution gate) can be stored.
+"""
+
+import binascii
+import json
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+from projectq import ops
+from projectq.cengines import BasicEngine, LastEngineException
+from projectq.meta import (ComputeTag,
+                           DirtyQubitTag,
+                           LogicalQubitIDTag,
+                           LoopTag,
+                           UncomputeTag)
+from projectq.ops import (BasicGate,
+                          BasicPhaseGate,
+                          BasicRotationGate,
+                          Command,
+                          Deallocate,
+                          FlushGate,
+                          Measure,
+                          QubitOperator)
+from projectq.types import WeakQubitRef
+
+
+_MAGIC = b'PQTRACE2'
+_FLAG_COMPRESSED = 1
+_COMMAND_CHUNK = b'C'
+_METADATA_CHUNK = b'M'
+# kind (1 byte), size of the data (8 bytes) and its CRC-32 (4 bytes)
+_CHUNK_HEADER = struct.Struct('<cQI')
+_COLUMNS = ('gates', 'tags', 'num_quregs', 'qureg_sizes', 'qubit_ids',
+            'num_controls', 'control_ids')
+# kinds of gate table entries
+_GATE = 0
+_PARAMETRIC_GATE = 1
+_NAMED_GATE = 2
+
+# names of the gate instances defined in projectq.ops (e.g., Swap)
+_GATE_NAMES = None
+
+_JSON_TYPES = (bool, int, float, str, type(None))
+if sys.version_info[0] < 3:  # pragma: no cover
+    _JSON_TYPES += (long, unicode)  # noqa: F821
+_CONTAINER_TYPES = (('l', list), ('t', tuple), ('s', set), ('f', frozenset))
+# classes (other than gate classes) whose objects can be stored
+_OBJECT_CLASSES = (ComputeTag, DirtyQubitTag, LogicalQubitIDTag, LoopTag,
+                   UncomputeTag, QubitOperator)
+
+
+class TraceFormatError(Exception):
+    pass
+
+
+def _is_parametric(gate):
+    """
+    Return True if the gate is fully described by its class and its angle.
+    """
+    return (isinstance(gate, (BasicRotationGate, BasicPhaseGate)) and
+            type(gate).__init__ in (BasicRotationGate.__init__,
+                                    BasicPhaseGate.__init__))
+
+
+def _get_gate_name(gate):
+    global _GATE_NAMES
+    if _GATE_NAMES is None:
+        _GATE_NAMES = dict((id(value), name)
+                           for name, value in sorted(vars(ops).items())
+                           if isinstance(value, BasicGate))
+    return _GATE_NAMES.get(id(gate))
+
+
+def _is_allowed(cls):
+    """
+    Return True if objects of the class can be stored in a trace (see
+    _OBJECT_CLASSES).
+    """
+    return issubclass(cls, BasicGate) or cls in _OBJECT_CLASSES
+
+
+def _get_class_path(cls):
+    """
+    Return the import path (module, qualified name) of a class.
+
+    Raises:
+        TypeError: If objects of the class cannot be stored (see _is_allowed)
+            or if the class cannot be found by its import path (e.g., it has
+            been defined in a function).
+    """
+    path = (cls.__module__, getattr(cls, '__qualname__', cls.__name__))
+    if not _is_allowed(cls):
+        raise TypeError("Objects of type {} cannot be recorded."
+                        .format(cls.__name__))
+    try:
+        found = _get_class(path)
+    except TraceFormatError:
+        found = None
+    if found is not cls:
+        raise TypeError("Class {}.{} cannot be found by its import path."
+                        .format(*path))
+    return path
+
+
+def _get_class(path):
+    """
+    Return the class of an import path (module, qualified name).
+
+    The class is only looked up in the modules which have already been
+    imported (i.e., no module is imported and no code is executed) and has to
+    be a gate class or one of _OBJECT_CLASSES.
+
+    Raises:
+        TraceFormatError: If the class cannot be found or if its objects
+            cannot be stored.
+    """
+    module_name, name = path
+    obj = sys.modules.get(module_name)
+    try:
+        for attribute in name.split('.'):
+            obj = getattr(obj, attribute)
+    except AttributeError:
+        obj = None
+    if not isinstance(obj, type):
+        raise TraceFormatError("Unknown class {}.{} (its module has to be "
+                               "imported before replaying).".format(*path))
+    if not _is_allowed(obj):
+        raise TraceFormatError("Objects of class {}.{} cannot be replayed."
+                               .format(*path))
+    return obj
+
+
+def _get_attributes(obj):
+    """
+    Return a dict containing the attributes of an object (including the ones
+    stored in __slots__).
+    """
+    attributes = dict(getattr(obj, '__dict__', {}))
+    for cls in type(obj).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            if name != '__weakref__' and hasattr(obj, name):
+                attributes[name] = getattr(obj, name)
+    return attributes
+
+
+def _encode(value):
+    """
+    Encode a value (e.g., a gate or a tag) such that it can be stored as
+    JSON.
+
+    Numbers, strings, containers and NumPy arrays are stored directly, other
+    objects by the import path of their class and their attributes.
+
+    Raises:
+        TypeError: If the value (or one of its attributes) cannot be encoded,
+            e.g., if it is a function.
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, _JSON_TYPES):
+        return ('v', value)
+    if isinstance(value, complex):
+        return ('c', value.real, value.imag)
+    if isinstance(value, bytes):
+        return ('b', binascii.hexlify(value).decode('ascii'))
+    if isinstance(value, np.ndarray) and value.dtype.kind in 'biufc':
+        return ('a', value.dtype.str, value.shape,
+                tuple(_encode(item)
+                      for item in np.asarray(value).ravel().tolist()),
+                isinstance(value, np.matrix))
+    for kind, container in _CONTAINER_TYPES:
+        if isinstance(value, container):
+            items = sorted(value, key=repr) if kind in 'sf' else value
+            return (kind, tuple(_encode(item) for item in items))
+    if isinstance(value, dict):
+        return ('d', tuple((_encode(key), _encode(item))
+                           for key, item in sorted(value.items(),
+                                                   key=repr)))
+    if (isinstance(value, type) or callable(value) or
+            not hasattr(value, '__dict__') and
+            not hasattr(type(value), '__slots__')):
+        raise TypeError("{!r} cannot be recorded.".format(value))
+    attributes = _get_attributes(value)
+    return ('o', _get_class_path(type(value)),
+            tuple((name, _encode(attributes[name]))
+                  for name in sorted(attributes)))
+
+
+def _decode(encoded):
+    """
+    Decode a value which has been encoded using _encode.
+
+    Raises:
+        TraceFormatError: If the value is invalid or refers to an unknown
+            class.
+    """
+    try:
+        kind = encoded[0]
+        if kind == 'v':
+            return encoded[1]
+        if kind == 'c':
+            return complex(encoded[1], encoded[2])
+        if kind == 'b':
+            return binascii.unhexlify(encoded[1])
+        if kind == 'a':
+            array = np.array([_decode(item) for item in encoded[3]],
+                             dtype=encoded[1]).reshape(encoded[2])
+            return np.matrix(array) if encoded[4] else array
+        containers = dict(_CONTAINER_TYPES)
+        if kind in containers:
+            return containers[kind](_decode(item) for item in encoded[1])
+        if kind == 'd':
+            return dict((_decode(key), _decode(item))
+                        for key, item in encoded[1])
+        if kind == 'o':
+            cls = _get_class(tuple(encoded[1]))
+            obj = cls.__new__(cls)
+            for name, item in encoded[2]:
+                object.__setattr__(obj, name, _decode(item))
+            return obj
+    except (TypeError, ValueError, IndexError, AttributeError):
+        pass
+    raise TraceFormatError("Invalid value in the trace file.")
+
+
+def _to_json(value):
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+def _from_json(data):
+    try:
+        return json.loads(data.decode('utf-8'))
+    except (ValueError, RuntimeError):
+        raise TraceFormatError("Corrupt trace chunk.")
+
+
+class _TraceWriter(object):
+    """
+    Writes commands to a file object in the binary trace format.
+
+    Commands are buffered and written in chunks of chunk_size commands.
+    """
+    def __init__(self, file_obj, chunk_size=8192, compress=False):
+        self._file = file_obj
+        self._chunk_size = chunk_size
+        self._compress = compress
+        self._gate_index = dict()
+        self._tag_index = dict()
+        # gate objects which have been encoded recently (pinned such that
+        # their id cannot be reused)
+        self._gate_memo = dict()
+        self._new_gates = []
+        self._new_tags = []
+        self._reset_columns()
+        self._file.write(_MAGIC + struct.pack(
+            '<B', _FLAG_COMPRESSED if compress else 0))
+
+    def _reset_columns(self):
+        self._columns = dict((name, []) for name in _COLUMNS)
+        self._params = []
+        self._num_buffered = 0
+
+    def _get_gate_index(self, gate):
+        memo = self._gate_memo.get(id(gate))
+        if memo is not None:
+            return memo[1]
+        name = _get_gate_name(gate)
+        if name is not None:
+            key = (_NAMED_GATE, name)
+        elif _is_parametric(gate):
+            key = (_PARAMETRIC_GATE, _get_class_path(type(gate)))
+        else:
+            key = (_GATE, _encode(gate))
+        if key not in self._gate_index:
+            self._gate_index[key] = len(self._gate_index)
+            self._new_gates.append(key)
+        if len(self._gate_memo) > 4096:
+            self._gate_memo = dict()
+        self._gate_memo[id(gate)] = (gate, self._gate_index[key])
+        return self._gate_index[key]
+
+    def _get_tag_index(self, tags):
+        key = _encode(tags) if len(tags) > 0 else None
+        if key not in self._tag_index:
+            self._tag_index[key] = len(self._tag_index)
+            self._new_tags.append(key)
+        return self._tag_index[key]
+
+    def append(self, cmd):
+        """
+        Add a command to the trace.
+
+        Raises:
+            TypeError: If the gate or a tag of the command cannot be recorded
+                (see _encode).
+        """
+        gate_idx = self._get_gate_index(cmd.gate)
+        tag_idx = self._get_tag_index(cmd.tags)
+        columns = self._columns
+        columns['gates'].append(gate_idx)
+        columns['tags'].append(tag_idx)
+        self._params.append(cmd.gate.angle if _is_parametric(cmd.gate)
+                            else 0.)
+        columns['num_quregs'].append(len(cmd.qubits))
+        for qureg in cmd.qubits:
+            columns['qureg_sizes'].append(len(qureg))
+            columns['qubit_ids'].extend([qubit.id for qubit in qureg])
+        columns['num_controls'].append(len(cmd.control_qubits))
+        columns['control_ids'].extend([qubit.id for qubit
+                                       in cmd.control_qubits])
+        self._num_buffered += 1
+        if self._num_buffered >= self._chunk_size:
+            self.flush()
+
+    def _write_chunk(self, kind, data):
+        if self._compress:
+            data = zlib.compress(data)
+        self._file.write(_CHUNK_HEADER.pack(kind, len(data),
+                                            zlib.crc32(data) & 0xffffffff))
+        self._file.write(data)
+
+    def write_metadata(self, metadata):
+        """
+        Write a dict of metadata to the trace (see _encode for the values
+        which can be stored).
+        """
+        self.flush()
+        self._write_chunk(_METADATA_CHUNK,
+                          _to_json(_encode(dict(metadata))))
+
+    def flush(self):
+        """
+        Write all buffered commands to the file object.
+        """
+        if self._num_buffered == 0:
+            return
+        # the tables are followed by the columns (in the order of _COLUMNS)
+        columns = [np.asarray(self._params, dtype='<f8').tobytes()]
+        for name in _COLUMNS:
+            columns.append(np.asarray(self._columns[name],
+                                      dtype='<i4').tobytes())
+        tables = _to_json((self._new_gates, self._new_tags,
+                           [len(column) for column in columns]))
+        self._write_chunk(_COMMAND_CHUNK, b''.join(
+            [struct.pack('<Q', len(tables)), tables] + columns))
+        self._new_gates = []
+        self._new_tags = []
+        self._reset_columns()
+        self._file.flush()
+
+
+class _TraceReader(object):
+    """
+    Reads a binary trace from a file object.
+
+    Attributes:
+        metadata (dict): Metadata which has been read so far.
+    """
+    def __init__(self, file_obj):
+        self._file = file_obj
+        header = self._file.read(len(_MAGIC) + 1)
+        if len(header) != len(_MAGIC) + 1 or not header.startswith(_MAGIC):
+            raise TraceFormatError("Not a ProjectQ trace file.")
+        self._compressed = bool(struct.unpack('<B', header[-1:])[0] &
+                                _FLAG_COMPRESSED)
+        self._gate_table = []
+        self._tag_table = []
+        self.metadata = dict()
+        self.max_qubit_id = -1
+
+    def _read_chunk(self):
+        header = self._file.read(_CHUNK_HEADER.size)
+        if len(header) == 0:
+            return None, None
+        if len(header) != _CHUNK_HEADER.size:
+            raise TraceFormatError("Truncated trace file.")
+        kind, size, checksum = _CHUNK_HEADER.unpack(header)
+        data = self._file.read(size)
+        if len(data) != size:
+            raise TraceFormatError("Truncated trace file.")
+        if zlib.crc32(data) & 0xffffffff != checksum:
+            raise TraceFormatError("Corrupt trace chunk.")
+        if self._compressed:
+            try:
+                data = zlib.decompress(data)
+            except zlib.error:
+                raise TraceFormatError("Corrupt trace chunk.")
+        return kind, data
+
+    def _read_gate_table(self, new_gates):
+        for kind, data in new_gates:
+            if kind == _NAMED_GATE:
+                gate = getattr(ops, data, None)
+                if not isinstance(gate, BasicGate):
+                    raise TraceFormatError("Unknown gate {}.".format(data))
+            elif kind == _PARAMETRIC_GATE:
+                gate = _get_class(tuple(data))
+                if not issubclass(gate, (BasicRotationGate, BasicPhaseGate)):
+                    raise TraceFormatError("{} is not a rotation gate."
+                                           .format(gate.__name__))
+            else:
+                gate = _decode(data)
+                if not isinstance(gate, BasicGate):
+                    raise TraceFormatError("{!r} is not a gate."
+                                           .format(gate))
+            self._gate_table.append((kind, gate))
+
+    def _decode_commands(self, data, engine):
+        (size,) = struct.unpack('<Q', data[:8])
+        new_gates, new_tags, sizes = _from_json(data[8:8 + size])
+        self._read_gate_table(new_gates)
+        self._tag_table.extend(new_tags)
+        pos = 8 + size
+        blobs = []
+        for size in sizes:
+            blobs.append(data[pos:pos + size])
+            pos += size
+        params = np.frombuffer(blobs[0], dtype='<f8').tolist()
+        columns = dict((name, np.frombuffer(blob, dtype='<i4').tolist())
+                       for name, blob in zip(_COLUMNS, blobs[1:]))
+        if len(columns['qubit_ids']) > 0:
+            self.max_qubit_id = max(self.max_qubit_id,
+                                    max(columns['qubit_ids']))
+        if len(columns['control_ids']) > 0:
+            self.max_qubit_id = max(self.max_qubit_id,
+                                    max(columns['control_ids']))
+
+        gate_table = self._gate_table
+        tag_table = self._tag_table
+        qureg_sizes = columns['qureg_sizes']
+        qubit_ids = columns['qubit_ids']
+        control_ids = columns['control_ids']
+        num_quregs = columns['num_quregs']
+        num_controls = columns['num_controls']
+        parametric_gates = dict()
+        command_list = []
+        qureg_pos = qubit_pos = ctrl_pos = 0
+        for i, gate_idx in enumerate(columns['gates']):
+            kind, gate = gate_table[gate_idx]
+            if kind == _PARAMETRIC_GATE:
+                key = (gate_idx, params[i])
+                if key not in parametric_gates:
+                    parametric_gates[key] = gate(params[i])
+                gate = parametric_gates[key]
+            quregs = []
+            for _ in range(num_quregs[i]):
+                size = qureg_sizes[qureg_pos]
+                quregs.append([WeakQubitRef(engine, idx) for idx in
+                               qubit_ids[qubit_pos:qubit_pos + size]])
+                qureg_pos += 1
+                qubit_pos += size
+            controls = [WeakQubitRef(engine, idx) for idx in
+                        control_ids[ctrl_pos:ctrl_pos + num_controls[i]]]
+            ctrl_pos += num_controls[i]
+            encoded_tags = tag_table[columns['tags'][i]]
+            # tags are decoded for every command as they may get modified
+            tags = _decode(encoded_tags) if encoded_tags is not None else []
+            if not isinstance(tags, list):
+                raise TraceFormatError("{!r} is not a list of tags."
+                                       .format(tags))
+            command_list.append(Command(engine, gate, tuple(quregs),
+                                        controls, tags))
+        return command_list
+
+    def read_chunks(self, engine):
+        """
+        Iterate over the trace chunk by chunk.
+
+        Args:
+            engine (BasicEngine): Engine of the decoded commands.
+
+        Yields:
+            list<Command> containing the commands of one chunk.
+
+        Raises:
+            TraceFormatError: If the trace file is invalid or refers to a
+                class whose module has not been imported.
+        """
+        while True:
+            kind, data = self._read_chunk()
+            if kind is None:
+                return
+            try:
+                if kind == _METADATA_CHUNK:
+                    self.metadata.update(_decode(_from_json(data)))
+                elif kind == _COMMAND_CHUNK:
+                    command_list = self._decode_commands(data, engine)
+                else:
+                    raise TraceFormatError("Unknown chunk type.")
+            except (TypeError, ValueError, IndexError, KeyError,
+                    struct.error):
+                raise TraceFormatError("Corrupt trace chunk.")
+            if kind == _COMMAND_CHUNK:
+                yield command_list
+
+
+class TraceRecorder(BasicEngine):
+    """
+    TraceRecorder is a compiler engine which writes all commands it receives
+    to a compact binary trace file prior to sending them on to the next
+    compiler engine.
+
+    Commands are written in chunks while the circuit is running (and on each
+    flush), i.e., the whole circuit is never kept in memory. The resulting
+    file can be replayed to any engine using TraceReplayer.
+
+    Example:
+        .. code-block:: python
+
+            recorder = TraceRecorder("circuit.pqtrace")
+            eng = MainEngine(Simulator(), get_engine_list() + [recorder])
+            ...
+            eng.flush()
+            recorder.close()
+
+    Note:
+        Gates and tags are recorded by the import path of their class and
+        their attributes, which have to be numbers, strings, containers,
+        NumPy arrays or such objects. Gates and tags containing functions
+        (e.g., a BasicMathGate) cannot be recorded.
+    """
+    def __init__(self, filename, chunk_size=8192, compress=False,
+                 metadata=None):
+        """
+        Initialize a TraceRecorder.
+
+        Args:
+            filename (str or file object): Name of the trace file to write
+                (or a file object opened in binary mode).
+            chunk_size (int): Number of commands per chunk.
+            compress (bool): If True, chunks are compressed using zlib.
+            metadata (dict): Metadata to store in the trace file.
+        """
+        BasicEngine.__init__(self)
+        if hasattr(filename, 'write'):
+            self._file = filename
+            self._owns_file = False
+        else:
+            self._file = open(filename, 'wb')
+            self._owns_file = True
+        self._writer = _TraceWriter(self._file, chunk_size, compress)
+        if metadata:
+            self._writer.write_metadata(metadata)
+        self.num_commands = 0
+
+    def is_available(self, cmd):
+        """
+        Specialized implementation of is_available: Returns True if the
+        TraceRecorder is the last engine (since it can record any command).
+
+        Args:
+            cmd (Command): Command of which to check availability (all
+                Commands can be recorded).
+        Returns:
+            availability (bool): True, unless the next engine cannot handle
+                the Command (if there is a next engine).
+        """
+        try:
+            return BasicEngine.is_available(self, cmd)
+        except LastEngineException:
+            return True
+
+    def close(self):
+        """
+        Write all buffered commands and close the trace file (if it was
+        opened by the TraceRecorder).
+        """
+        if self._writer is None:
+            return
+        self._writer.flush()
+        if self._owns_file:
+            self._file.close()
+        self._writer = None
+
+    def _record_cmd(self, cmd):
+        if self._writer is None:
+            # the qubits are deallocated (and the engine flushed) when the
+            # MainEngine is destroyed, possibly after closing the trace file
+            if cmd.gate == Deallocate or isinstance(cmd.gate, FlushGate):
+                return
+            raise ValueError("The trace file has already been closed.")
+        self._writer.append(cmd)
+        self.num_commands += 1
+        if self.is_last_engine and cmd.gate == Measure:
+            # There is no back-end, all measurements yield 0
+            for qureg in cmd.qubits:
+                for qubit in qureg:
+                    for tag in cmd.tags:
+                        if isinstance(tag, LogicalQubitIDTag):
+                            qubit = WeakQubitRef(qubit.engine,
+                                                 tag.logical_qubit_id)
+                    self.main_engine.set_measurement_result(qubit, 0)
+
+    def receive(self, command_list):
+        """
+        Receive a list of commands from the previous engine, write them to
+        the trace file, and then send them on to the next engine.
+
+        Args:
+            command_list (list<Command>): List of commands to record.
+        """
+        for cmd in command_list:
+            self._record_cmd(cmd)
+            if isinstance(cmd.gate, FlushGate) and self._writer is not None:
+                self._writer.flush()
+        if not self.is_last_engine:
+            self.send(command_list)
+
+
+class TraceReplayer(object):
+    """
+    TraceReplayer reads a trace file (see TraceRecorder) and sends the
+    recorded commands to a compiler engine or back-end.
+
+    Example:
+        .. code-block:: python
+
+            eng = MainEngine(Simulator(), [])
+            TraceReplayer("circuit.pqtrace").replay(eng)
+
+    Note:
+        Replaying a trace file does not execute code from the file (it is
+        not unpickled), hence trace files can be shared between jobs and
+        users. The gates and tags are restored by creating objects of their
+        classes (without calling __init__) and setting their attributes.
+        The classes are only looked up in modules which have already been
+        imported; the modules of user-defined gates have to be imported
+        before calling replay.
+
+    Attributes:
+        metadata (dict): Metadata stored in the trace file (available after
+            calling replay).
+    """
+    def __init__(self, filename):
+        """
+        Initialize a TraceReplayer.
+
+        Args:
+            filename (str or file object): Name of the trace file (or a file
+                object opened in binary mode).
+        """
+        self._filename = filename
+        self.metadata = dict()
+
+    def _open(self):
+        if hasattr(self._filename, 'read'):
+            return self._filename, False
+        return open(self._filename, 'rb'), True
+
+    def replay(self, engine):
+        """
+        Send all commands of the trace to an engine.
+
+        The commands are sent chunk by chunk using engine.receive. If the
+        engine is a MainEngine, its qubit counter is advanced past all qubit
+        ids in the trace, such that newly allocated qubits do not collide
+        with the replayed ones.
+
+        Args:
+            engine (BasicEngine): Engine to which to send the commands (e.g.,
+                a MainEngine). The commands are owned by its main engine.
+
+        Returns:
+            Number of replayed commands.
+        """
+        file_obj, owns_file = self._open()
+        owner = engine.main_engine if engine.main_engine is not None \
+            else engine
+        num_commands = 0
+        try:
+            reader = _TraceReader(file_obj)
+            for command_list in reader.read_chunks(owner):
+                engine.receive(command_list)
+                num_commands += len(command_list)
+        finally:
+            if owns_file:
+                file_obj.close()
+        self.metadata = reader.metadata
+        if hasattr(owner, '_qubit_idx'):
+            owner._qubit_idx = max(owner._qubit_idx, reader.max_qubit_id + 1)
+        return num_commands
@@ -0,0 +1,325 @@
+#   Copyright 2017 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Tests for projectq.backends._trace.py.
+"""
+
+import io
+import json
+import math
+import sys
+import types
+import weakref
+import zlib
+
+import pytest
+
+from projectq import MainEngine
+from projectq.cengines import DummyEngine
+from projectq.meta import LogicalQubitIDTag
+from projectq.ops import (All, Allocate, BasicGate, BasicMathGate, C, CNOT,
+                          Command, FlipBits, FlushGate, H, Measure, Ph,
+                          QubitOperator, Rx, Rz, SqrtX, StatePreparation,
+                          Swap, Tdag, TimeEvolution, UniformlyControlledRy, X,
+                          get_inverse)
+from projectq.types import WeakQubitRef
+
+from projectq.backends import Simulator
+from projectq.backends import _trace
+
+
+def _record(recorder, backend=None):
+    if backend is None:
+        backend = DummyEngine(save_commands=True)
+    eng = MainEngine(backend, [recorder])
+    qureg = eng.allocate_qureg(3)
+    H | qureg[0]
+    CNOT | (qureg[0], qureg[1])
+    Swap | (qureg[2], qureg[1])
+    for i in range(10):
+        Rz(0.1 * i) | qureg[2]
+    Ph(1.5) | qureg[1]
+    Tdag | qureg[0]
+    X | qureg[2]
+    All(Measure) | qureg
+    eng.flush()
+    return eng, backend
+
+
+def test_trace_writer_reader_roundtrip():
+    eng = MainEngine(DummyEngine(), [])
+    qubits = [WeakQubitRef(eng, idx) for idx in range(3)]
+    commands = [Command(eng, Allocate, ([qubits[0]],)),
+                Command(eng, X, ([qubits[1]],), controls=qubits[::2],
+                        tags=["tag"]),
+                Command(eng, H, (qubits[:2], [qubits[2]]),
+                        tags=[LogicalQubitIDTag(4)]),
+                Command(eng, Rz(0.5), ([qubits[2]],)),
+                Command(eng, Swap, ([qubits[0]], [qubits[1]]))]
+    trace = io.BytesIO()
+    writer = _trace._TraceWriter(trace, chunk_size=2, compress=True)
+    for cmd in commands:
+        writer.append(cmd)
+    writer.write_metadata({'mapping': {0: 1}})
+    trace.seek(0)
+    reader = _trace._TraceReader(trace)
+    decoded = [cmd for chunk in reader.read_chunks(eng) for cmd in chunk]
+    assert reader.metadata == {'mapping': {0: 1}}
+    assert reader.max_qubit_id == 2
+    assert [str(cmd) for cmd in decoded] == [str(cmd) for cmd in commands]
+    assert [cmd.tags for cmd in decoded] == [cmd.tags for cmd in commands]
+
+
+def test_trace_recorder_replayer_roundtrip():
+    trace = io.BytesIO()
+    recorder = _trace.TraceRecorder(trace, chunk_size=4)
+    eng, backend = _record(recorder)
+    # the deallocations after the flush are written on close
+    recorder.close()
+    assert recorder.num_commands == len(backend.received_commands)
+    trace.seek(0)
+
+    backend2 = DummyEngine(save_commands=True)
+    eng2 = MainEngine(backend2, [])
+    replayer = _trace.TraceReplayer(trace)
+    assert replayer.replay(eng2) == len(backend.received_commands)
+    assert ([str(cmd) for cmd in backend2.received_commands] ==
+            [str(cmd) for cmd in backend.received_commands])
+    for cmd, cmd2 in zip(backend.received_commands,
+                         backend2.received_commands):
+        assert cmd2.gate == cmd.gate
+        assert cmd2.tags == cmd.tags
+        assert cmd2.engine is eng2
+    # new qubits of eng2 do not collide with the replayed ones
+    assert eng2.allocate_qubit()[0].id == 3
+
+
+def test_trace_parametric_gates_share_table_entry():
+    trace = io.BytesIO()
+    recorder = _trace.TraceRecorder(trace)
+    _record(recorder)
+    recorder.close()
+    trace.seek(0)
+    reader = _trace._TraceReader(trace)
+    chunks = list(reader.read_chunks(DummyEngine()))
+    # one chunk per flush, the deallocations are written on close
+    assert len(chunks) == 2
+    kinds = [kind for kind, _ in reader._gate_table]
+    assert kinds.count(_trace._PARAMETRIC_GATE) == 2  # Rz and Ph
+    rz_gates = [cmd.gate for cmd in chunks[0] if isinstance(cmd.gate, Rz)]
+    assert rz_gates == [Rz(0.1 * i) for i in range(10)]
+
+
+def test_trace_recorder_as_last_engine(tmpdir):
+    filename = str(tmpdir.join("circuit.pqtrace"))
+    recorder = _trace.TraceRecorder(filename, compress=True,
+                                    metadata={'name': 'test'})
+    eng = MainEngine(recorder, [])
+    qubit = eng.allocate_qubit()
+    assert eng.is_available(Command(eng, H, (qubit,)))
+    Measure | qubit
+    assert int(qubit) == 0
+    cmd = Command(eng, Measure, ([WeakQubitRef(eng, 5)],),
+                  tags=[LogicalQubitIDTag(7)])
+    eng.send([cmd])
+    eng.flush()
+    recorder.close()
+    recorder.close()
+    assert int(WeakQubitRef(eng, 7)) == 0
+    with pytest.raises(ValueError):
+        eng.send([cmd])
+
+    backend = DummyEngine(save_commands=True)
+    replayer = _trace.TraceReplayer(filename)
+    replayer.replay(MainEngine(backend, []))
+    assert replayer.metadata == {'name': 'test'}
+    assert backend.received_commands[2].tags == [LogicalQubitIDTag(7)]
+    assert isinstance(backend.received_commands[-1].gate, FlushGate)
+
+
+def test_trace_recorder_close_before_teardown(tmpdir):
+    # usage of the docstring: the MainEngine deallocates the qubits (and
+    # flushes) when it is destroyed, i.e., after the trace file was closed
+    filename = str(tmpdir.join("circuit.pqtrace"))
+    recorder = _trace.TraceRecorder(filename)
+    sim = Simulator()
+    eng = MainEngine(sim, [recorder])
+    qureg = eng.allocate_qureg(2)
+    X | qureg[0]
+    eng.flush()
+    recorder.close()
+    num_commands = recorder.num_commands
+    eng._delfun(weakref.ref(eng))
+    assert recorder.num_commands == num_commands
+    assert len(sim.cheat()[0]) == 0
+    with pytest.raises(ValueError):
+        H | qureg[1]
+
+
+def test_trace_replay_to_simulator():
+    trace = io.BytesIO()
+    recorder = _trace.TraceRecorder(trace)
+    eng = MainEngine(DummyEngine(), [recorder])
+    qureg = eng.allocate_qureg(2)
+    X | qureg[0]
+    Rx(math.pi) | qureg[1]
+    eng.flush()
+    recorder.close()
+    trace.seek(0)
+    sim = Simulator()
+    eng2 = MainEngine(sim, [])
+    _trace.TraceReplayer(trace).replay(eng2)
+    _, wavefunction = sim.cheat()
+    assert abs(abs(wavefunction[3]) - 1.) < 1e-10
+
+
+def test_trace_gates_with_attributes():
+    eng = MainEngine(DummyEngine(), [])
+    qubits = [WeakQubitRef(eng, idx) for idx in range(2)]
+    gates = [TimeEvolution(0.5, QubitOperator("X0 Z1", 0.3)),
+             StatePreparation([0.6, 0.8j, 0., 0.]),
+             UniformlyControlledRy([0.1, 0.2]),
+             get_inverse(SqrtX), C(H, 1), FlipBits([1, 0])]
+    commands = [Command(eng, gate, (qubits,)) for gate in gates]
+    trace = io.BytesIO()
+    writer = _trace._TraceWriter(trace)
+    for cmd in commands:
+        writer.append(cmd)
+    writer.write_metadata({'angles': (0.5, float('nan')), 'ids': {1, 2}})
+    trace.seek(0)
+    reader = _trace._TraceReader(trace)
+    decoded = [cmd for chunk in reader.read_chunks(eng) for cmd in chunk]
+    # the decoded gates have the same classes and attributes
+    assert ([_trace._encode(cmd.gate) for cmd in decoded] ==
+            [_trace._encode(gate) for gate in gates])
+    assert [str(cmd) for cmd in decoded] == [str(cmd) for cmd in commands]
+    assert reader.metadata['ids'] == {1, 2}
+    assert math.isnan(reader.metadata['angles'][1])
+
+
+def test_trace_unrecordable_gate():
+    recorder = _trace.TraceRecorder(io.BytesIO())
+    eng = MainEngine(DummyEngine(), [recorder])
+    qureg = eng.allocate_qureg(2)
+    with pytest.raises(TypeError):
+        BasicMathGate(lambda x, y: (x, x + y)) | (qureg[0:1], qureg[1:])
+
+    class LocalGate(BasicGate):
+        pass
+    with pytest.raises(TypeError):
+        LocalGate() | qureg[0]
+    eng.flush(deallocate_qubits=True)
+    recorder.close()
+
+
+def test_trace_unknown_class(monkeypatch):
+    # gate class of a module which is not imported when replaying
+    module = types.ModuleType("trace_test_gates")
+
+    class CustomGate(BasicGate):
+        pass
+    CustomGate.__module__ = module.__name__
+    CustomGate.__qualname__ = CustomGate.__name__ = "CustomGate"
+    module.CustomGate = CustomGate
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+    eng = MainEngine(DummyEngine(), [])
+    trace = io.BytesIO()
+    writer = _trace._TraceWriter(trace)
+    writer.append(Command(eng, CustomGate(), ([WeakQubitRef(eng, 0)],)))
+    writer.flush()
+    trace.seek(0)
+    assert isinstance(list(_trace._TraceReader(trace).read_chunks(eng))[0][0]
+                      .gate, CustomGate)
+    monkeypatch.delitem(sys.modules, module.__name__)
+    trace.seek(0)
+    with pytest.raises(_trace.TraceFormatError):
+        list(_trace._TraceReader(trace).read_chunks(eng))
+
+
+def test_trace_only_gates_and_tags(tmpdir):
+    recorder = _trace.TraceRecorder(io.BytesIO())
+    eng = MainEngine(DummyEngine(), [recorder])
+    qubit = eng.allocate_qubit()
+    with pytest.raises(TypeError):
+        eng.send([Command(eng, H, (qubit,), tags=[io.BytesIO()])])
+    eng.flush(deallocate_qubits=True)
+    recorder.close()
+    # a crafted trace cannot create objects of other classes (e.g., one whose
+    # destructor deletes a file)
+    victim = tmpdir.join("victim")
+    victim.write("data")
+    closer = ['o', ['tempfile', '_TemporaryFileCloser'],
+              [['name', ['v', str(victim)]], ['delete', ['v', True]],
+               ['close_called', ['v', False]], ['file', ['v', None]]]]
+    trace = io.BytesIO()
+    _trace._TraceWriter(trace)
+    as_metadata = _append_chunk(trace.getvalue(), _trace._METADATA_CHUNK,
+                                json.dumps(closer).encode())
+    as_gate = _command_chunk([[_trace._GATE, closer]], [])
+    as_tag = _command_chunk([[_trace._NAMED_GATE, 'H']], [['l', [closer]]])
+    for data in [as_metadata, as_gate, as_tag]:
+        with pytest.raises(_trace.TraceFormatError):
+            _trace.TraceReplayer(data).replay(MainEngine(DummyEngine(), []))
+    assert victim.check()
+
+
+def _command_chunk(new_gates, new_tags):
+    """
+    Return a trace containing one command chunk with the given tables.
+    """
+    trace = io.BytesIO()
+    writer = _trace._TraceWriter(trace)
+    eng = MainEngine(DummyEngine(), [])
+    writer.append(Command(eng, H, ([WeakQubitRef(eng, 0)],),
+                          tags=[LogicalQubitIDTag(0)]))
+    writer._new_gates = new_gates
+    writer._new_tags = new_tags
+    writer.flush()
+    return io.BytesIO(trace.getvalue())
+
+
+def _append_chunk(trace, kind, data):
+    return io.BytesIO(trace + _trace._CHUNK_HEADER.pack(
+        kind, len(data), zlib.crc32(data) & 0xffffffff) + data)
+
+
+def test_trace_format_errors():
+    with pytest.raises(_trace.TraceFormatError):
+        _trace._TraceReader(io.BytesIO(b"not a trace"))
+    trace = io.BytesIO()
+    recorder = _trace.TraceRecorder(trace)
+    _record(recorder)
+    recorder.close()
+    truncated = io.BytesIO(trace.getvalue()[:-10])
+    with pytest.raises(_trace.TraceFormatError):
+        _trace.TraceReplayer(truncated).replay(MainEngine(DummyEngine(), []))
+    data = bytearray(trace.getvalue())
+    data[-1] ^= 0xff
+    corrupt = io.BytesIO(bytes(data))
+    with pytest.raises(_trace.TraceFormatError):
+        _trace.TraceReplayer(corrupt).replay(MainEngine(DummyEngine(), []))
+    unknown = _append_chunk(trace.getvalue(), b"X", b"None")
+    with pytest.raises(_trace.TraceFormatError):
+        _trace.TraceReplayer(unknown).replay(MainEngine(DummyEngine(), []))
+    # the metadata is not evaluated as code
+    code = _append_chunk(trace.getvalue(), _trace._METADATA_CHUNK,
+                         b"__import__('os').system('exit 1')")
+    with pytest.raises(_trace.TraceFormatError):
+        _trace.TraceReplayer(code).replay(MainEngine(DummyEngine(), []))
+    # objects are only created of classes (not of functions)
+    function = _append_chunk(trace.getvalue(), _trace._METADATA_CHUNK,
+                             json.dumps(['o', ['os', 'system'], []]).encode())
+    with pytest.raises(_trace.TraceFormatError):
+        _trace.TraceReplayer(function).replay(MainEngine(DummyEngine(), []))
@@ -17,18 +17,23 @@ from ._basics import (BasicEngine,
                       ForwarderEngine)
 from ._cmdmodifier import CommandModifier
 from ._basicmapper import BasicMapperEngine
-from ._ibm5qubitmapper import IBM5QubitMapper
 from ._swapandcnotflipper import SwapAndCNOTFlipper
 from ._linearmapper import LinearMapper, return_swap_depth
 from ._manualmapper import ManualMapper
+from ._profiler import EngineProfile, PipelineProfiler
 from ._main import (MainEngine,
                     NotYetMeasuredError,
                     UnsupportedEngineError)
 from ._optimize import LocalOptimizer
 from ._replacer import (AutoReplacer,
+                        CostDecompositionChooser,
                         InstructionFilter,
                         DecompositionRuleSet,
                         DecompositionRule)
 from ._tagremover import TagRemover
 from ._testengine import CompareEngine, DummyEngine
 from ._twodmapper import GridMapper
+from ._graphmapper import GraphMapper
+from ._placementmapper import PlacementMapper
+from ._ibm5qubitmapper import IBM5QubitMapper
+from ._compilationcache import CompilationCache
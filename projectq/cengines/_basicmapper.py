@@ -58,14 +58,17 @@ class BasicMapperEngine(BasicEngine):
             cmd: Command object with logical qubit ids.
         """
         new_cmd = deepcopy(cmd)
+        # use the mapping directly (the current_mapping property returns a
+        # copy)
+        mapping = self._current_mapping
         qubits = new_cmd.qubits
         for qureg in qubits:
             for qubit in qureg:
                 if qubit.id != -1:
-                    qubit.id = self.current_mapping[qubit.id]
+                    qubit.id = mapping[qubit.id]
         control_qubits = new_cmd.control_qubits
         for qubit in control_qubits:
-            qubit.id = self.current_mapping[qubit.id]
+            qubit.id = mapping[qubit.id]
         if isinstance(new_cmd.gate, MeasureGate):
             assert len(new_cmd.qubits) == 1 and len(new_cmd.qubits[0]) == 1
 
@@ -0,0 +1,375 @@
+#   Copyright 2017 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Contains a compiler engine which caches the output of the compilation
+pipeline on disk (CompilationCache).
+
+On a cache hit, the compiled command stream is replayed directly to the
+back-end, skipping all intermediate compiler engines.
+"""
+
+import functools
+import hashlib
+import io
+import numbers
+import os
+import random
+import tempfile
+import types
+
+import numpy as np
+
+import projectq
+from projectq.backends._trace import _TraceReader, _TraceWriter
+from projectq.cengines import BasicEngine
+from projectq.meta import insert_engine
+from projectq.ops import FlushGate
+
+
+# os.replace is not available in Python 2.7
+_replace = getattr(os, 'replace', os.rename)
+
+
+class _CompiledStreamRecorder(BasicEngine):
+    """
+    Engine which is inserted right before the back-end in order to record
+    the compiled command stream into a (compressed) binary trace.
+
+    If discard is True, all commands are swallowed instead (used to bring the
+    compiler engines up to date after replaying cached segments).
+    """
+    def __init__(self):
+        BasicEngine.__init__(self)
+        self.discard = False
+        self.start()
+
+    def start(self):
+        """
+        Start recording a new segment.
+        """
+        self.buffer = io.BytesIO()
+        self.writer = _TraceWriter(self.buffer, compress=True)
+
+    def receive(self, command_list):
+        if self.discard:
+            return
+        for cmd in command_list:
+            if self.writer is not None and not isinstance(cmd.gate,
+                                                          FlushGate):
+                try:
+                    self.writer.append(cmd)
+                except TypeError:
+                    # this segment cannot be cached
+                    self.writer = None
+        self.send(command_list)
+
+
+def _describe(value, _path=()):
+    """
+    Return a deterministic string describing the configuration value of a
+    compiler engine (or the state of a gate or tag).
+
+    Functions are described by their name, code, default arguments and the
+    contents of their closure (e.g., the gate sets captured by the filter
+    functions of projectq.setups). Other compiler engines which are
+    referenced are only described by their type, as the engines of the
+    pipeline are described one by one.
+
+    Raises:
+        TypeError: If the value cannot be described deterministically.
+    """
+    if isinstance(value, (bool, numbers.Number, str, bytes, type(None),
+                          np.generic)):
+        return repr(value)
+    if isinstance(value, (type, types.BuiltinFunctionType)):
+        return "{}.{}".format(value.__module__,
+                              getattr(value, '__qualname__', value.__name__))
+    if isinstance(value, BasicEngine):
+        return "<{}>".format(type(value).__name__)
+    if id(value) in _path:
+        # reference to an enclosing object
+        return "<{}>".format(len(_path) - _path.index(id(value)))
+    path = _path + (id(value),)
+    if isinstance(value, types.FunctionType):
+        closure = [cell.cell_contents for cell in value.__closure__ or ()]
+        return "{}.{}({},{},{},{})".format(
+            value.__module__,
+            getattr(value, '__qualname__', value.__name__),
+            _describe(value.__code__, path),
+            _describe(value.__defaults__, path),
+            _describe(getattr(value, '__kwdefaults__', None), path),
+            _describe(closure, path))
+    if isinstance(value, types.CodeType):
+        return "code({},{},{})".format(repr(value.co_code),
+                                       _describe(value.co_consts, path),
+                                       _describe(value.co_names, path))
+    if isinstance(value, types.MethodType):
+        return "method({},{})".format(_describe(value.__func__, path),
+                                      _describe(value.__self__, path))
+    if isinstance(value, functools.partial):
+        return "partial({},{},{})".format(_describe(value.func, path),
+                                          _describe(value.args, path),
+                                          _describe(value.keywords, path))
+    if isinstance(value, np.ndarray):
+        return "array({},{})".format(value.dtype.str,
+                                     _describe(value.tolist(), path))
+    if isinstance(value, (list, tuple)):
+        return "[{}]".format(",".join(_describe(v, path) for v in value))
+    if isinstance(value, (set, frozenset)):
+        return "{{{}}}".format(",".join(sorted(
+            _describe(v, path) for v in value)))
+    if isinstance(value, dict):
+        return "{{{}}}".format(",".join(sorted(
+            _describe(k, path) + ":" + _describe(v, path)
+            for k, v in value.items())))
+    if isinstance(value, random.Random):
+        return "Random({})".format(_describe(value.getstate(), path))
+    attributes = _get_attributes(value)
+    if not hasattr(value, '__dict__') and len(attributes) == 0:
+        # e.g., objects implemented in C which keep their state internally
+        raise TypeError("Cannot describe the state of {}."
+                        .format(type(value).__name__))
+    return "{}({})".format(_describe(type(value), path),
+                           _describe(attributes, path))
+
+
+def _get_attributes(obj):
+    """
+    Return a dict containing the attributes of an object (including the ones
+    stored in __slots__).
+    """
+    attributes = dict(getattr(obj, '__dict__', {}))
+    for cls in type(obj).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            if name != '__weakref__' and hasattr(obj, name):
+                attributes[name] = getattr(obj, name)
+    return attributes
+
+
+def _tag_key(tag):
+    if isinstance(tag, str):
+        return repr(tag)
+    return "{}({})".format(type(tag).__name__,
+                           _describe(_get_attributes(tag)))
+
+
+def _gate_key(gate):
+    """
+    Return a string which identifies a gate by its class and its full state.
+
+    str(gate) cannot be used, as it omits the parameters of some gates
+    (e.g., the amplitudes of a StatePreparation).
+    """
+    return "{}.{}({})".format(type(gate).__module__, type(gate).__name__,
+                              _describe(_get_attributes(gate)))
+
+
+def _encode_input(command_list):
+    """
+    Return a deterministic byte string which identifies a list of commands.
+    """
+    lines = []
+    for cmd in command_list:
+        lines.append("{}|{}|{}|{}".format(
+            _gate_key(cmd.gate),
+            [[qubit.id for qubit in qureg] for qureg in cmd.qubits],
+            [qubit.id for qubit in cmd.control_qubits],
+            [_tag_key(tag) for tag in cmd.tags]))
+    return "\n".join(lines).encode('utf-8')
+
+
+class CompilationCache(BasicEngine):
+    """
+    CompilationCache is an opt-in compiler engine which caches the compiled
+    command stream (i.e., the commands which arrive at the back-end) on disk.
+
+    It must be the first engine of the engine list. All commands are buffered
+    until the next flush. The buffered commands are fingerprinted together
+    with the configuration of all following compiler engines and all
+    previously flushed commands. If a compiled stream for this fingerprint
+    exists in the cache directory, it is sent directly to the back-end
+    (skipping all intermediate compiler engines). Otherwise, the commands are
+    compiled as usual and the output is stored in the cache as a compressed
+    binary trace (see TraceRecorder).
+
+    Example:
+        .. code-block:: python
+
+            import projectq.setups.restrictedgateset as setup
+            cache = CompilationCache("~/.cache/projectq")
+            eng = MainEngine(backend,
+                             [cache] + setup.get_engine_list())
+
+    Note:
+        Since all commands are buffered until the next flush, measurement
+        results only become available after calling eng.flush().
+
+    Note:
+        Segments containing gates which cannot be recorded (e.g., gates
+        defined by a lambda function, see TraceRecorder) are compiled but not
+        cached. If the configuration of the compiler engines or the state of
+        a gate cannot be fingerprinted deterministically (e.g., objects
+        implemented in C), nothing is cached from then on.
+
+    Attributes:
+        cache_dir (str): Directory containing the cached streams.
+        num_hits (int): Number of flushed segments which have been replayed
+            from the cache.
+        num_misses (int): Number of flushed segments which have been
+            compiled.
+    """
+    def __init__(self, cache_dir, config_key=""):
+        """
+        Initialize a CompilationCache.
+
+        Args:
+            cache_dir (str): Directory in which to store the compiled
+                command streams (created if it does not exist).
+            config_key (str): Additional string which is included in all
+                fingerprints. Use it to invalidate cached streams, e.g., if
+                the decomposition rules have changed.
+        """
+        BasicEngine.__init__(self)
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.num_hits = 0
+        self.num_misses = 0
+        self._config_key = config_key
+        self._config_fingerprint = None
+        self._last_key = b""
+        self._cacheable = True
+        self._buffer = []
+        # input segments which were replayed from the cache but have not
+        # been sent through the compiler engines
+        self._replayed_inputs = []
+        self._recorder = None
+
+    def _get_config_fingerprint(self):
+        """
+        Return a fingerprint of the configuration of all following engines.
+        """
+        engine = self.next_engine
+        description = [projectq.__version__, self._config_key]
+        while engine is not self.main_engine.backend:
+            attributes = dict((key, value) for key, value
+                              in vars(engine).items()
+                              if key not in ('main_engine', 'next_engine'))
+            description.append("{}.{}{}".format(type(engine).__module__,
+                                                type(engine).__name__,
+                                                _describe(attributes)))
+            engine = engine.next_engine
+        # the state of the back-end (e.g., the wave function of a simulator)
+        # does not change the compiled stream
+        description.append(_describe(type(engine)))
+        return "\n".join(description).encode('utf-8')
+
+    def _insert_recorder(self):
+        engine = self
+        while engine.next_engine is not self.main_engine.backend:
+            engine = engine.next_engine
+        self._recorder = _CompiledStreamRecorder()
+        insert_engine(engine, self._recorder)
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, key + ".pqcc")
+
+    def _replay(self, path, flush_cmd):
+        backend = self.main_engine.backend
+        with open(path, 'rb') as cache_file:
+            reader = _TraceReader(cache_file)
+            for command_list in reader.read_chunks(self.main_engine):
+                backend.receive(command_list)
+        mapping = reader.metadata.get('mapping')
+        if mapping is not None and self.main_engine.mapper is not None:
+            self.main_engine.mapper.current_mapping = mapping
+        backend.receive([flush_cmd])
+
+    def _compile(self, flush_cmd):
+        # Bring all compiler engines up to date (if segments have been
+        # replayed before) without sending anything to the back-end.
+        if len(self._replayed_inputs) > 0:
+            self._recorder.discard = True
+            for command_list in self._replayed_inputs:
+                self.send(command_list)
+            self._replayed_inputs = []
+            self._recorder.discard = False
+        self._recorder.start()
+        self.send(self._buffer + [flush_cmd])
+
+    def _store(self, path):
+        writer = self._recorder.writer
+        if writer is None:
+            return
+        mapping = None
+        if self.main_engine.mapper is not None:
+            mapping = self.main_engine.mapper.current_mapping
+        writer.write_metadata({'mapping': mapping})
+        data = self._recorder.buffer.getvalue()
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        # write to a temporary file first such that concurrent jobs never
+        # read a partially written stream
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+        _replace(tmp_path, path)
+
+    def _get_key(self):
+        """
+        Return the key of the buffered segment (which depends on the keys of
+        all previous segments) or None if it cannot be cached.
+        """
+        if not self._cacheable:
+            return None
+        try:
+            if self._config_fingerprint is None:
+                self._config_fingerprint = self._get_config_fingerprint()
+            encoded_input = _encode_input(self._buffer)
+        except TypeError:
+            # all following segments depend on this one
+            self._cacheable = False
+            return None
+        key = hashlib.sha256(self._last_key + self._config_fingerprint +
+                             encoded_input).hexdigest()
+        self._last_key = key.encode('ascii')
+        return key
+
+    def _flush(self, flush_cmd):
+        key = self._get_key()
+        if self._recorder is None:
+            self._insert_recorder()
+        path = None if key is None else self._cache_path(key)
+        if path is not None and os.path.isfile(path):
+            self.num_hits += 1
+            self._replay(path, flush_cmd)
+            self._replayed_inputs.append(self._buffer + [flush_cmd])
+        else:
+            self.num_misses += 1
+            self._compile(flush_cmd)
+            if path is not None:
+                self._store(path)
+        self._buffer = []
+
+    def receive(self, command_list):
+        """
+        Receive a list of commands and buffer them until the next flush.
+
+        Args:
+            command_list (list<Command>): List of commands to receive.
+        """
+        for cmd in command_list:
+            if isinstance(cmd.gate, FlushGate):
+                self._flush(cmd)
+            else:
+                self._buffer.append(cmd)
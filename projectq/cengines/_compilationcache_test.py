@@ -0,0 +1,207 @@
+#   Copyright 2017 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Tests for projectq.cengines._compilationcache.py."""
+
+import functools
+import os
+
+import numpy
+import pytest
+
+from projectq import MainEngine
+from projectq.backends import Simulator
+from projectq.cengines import (AutoReplacer, DecompositionRuleSet,
+                               DummyEngine, InstructionFilter, LocalOptimizer,
+                               ManualMapper)
+from projectq.meta import LogicalQubitIDTag
+from projectq.ops import (BasicMathGate, CNOT, H, Measure, Rx, Ry, Rz,
+                          StatePreparation, UniformlyControlledRy,
+                          UniformlyControlledRz, X)
+from projectq.setups import decompositions, restrictedgateset
+
+from projectq.cengines import _compilationcache
+
+
+def _get_engines(cache_dir, config_key=""):
+    cache = _compilationcache.CompilationCache(cache_dir, config_key)
+    middle = DummyEngine(save_commands=True)
+    backend = DummyEngine(save_commands=True)
+    eng = MainEngine(backend=backend,
+                     engine_list=[cache, middle, LocalOptimizer(3)])
+    return eng, cache, middle, backend
+
+
+def _program(eng, angle=0.5):
+    qureg = eng.allocate_qureg(2)
+    H | qureg[0]
+    CNOT | (qureg[0], qureg[1])
+    Rx(angle) | qureg[1]
+    Rx(-angle) | qureg[1]
+    eng.flush()
+    return qureg
+
+
+def test_compilation_cache_replays_stream(tmpdir):
+    eng, cache, middle, backend = _get_engines(str(tmpdir))
+    _program(eng)
+    assert cache.num_misses == 1 and cache.num_hits == 0
+    assert len(middle.received_commands) > 0
+    assert len(os.listdir(str(tmpdir))) == 1
+    expected = [str(cmd) for cmd in backend.received_commands]
+    # the optimizer cancelled the rotations
+    assert not any("Rx" in cmd_str for cmd_str in expected)
+
+    eng2, cache2, middle2, backend2 = _get_engines(str(tmpdir))
+    _program(eng2)
+    assert cache2.num_hits == 1 and cache2.num_misses == 0
+    assert len(middle2.received_commands) == 0
+    assert [str(cmd) for cmd in backend2.received_commands] == expected
+    assert all(cmd.engine is eng2 for cmd in backend2.received_commands)
+
+
+def test_compilation_cache_key_depends_on_input_and_config(tmpdir):
+    # keep the engines and qubits alive: their deallocation and the final
+    # flush (when they are garbage collected) would add further entries
+    alive = []
+    eng, cache, _, _ = _get_engines(str(tmpdir))
+    alive.append((eng, _program(eng)))
+    eng, cache, _, _ = _get_engines(str(tmpdir))
+    alive.append((eng, _program(eng, angle=0.3)))
+    assert cache.num_misses == 1
+    eng, cache, _, _ = _get_engines(str(tmpdir), config_key="v2")
+    alive.append((eng, _program(eng)))
+    assert cache.num_misses == 1
+    assert len(os.listdir(str(tmpdir))) == 3
+
+
+def test_compilation_cache_key_depends_on_filter_closures(tmpdir):
+    # the filter functions of restrictedgateset are closures over the gate set
+    alive = []
+    for one_qubit_gates, num_misses in [((Rz, Ry), 1), ((Rz, Rx), 1),
+                                        ((Rz, Ry), 0)]:
+        cache = _compilationcache.CompilationCache(str(tmpdir))
+        backend = DummyEngine(save_commands=True)
+        engine_list = restrictedgateset.get_engine_list(
+            one_qubit_gates=one_qubit_gates)
+        eng = MainEngine(backend=backend, engine_list=[cache] + engine_list)
+        alive.append((eng, _program(eng)))
+        assert cache.num_misses == num_misses
+        gate_classes = set(type(cmd.gate).__name__
+                           for cmd in backend.received_commands)
+        assert "HGate" not in gate_classes
+        assert ("Rx" in gate_classes) == (Rx in one_qubit_gates)
+        assert ("Ry" in gate_classes) == (Ry in one_qubit_gates)
+    assert len(os.listdir(str(tmpdir))) == 2
+
+
+def test_compilation_cache_describe():
+    def _filter(gates):
+        return lambda eng, cmd: isinstance(cmd.gate, gates)
+
+    describe = _compilationcache._describe
+    assert describe(_filter((Rx,))) != describe(_filter((Ry,)))
+    assert describe(lambda x=1: x) != describe(lambda x=2: x)
+    assert (describe(functools.partial(max, 1)) !=
+            describe(functools.partial(max, 2)))
+    nested = [[[[[[Rx(0.1)]]]]]]
+    assert describe(nested) != describe([[[[[[Rx(0.2)]]]]]])
+    with pytest.raises(TypeError):
+        describe(iter([1]))
+
+
+def test_compilation_cache_skips_undescribable_config(tmpdir):
+    for _ in range(2):
+        eng, cache, middle, _ = _get_engines(str(tmpdir))
+        middle.state = iter([])
+        _program(eng)
+        assert cache.num_misses == 1
+    assert len(os.listdir(str(tmpdir))) == 0
+
+
+def _no_state_preparation(self, cmd):
+    return not isinstance(cmd.gate, (StatePreparation, UniformlyControlledRy,
+                                     UniformlyControlledRz))
+
+
+def test_compilation_cache_key_depends_on_gate_parameters(tmpdir):
+    # str(StatePreparation(...)) does not contain the amplitudes
+    alive = []
+    final_states = []
+    for amplitudes in [[0., 1.], [1., 0.], [0., 1.]]:
+        sim = Simulator()
+        cache = _compilationcache.CompilationCache(str(tmpdir))
+        rule_set = DecompositionRuleSet(modules=[decompositions])
+        eng = MainEngine(sim, [cache, AutoReplacer(rule_set),
+                               InstructionFilter(_no_state_preparation)])
+        qubit = eng.allocate_qubit()
+        StatePreparation(amplitudes) | qubit
+        eng.flush()
+        final_states.append(list(sim.cheat()[1]))
+        alive.append((eng, qubit))
+    assert numpy.allclose(final_states, [[0., 1.], [1., 0.], [0., 1.]])
+    assert cache.num_hits == 1
+    assert len(os.listdir(str(tmpdir))) == 2
+
+
+def test_compilation_cache_catches_up_after_hit(tmpdir):
+    eng, cache, middle, backend = _get_engines(str(tmpdir))
+    qureg = _program(eng)
+    eng, cache, middle, backend = _get_engines(str(tmpdir))
+    qureg = _program(eng)
+    assert cache.num_hits == 1
+    num_received = len(backend.received_commands)
+    X | qureg[0]
+    eng.flush()
+    assert cache.num_misses == 1
+    # the replayed segment was sent through the compiler engines but not
+    # to the back-end again
+    assert len(middle.received_commands) == 9
+    assert len(backend.received_commands) == num_received + 2
+    assert backend.received_commands[-2].gate == X
+
+
+def test_compilation_cache_restores_mapping(tmpdir):
+    def _run():
+        cache = _compilationcache.CompilationCache(str(tmpdir))
+        mapper = ManualMapper(lambda x: x + 3)
+        backend = DummyEngine(save_commands=True)
+        eng = MainEngine(backend=backend, engine_list=[cache, mapper])
+        qubit = eng.allocate_qubit()
+        Measure | qubit
+        eng.flush()
+        return cache, mapper, backend
+
+    _run()
+    cache, mapper, backend = _run()
+    assert cache.num_hits == 1
+    assert mapper.current_mapping[0] == 3
+    measure_cmd = backend.received_commands[1]
+    assert measure_cmd.qubits[0][0].id == 3
+    assert measure_cmd.tags == [LogicalQubitIDTag(0)]
+
+
+def test_compilation_cache_tag_key():
+    assert (_compilationcache._tag_key(LogicalQubitIDTag(0)) !=
+            _compilationcache._tag_key(LogicalQubitIDTag(1)))
+
+
+def test_compilation_cache_skips_unpicklable_gates(tmpdir):
+    eng, cache, _, backend = _get_engines(str(tmpdir))
+    qureg = eng.allocate_qureg(2)
+    BasicMathGate(lambda x, y: (x, x + y)) | (qureg[0:1], qureg[1:])
+    eng.flush()
+    assert cache.num_misses == 1
+    assert len(os.listdir(str(tmpdir))) == 0
+    assert isinstance(backend.received_commands[-2].gate, BasicMathGate)
@@ -0,0 +1,527 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Mapper for a quantum circuit to an arbitrary coupling graph.
+
+Input: Quantum circuit with 1 and 2 qubit gates on n qubits. Gates are assumed
+       to be applied in parallel if they act on disjoint qubit(s) and any pair
+       of qubits can perform a 2 qubit gate (all-to-all connectivity)
+Output: Quantum circuit in which qubits are placed on the nodes of a coupling
+        graph in which only neighbouring qubits can perform a 2 qubit gate.
+        The mapper inserts Swap gates using a lookahead heuristic (SABRE, see
+        Li, Ding and Xie, arXiv:1809.02573).
+"""
+
+import networkx as nx
+
+from projectq.cengines import BasicMapperEngine, return_swap_depth
+from projectq.meta import LogicalQubitIDTag
+from projectq.ops import (AllocateQubitGate, Command, DeallocateQubitGate,
+                          FlushGate, Swap)
+from projectq.types import WeakQubitRef
+
+
+def _build_dependencies(qubit_ids):
+    """
+    Return the successors and the number of predecessors of each command of
+    a command sequence (two commands depend on each other if they share a
+    qubit).
+
+    Args:
+        qubit_ids (list<list<int>>): Qubit ids of each command.
+    """
+    successors = [[] for _ in qubit_ids]
+    num_predecessors = [0] * len(qubit_ids)
+    last_command = dict()
+    for index, ids in enumerate(qubit_ids):
+        predecessors = set(last_command[qubit_id] for qubit_id in ids
+                           if qubit_id in last_command)
+        for predecessor in predecessors:
+            successors[predecessor].append(index)
+        num_predecessors[index] = len(predecessors)
+        for qubit_id in ids:
+            last_command[qubit_id] = index
+    return successors, num_predecessors
+
+
+class GraphMapper(BasicMapperEngine):
+    """
+    Maps a quantum circuit to an arbitrary coupling graph using Swap gates.
+
+    Whenever none of the commands in the front layer (the commands whose
+    predecessors have all been sent) can be executed, the mapper applies the
+    Swap which minimizes the distance between the qubits of the blocked
+    two-qubit gates, taking into account the next few gates (lookahead) and
+    penalizing recently swapped qubits (decay).
+
+    The initial placement of the qubits is refined by routing the stored
+    circuit forwards and backwards (without sending anything) and using the
+    final placement of the backward pass as the initial placement.
+
+    Example:
+        .. code-block:: python
+
+            import networkx as nx
+            graph = nx.Graph([(0, 1), (1, 2), (1, 3), (3, 4)])
+            eng = MainEngine(backend, [AutoReplacer(rule_set),
+                                       GraphMapper(graph)])
+
+    Attributes:
+        current_mapping:  Stores the mapping: key is logical qubit id, value
+                          is the backend qubit id (node of the graph).
+        graph (networkx.Graph): The coupling graph.
+        storage (int): Number of gates it caches before mapping.
+        num_mappings (int): Number of times the mapper changed the mapping
+        depth_of_swaps (dict): Key are circuit depth of swaps, value is the
+                               number of such mappings which have been
+                               applied
+        num_of_swaps_per_mapping (dict): Key are the number of swaps per
+                                         mapping, value is the number of such
+                                         mappings which have been applied
+
+    Note:
+        1) Gates are cached and only mapped from time to time. A
+           FastForwarding gate doesn't empty the cache, only a FlushGate does.
+        2) Only 1 and two qubit gates allowed.
+        3) Does not optimize for dirty qubits.
+    """
+    def __init__(self, graph, storage=1000, num_lookahead_gates=20,
+                 lookahead_weight=0.5, decay=0.001, num_layout_iterations=1):
+        """
+        Initialize a GraphMapper compiler engine.
+
+        Args:
+            graph (networkx.Graph or list of tuples): Connected coupling graph
+                (or its list of edges). The nodes are the backend qubit ids.
+                Directed graphs are treated as undirected.
+            storage (int): Number of gates to temporarily store.
+            num_lookahead_gates (int): Number of upcoming two-qubit gates
+                taken into account when choosing a Swap.
+            lookahead_weight (float): Weight of the upcoming gates relative
+                to the blocked gates.
+            decay (float): Penalty for swapping recently swapped qubits
+                again (favors parallel Swaps).
+            num_layout_iterations (int): Number of forward-backward passes
+                used to refine the initial placement.
+
+        Raises:
+            RuntimeError: if the graph is empty or not connected.
+        """
+        BasicMapperEngine.__init__(self)
+        if not isinstance(graph, nx.Graph):
+            graph = nx.Graph(list(graph))
+        self.graph = nx.Graph(graph)
+        if (self.graph.number_of_nodes() == 0 or
+                not nx.is_connected(self.graph)):
+            raise RuntimeError("The coupling graph must be connected.")
+        self.num_qubits = self.graph.number_of_nodes()
+        self.storage = storage
+        self.num_lookahead_gates = num_lookahead_gates
+        self.lookahead_weight = lookahead_weight
+        self.decay = decay
+        self.num_layout_iterations = num_layout_iterations
+        self._distance = dict(nx.all_pairs_shortest_path_length(self.graph))
+        self._neighbours = dict((node, sorted(self.graph[node]))
+                                for node in self.graph)
+        # Nodes in breadth-first order starting from a center of the graph
+        # (used to place qubits close to each other)
+        center = min(nx.center(self.graph))
+        self._placement_order = [center]
+        visited = set([center])
+        for node in self._placement_order:
+            for neighbour in self._neighbours[node]:
+                if neighbour not in visited:
+                    visited.add(neighbour)
+                    self._placement_order.append(neighbour)
+        # Storing commands
+        self._stored_commands = list()
+        # Logical qubit ids for which the Allocate gate has already been
+        # processed and sent to the next engine but which are not yet
+        # deallocated:
+        self._currently_allocated_ids = set()
+        # Inverse of the current mapping and the backend ids which are
+        # allocated in the next engine (which includes ids only allocated to
+        # perform Swaps)
+        self._backend_to_logical = dict()
+        self._allocated_backend_ids = set()
+        # Placement planned for qubits which have not been allocated yet
+        self._planned_mapping = dict()
+        # Swaps applied since the last gate was sent
+        self._current_swaps = []
+        # Statistics:
+        self.num_mappings = 0
+        self.depth_of_swaps = dict()
+        self.num_of_swaps_per_mapping = dict()
+
+    def is_available(self, cmd):
+        """
+        Only allows 1 or two qubit gates.
+        """
+        num_qubits = 0
+        for qureg in cmd.all_qubits:
+            num_qubits += len(qureg)
+        return num_qubits <= 2
+
+    def _swap_score(self, swap, front_pairs, lookahead_pairs, decay):
+        """
+        Return the cost of the mapping after applying a Swap.
+
+        Args:
+            swap (tuple): The two backend ids to swap.
+            front_pairs (list<tuple>): Backend ids of the blocked gates.
+            lookahead_pairs (list<tuple>): Backend ids of the upcoming gates.
+            decay (dict): Decay factor of each backend id.
+        """
+        backend_id0, backend_id1 = swap
+
+        def position(backend_id):
+            if backend_id == backend_id0:
+                return backend_id1
+            if backend_id == backend_id1:
+                return backend_id0
+            return backend_id
+
+        distance = self._distance
+        cost = (sum(distance[position(a)][position(b)]
+                    for a, b in front_pairs) / float(len(front_pairs)))
+        if len(lookahead_pairs) > 0:
+            cost += (self.lookahead_weight *
+                     sum(distance[position(a)][position(b)]
+                         for a, b in lookahead_pairs) /
+                     float(len(lookahead_pairs)))
+        return cost * max(decay.get(backend_id0, 1.),
+                          decay.get(backend_id1, 1.))
+
+    def _choose_swap(self, front_pairs, lookahead_pairs, decay):
+        """
+        Return the best Swap (tuple of two backend ids) for the blocked gates.
+        """
+        candidates = set()
+        for pair in front_pairs:
+            for backend_id in pair:
+                for neighbour in self._neighbours[backend_id]:
+                    candidates.add((min(backend_id, neighbour),
+                                    max(backend_id, neighbour)))
+        return min(sorted(candidates),
+                   key=lambda swap: self._swap_score(swap, front_pairs,
+                                                     lookahead_pairs, decay))
+
+    def _lookahead(self, front, successors, is_two_qubit_gate):
+        """
+        Return the indices of the next num_lookahead_gates two-qubit gates
+        following the front layer (in breadth-first order).
+        """
+        result = []
+        visited = set(front)
+        layer = list(front)
+        while len(layer) > 0 and len(result) < self.num_lookahead_gates:
+            next_layer = []
+            for index in layer:
+                for successor in successors[index]:
+                    if successor not in visited:
+                        visited.add(successor)
+                        next_layer.append(successor)
+                        if (is_two_qubit_gate(successor) and
+                                len(result) < self.num_lookahead_gates):
+                            result.append(successor)
+            layer = sorted(next_layer)
+        return result
+
+    def _route_gates(self, gates, mapping):
+        """
+        Route a sequence of two-qubit gates without sending any command and
+        return the final mapping (used to refine the initial placement).
+
+        Args:
+            gates (list<tuple>): Logical qubit ids of the two-qubit gates.
+            mapping (dict): Initial mapping (logical id to backend id),
+                gates on qubits which are not in the mapping are ignored.
+        """
+        mapping = dict(mapping)
+        backend_to_logical = dict((v, k) for k, v in mapping.items())
+        gates = [gate for gate in gates
+                 if gate[0] in mapping and gate[1] in mapping]
+        successors, num_predecessors = _build_dependencies(gates)
+        front = [i for i in range(len(gates)) if num_predecessors[i] == 0]
+        decay = dict()
+        num_swaps_without_progress = 0
+        while len(front) > 0:
+            remaining = []
+            executed = []
+            for index in front:
+                qubit0, qubit1 = gates[index]
+                if self._distance[mapping[qubit0]][mapping[qubit1]] == 1:
+                    executed.append(index)
+                else:
+                    remaining.append(index)
+            if len(executed) > 0:
+                for index in executed:
+                    for successor in successors[index]:
+                        num_predecessors[successor] -= 1
+                        if num_predecessors[successor] == 0:
+                            remaining.append(successor)
+                front = sorted(remaining)
+                decay = dict()
+                num_swaps_without_progress = 0
+                continue
+            front_pairs = [(mapping[gates[i][0]], mapping[gates[i][1]])
+                           for i in front]
+            if num_swaps_without_progress > 2 * self.num_qubits:
+                path = nx.shortest_path(self.graph, *front_pairs[0])
+                swaps = list(zip(path[:-2], path[1:-1]))
+            else:
+                lookahead = self._lookahead(front, successors,
+                                            lambda index: True)
+                lookahead_pairs = [(mapping[gates[i][0]],
+                                    mapping[gates[i][1]])
+                                   for i in lookahead]
+                swaps = [self._choose_swap(front_pairs, lookahead_pairs,
+                                           decay)]
+            for backend_id0, backend_id1 in swaps:
+                logical0 = backend_to_logical.pop(backend_id0, None)
+                logical1 = backend_to_logical.pop(backend_id1, None)
+                if logical0 is not None:
+                    mapping[logical0] = backend_id1
+                    backend_to_logical[backend_id1] = logical0
+                if logical1 is not None:
+                    mapping[logical1] = backend_id0
+                    backend_to_logical[backend_id0] = logical1
+                decay[backend_id0] = decay.get(backend_id0, 1.) + self.decay
+                decay[backend_id1] = decay.get(backend_id1, 1.) + self.decay
+                num_swaps_without_progress += 1
+        return mapping
+
+    def _plan_initial_mapping(self, qubit_ids):
+        """
+        Plan the placement of the qubits allocated in the stored commands
+        using forward-backward passes over the stored two-qubit gates.
+        """
+        logical_ids = []
+        gates = []
+        for cmd, ids in zip(self._stored_commands, qubit_ids):
+            if isinstance(cmd.gate, AllocateQubitGate):
+                logical_ids.append(ids[0])
+            elif len(ids) == 2:
+                gates.append(tuple(ids))
+        mapping = dict(zip(logical_ids, self._placement_order))
+        for _ in range(self.num_layout_iterations):
+            mapping = self._route_gates(gates, mapping)
+            mapping = self._route_gates(list(reversed(gates)), mapping)
+        self._planned_mapping = mapping
+
+    def _find_free_backend_id(self, logical_id):
+        planned = self._planned_mapping.pop(logical_id, None)
+        if planned is not None and planned not in self._backend_to_logical:
+            return planned
+        for backend_id in self._placement_order:
+            if backend_id not in self._backend_to_logical:
+                return backend_id
+        return None
+
+    def _send_swap(self, backend_id0, backend_id1):
+        for backend_id in (backend_id0, backend_id1):
+            if backend_id not in self._allocated_backend_ids:
+                qb = WeakQubitRef(engine=self, idx=backend_id)
+                self.send([Command(engine=self, gate=AllocateQubitGate(),
+                                   qubits=([qb],))])
+                self._allocated_backend_ids.add(backend_id)
+        q0 = WeakQubitRef(engine=self, idx=backend_id0)
+        q1 = WeakQubitRef(engine=self, idx=backend_id1)
+        self.send([Command(engine=self, gate=Swap, qubits=([q0], [q1]))])
+        logical0 = self._backend_to_logical.pop(backend_id0, None)
+        logical1 = self._backend_to_logical.pop(backend_id1, None)
+        if logical0 is not None:
+            self._current_mapping[logical0] = backend_id1
+            self._backend_to_logical[backend_id1] = logical0
+        if logical1 is not None:
+            self._current_mapping[logical1] = backend_id0
+            self._backend_to_logical[backend_id0] = logical1
+        self._current_swaps.append((backend_id0, backend_id1))
+
+    def _finish_swaps(self):
+        """
+        Register the statistics of the Swaps applied since the last gate and
+        deallocate all backend ids which were only needed for the Swaps.
+        """
+        swaps = self._current_swaps
+        if len(swaps) == 0:
+            return
+        self.num_mappings += 1
+        depth = return_swap_depth(swaps)
+        if depth not in self.depth_of_swaps:
+            self.depth_of_swaps[depth] = 1
+        else:
+            self.depth_of_swaps[depth] += 1
+        if len(swaps) not in self.num_of_swaps_per_mapping:
+            self.num_of_swaps_per_mapping[len(swaps)] = 1
+        else:
+            self.num_of_swaps_per_mapping[len(swaps)] += 1
+        self._current_swaps = []
+        for backend_id in sorted(self._allocated_backend_ids.difference(
+                self._backend_to_logical)):
+            qb = WeakQubitRef(engine=self, idx=backend_id)
+            self.send([Command(engine=self, gate=DeallocateQubitGate(),
+                               qubits=([qb],))])
+            self._allocated_backend_ids.remove(backend_id)
+
+    def _try_send(self, cmd, ids):
+        """
+        Send a command of the front layer if possible (without Swaps).
+
+        Returns:
+            True if the command has been sent.
+        """
+        mapping = self._current_mapping
+        if isinstance(cmd.gate, AllocateQubitGate):
+            logical_id = ids[0]
+            backend_id = self._find_free_backend_id(logical_id)
+            if backend_id is None:
+                return False
+            self._finish_swaps()
+            mapping[logical_id] = backend_id
+            self._backend_to_logical[backend_id] = logical_id
+            self._allocated_backend_ids.add(backend_id)
+            self._currently_allocated_ids.add(logical_id)
+            qb = WeakQubitRef(engine=self, idx=backend_id)
+            self.send([Command(engine=self, gate=AllocateQubitGate(),
+                               qubits=([qb],),
+                               tags=[LogicalQubitIDTag(logical_id)])])
+            return True
+        if any(qubit_id not in mapping for qubit_id in ids):
+            return False
+        if (len(ids) == 2 and
+                self._distance[mapping[ids[0]]][mapping[ids[1]]] != 1):
+            return False
+        self._finish_swaps()
+        if isinstance(cmd.gate, DeallocateQubitGate):
+            logical_id = ids[0]
+            backend_id = mapping.pop(logical_id)
+            del self._backend_to_logical[backend_id]
+            self._allocated_backend_ids.remove(backend_id)
+            self._currently_allocated_ids.remove(logical_id)
+            qb = WeakQubitRef(engine=self, idx=backend_id)
+            self.send([Command(engine=self, gate=DeallocateQubitGate(),
+                               qubits=([qb],),
+                               tags=[LogicalQubitIDTag(logical_id)])])
+        else:
+            self._send_cmd_with_mapped_ids(cmd)
+        return True
+
+    def _run(self):
+        """
+        Routes and sends all stored commands.
+
+        Raises:
+            RuntimeError: if the commands cannot be routed (e.g., if more
+                qubits are alive at the same time than the graph has nodes).
+        """
+        commands = self._stored_commands
+        qubit_ids = [[qubit.id for qureg in cmd.all_qubits for qubit in qureg]
+                     for cmd in commands]
+        if not self._current_mapping:
+            self.current_mapping = dict()
+            self._plan_initial_mapping(qubit_ids)
+        successors, num_predecessors = _build_dependencies(qubit_ids)
+        front = [i for i in range(len(commands)) if num_predecessors[i] == 0]
+        decay = dict()
+        num_swaps_without_progress = 0
+        while len(front) > 0:
+            remaining = []
+            progress = False
+            for index in front:
+                if self._try_send(commands[index], qubit_ids[index]):
+                    progress = True
+                    for successor in successors[index]:
+                        num_predecessors[successor] -= 1
+                        if num_predecessors[successor] == 0:
+                            remaining.append(successor)
+                else:
+                    remaining.append(index)
+            front = sorted(remaining)
+            if progress:
+                decay = dict()
+                num_swaps_without_progress = 0
+                continue
+            mapping = self._current_mapping
+            blocked = [index for index in front
+                       if len(qubit_ids[index]) == 2 and
+                       all(qubit_id in mapping
+                           for qubit_id in qubit_ids[index])]
+            if len(blocked) == 0:
+                self._stored_commands = [commands[index] for index in
+                                         sorted(self._pending(front,
+                                                              successors))]
+                raise RuntimeError("Mapper is potentially in an infinite "
+                                   "loop. It is likely that the algorithm "
+                                   "requires too many qubits. Increase the "
+                                   "number of qubits for this mapper.")
+            front_pairs = [(mapping[qubit_ids[i][0]], mapping[qubit_ids[i][1]])
+                           for i in blocked]
+            if num_swaps_without_progress > 2 * self.num_qubits:
+                path = nx.shortest_path(self.graph, *front_pairs[0])
+                swaps = list(zip(path[:-2], path[1:-1]))
+            else:
+                lookahead = self._lookahead(
+                    front, successors,
+                    lambda index: (len(qubit_ids[index]) == 2 and all(
+                        qubit_id in mapping
+                        for qubit_id in qubit_ids[index])))
+                lookahead_pairs = [(mapping[qubit_ids[i][0]],
+                                    mapping[qubit_ids[i][1]])
+                                   for i in lookahead]
+                swaps = [self._choose_swap(front_pairs, lookahead_pairs,
+                                           decay)]
+            for backend_id0, backend_id1 in swaps:
+                self._send_swap(backend_id0, backend_id1)
+                decay[backend_id0] = decay.get(backend_id0, 1.) + self.decay
+                decay[backend_id1] = decay.get(backend_id1, 1.) + self.decay
+                num_swaps_without_progress += 1
+        self._finish_swaps()
+        self._stored_commands = []
+
+    @staticmethod
+    def _pending(front, successors):
+        """
+        Return the indices of the front layer and all commands depending on
+        it.
+        """
+        pending = set(front)
+        stack = list(front)
+        while len(stack) > 0:
+            for successor in successors[stack.pop()]:
+                if successor not in pending:
+                    pending.add(successor)
+                    stack.append(successor)
+        return pending
+
+    def receive(self, command_list):
+        """
+        Receives a command list and, for each command, stores it until
+        we do a mapping (FlushGate or Cache of stored commands is full).
+
+        Args:
+            command_list (list of Command objects): list of commands to
+                receive.
+        """
+        for cmd in command_list:
+            if isinstance(cmd.gate, FlushGate):
+                while len(self._stored_commands):
+                    self._run()
+                self.send([cmd])
+            else:
+                self._stored_commands.append(cmd)
+            # Storage is full: Create new map and send some gates away:
+            if len(self._stored_commands) >= self.storage:
+                self._run()
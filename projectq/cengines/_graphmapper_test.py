@@ -0,0 +1,173 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Tests for projectq.cengines._graphmapper.py."""
+
+import random
+
+import networkx as nx
+import pytest
+
+from projectq import MainEngine
+from projectq.backends import Simulator
+from projectq.cengines import DummyEngine
+from projectq.meta import LogicalQubitIDTag
+from projectq.ops import (All, Allocate, CNOT, Command, Deallocate,
+                          H, Measure, Rx, Swap, X)
+from projectq.types import WeakQubitRef
+
+from projectq.cengines import _graphmapper
+
+
+def _heavy_square_graph():
+    # 2x3 grid with one additional qubit attached to a corner
+    return nx.Graph([(0, 1), (1, 2), (3, 4), (4, 5), (0, 3), (1, 4), (2, 5),
+                     (5, 6)])
+
+
+def _random_circuit(eng, num_qubits, num_gates, seed):
+    rng = random.Random(seed)
+    qureg = eng.allocate_qureg(num_qubits)
+    for _ in range(num_gates):
+        qb0, qb1 = rng.sample(range(num_qubits), 2)
+        choice = rng.random()
+        if choice < 0.5:
+            CNOT | (qureg[qb0], qureg[qb1])
+        elif choice < 0.75:
+            H | qureg[qb0]
+        else:
+            Rx(choice) | qureg[qb1]
+    eng.flush()
+    return qureg
+
+
+def test_graph_mapper_invalid_graph():
+    with pytest.raises(RuntimeError):
+        _graphmapper.GraphMapper(nx.Graph([(0, 1), (2, 3)]))
+    with pytest.raises(RuntimeError):
+        _graphmapper.GraphMapper([])
+
+
+def test_graph_mapper_is_available():
+    mapper = _graphmapper.GraphMapper([(0, 1), (1, 2)])
+    qb0, qb1, qb2 = [WeakQubitRef(engine=None, idx=i) for i in range(3)]
+    assert mapper.is_available(Command(None, X, ([qb0],), controls=[qb1]))
+    assert not mapper.is_available(Command(None, X, ([qb0],),
+                                           controls=[qb1, qb2]))
+
+
+def test_build_dependencies():
+    successors, num_predecessors = _graphmapper._build_dependencies(
+        [[0], [1], [0, 1], [2], [1]])
+    assert successors == [[2], [2], [4], [], []]
+    assert num_predecessors == [0, 0, 2, 0, 1]
+
+
+@pytest.mark.parametrize("num_layout_iterations", [0, 1])
+@pytest.mark.parametrize("storage", [5, 1000])
+def test_graph_mapper_routes_to_neighbours(num_layout_iterations, storage):
+    graph = _heavy_square_graph()
+    backend = DummyEngine(save_commands=True)
+    backend.is_last_engine = True
+    mapper = _graphmapper.GraphMapper(
+        graph, storage=storage, num_layout_iterations=num_layout_iterations)
+    eng = MainEngine(backend=backend, engine_list=[mapper])
+    qureg = _random_circuit(eng, 6, 100, seed=4)
+    allocated = set()
+    for cmd in backend.received_commands:
+        ids = [qb.id for qureg in cmd.all_qubits for qb in qureg]
+        if cmd.gate == Allocate:
+            assert ids[0] not in allocated
+            allocated.add(ids[0])
+        elif cmd.gate == Deallocate:
+            allocated.remove(ids[0])
+        elif len(ids) == 2:
+            assert graph.has_edge(*ids)
+        if ids[0] != -1:
+            assert set(ids) <= allocated
+    assert mapper.num_mappings > 0
+    assert (sum(mapper.num_of_swaps_per_mapping.values()) ==
+            sum(mapper.depth_of_swaps.values()) == mapper.num_mappings)
+    # only the backend ids of the logical qubits stay allocated
+    assert allocated == set(mapper.current_mapping.values())
+    assert len(mapper.current_mapping) == len(qureg)
+
+
+def test_graph_mapper_simulation():
+    def _run(mapper):
+        sim = Simulator()
+        engine_list = [] if mapper is None else [mapper]
+        eng = MainEngine(backend=sim, engine_list=engine_list)
+        qureg = _random_circuit(eng, 5, 60, seed=1)
+        eng.flush()
+        probabilities = [sim.get_probability(format(i, '05b'), qureg)
+                         for i in range(2 ** 5)]
+        All(Measure) | qureg
+        eng.flush()
+        return probabilities
+
+    expected = _run(None)
+    mapped = _run(_graphmapper.GraphMapper(_heavy_square_graph()))
+    assert mapped == pytest.approx(expected, abs=1e-10)
+
+
+def test_graph_mapper_measurement_and_deallocation():
+    backend = DummyEngine(save_commands=True)
+    backend.is_last_engine = True
+    mapper = _graphmapper.GraphMapper([(0, 1), (1, 2), (2, 3)])
+    eng = MainEngine(backend=backend, engine_list=[mapper])
+    qubit0 = eng.allocate_qubit()
+    qubit1 = eng.allocate_qubit()
+    qubit2 = eng.allocate_qubit()
+    CNOT | (qubit0, qubit2)
+    Measure | qubit2
+    del qubit1
+    eng.flush()
+    measure_cmd = [cmd for cmd in backend.received_commands
+                   if cmd.gate == Measure][0]
+    assert measure_cmd.tags == [LogicalQubitIDTag(2)]
+    assert measure_cmd.qubits[0][0].id == mapper.current_mapping[2]
+    assert 1 not in mapper.current_mapping
+    # the deallocated qubit's place can be reused
+    qureg = eng.allocate_qureg(2)
+    eng.flush()
+    assert len(mapper.current_mapping) == 4
+
+
+def test_graph_mapper_too_many_qubits():
+    backend = DummyEngine()
+    backend.is_last_engine = True
+    mapper = _graphmapper.GraphMapper([(0, 1)])
+    eng = MainEngine(backend=backend, engine_list=[mapper],
+                     verbose=True)
+    qureg = eng.allocate_qureg(3)
+    with pytest.raises(RuntimeError):
+        eng.flush()
+    All(Measure) | qureg[:2]
+
+
+def test_graph_mapper_fewer_swaps_than_linear_mapper():
+    from projectq.cengines import LinearMapper
+
+    def _num_swaps(mapper):
+        backend = DummyEngine(save_commands=True)
+        backend.is_last_engine = True
+        eng = MainEngine(backend=backend, engine_list=[mapper])
+        _random_circuit(eng, 8, 150, seed=2)
+        return len([cmd for cmd in backend.received_commands
+                    if cmd.gate == Swap])
+
+    graph = nx.path_graph(8)
+    assert (_num_swaps(_graphmapper.GraphMapper(graph)) <
+            _num_swaps(LinearMapper(8)))
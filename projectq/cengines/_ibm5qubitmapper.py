@@ -15,11 +15,8 @@
 """
 Contains a compiler engine to map to the 5-qubit IBM chip
 """
-from copy import deepcopy
-
-import itertools
-
 from projectq.cengines import BasicMapperEngine
+from projectq.cengines._placementmapper import _PlacementSearch
 from projectq.ops import FlushGate, NOT, Allocate
 from projectq.meta import get_control_count
 from projectq.backends import IBMBackend
@@ -40,13 +37,21 @@ class IBM5QubitMapper(BasicMapperEngine):
         **raises an Exception**.
     """
 
-    def __init__(self):
+    def __init__(self, connections=None):
         """
         Initialize an IBM 5-qubit mapper compiler engine.
 
         Resets the mapping.
+
+        Args:
+            connections (set of tuples): Directed (control, target) pairs of
+                backend ids on which a CNOT can be applied. Defaults to the
+                connectivity of the ibmqx4 chip.
         """
         BasicMapperEngine.__init__(self)
+        if connections is None:
+            from projectq.setups.ibm import ibmqx4_connections as connections
+        self._placement = _PlacementSearch(connections, canonical=True)
         self.current_mapping = dict()
         self._reset()
 
@@ -78,32 +83,6 @@ class IBM5QubitMapper(BasicMapperEngine):
         return (isinstance(cmd.gate, NOT.__class__) and
                 get_control_count(cmd) == 1)
 
-    def _determine_cost(self, mapping):
-        """
-        Determines the cost of the circuit with the given mapping.
-
-        Args:
-            mapping (dict): Dictionary with key, value pairs where keys are
-                logical qubit ids and the corresponding value is the physical
-                location on the IBM Q chip.
-        Returns:
-            Cost measure taking into account CNOT directionality or None
-            if the circuit cannot be executed given the mapping.
-        """
-        from projectq.setups.ibm import ibmqx4_connections as connections
-        cost = 0
-        for tpl in self._interactions:
-            ctrl_id = tpl[0]
-            target_id = tpl[1]
-            ctrl_pos = mapping[ctrl_id]
-            target_pos = mapping[target_id]
-            if not (ctrl_pos, target_pos) in connections:
-                if (target_pos, ctrl_pos) in connections:
-                    cost += self._interactions[tpl]
-                else:
-                    return None
-        return cost
-
     def _run(self):
         """
         Runs all stored gates.
@@ -114,30 +93,21 @@ class IBM5QubitMapper(BasicMapperEngine):
                 the mapping was already determined but more CNOTs get sent
                 down the pipeline.
         """
+        num_qubits = len(self._placement.nodes)
         if (len(self.current_mapping) > 0 and
-                max(self.current_mapping.values()) > 4):
+                max(self.current_mapping.values()) >= num_qubits):
             raise RuntimeError("Too many qubits allocated. The IBM Q "
-                               "device supports at most 5 qubits and no "
+                               "device supports at most {} qubits and no "
                                "intermediate measurements / "
-                               "reallocations.")
+                               "reallocations.".format(num_qubits))
         if len(self._interactions) > 0:
-            logical_ids = [qbid for qbid in self.current_mapping]
-            best_mapping = self.current_mapping
-            best_cost = None
-            for physical_ids in itertools.permutations(list(range(5)),
-                                                       len(logical_ids)):
-                mapping = {logical_ids[i]: physical_ids[i]
-                           for i in range(len(logical_ids))}
-                new_cost = self._determine_cost(mapping)
-                if new_cost is not None:
-                    if best_cost is None or new_cost < best_cost:
-                        best_cost = new_cost
-                        best_mapping = mapping
-            if best_cost is None:
+            mapping = self._placement.find(self._interactions,
+                                           self.current_mapping)
+            if mapping is None:
                 raise RuntimeError("Circuit cannot be mapped without using "
                                    "Swaps. Mapping failed.")
             self._interactions = dict()
-            self.current_mapping = best_mapping
+            self.current_mapping = mapping
 
         for cmd in self._cmds:
             self._send_cmd_with_mapped_ids(cmd)
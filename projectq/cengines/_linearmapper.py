@@ -23,8 +23,8 @@ Output: Quantum circuit in which qubits are placed in 1-D chain in which only
         Swap gates in order to move qubits next to each other.
 """
 
-from collections import deque
-from copy import deepcopy
+from collections import deque, OrderedDict
+import heapq
 
 from projectq.cengines import BasicMapperEngine
 from projectq.meta import LogicalQubitIDTag
@@ -57,6 +57,175 @@ def return_swap_depth(swaps):
     return max(list(depth_of_qubits.values()) + [0])
 
 
+# Number of candidate mappings (containing the gates of the first 1, 2, ...
+# layers) which are compared if the stored commands are scheduled into layers
+_NUM_CANDIDATE_LAYERS = 8
+
+
+def _schedule_layers(commands):
+    """
+    Returns the commands sorted into parallel layers.
+
+    The layers are an as soon as possible (ASAP) schedule of the two qubit
+    gates on the dependency graph of the logical qubits: a two qubit gate is
+    placed in the layer after the last two qubit gate on any of its qubits.
+    All other commands stay in the layer of the preceding two qubit gate on
+    their qubit (layer 0 if there is none). Within a layer, the commands keep
+    their order, hence the order of the commands on each qubit is preserved.
+
+    Args:
+        commands (iterable of Command objects): Commands in the order they
+                                                were received.
+
+    Returns: List of layers. Each layer is a list of commands.
+    """
+    layer_of_qubit = dict()
+    layers = [[]]
+    for cmd in commands:
+        qubit_ids = [qubit.id for qureg in cmd.all_qubits for qubit in qureg]
+        layer = max([layer_of_qubit.get(qubit_id, 0)
+                     for qubit_id in qubit_ids] + [0])
+        if len(qubit_ids) == 2:
+            layer += 1
+        for qubit_id in qubit_ids:
+            layer_of_qubit[qubit_id] = layer
+        if layer == len(layers):
+            layers.append([])
+        layers[layer].append(cmd)
+    return layers
+
+
+def _num_executable_gates(commands, mapping, are_neighbours):
+    """
+    Returns the number of two qubit gates which can be executed with a
+    mapping before the next swaps are required.
+
+    Args:
+        commands (list of Command objects): Stored commands in the order they
+                                            were received.
+        mapping (dict): Key is logical qubit id, value is mapped id.
+        are_neighbours (function): Takes two mapped ids and returns True if
+                                   they are nearest neighbours.
+    """
+    blocked_ids = set()
+    num_gates = 0
+    for cmd in commands:
+        qubit_ids = [qubit.id for qureg in cmd.all_qubits for qubit in qureg]
+        if len(qubit_ids) != 2:
+            if qubit_ids[0] not in mapping:
+                blocked_ids.add(qubit_ids[0])
+            continue
+        qubit0, qubit1 = qubit_ids
+        if (qubit0 in blocked_ids or qubit1 in blocked_ids or
+                qubit0 not in mapping or qubit1 not in mapping or
+                not are_neighbours(mapping[qubit0], mapping[qubit1])):
+            blocked_ids.add(qubit0)
+            blocked_ids.add(qubit1)
+        else:
+            num_gates += 1
+    return num_gates
+
+
+def _return_layered_mapping(commands, return_new_mapping, return_depth,
+                            are_neighbours):
+    """
+    Returns a new mapping which maximizes the number of executable two qubit
+    gates per layer of swaps.
+
+    The commands are scheduled into parallel layers (see _schedule_layers).
+    Candidate mappings are built for the gates of the first 1, 2, ...,
+    _NUM_CANDIDATE_LAYERS layers and of all layers. Including fewer layers
+    leaves more freedom to keep the qubits close to their current position
+    (i.e., shallower swaps) while including more layers makes more gates
+    executable.
+
+    Args:
+        commands (list of Command objects): Stored commands in the order they
+                                            were received.
+        return_new_mapping (function): Takes a list of commands and returns a
+                                       new mapping for them.
+        return_depth (function): Takes a new mapping and returns the depth of
+                                 the swaps to go to it.
+        are_neighbours (function): Takes two mapped ids and returns True if
+                                   they are nearest neighbours.
+
+    Returns: A new mapping as a dict. key is logical qubit id,
+             value is mapped id
+    """
+    layers = _schedule_layers(commands)
+    num_layers = list(range(1, min(len(layers), _NUM_CANDIDATE_LAYERS + 1)))
+    # Ties are broken in favour of the candidate containing more layers
+    num_layers = [len(layers)] + num_layers[::-1]
+    best_mapping = None
+    best_score = None
+    for num in num_layers:
+        mapping = return_new_mapping([cmd for layer in layers[:num]
+                                      for cmd in layer])
+        num_gates = _num_executable_gates(commands, mapping, are_neighbours)
+        score = (num_gates / float(return_depth(mapping) + 1), num_gates)
+        if best_score is None or score > best_score:
+            best_mapping = mapping
+            best_score = score
+    return best_mapping
+
+
+class _SwapCache(object):
+    """
+    Bounded LRU cache of swap networks.
+
+    Iterative algorithms (e.g., Trotter steps) lead to the same remappings
+    over and over again. The key of an entry is the permutation of the mapped
+    qubit ids which the swaps implement (tuple containing the final position
+    of the qubit at each mapped id), the value is the tuple of swaps and
+    their depth.
+    """
+    def __init__(self, size):
+        """
+        Args:
+            size (int): Maximal number of entries (0 disables the cache).
+        """
+        self.size = size
+        self._entries = OrderedDict()
+
+    def get(self, permutation):
+        """
+        Return the cached (swaps, depth) of a permutation or None.
+        """
+        entry = self._entries.pop(permutation, None)
+        if entry is not None:
+            self._entries[permutation] = entry
+        return entry
+
+    def put(self, permutation, swaps, depth):
+        """
+        Store the swaps and their depth and return the new entry.
+        """
+        entry = (tuple(swaps), depth)
+        if self.size > 0:
+            self._entries[permutation] = entry
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return entry
+
+
+class _StoredCommand(object):
+    """
+    Node of the dependency graph of the commands stored in a mapper.
+
+    Attributes:
+        cmd (Command): The stored command.
+        seq (int): Position of the command in the stored command stream.
+        qubit_ids (list<int>): Logical ids of all qubits of the command.
+    """
+    __slots__ = ('cmd', 'seq', 'qubit_ids')
+
+    def __init__(self, cmd, seq):
+        self.cmd = cmd
+        self.seq = seq
+        self.qubit_ids = [qubit.id for qureg in cmd.all_qubits
+                          for qubit in qureg]
+
+
 class LinearMapper(BasicMapperEngine):
     """
     Maps a quantum circuit to a linear chain of nearest neighbour interactions.
@@ -77,6 +246,12 @@ class LinearMapper(BasicMapperEngine):
         num_of_swaps_per_mapping (dict): Key are the number of swaps per
                                          mapping, value is the number of such
                                          mappings which have been applied
+        num_swap_cache_hits (int): Number of (candidate) mappings whose swaps
+                                   were found in the swap cache
+        num_swap_cache_misses (int): Number of (candidate) mappings whose
+                                     swaps had to be computed
+        schedule_layers (bool): If True, the stored commands are scheduled
+                                into parallel layers to choose new mappings
 
     Note:
         1) Gates are cached and only mapped from time to time. A
@@ -85,7 +260,8 @@ class LinearMapper(BasicMapperEngine):
         3) Does not optimize for dirty qubits.
     """
 
-    def __init__(self, num_qubits, cyclic=False, storage=1000):
+    def __init__(self, num_qubits, cyclic=False, storage=1000,
+                 swap_cache_size=100, schedule_layers=False):
         """
         Initialize a LinearMapper compiler engine.
 
@@ -93,13 +269,23 @@ class LinearMapper(BasicMapperEngine):
             num_qubits(int): Number of physical qubits in the linear chain
             cyclic(bool): If 1D chain is a cycle. Default is False.
             storage(int): Number of gates to temporarily store, default is 1000
+            swap_cache_size(int): Number of swap networks (per permutation of
+                                  the mapped ids) to keep, default is 100
+            schedule_layers(bool): If True, the stored commands are scheduled
+                                   into parallel layers (as soon as possible)
+                                   and the new mapping is chosen to maximize
+                                   the number of executable two qubit gates
+                                   per layer of swaps. This reduces the
+                                   circuit depth. Default is False (first
+                                   come first served).
         """
         BasicMapperEngine.__init__(self)
         self.num_qubits = num_qubits
         self.cyclic = cyclic
         self.storage = storage
-        # Storing commands
-        self._stored_commands = list()
+        self.schedule_layers = schedule_layers
+        # Storing commands (see _stored_commands)
+        self._reset_stored_commands()
         # Logical qubit ids for which the Allocate gate has already been
         # processed and sent to the next engine but which are not yet
         # deallocated:
@@ -108,6 +294,79 @@ class LinearMapper(BasicMapperEngine):
         self.num_mappings = 0
         self.depth_of_swaps = dict()
         self.num_of_swaps_per_mapping = dict()
+        self._swap_cache = _SwapCache(swap_cache_size)
+        self.num_swap_cache_hits = 0
+        self.num_swap_cache_misses = 0
+
+    def _reset_stored_commands(self):
+        # The stored commands form a dependency graph: each logical qubit id
+        # has a queue of the stored commands acting on it and a command can be
+        # sent once it is at the front of the queues of all its qubits (the
+        # front layer). Nodes are stored in the order they were received.
+        self._nodes = OrderedDict()
+        self._qubit_queues = dict()
+        self._front = dict()
+        self._next_seq = 0
+        # commands assigned to _stored_commands which have not been added to
+        # the dependency graph yet
+        self._unindexed_commands = None
+
+    def _index_stored_commands(self):
+        if self._unindexed_commands is not None:
+            commands = self._unindexed_commands
+            self._unindexed_commands = None
+            for cmd in commands:
+                self._store_command(cmd)
+
+    def _store_command(self, cmd):
+        node = _StoredCommand(cmd, self._next_seq)
+        self._next_seq += 1
+        self._nodes[node.seq] = node
+        is_front = True
+        for qubit_id in node.qubit_ids:
+            queue = self._qubit_queues.get(qubit_id)
+            if queue is None:
+                self._qubit_queues[qubit_id] = deque([node])
+            else:
+                queue.append(node)
+                is_front = False
+        if is_front:
+            self._front[node.seq] = node
+
+    def _release_command(self, node, new_front):
+        """
+        Remove a node (which is in the front layer) from the dependency graph
+        and add the sequence numbers of all commands which thereby enter the
+        front layer to the heap new_front.
+        """
+        del self._nodes[node.seq]
+        del self._front[node.seq]
+        for qubit_id in node.qubit_ids:
+            queue = self._qubit_queues[qubit_id]
+            queue.popleft()
+            if len(queue) == 0:
+                del self._qubit_queues[qubit_id]
+                continue
+            head = queue[0]
+            if head.seq not in self._front and all(
+                    self._qubit_queues[idx][0] is head
+                    for idx in head.qubit_ids):
+                self._front[head.seq] = head
+                heapq.heappush(new_front, head.seq)
+
+    @property
+    def _stored_commands(self):
+        """
+        List of all stored commands (in the order they were received).
+        """
+        if self._unindexed_commands is not None:
+            return self._unindexed_commands
+        return [node.cmd for node in self._nodes.values()]
+
+    @_stored_commands.setter
+    def _stored_commands(self, commands):
+        self._reset_stored_commands()
+        self._unindexed_commands = list(commands)
 
     def is_available(self, cmd):
         """
@@ -129,8 +388,9 @@ class LinearMapper(BasicMapperEngine):
 
         It goes through stored_commands and tries to find a
         mapping to apply these gates on a first come first served basis.
-        More compilicated scheme could try to optimize to apply as many gates
-        as possible between the Swaps.
+        LinearMapper(schedule_layers=True) calls it for the commands of the
+        first few parallel layers and chooses the mapping which allows to
+        apply the most gates per layer of Swaps.
 
         Args:
             num_qubits(int): Total number of qubits in the linear chain
@@ -156,8 +416,8 @@ class LinearMapper(BasicMapperEngine):
         # allocated_qubits is used as this mapper currently does not reassign
         # a qubit placement to a new qubit if the previous qubit at that
         # location has been deallocated. This is done after the next swaps.
-        allocated_qubits = deepcopy(currently_allocated_ids)
-        active_qubits = deepcopy(currently_allocated_ids)
+        allocated_qubits = set(currently_allocated_ids)
+        active_qubits = set(currently_allocated_ids)
         # Segments contains a list of segments. A segment is a list of
         # neighouring qubit ids
         segments = []
@@ -358,8 +618,8 @@ class LinearMapper(BasicMapperEngine):
             A new mapping as a dict. key is logical qubit id,
             value is placement id
         """
-        remaining_segments = deepcopy(segments)
-        individual_qubits = deepcopy(allocated_qubits)
+        remaining_segments = [list(segment) for segment in segments]
+        individual_qubits = set(allocated_qubits)
         num_unused_qubits = num_qubits - len(allocated_qubits)
         # Create a segment out of individual qubits and add to segments
         for segment in segments:
@@ -418,6 +678,30 @@ class LinearMapper(BasicMapperEngine):
                 new_mapping[logical_id] = pos
         return new_mapping
 
+    def _return_new_mapping_for(self, stored_commands):
+        """
+        Returns a new mapping for stored_commands (see return_new_mapping).
+        """
+        return self.return_new_mapping(self.num_qubits,
+                                       self.cyclic,
+                                       self._currently_allocated_ids,
+                                       stored_commands,
+                                       self._current_mapping)
+
+    def _return_swap_depth_to(self, new_mapping):
+        """
+        Returns the depth of the swaps to go from the current mapping to
+        new_mapping.
+        """
+        return self._return_swaps(self._current_mapping, new_mapping)[1]
+
+    def _are_neighbours(self, mapped_id0, mapped_id1):
+        """
+        Returns True if the two mapped ids are nearest neighbours.
+        """
+        diff = abs(mapped_id0 - mapped_id1)
+        return diff == 1 or (self.cyclic and diff == self.num_qubits - 1)
+
     def _odd_even_transposition_sort_swaps(self, old_mapping, new_mapping):
         """
         Returns the swap operation for an odd-even transposition sort.
@@ -433,6 +717,35 @@ class LinearMapper(BasicMapperEngine):
             List of tuples. Each tuple is a swap operation which needs to be
             applied. Tuple contains the two MappedQubit ids for the Swap.
         """
+        return list(self._return_swaps(old_mapping, new_mapping)[0])
+
+    def _return_swaps(self, old_mapping, new_mapping):
+        """
+        Returns the swaps to change the mapping and their depth (memoized
+        per permutation of the mapped ids).
+
+        Returns:
+            Tuple (swaps, depth), see _odd_even_transposition_sort_swaps.
+        """
+        final_positions = self._return_final_positions(old_mapping,
+                                                       new_mapping)
+        permutation = tuple(final_positions)
+        entry = self._swap_cache.get(permutation)
+        if entry is not None:
+            self.num_swap_cache_hits += 1
+            return entry
+        self.num_swap_cache_misses += 1
+        swaps = self._odd_even_transposition_sort(final_positions)
+        return self._swap_cache.put(permutation, swaps,
+                                    return_swap_depth(swaps))
+
+    def _return_final_positions(self, old_mapping, new_mapping):
+        """
+        Returns the final position of the qubit at each mapped id.
+
+        Mapped ids which are not used in both mappings are assigned to the
+        remaining positions in increasing order.
+        """
         final_positions = [None] * self.num_qubits
         # move qubits which are in both mappings
         for logical_id in old_mapping:
@@ -449,7 +762,13 @@ class LinearMapper(BasicMapperEngine):
             if final_positions[i] is None:
                 final_positions[i] = not_used_mapped_ids.pop()
         assert len(not_used_mapped_ids) == 0
-        # Start sorting:
+        return final_positions
+
+    @staticmethod
+    def _odd_even_transposition_sort(final_positions):
+        """
+        Sorts final_positions (in place) and returns the swap operations.
+        """
         swap_operations = []
         finished_sorting = False
         while not finished_sorting:
@@ -474,37 +793,37 @@ class LinearMapper(BasicMapperEngine):
         """
         Sends the stored commands possible without changing the mapping.
 
+        Only the front layer of the stored commands is inspected: a command
+        which cannot be sent blocks all later commands on its qubits.
+        The commands are sent in the order in which they were received.
+
         Note: self.current_mapping must exist already
         """
-        active_ids = deepcopy(self._currently_allocated_ids)
-        for logical_id in self.current_mapping:
-            active_ids.add(logical_id)
-
-        new_stored_commands = []
-        for i in range(len(self._stored_commands)):
-            cmd = self._stored_commands[i]
-            if len(active_ids) == 0:
-                new_stored_commands += self._stored_commands[i:]
-                break
+        self._index_stored_commands()
+        mapping = self._current_mapping
+        active_ids = self._currently_allocated_ids.union(mapping)
+        front = sorted(self._front)
+        while len(front) > 0:
+            node = self._front[heapq.heappop(front)]
+            cmd = node.cmd
             if isinstance(cmd.gate, AllocateQubitGate):
-                if cmd.qubits[0][0].id in self.current_mapping:
+                if cmd.qubits[0][0].id in mapping:
                     self._currently_allocated_ids.add(cmd.qubits[0][0].id)
                     qb = WeakQubitRef(
                         engine=self,
-                        idx=self.current_mapping[cmd.qubits[0][0].id])
+                        idx=mapping[cmd.qubits[0][0].id])
                     new_cmd = Command(
                         engine=self,
                         gate=AllocateQubitGate(),
                         qubits=([qb],),
                         tags=[LogicalQubitIDTag(cmd.qubits[0][0].id)])
                     self.send([new_cmd])
-                else:
-                    new_stored_commands.append(cmd)
+                    self._release_command(node, front)
             elif isinstance(cmd.gate, DeallocateQubitGate):
                 if cmd.qubits[0][0].id in active_ids:
                     qb = WeakQubitRef(
                         engine=self,
-                        idx=self.current_mapping[cmd.qubits[0][0].id])
+                        idx=mapping[cmd.qubits[0][0].id])
                     new_cmd = Command(
                         engine=self,
                         gate=DeallocateQubitGate(),
@@ -512,37 +831,24 @@ class LinearMapper(BasicMapperEngine):
                         tags=[LogicalQubitIDTag(cmd.qubits[0][0].id)])
                     self._currently_allocated_ids.remove(cmd.qubits[0][0].id)
                     active_ids.remove(cmd.qubits[0][0].id)
-                    self._current_mapping.pop(cmd.qubits[0][0].id)
+                    mapping.pop(cmd.qubits[0][0].id)
                     self.send([new_cmd])
-                else:
-                    new_stored_commands.append(cmd)
+                    self._release_command(node, front)
             else:
                 send_gate = True
                 mapped_ids = set()
-                for qureg in cmd.all_qubits:
-                    for qubit in qureg:
-                        if qubit.id not in active_ids:
-                            send_gate = False
-                            break
-                        mapped_ids.add(self.current_mapping[qubit.id])
+                for qubit_id in node.qubit_ids:
+                    if qubit_id not in active_ids:
+                        send_gate = False
+                        break
+                    mapped_ids.add(mapping[qubit_id])
                 # Check that mapped ids are nearest neighbour
-                if len(mapped_ids) == 2:
-                    mapped_ids = list(mapped_ids)
-                    diff = abs(mapped_ids[0]-mapped_ids[1])
-                    if self.cyclic:
-                        if diff != 1 and diff != self.num_qubits-1:
-                            send_gate = False
-                    else:
-                        if diff != 1:
-                            send_gate = False
+                if len(mapped_ids) == 2 and not self._are_neighbours(
+                        *mapped_ids):
+                    send_gate = False
                 if send_gate:
                     self._send_cmd_with_mapped_ids(cmd)
-                else:
-                    for qureg in cmd.all_qubits:
-                        for qubit in qureg:
-                            active_ids.discard(qubit.id)
-                    new_stored_commands.append(cmd)
-        self._stored_commands = new_stored_commands
+                    self._release_command(node, front)
 
     def _run(self):
         """
@@ -554,26 +860,31 @@ class LinearMapper(BasicMapperEngine):
         executes all possible gates, and finally deallocates mapped qubit ids
         which don't store any information.
         """
-        num_of_stored_commands_before = len(self._stored_commands)
-        if not self.current_mapping:
+        self._index_stored_commands()
+        num_of_stored_commands_before = len(self._nodes)
+        if not self._current_mapping:
             self.current_mapping = dict()
         else:
             self._send_possible_commands()
-            if len(self._stored_commands) == 0:
+            if len(self._nodes) == 0:
                 return
-        new_mapping = self.return_new_mapping(self.num_qubits,
-                                              self.cyclic,
-                                              self._currently_allocated_ids,
-                                              self._stored_commands,
-                                              self.current_mapping)
-        swaps = self._odd_even_transposition_sort_swaps(
-                old_mapping=self.current_mapping, new_mapping=new_mapping)
+        if self.schedule_layers:
+            new_mapping = _return_layered_mapping(
+                [node.cmd for node in self._nodes.values()],
+                self._return_new_mapping_for,
+                self._return_swap_depth_to,
+                self._are_neighbours)
+        else:
+            new_mapping = self._return_new_mapping_for(
+                node.cmd for node in self._nodes.values())
+        swaps, depth = self._return_swaps(old_mapping=self._current_mapping,
+                                          new_mapping=new_mapping)
         if swaps:  # first mapping requires no swaps
             # Allocate all mapped qubit ids (which are not already allocated,
             # i.e., contained in self._currently_allocated_ids)
             mapped_ids_used = set()
             for logical_id in self._currently_allocated_ids:
-                mapped_ids_used.add(self.current_mapping[logical_id])
+                mapped_ids_used.add(self._current_mapping[logical_id])
             not_allocated_ids = set(range(self.num_qubits)).difference(
                 mapped_ids_used)
             for mapped_id in not_allocated_ids:
@@ -588,7 +899,6 @@ class LinearMapper(BasicMapperEngine):
                 self.send([cmd])
             # Register statistics:
             self.num_mappings += 1
-            depth = return_swap_depth(swaps)
             if depth not in self.depth_of_swaps:
                 self.depth_of_swaps[depth] = 1
             else:
@@ -614,7 +924,7 @@ class LinearMapper(BasicMapperEngine):
         # Send possible gates:
         self._send_possible_commands()
         # Check that mapper actually made progress
-        if len(self._stored_commands) == num_of_stored_commands_before:
+        if len(self._nodes) == num_of_stored_commands_before:
             raise RuntimeError("Mapper is potentially in an infinite loop. "
                                "It is likely that the algorithm requires "
                                "too many qubits. Increase the number of "
@@ -629,13 +939,14 @@ class LinearMapper(BasicMapperEngine):
             command_list (list of Command objects): list of commands to
                 receive.
         """
+        self._index_stored_commands()
         for cmd in command_list:
             if isinstance(cmd.gate, FlushGate):
-                while(len(self._stored_commands)):
+                while(len(self._nodes)):
                     self._run()
                 self.send([cmd])
             else:
-                self._stored_commands.append(cmd)
+                self._store_command(cmd)
             # Storage is full: Create new map and send some gates away:
-            if len(self._stored_commands) >= self.storage:
+            if len(self._nodes) >= self.storage:
                 self._run()
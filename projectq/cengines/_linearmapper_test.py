@@ -14,13 +14,16 @@
 
 """Tests for projectq.cengines._linearmapper.py."""
 from copy import deepcopy
+import random
 
 import pytest
 
+import projectq
+from projectq.backends import Simulator
 from projectq.cengines import DummyEngine
 from projectq.meta import LogicalQubitIDTag
-from projectq.ops import (Allocate, BasicGate, CNOT, Command, Deallocate,
-                          FlushGate, Measure, QFT, X)
+from projectq.ops import (All, Allocate, BasicGate, CNOT, Command, Deallocate,
+                          FlushGate, H, Measure, QFT, X)
 from projectq.types import WeakQubitRef
 
 from projectq.cengines import _linearmapper as lm
@@ -35,6 +38,122 @@ def test_return_swap_depth():
     assert lm.return_swap_depth(swaps) == 4
 
 
+def test_swap_cache():
+    cache = lm._SwapCache(size=2)
+    assert cache.get((1, 0)) is None
+    assert cache.put((1, 0), [(0, 1)], 1) == (((0, 1),), 1)
+    cache.put((0, 1), [], 0)
+    assert cache.get((1, 0)) == (((0, 1),), 1)
+    # (0, 1) is the least recently used entry
+    cache.put((0, 2, 1), [(1, 2)], 1)
+    assert cache.get((0, 1)) is None
+    assert cache.get((1, 0)) is not None
+    disabled = lm._SwapCache(size=0)
+    disabled.put((1, 0), [(0, 1)], 1)
+    assert disabled.get((1, 0)) is None
+
+
+def test_schedule_layers():
+    qb0, qb1, qb2, qb3, qb4 = [WeakQubitRef(engine=None, idx=i)
+                               for i in range(5)]
+    cmd0 = Command(None, X, qubits=([qb1],), controls=[qb0])
+    cmd1 = Command(None, X, qubits=([qb2],), controls=[qb1])
+    cmd2 = Command(None, X, qubits=([qb3],))
+    cmd3 = Command(None, X, qubits=([qb4],), controls=[qb3])
+    cmd4 = Command(None, Deallocate, qubits=([qb0],))
+    layers = lm._schedule_layers([cmd0, cmd1, cmd2, cmd3, cmd4])
+    assert layers == [[cmd2], [cmd0, cmd3, cmd4], [cmd1]]
+    assert lm._schedule_layers([]) == [[]]
+
+
+def test_num_executable_gates():
+    qb0, qb1, qb2, qb3, qb4 = [WeakQubitRef(engine=None, idx=i)
+                               for i in range(5)]
+    mapping = {0: 0, 1: 1, 2: 3, 3: 2}
+    commands = [Command(None, X, qubits=([qb1],), controls=[qb0]),
+                Command(None, X, qubits=([qb3],), controls=[qb2]),
+                Command(None, X, qubits=([qb0],), controls=[qb3]),
+                Command(None, X, qubits=([qb1],), controls=[qb0]),
+                Command(None, X, qubits=([qb2],), controls=[qb1]),
+                Command(None, X, qubits=([qb3],), controls=[qb2]),
+                Command(None, Allocate, qubits=([qb4],)),
+                Command(None, X, qubits=([qb4],), controls=[qb0])]
+
+    def are_neighbours(mapped_id0, mapped_id1):
+        return abs(mapped_id0 - mapped_id1) == 1
+
+    # the third gate blocks qubits 0 and 3, the fifth qubits 1 and 2
+    assert lm._num_executable_gates(commands, mapping, are_neighbours) == 2
+
+
+def _random_cnot_circuit(mapper, num_qubits, seed):
+    backend = DummyEngine(save_commands=True)
+    backend.is_last_engine = True
+    eng = projectq.MainEngine(backend, [mapper])
+    qureg = eng.allocate_qureg(num_qubits)
+    rng = random.Random(seed)
+    for _ in range(100):
+        qubit0, qubit1 = rng.sample(qureg, 2)
+        H | qubit0
+        CNOT | (qubit0, qubit1)
+    eng.flush()
+    return backend.received_commands
+
+
+def _circuit_depth(commands):
+    depth_of_qubits = dict()
+    for cmd in commands:
+        if cmd.gate == Allocate or cmd.gate == Deallocate:
+            continue
+        qubit_ids = [qubit.id for qureg in cmd.all_qubits for qubit in qureg]
+        depth = max(depth_of_qubits.get(qubit_id, 0)
+                    for qubit_id in qubit_ids) + 1
+        for qubit_id in qubit_ids:
+            depth_of_qubits[qubit_id] = depth
+    return max(depth_of_qubits.values())
+
+
+def test_run_schedule_layers_reduces_depth():
+    depths = []
+    for schedule_layers in [False, True]:
+        depth = 0
+        for seed in range(4):
+            mapper = lm.LinearMapper(num_qubits=8,
+                                     schedule_layers=schedule_layers)
+            commands = _random_cnot_circuit(mapper, 8, seed)
+            for cmd in commands:
+                qubit_ids = [qb.id for qureg in cmd.all_qubits
+                             for qb in qureg]
+                if len(qubit_ids) == 2:
+                    assert abs(qubit_ids[0] - qubit_ids[1]) == 1
+            assert len([cmd for cmd in commands if cmd.gate == H]) == 100
+            depth += _circuit_depth(commands)
+        depths.append(depth)
+    assert depths[1] < depths[0]
+
+
+def test_run_schedule_layers_simulation():
+    probabilities = []
+    for mapper in [None, lm.LinearMapper(num_qubits=5, cyclic=True,
+                                         schedule_layers=True)]:
+        sim = Simulator()
+        engine_list = [] if mapper is None else [mapper]
+        eng = projectq.MainEngine(sim, engine_list)
+        qureg = eng.allocate_qureg(5)
+        rng = random.Random(2)
+        for _ in range(40):
+            qubit0, qubit1 = rng.sample(qureg, 2)
+            H | qubit0
+            CNOT | (qubit0, qubit1)
+        eng.flush()
+        probabilities.append([sim.get_probability(format(i, '05b'), qureg)
+                              for i in range(2 ** 5)])
+        All(Measure) | qureg
+        eng.flush()
+    assert probabilities[1] == pytest.approx(probabilities[0], abs=1e-10)
+    assert mapper.num_mappings > 0
+
+
 def test_is_available():
     mapper = lm.LinearMapper(num_qubits=5, cyclic=False)
     qb0 = WeakQubitRef(engine=None, idx=0)
@@ -516,6 +635,30 @@ def test_send_possible_commands_keep_remaining_gates():
     assert mapper._stored_commands == [cmd2]
 
 
+def test_send_possible_commands_front_layer():
+    mapper = lm.LinearMapper(num_qubits=4, cyclic=False)
+    backend = DummyEngine(save_commands=True)
+    backend.is_last_engine = True
+    mapper.next_engine = backend
+    qb = [WeakQubitRef(engine=None, idx=i) for i in range(4)]
+    cmd0 = Command(None, X, ([qb[0]],), controls=[qb[2]])
+    cmd1 = Command(None, X, ([qb[0]],))
+    cmd2 = Command(None, X, ([qb[1]],))
+    cmd3 = Command(None, X, ([qb[1]],), controls=[qb[3]])
+    cmd4 = Command(None, X, ([qb[3]],))
+    for cmd in [cmd0, cmd1, cmd2, cmd3, cmd4]:
+        mapper._store_command(cmd)
+    assert sorted(mapper._front) == [0, 2]
+    mapper._currently_allocated_ids = set(range(4))
+    mapper.current_mapping = {0: 0, 1: 1, 2: 3, 3: 2}
+    mapper._send_possible_commands()
+    # cmd0 blocks cmd1, all other commands are sent in order
+    assert mapper._stored_commands == [cmd0, cmd1]
+    assert sorted(mapper._front) == [0]
+    assert [str(cmd) for cmd in backend.received_commands] == [
+        "X | Qureg[1]", "CX | ( Qureg[2], Qureg[1] )", "X | Qureg[2]"]
+
+
 def test_send_possible_commands_not_cyclic():
     mapper = lm.LinearMapper(num_qubits=4, cyclic=False)
     backend = DummyEngine(save_commands=True)
@@ -713,3 +856,35 @@ def test_correct_stats():
     mapper.receive([cmd0, cmd1, cmd2, cmd3, cmd4, cmd5, cmd6, cmd7, cmd8,
                     cmd_flush])
     assert mapper.num_mappings == 2
+
+
+@pytest.mark.parametrize("swap_cache_size", [0, 100])
+def test_swap_cache_repeated_remappings(swap_cache_size):
+    import projectq
+
+    def _trotter_steps(mapper):
+        backend = DummyEngine(save_commands=True)
+        backend.is_last_engine = True
+        eng = projectq.MainEngine(backend, [mapper])
+        qureg = eng.allocate_qureg(4)
+        for _ in range(3):
+            CNOT | (qureg[0], qureg[3])
+            eng.flush()
+            CNOT | (qureg[0], qureg[1])
+            CNOT | (qureg[2], qureg[3])
+            eng.flush()
+        return [str(cmd) for cmd in backend.received_commands]
+
+    mapper = lm.LinearMapper(num_qubits=4, cyclic=False,
+                             swap_cache_size=swap_cache_size)
+    commands = _trotter_steps(mapper)
+    assert (mapper.num_swap_cache_hits + mapper.num_swap_cache_misses ==
+            mapper.num_mappings + 1)
+    if swap_cache_size == 0:
+        assert mapper.num_swap_cache_hits == 0
+    else:
+        assert mapper.num_swap_cache_hits > 0
+        no_cache_mapper = lm.LinearMapper(num_qubits=4, cyclic=False,
+                                          swap_cache_size=0)
+        assert _trotter_steps(no_cache_mapper) == commands
+        assert no_cache_mapper.depth_of_swaps == mapper.depth_of_swaps
@@ -22,7 +22,9 @@ import traceback
 import weakref
 
 import projectq
-from projectq.cengines import BasicEngine, BasicMapperEngine
+from projectq.cengines import (BasicEngine,
+                               BasicMapperEngine,
+                               PipelineProfiler)
 from projectq.ops import Command, FlushGate
 from projectq.types import WeakQubitRef
 from projectq.backends import Simulator
@@ -52,6 +54,8 @@ class MainEngine(BasicEngine):
         dirty_qubits (Set): Containing all dirty qubit ids
         backend (BasicEngine): Access the back-end.
         mapper (BasicMapperEngine): Access to the mapper if there is one.
+        profiler (PipelineProfiler): The attached profiler (None unless
+            profiling has been enabled using enable_profiling).
 
     """
     def __init__(self, backend=None, engine_list=None, verbose=False):
@@ -164,6 +168,7 @@ class MainEngine(BasicEngine):
         self._measurements = dict()
         self.dirty_qubits = set()
         self.verbose = verbose
+        self.profiler = None
 
         # In order to terminate an example code without eng.flush
         def atexit_function(weakref_main_eng):
@@ -287,6 +292,38 @@ class MainEngine(BasicEngine):
                 compact_exception.__cause__ = None
                 raise compact_exception  # use verbose=True for more info
 
+    def enable_profiling(self):
+        """
+        Start recording per-engine statistics (see PipelineProfiler).
+
+        The receive methods of all engines are wrapped until
+        disable_profiling is called (the commands an engine sends are counted
+        when the next engine receives them); without a profiler, the engines
+        run unmodified.
+
+        Returns:
+            profiler (PipelineProfiler): The attached profiler (also available
+            as self.profiler).
+        """
+        if self.profiler is None:
+            self.profiler = PipelineProfiler(self)
+            self.profiler.attach()
+        return self.profiler
+
+    def disable_profiling(self):
+        """
+        Stop recording per-engine statistics and remove the profiler.
+
+        Returns:
+            profiler (PipelineProfiler): The detached profiler containing the
+            recorded statistics (or None if profiling was not enabled).
+        """
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.detach()
+            self.profiler = None
+        return profiler
+
     def flush(self, deallocate_qubits=False):
         """
         Flush the entire circuit down the pipeline, clearing potential buffers
@@ -0,0 +1,331 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Mapper which places a quantum circuit on a device with directed CNOT
+connectivity.
+
+The initial placement is determined by a subgraph-isomorphism search
+(VF2-style backtracking) of the interaction graph of the circuit in the
+coupling graph of the device. Among all placements which do not require any
+Swap, the one requiring the fewest CNOT flips (i.e., CNOTs which have to be
+applied against the direction of the connection) is chosen using
+branch-and-bound.
+"""
+
+from collections import OrderedDict
+
+import networkx as nx
+
+from projectq.cengines import GraphMapper
+from projectq.ops import AllocateQubitGate
+
+
+class _PlacementSearch(object):
+    """
+    Search for placements of logical qubits on the nodes of a device with
+    directed connectivity which do not require any Swap.
+
+    The results are memoized per interaction graph (up to relabeling of the
+    logical qubit ids), i.e., the search is only run once if the same circuit
+    is executed several times on freshly allocated qubits.
+    """
+    def __init__(self, connections, max_steps=100000, cache_size=128,
+                 canonical=False):
+        """
+        Initialize the search.
+
+        Args:
+            connections (iterable of tuples): Directed (control, target)
+                pairs of backend ids on which a CNOT can be applied.
+            max_steps (int): Maximal number of search steps. If it is
+                exceeded, the best placement found so far is returned.
+            cache_size (int): Number of memoized interaction graphs.
+            canonical (bool): If True, ties are broken by choosing the
+                lexicographically smallest placement (in order of the logical
+                ids). This disables the search heuristics and should only be
+                used for small devices.
+        """
+        self.connections = frozenset(connections)
+        self.canonical = canonical
+        self.max_steps = max_steps
+        self.cache_size = cache_size
+        neighbours = dict()
+        for backend_id0, backend_id1 in self.connections:
+            neighbours.setdefault(backend_id0, set()).add(backend_id1)
+            neighbours.setdefault(backend_id1, set()).add(backend_id0)
+        self.nodes = sorted(neighbours)
+        self._neighbours = dict((node, sorted(neighbours[node]))
+                                for node in neighbours)
+        self._cache = OrderedDict()
+
+    def _pair_cost(self, backend_id0, backend_id1, num_01, num_10):
+        """
+        Return the number of CNOTs which have to be flipped if two
+        interacting qubits are placed on backend_id0 and backend_id1 or None
+        if the backend ids are not connected.
+
+        Args:
+            num_01 (int): Number of gates controlled by the qubit on
+                backend_id0 and acting on the qubit on backend_id1.
+            num_10 (int): Number of gates in the other direction.
+        """
+        if (backend_id0, backend_id1) in self.connections:
+            if (backend_id1, backend_id0) in self.connections:
+                return 0
+            return num_10
+        if (backend_id1, backend_id0) in self.connections:
+            return num_01
+        return None
+
+    def find(self, interactions, logical_ids):
+        """
+        Return the placement with the fewest CNOT flips among all placements
+        which do not require any Swap.
+
+        Args:
+            interactions (dict): Key is a tuple (control id, target id) of
+                logical qubit ids, value is the number of such CNOTs. Two
+                qubit gates without a preferred direction (e.g., Swap) are
+                stored with value 0.
+            logical_ids (iterable of int): Logical ids of all qubits to
+                place.
+
+        Returns:
+            Mapping (dict) from logical ids to backend ids or None if no
+            placement without Swaps has been found.
+        """
+        logical_ids = sorted(logical_ids)
+        if len(logical_ids) > len(self.nodes):
+            return None
+        index = dict((logical_id, i) for i, logical_id in
+                     enumerate(logical_ids))
+        fingerprint = (len(logical_ids),
+                       tuple(sorted((index[ctrl], index[target], num)
+                                    for (ctrl, target), num in
+                                    interactions.items())))
+        if fingerprint in self._cache:
+            placement = self._cache.pop(fingerprint)
+        else:
+            placement = self._search(*fingerprint)
+        self._cache[fingerprint] = placement
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        if placement is None:
+            return None
+        return dict(zip(logical_ids, placement))
+
+    def _search(self, num_qubits, interactions):
+        """
+        Run the branch-and-bound search for qubits 0, ..., num_qubits - 1.
+
+        Returns:
+            Tuple of backend ids (one per qubit) or None.
+        """
+        # weights[i][j]: number of gates controlled by qubit i acting on j
+        weights = [dict() for _ in range(num_qubits)]
+        for ctrl, target, num in interactions:
+            weights[ctrl][target] = weights[ctrl].get(target, 0) + num
+            weights[target].setdefault(ctrl, 0)
+        degree = [len(weight) for weight in weights]
+
+        # Place the qubit with the most already placed neighbours next
+        # (ties: highest degree) such that infeasible branches are cut early.
+        order = []
+        ordered = set()
+        remaining = set(i for i in range(num_qubits) if degree[i] > 0)
+        if self.canonical:
+            order = list(range(num_qubits))
+            remaining = set()
+        while len(remaining) > 0:
+            qubit = max(remaining, key=lambda i: (
+                sum(1 for j in weights[i] if j in ordered), degree[i], -i))
+            order.append(qubit)
+            ordered.add(qubit)
+            remaining.remove(qubit)
+        anchors = []
+        for k, qubit in enumerate(order):
+            anchors.append([j for j in order[:k] if j in weights[qubit]])
+
+        position = [None] * num_qubits
+        # backend id -> placed qubit
+        occupant = dict()
+        # number of neighbours which are not placed yet (per qubit) and
+        # number of free neighbours (per backend id)
+        num_pending = list(degree)
+        num_free = dict((node, len(self._neighbours[node]))
+                        for node in self.nodes)
+        # best cost, best placement and number of search steps
+        best = [None, None, 0]
+
+        def is_feasible(qubit, backend_id, k):
+            # Forward check: the qubit and all placed qubits next to the
+            # backend id must keep enough free neighbours for their
+            # remaining interaction partners (num_pending only counts the
+            # partners which are not placed yet).
+            if num_free[backend_id] < num_pending[qubit]:
+                return False
+            for neighbour in self._neighbours[backend_id]:
+                other = occupant.get(neighbour)
+                if other is not None:
+                    needed = num_pending[other] - (qubit in weights[other])
+                    if num_free[neighbour] - 1 < needed:
+                        return False
+            return True
+
+        def place(qubit, backend_id, delta):
+            for neighbour in self._neighbours[backend_id]:
+                num_free[neighbour] -= delta
+            for j in weights[qubit]:
+                num_pending[j] -= delta
+            if delta > 0:
+                position[qubit] = backend_id
+                occupant[backend_id] = qubit
+            else:
+                position[qubit] = None
+                del occupant[backend_id]
+
+        def extend(k, cost):
+            if k == len(order):
+                best[0] = cost
+                best[1] = list(position)
+                return
+            best[2] += 1
+            qubit = order[k]
+            if len(anchors[k]) > 0:
+                candidates = self._neighbours[position[anchors[k][0]]]
+            else:
+                candidates = self.nodes
+            options = []
+            for backend_id in candidates:
+                if (backend_id in occupant or
+                        not is_feasible(qubit, backend_id, k)):
+                    continue
+                new_cost = cost
+                for j in anchors[k]:
+                    pair_cost = self._pair_cost(backend_id, position[j],
+                                                weights[qubit][j],
+                                                weights[j][qubit])
+                    if pair_cost is None:
+                        break
+                    new_cost += pair_cost
+                else:
+                    options.append((new_cost, num_free[backend_id],
+                                    backend_id))
+            if not self.canonical:
+                # cheapest first, then the most constrained backend id
+                # (Warnsdorff's rule, avoids dead ends when embedding paths)
+                options.sort()
+            for new_cost, _, backend_id in options:
+                if best[0] is not None and new_cost >= best[0]:
+                    continue
+                place(qubit, backend_id, 1)
+                extend(k + 1, new_cost)
+                place(qubit, backend_id, -1)
+                if best[0] == 0 or best[2] > self.max_steps:
+                    return
+
+        extend(0, 0)
+        if best[1] is None:
+            return None
+        # qubits without any two-qubit gate can be placed anywhere
+        placement = best[1]
+        free = iter(node for node in self.nodes if node not in placement)
+        for qubit in range(num_qubits):
+            if placement[qubit] is None:
+                placement[qubit] = next(free)
+        return tuple(placement)
+
+
+class PlacementMapper(GraphMapper):
+    """
+    Maps a quantum circuit to a device with directed CNOT connectivity.
+
+    The initial placement is chosen such that no Swap is required and the
+    number of CNOTs which have to be flipped (i.e., executed against the
+    direction of the connection) is minimal. If no such placement exists,
+    the mapper falls back to the heuristic placement and routing with Swaps
+    of the GraphMapper.
+
+    The CNOTs are sent in their original direction, i.e., a
+    SwapAndCNOTFlipper has to follow the mapper.
+
+    Example:
+        .. code-block:: python
+
+            connections = set([(2, 1), (4, 2), (2, 0), (3, 2), (3, 4),
+                               (1, 0)])
+            eng = MainEngine(backend, [AutoReplacer(rule_set),
+                                       PlacementMapper(connections),
+                                       SwapAndCNOTFlipper(connections)])
+
+    Attributes:
+        connections (frozenset): Directed (control, target) pairs of backend
+            ids on which a CNOT can be applied.
+        num_fallbacks (int): Number of times no placement without Swaps has
+            been found.
+    """
+    def __init__(self, connections, storage=1000, max_steps=100000,
+                 **kwargs):
+        """
+        Initialize a PlacementMapper compiler engine.
+
+        Args:
+            connections (networkx.Graph or iterable of tuples): Directed
+                (control, target) pairs of backend ids on which a CNOT can be
+                applied. Edges of an undirected graph are used in both
+                directions.
+            storage (int): Number of gates to temporarily store.
+            max_steps (int): Maximal number of steps of the placement search.
+            kwargs: Parameters of the GraphMapper used if no placement
+                without Swaps exists.
+
+        Raises:
+            RuntimeError: if the coupling graph is empty or not connected.
+        """
+        if isinstance(connections, nx.Graph):
+            edges = list(connections.edges())
+            if not connections.is_directed():
+                edges += [(target, ctrl) for ctrl, target in edges]
+            connections = edges
+        connections = [tuple(connection) for connection in connections]
+        GraphMapper.__init__(self, connections, storage=storage, **kwargs)
+        self._placement = _PlacementSearch(connections, max_steps=max_steps)
+        self.connections = self._placement.connections
+        self.num_fallbacks = 0
+
+    def _plan_initial_mapping(self, qubit_ids):
+        """
+        Plan the placement of the qubits allocated in the stored commands
+        without Swaps if possible.
+        """
+        logical_ids = set()
+        interactions = dict()
+        for cmd, ids in zip(self._stored_commands, qubit_ids):
+            if isinstance(cmd.gate, AllocateQubitGate):
+                logical_ids.add(ids[0])
+            elif len(ids) == 2:
+                num = 1 if len(cmd.control_qubits) == 1 else 0
+                # all_qubits starts with the control qubits
+                key = tuple(ids)
+                interactions[key] = interactions.get(key, 0) + num
+        interactions = dict((key, num) for key, num in interactions.items()
+                            if key[0] in logical_ids and
+                            key[1] in logical_ids)
+        mapping = self._placement.find(interactions, logical_ids)
+        if mapping is None:
+            self.num_fallbacks += 1
+            GraphMapper._plan_initial_mapping(self, qubit_ids)
+        else:
+            self._planned_mapping = mapping
@@ -0,0 +1,186 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Tests for projectq.cengines._placementmapper.py."""
+
+import itertools
+import random
+
+import networkx as nx
+import pytest
+
+from projectq import MainEngine
+from projectq.cengines import DummyEngine, SwapAndCNOTFlipper
+from projectq.ops import All, Allocate, CNOT, Deallocate, H, Measure, Swap
+
+from projectq.cengines import _placementmapper
+
+
+ibmqx4_connections = set([(2, 1), (4, 2), (2, 0), (3, 2), (3, 4), (1, 0)])
+
+
+def _brute_force(connections, interactions, num_qubits):
+    # returns the first placement with minimal cost (in lexicographic order)
+    best_cost = None
+    best_placement = None
+    nodes = sorted(set(itertools.chain(*connections)))
+    for placement in itertools.permutations(nodes, num_qubits):
+        cost = 0
+        for (ctrl, target), num in interactions.items():
+            if (placement[ctrl], placement[target]) in connections:
+                continue
+            if (placement[target], placement[ctrl]) not in connections:
+                break
+            cost += num
+        else:
+            if best_cost is None or cost < best_cost:
+                best_cost = cost
+                best_placement = placement
+    return best_cost, best_placement
+
+
+def test_placement_search_minimal_flips():
+    search = _placementmapper._PlacementSearch(ibmqx4_connections)
+    canonical_search = _placementmapper._PlacementSearch(ibmqx4_connections,
+                                                         canonical=True)
+    rng = random.Random(3)
+    for _ in range(200):
+        num_qubits = rng.randint(2, 5)
+        interactions = dict()
+        for _ in range(rng.randint(1, 6)):
+            ctrl, target = rng.sample(range(num_qubits), 2)
+            interactions[(ctrl, target)] = rng.randint(1, 3)
+        mapping = search.find(interactions, range(num_qubits))
+        canonical = canonical_search.find(interactions, range(num_qubits))
+        expected, placement = _brute_force(ibmqx4_connections, interactions,
+                                           num_qubits)
+        if expected is None:
+            assert mapping is None and canonical is None
+            continue
+        assert tuple(canonical[i] for i in range(num_qubits)) == placement
+        assert len(set(mapping.values())) == num_qubits
+        cost = sum(num for (ctrl, target), num in interactions.items()
+                   if (mapping[ctrl], mapping[target]) not in
+                   ibmqx4_connections)
+        assert cost == expected
+
+
+def test_placement_search_no_embedding():
+    search = _placementmapper._PlacementSearch(ibmqx4_connections)
+    # the interaction graph contains a 4-cycle
+    assert search.find({(0, 1): 1, (1, 2): 1, (2, 3): 1, (3, 0): 1},
+                       range(4)) is None
+    assert search.find({(0, 1): 1}, range(6)) is None
+
+
+def test_placement_search_large_device():
+    graph = nx.convert_node_labels_to_integers(nx.grid_2d_graph(10, 10))
+    connections = set((a, b) if (a + b) % 2 else (b, a)
+                      for a, b in graph.edges())
+    search = _placementmapper._PlacementSearch(connections, max_steps=1000)
+    interactions = dict(((i, i + 1), 1) for i in range(60))
+    mapping = search.find(interactions, range(61))
+    for ctrl, target in interactions:
+        assert graph.has_edge(mapping[ctrl], mapping[target])
+
+
+def test_placement_search_prunes_early():
+    # the placed partners of a qubit must not be subtracted again from the
+    # number of its pending partners, otherwise the search runs into dead
+    # ends and does not find a placement within a few steps
+    graph = nx.convert_node_labels_to_integers(nx.grid_2d_graph(4, 4))
+    connections = set((a, b) if (a + b) % 2 else (b, a)
+                      for a, b in graph.edges())
+    search = _placementmapper._PlacementSearch(connections, max_steps=5)
+    interactions = dict((pair, 1) for pair in [(0, 3), (0, 5), (1, 2), (2, 3),
+                                               (2, 4), (5, 7), (6, 7)])
+    mapping = search.find(interactions, range(8))
+    assert mapping is not None
+    for ctrl, target in interactions:
+        assert graph.has_edge(mapping[ctrl], mapping[target])
+
+
+def test_placement_search_memoized():
+    search = _placementmapper._PlacementSearch(ibmqx4_connections,
+                                               cache_size=1)
+    mapping = search.find({(0, 1): 2, (1, 2): 1}, [0, 1, 2])
+
+    def no_search(*args):
+        raise AssertionError("The placement should be memoized.")
+
+    original_search = search._search
+    search._search = no_search
+    # same interaction graph on freshly allocated qubits
+    relabeled = search.find({(5, 6): 2, (6, 7): 1}, [5, 6, 7])
+    assert relabeled == dict((qubit + 5, backend_id)
+                             for qubit, backend_id in mapping.items())
+    search._search = original_search
+    search.find({(0, 1): 1}, [0, 1])
+    assert len(search._cache) == 1
+
+
+@pytest.mark.parametrize("connections", [
+    ibmqx4_connections, nx.DiGraph(list(ibmqx4_connections))])
+def test_placement_mapper_without_swaps(connections):
+    backend = DummyEngine(save_commands=True)
+    mapper = _placementmapper.PlacementMapper(connections)
+    eng = MainEngine(backend=backend,
+                     engine_list=[mapper,
+                                  SwapAndCNOTFlipper(ibmqx4_connections)])
+    qureg = eng.allocate_qureg(4)
+    CNOT | (qureg[1], qureg[2])
+    CNOT | (qureg[2], qureg[1])
+    CNOT | (qureg[1], qureg[2])
+    CNOT | (qureg[0], qureg[1])
+    Swap | (qureg[3], qureg[2])
+    All(Measure) | qureg
+    eng.flush()
+    assert mapper.num_fallbacks == 0
+    assert mapper.num_mappings == 0
+    assert [cmd for cmd in backend.received_commands
+            if cmd.gate == Swap] == []
+    # only one CNOT has to be flipped (and the Swap is decomposed)
+    assert len([cmd for cmd in backend.received_commands
+                if cmd.gate == H]) == 4 + 4
+    for cmd in backend.received_commands:
+        if len(cmd.control_qubits) == 1:
+            assert ((cmd.control_qubits[0].id, cmd.qubits[0][0].id) in
+                    ibmqx4_connections)
+
+
+def test_placement_mapper_fallback():
+    graph = nx.grid_2d_graph(2, 3)
+    graph = nx.convert_node_labels_to_integers(graph)
+    backend = DummyEngine(save_commands=True)
+    backend.is_last_engine = True
+    mapper = _placementmapper.PlacementMapper(graph)
+    assert len(mapper.connections) == 2 * graph.number_of_edges()
+    eng = MainEngine(backend=backend, engine_list=[mapper])
+    qureg = eng.allocate_qureg(4)
+    for qubit0, qubit1 in itertools.combinations(qureg, 2):
+        CNOT | (qubit0, qubit1)
+    All(Measure) | qureg
+    eng.flush()
+    assert mapper.num_fallbacks == 1
+    assert mapper.num_mappings > 0
+    allocated = set()
+    for cmd in backend.received_commands:
+        ids = [qb.id for qureg in cmd.all_qubits for qb in qureg]
+        if cmd.gate == Allocate:
+            allocated.add(ids[0])
+        elif cmd.gate == Deallocate:
+            allocated.remove(ids[0])
+        elif len(ids) == 2:
+            assert graph.has_edge(*ids)
+            assert set(ids) <= allocated
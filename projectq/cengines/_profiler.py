@@ -0,0 +1,251 @@
+#   Copyright 2017 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Contains the PipelineProfiler which records per-engine statistics (number
+of commands, wall time, buffered commands, flushes) of a compiler engine
+pipeline.
+
+The profiler wraps the receive method of each engine (as an instance
+attribute) while it is attached, i.e., the pipeline runs unmodified if no
+profiler is attached.
+"""
+
+import json
+import time
+
+from projectq.ops import FlushGate
+
+
+# time.perf_counter is not available in Python 2.7
+_timer = getattr(time, 'perf_counter', time.time)
+
+# attributes in which engines buffer commands (e.g., LocalOptimizer._l or
+# the mapper's _stored_commands)
+_BUFFER_ATTRIBUTES = ('_l', '_stored_commands', '_cmd_list', '_buffer')
+
+
+def _num_buffered(engine):
+    """
+    Return the number of commands which are currently buffered in an engine.
+
+    For engines which store commands per qubit (e.g., LocalOptimizer), a
+    command acting on several qubits is counted once per qubit.
+    """
+    num = 0
+    for name in _BUFFER_ATTRIBUTES:
+        buffer = getattr(engine, name, None)
+        if isinstance(buffer, dict):
+            num += sum(len(value) for value in buffer.values())
+        elif isinstance(buffer, list):
+            num += len(buffer)
+    return num
+
+
+class EngineProfile(object):
+    """
+    Statistics of one compiler engine.
+
+    Calls to receive from within receive (e.g., the AutoReplacer receives
+    the commands of its decompositions) are not counted in receive_calls,
+    commands_in, flushes and inclusive_time, such that the commands and the
+    time are not counted twice.
+
+    Attributes:
+        name (str): Class name of the engine.
+        receive_calls (int): Number of calls to receive.
+        commands_in (int): Number of received commands.
+        commands_out (int): Number of commands sent to the next engine
+            (counted when the next engine receives them).
+        flushes (int): Number of received flush commands.
+        inclusive_time (float): Wall time (in seconds) spent in receive,
+            including the time spent in all following engines.
+        exclusive_time (float): Wall time (in seconds) spent in receive,
+            excluding the time spent in the receive calls of the following
+            (profiled) engines.
+        buffered (int): Number of commands buffered in the engine after the
+            last call to receive.
+        max_buffered (int): Maximal number of buffered commands.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.receive_calls = 0
+        self.commands_in = 0
+        self.commands_out = 0
+        self.flushes = 0
+        self.inclusive_time = 0.
+        self.exclusive_time = 0.
+        self.buffered = 0
+        self.max_buffered = 0
+
+    def to_dict(self):
+        """
+        Return the statistics as a dict.
+        """
+        return dict(vars(self))
+
+
+class PipelineProfiler(object):
+    """
+    PipelineProfiler records statistics of all engines of a MainEngine.
+
+    Use MainEngine.enable_profiling to create and attach a profiler, and
+    MainEngine.disable_profiling to remove it again.
+
+    Example:
+        .. code-block:: python
+
+            eng = MainEngine()
+            profiler = eng.enable_profiling()
+            ...  # run the circuit
+            eng.flush()
+            print(profiler)
+            profiler.to_json("profile.json")
+
+    Attributes:
+        profiles (list<EngineProfile>): Statistics of all engines (in
+            pipeline order, the last one belongs to the back-end).
+    """
+    def __init__(self, main_engine):
+        """
+        Initialize a PipelineProfiler.
+
+        Args:
+            main_engine (MainEngine): Main engine of the pipeline to profile.
+        """
+        self.main_engine = main_engine
+        self.profiles = []
+        # (engine, original instance attribute receive)
+        self._engines = []
+        # time spent in the profiled engines called by the engines which are
+        # currently in receive (one entry per active receive call)
+        self._child_times = []
+
+    def attach(self):
+        """
+        Wrap the receive methods of all engines following the main engine.
+        """
+        engine = self.main_engine.next_engine
+        previous_profile = None
+        while engine is not None:
+            profile = EngineProfile(type(engine).__name__)
+            self._engines.append((engine, engine.__dict__.get('receive')))
+            self._wrap(engine, profile, previous_profile)
+            self.profiles.append(profile)
+            previous_profile = profile
+            engine = engine.next_engine
+
+    def detach(self):
+        """
+        Restore the original receive methods of all engines.
+        """
+        for engine, receive in self._engines:
+            if receive is None:
+                del engine.__dict__['receive']
+            else:
+                engine.__dict__['receive'] = receive
+        self._engines = []
+
+    def _wrap(self, engine, profile, previous_profile):
+        """
+        Wrap the receive method of an engine.
+
+        The commands are counted as outgoing commands of the previous engine
+        (previous_profile) when they arrive, as some engines (e.g., the
+        InstructionFilter) call the receive method of the next engine
+        directly instead of send.
+        """
+        original_receive = engine.receive
+        child_times = self._child_times
+        # number of active receive calls of this engine
+        depth = [0]
+
+        def receive(command_list):
+            depth[0] += 1
+            child_times.append(0.)
+            start = _timer()
+            try:
+                original_receive(command_list)
+            finally:
+                elapsed = _timer() - start
+                child_time = child_times.pop()
+                if len(child_times) > 0:
+                    child_times[-1] += elapsed
+                depth[0] -= 1
+                if depth[0] == 0:
+                    profile.inclusive_time += elapsed
+                profile.exclusive_time += elapsed - child_time
+            if depth[0] == 0:
+                profile.receive_calls += 1
+                profile.commands_in += len(command_list)
+                if previous_profile is not None:
+                    previous_profile.commands_out += len(command_list)
+                for cmd in command_list:
+                    if isinstance(cmd.gate, FlushGate):
+                        profile.flushes += 1
+            profile.buffered = _num_buffered(engine)
+            profile.max_buffered = max(profile.max_buffered,
+                                       profile.buffered)
+
+        engine.receive = receive
+
+    def reset(self):
+        """
+        Reset all statistics to zero.
+        """
+        for profile in self.profiles:
+            profile.__init__(profile.name)
+
+    def to_dict(self):
+        """
+        Return the statistics of all engines as a list of dicts (in pipeline
+        order).
+        """
+        return [profile.to_dict() for profile in self.profiles]
+
+    def to_json(self, filename=None):
+        """
+        Export the statistics in JSON format.
+
+        Args:
+            filename (str): If given, the JSON document is written to this
+                file.
+
+        Returns:
+            The JSON document (str).
+        """
+        document = json.dumps({'engines': self.to_dict()}, indent=2,
+                              sort_keys=True)
+        if filename is not None:
+            with open(filename, 'w') as json_file:
+                json_file.write(document)
+        return document
+
+    def __str__(self):
+        """
+        Return a table of the statistics of all engines.
+        """
+        lines = ["{:<24} {:>10} {:>10} {:>8} {:>12} {:>12} {:>10}".format(
+            "Engine", "Cmds in", "Cmds out", "Flushes", "Incl. [s]",
+            "Excl. [s]", "Max. buf.")]
+        for profile in self.profiles:
+            lines.append("{:<24} {:>10} {:>10} {:>8} {:>12.6f} {:>12.6f} "
+                         "{:>10}".format(profile.name[:24],
+                                         profile.commands_in,
+                                         profile.commands_out,
+                                         profile.flushes,
+                                         profile.inclusive_time,
+                                         profile.exclusive_time,
+                                         profile.max_buffered))
+        return "\n".join(lines)
@@ -0,0 +1,125 @@
+#   Copyright 2017 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Tests for projectq.cengines._profiler.py."""
+
+import json
+import time
+
+from projectq import MainEngine
+from projectq.cengines import (AutoReplacer, DecompositionRuleSet,
+                               DummyEngine, InstructionFilter, LocalOptimizer)
+from projectq.ops import CNOT, H, QFT, Rx, Toffoli
+from projectq.setups import decompositions
+
+from projectq.cengines import _profiler
+
+
+def test_profiler_records_statistics(tmpdir):
+    backend = DummyEngine(save_commands=True)
+    optimizer = LocalOptimizer(m=10)
+    eng = MainEngine(backend=backend, engine_list=[optimizer])
+    assert eng.profiler is None
+    profiler = eng.enable_profiling()
+    assert eng.enable_profiling() is profiler
+    qureg = eng.allocate_qureg(2)
+    H | qureg[0]
+    CNOT | (qureg[0], qureg[1])
+    Rx(0.3) | qureg[1]
+    Rx(-0.3) | qureg[1]
+    opt_profile, backend_profile = profiler.profiles
+    assert opt_profile.name == "LocalOptimizer"
+    assert opt_profile.commands_in == 6
+    assert opt_profile.commands_out == 0
+    # the CNOT is stored for both qubits
+    assert opt_profile.max_buffered == 7
+    eng.flush()
+    assert opt_profile.flushes == 1
+    assert opt_profile.buffered == 0
+    assert opt_profile.commands_out == len(backend.received_commands)
+    assert backend_profile.commands_in == len(backend.received_commands)
+    assert backend_profile.receive_calls > 0
+    assert opt_profile.inclusive_time >= opt_profile.exclusive_time >= 0
+    assert opt_profile.inclusive_time >= backend_profile.inclusive_time
+
+    table = str(profiler)
+    assert "LocalOptimizer" in table and "DummyEngine" in table
+    filename = str(tmpdir.join("profile.json"))
+    data = json.loads(profiler.to_json(filename))
+    with open(filename) as json_file:
+        assert json.load(json_file) == data
+    assert data['engines'][0]['commands_in'] == 7
+    assert data['engines'][1]['name'] == "DummyEngine"
+
+    profiler.reset()
+    assert opt_profile.commands_in == 0 and opt_profile.name is not None
+
+
+def test_profiler_counts_reentrant_and_direct_receive():
+    def no_qft_or_toffoli(eng, cmd):
+        return not (isinstance(cmd.gate, type(QFT)) or cmd.gate == Toffoli)
+
+    backend = DummyEngine(save_commands=True)
+    replacer = AutoReplacer(DecompositionRuleSet(modules=[decompositions]))
+    instruction_filter = InstructionFilter(no_qft_or_toffoli)
+    eng = MainEngine(backend=backend,
+                     engine_list=[replacer, instruction_filter])
+    profiler = eng.enable_profiling()
+    start = time.time()
+    qureg = eng.allocate_qureg(3)
+    QFT | qureg
+    Toffoli | (qureg[0], qureg[1], qureg[2])
+    eng.flush()
+    wall_time = time.time() - start
+    replacer_profile, filter_profile, backend_profile = profiler.profiles
+    # the AutoReplacer receives its decompositions, which are not counted
+    assert replacer_profile.commands_in == 3 + 2 + 1
+    assert replacer_profile.receive_calls == replacer_profile.commands_in
+    assert replacer_profile.flushes == 1
+    # the InstructionFilter calls the receive method of the next engine
+    assert (replacer_profile.commands_out == filter_profile.commands_in ==
+            filter_profile.commands_out == backend_profile.commands_in ==
+            len(backend.received_commands))
+    assert (replacer_profile.inclusive_time <= wall_time and
+            replacer_profile.exclusive_time <=
+            replacer_profile.inclusive_time)
+    assert (sum(profile.exclusive_time for profile in profiler.profiles) <=
+            replacer_profile.inclusive_time + 1e-6)
+
+
+def test_profiler_disable_restores_engines():
+    backend = DummyEngine()
+    own_receive = backend.receive
+    backend.receive = own_receive
+    optimizer = LocalOptimizer(m=10)
+    eng = MainEngine(backend=backend, engine_list=[optimizer])
+    profiler = eng.enable_profiling()
+    assert 'receive' in vars(optimizer)
+    assert eng.disable_profiling() is profiler
+    assert eng.profiler is None
+    assert eng.disable_profiling() is None
+    assert 'receive' not in vars(optimizer)
+    assert 'send' not in vars(optimizer)
+    assert vars(backend)['receive'] is own_receive
+    qubit = eng.allocate_qubit()
+    H | qubit
+    eng.flush()
+    assert profiler.profiles[0].commands_in == 0
+
+
+def test_num_buffered():
+    engine = DummyEngine()
+    engine._l = {0: [1, 2], 1: [3]}
+    engine._stored_commands = [4]
+    assert _profiler._num_buffered(engine) == 4
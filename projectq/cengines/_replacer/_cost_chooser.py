@@ -0,0 +1,275 @@
+#   Copyright 2017 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Contains a decomposition chooser for the AutoReplacer which estimates the
+cost of every candidate decomposition and picks the cheapest one.
+
+The cost of a decomposition is estimated by dry-running it through a
+lightweight counting engine. Commands which are not elementary (see
+CostDecompositionChooser) are estimated recursively using their own cheapest
+decomposition.
+"""
+
+from projectq.cengines import BasicEngine, ForwarderEngine
+from projectq.ops import (Allocate,
+                          ClassicalInstructionGate,
+                          Command,
+                          DaggeredGate,
+                          Deallocate,
+                          TGate)
+from projectq.types import WeakQubitRef
+
+from ._replacer import _find_decompositions
+
+
+COST_METRICS = ('gate_count', 'cnot_count', 't_count', 'depth',
+                'ancilla_count')
+
+
+def _is_t_gate(gate):
+    return (isinstance(gate, TGate) or
+            (isinstance(gate, DaggeredGate) and isinstance(gate._gate, TGate)))
+
+
+def _elementary_cost(cmd):
+    """
+    Return the cost of a single elementary command.
+    """
+    num_qubits = sum(len(qureg) for qureg in cmd.all_qubits)
+    return {'gate_count': 1,
+            'cnot_count': int(num_qubits == 2),
+            't_count': int(_is_t_gate(cmd.gate)),
+            'depth': 1,
+            'ancilla_count': 0}
+
+
+def _default_is_elementary(cmd):
+    """
+    Default cost model: all one- and two-qubit gates are elementary.
+    """
+    if isinstance(cmd.gate, ClassicalInstructionGate):
+        return True
+    return sum(len(qureg) for qureg in cmd.all_qubits) <= 2
+
+
+class _CostCountingEngine(BasicEngine):
+    """
+    Backend used to dry-run a decomposition. It accumulates the cost of all
+    received commands instead of executing them.
+    """
+    def __init__(self, chooser):
+        BasicEngine.__init__(self)
+        self.is_last_engine = True
+        self.cost = dict.fromkeys(COST_METRICS, 0)
+        self._chooser = chooser
+        self._depth_of_qubit = dict()
+        self._num_ancillas = 0
+
+    def is_available(self, cmd):
+        return True
+
+    def _add_cost(self, cmd, cost):
+        for metric in ('gate_count', 'cnot_count', 't_count'):
+            self.cost[metric] += cost[metric]
+        self.cost['ancilla_count'] = max(self.cost['ancilla_count'],
+                                         self._num_ancillas +
+                                         cost['ancilla_count'])
+        qubit_ids = [qubit.id for qureg in cmd.all_qubits for qubit in qureg]
+        depth = max(self._depth_of_qubit.get(qubit_id, 0)
+                    for qubit_id in qubit_ids) + cost['depth']
+        for qubit_id in qubit_ids:
+            self._depth_of_qubit[qubit_id] = depth
+        self.cost['depth'] = max(self.cost['depth'], depth)
+
+    def receive(self, command_list):
+        for cmd in command_list:
+            if cmd.gate == Allocate:
+                self._num_ancillas += 1
+                self.cost['ancilla_count'] = max(self.cost['ancilla_count'],
+                                                 self._num_ancillas)
+            elif cmd.gate == Deallocate:
+                self._num_ancillas -= 1
+            elif not isinstance(cmd.gate, ClassicalInstructionGate):
+                self._add_cost(cmd, self._chooser.estimate(cmd))
+
+
+class CostDecompositionChooser(object):
+    """
+    Decomposition chooser which picks the decomposition with the lowest
+    estimated cost.
+
+    The cost of a candidate decomposition is described by the metrics
+    'gate_count', 'cnot_count' (number of two-qubit gates), 't_count'
+    (number of T and T^dagger gates), 'depth' and 'ancilla_count' (max.
+    number of qubits allocated by the decomposition at the same time). The
+    metrics are combined into a single cost using the supplied weights.
+
+    Estimates are cached per gate signature, i.e., per gate, number of
+    control qubits and register sizes, and per list of candidate
+    decompositions, such that each candidate is dry-run only once.
+
+    Example:
+        .. code-block:: python
+
+            rule_set = DecompositionRuleSet(
+                modules=[projectq.setups.decompositions])
+            chooser = CostDecompositionChooser(rule_set,
+                                               weights={'gate_count': 1,
+                                                        'cnot_count': 10})
+            eng = MainEngine(engine_list=[AutoReplacer(rule_set, chooser),
+                                          ...])
+
+    Attributes:
+        weights (dict): Weight of each cost metric.
+        num_dry_runs (int): Number of decompositions which have been dry-run
+            (i.e., number of cache misses).
+    """
+    def __init__(self, rule_set=None, weights=None, is_elementary=None):
+        """
+        Initialize a CostDecompositionChooser.
+
+        Args:
+            rule_set (DecompositionRuleSet): Rule set which is used to
+                recursively estimate the cost of commands which are not
+                elementary. If None, all commands produced by a
+                decomposition are considered to be elementary.
+            weights (dict): Weight of each cost metric (see COST_METRICS).
+                Missing metrics have weight 0.
+                Default: {'gate_count': 1, 'cnot_count': 10}.
+            is_elementary (function): Function which, when called with a
+                Command, returns True if the command is not decomposed any
+                further (and thus has unit cost). Default: all one- and
+                two-qubit gates are elementary.
+        """
+        if weights is None:
+            weights = {'gate_count': 1, 'cnot_count': 10}
+        for metric in weights:
+            if metric not in COST_METRICS:
+                raise ValueError("Unknown cost metric '{}'. Valid metrics "
+                                 "are {}.".format(metric, COST_METRICS))
+        if is_elementary is None:
+            is_elementary = _default_is_elementary
+        self.weights = dict(weights)
+        self.num_dry_runs = 0
+        self._rule_set = rule_set
+        self._is_elementary = is_elementary
+        # key: (gate signature, candidate decompositions), value: list of
+        # cost dicts (one per candidate)
+        self._cache = dict()
+        self._in_progress = set()
+        self._dry_run_engine = None
+
+    def __call__(self, cmd, decomposition_list):
+        """
+        Return the decomposition with the lowest weighted cost.
+
+        Args:
+            cmd (Command): Command to decompose.
+            decomposition_list (list): Candidate decompositions for cmd.
+        """
+        costs = self._get_costs(cmd, decomposition_list)
+        weighted = [self.weighted_cost(cost) for cost in costs]
+        return decomposition_list[weighted.index(min(weighted))]
+
+    def weighted_cost(self, cost):
+        """
+        Combine the metrics of a cost dict into a single number.
+
+        Args:
+            cost (dict): Cost metrics as returned by estimate.
+        """
+        return sum(self.weights.get(metric, 0) * cost[metric]
+                   for metric in COST_METRICS)
+
+    def estimate(self, cmd):
+        """
+        Return the estimated cost of executing a command.
+
+        Elementary commands have unit cost. For all other commands, the cost
+        of the cheapest decomposition in the rule set is returned.
+
+        Args:
+            cmd (Command): Command to estimate.
+
+        Returns:
+            Dictionary with one entry per metric in COST_METRICS.
+        """
+        if self._is_elementary(cmd) or self._rule_set is None:
+            return _elementary_cost(cmd)
+        signature = self._get_signature(cmd)
+        if signature is not None and signature in self._in_progress:
+            # Cyclic decomposition rules: stop the recursion here.
+            return _elementary_cost(cmd)
+        decomposition_list = _find_decompositions(self._rule_set, cmd)
+        if len(decomposition_list) == 0:
+            return _elementary_cost(cmd)
+        costs = self._get_costs(cmd, decomposition_list)
+        weighted = [self.weighted_cost(cost) for cost in costs]
+        return costs[weighted.index(min(weighted))]
+
+    def _get_signature(self, cmd):
+        """
+        Return the cache key of a command or None if its gate is unhashable.
+        """
+        signature = (cmd.gate, len(cmd.control_qubits),
+                     tuple(len(qureg) for qureg in cmd.qubits))
+        try:
+            hash(signature)
+        except (NotImplementedError, TypeError):
+            return None
+        return signature
+
+    def _get_costs(self, cmd, decomposition_list):
+        signature = self._get_signature(cmd)
+        # the candidates are compared by identity (the cache keeps them
+        # alive, such that their ids are not reused)
+        key = (signature, tuple(decomposition_list))
+        if signature is not None:
+            costs = self._cache.get(key)
+            if costs is not None:
+                return costs
+            self._in_progress.add(signature)
+        try:
+            costs = [self._dry_run(cmd, decomposition)
+                     for decomposition in decomposition_list]
+        finally:
+            self._in_progress.discard(signature)
+        if signature is not None:
+            self._cache[key] = costs
+        return costs
+
+    def _dry_run(self, cmd, decomposition):
+        """
+        Run a decomposition on a copy of cmd which acts on fresh qubits of a
+        private engine and return the resulting cost.
+        """
+        if self._dry_run_engine is None:
+            from projectq.cengines import DummyEngine, MainEngine
+            self._dry_run_engine = MainEngine(backend=DummyEngine(),
+                                              engine_list=[])
+        main_engine = self._dry_run_engine
+        counter = _CostCountingEngine(self)
+        counter.main_engine = main_engine
+
+        def fresh_qubit():
+            return WeakQubitRef(counter, main_engine.get_new_qubit_id())
+
+        qubits = tuple([fresh_qubit() for _ in qureg] for qureg in cmd.qubits)
+        controls = [fresh_qubit() for _ in cmd.control_qubits]
+        dry_cmd = Command(counter, cmd.gate, qubits, controls, cmd.tags)
+        dry_cmd.engine = ForwarderEngine(counter)
+        self.num_dry_runs += 1
+        decomposition.decompose(dry_cmd)
+        return counter.cost
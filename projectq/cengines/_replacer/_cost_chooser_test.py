@@ -0,0 +1,192 @@
+#   Copyright 2017 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Tests for projectq.cengines._replacer._cost_chooser.py."""
+
+import pytest
+
+from projectq import MainEngine
+from projectq.cengines import (AutoReplacer,
+                               DecompositionRule,
+                               DecompositionRuleSet,
+                               DummyEngine,
+                               InstructionFilter)
+from projectq.ops import (BasicGate, ClassicalInstructionGate, CNOT, Command,
+                          H, T, Tdag, Toffoli, X)
+from projectq.setups.decompositions import toffoli2cnotandtgate
+
+from projectq.cengines._replacer import _cost_chooser
+
+
+class CostTestGate(BasicGate):
+    def __str__(self):
+        return "CostTestGate"
+
+
+def _cnot_heavy(cmd):
+    a, b = cmd.qubits[0]
+    CNOT | (a, b)
+    CNOT | (b, a)
+    CNOT | (a, b)
+
+
+def _single_qubit_heavy(cmd):
+    for qubit in cmd.qubits[0]:
+        H | qubit
+        T | qubit
+        H | qubit
+
+
+def _with_ancilla(cmd):
+    ancilla = cmd.engine.allocate_qubit()
+    X | ancilla
+    del ancilla
+
+
+def _make_rule_set(*decompositions):
+    return DecompositionRuleSet(rules=[DecompositionRule(CostTestGate, d)
+                                       for d in decompositions])
+
+
+def _gate_filter(self, cmd):
+    return (isinstance(cmd.gate, ClassicalInstructionGate) or
+            not isinstance(cmd.gate, CostTestGate))
+
+
+def _run(rule_set, chooser):
+    backend = DummyEngine(save_commands=True)
+    eng = MainEngine(backend=backend,
+                     engine_list=[AutoReplacer(rule_set, chooser),
+                                  InstructionFilter(_gate_filter)])
+    qureg = eng.allocate_qureg(2)
+    CostTestGate() | qureg
+    eng.flush()
+    return backend.received_commands
+
+
+def _num_cnots(commands):
+    return len([cmd for cmd in commands
+                if cmd.gate == X and len(cmd.control_qubits) == 1])
+
+
+def test_cost_chooser_prefers_fewer_cnots():
+    rule_set = _make_rule_set(_cnot_heavy, _single_qubit_heavy)
+    chooser = _cost_chooser.CostDecompositionChooser(rule_set)
+    commands = _run(rule_set, chooser)
+    assert _num_cnots(commands) == 0
+    assert [cmd.gate for cmd in commands].count(H) == 4
+
+
+def test_cost_chooser_weights():
+    rule_set = _make_rule_set(_single_qubit_heavy, _cnot_heavy)
+    chooser = _cost_chooser.CostDecompositionChooser(
+        rule_set, weights={'gate_count': 1})
+    assert _num_cnots(_run(rule_set, chooser)) == 3
+    chooser = _cost_chooser.CostDecompositionChooser(
+        rule_set, weights={'t_count': 1})
+    assert T not in [cmd.gate for cmd in _run(rule_set, chooser)]
+
+
+def test_cost_chooser_invalid_metric():
+    with pytest.raises(ValueError):
+        _cost_chooser.CostDecompositionChooser(weights={'qubits': 1})
+
+
+def test_cost_chooser_caches_estimates():
+    rule_set = _make_rule_set(_cnot_heavy, _single_qubit_heavy)
+    chooser = _cost_chooser.CostDecompositionChooser(rule_set)
+    backend = DummyEngine()
+    eng = MainEngine(backend=backend,
+                     engine_list=[AutoReplacer(rule_set, chooser),
+                                  InstructionFilter(_gate_filter)])
+    qureg = eng.allocate_qureg(2)
+    for _ in range(5):
+        CostTestGate() | qureg
+    eng.flush()
+    assert chooser.num_dry_runs == 2
+
+
+def test_cost_chooser_cache_key_contains_candidates():
+    rule_set = _make_rule_set(_cnot_heavy, _single_qubit_heavy, _with_ancilla)
+    chooser = _cost_chooser.CostDecompositionChooser(rule_set)
+    eng = MainEngine(backend=DummyEngine(), engine_list=[])
+    cmd = CostTestGate().generate_command(eng.allocate_qureg(2))
+    decompositions = rule_set.decompositions["CostTestGate"]
+    costs = chooser._get_costs(cmd, decompositions[:2])
+    assert chooser._get_costs(cmd, decompositions[:2]) == costs
+    assert chooser.num_dry_runs == 2
+    # another list of candidates of the same length (e.g., after a rule has
+    # been filtered out) is dry-run again
+    assert chooser._get_costs(cmd, decompositions[1:]) == [
+        costs[1], {'gate_count': 1, 'cnot_count': 0, 't_count': 0,
+                   'depth': 1, 'ancilla_count': 1}]
+    assert chooser.num_dry_runs == 4
+    # the candidates for inverse gates keep their identity
+    inverse = decompositions[0].get_inverse_decomposition()
+    assert decompositions[0].get_inverse_decomposition() is inverse
+
+
+def test_cost_chooser_estimate_metrics():
+    rule_set = _make_rule_set(_cnot_heavy, _single_qubit_heavy, _with_ancilla)
+    chooser = _cost_chooser.CostDecompositionChooser(rule_set)
+    eng = MainEngine(backend=DummyEngine(), engine_list=[])
+    qureg = eng.allocate_qureg(2)
+    cmd = CostTestGate().generate_command(qureg)
+    costs = chooser._get_costs(cmd, rule_set.decompositions["CostTestGate"])
+    assert costs[0] == {'gate_count': 3, 'cnot_count': 3, 't_count': 0,
+                        'depth': 3, 'ancilla_count': 0}
+    assert costs[1] == {'gate_count': 6, 'cnot_count': 0, 't_count': 2,
+                        'depth': 3, 'ancilla_count': 0}
+    assert costs[2] == {'gate_count': 1, 'cnot_count': 0, 't_count': 0,
+                        'depth': 1, 'ancilla_count': 1}
+
+
+def test_cost_chooser_recursive_estimate():
+    def _with_toffoli(cmd):
+        a, b = cmd.qubits[0]
+        ancilla = cmd.engine.allocate_qubit()
+        Toffoli | (a, b, ancilla)
+        del ancilla
+
+    rule_set = _make_rule_set(_with_toffoli)
+    rule_set.add_decomposition_rules(
+        toffoli2cnotandtgate.all_defined_decomposition_rules)
+    chooser = _cost_chooser.CostDecompositionChooser(
+        rule_set, is_elementary=lambda cmd: (
+            len(cmd.control_qubits) < 2 and
+            not isinstance(cmd.gate, CostTestGate)))
+    eng = MainEngine(backend=DummyEngine(), engine_list=[])
+    qureg = eng.allocate_qureg(3)
+    cost = chooser.estimate(Command(eng, X, ([qureg[2]],),
+                                    controls=qureg[0:2]))
+    assert cost['cnot_count'] == 6
+    assert cost['t_count'] == 7
+    cmd = CostTestGate().generate_command(qureg[0:2])
+    cost = chooser.estimate(cmd)
+    assert cost['cnot_count'] == 6
+    assert cost['ancilla_count'] == 1
+    # Without a rule set, the Toffoli is counted as a single gate
+    chooser = _cost_chooser.CostDecompositionChooser()
+    costs = chooser._get_costs(cmd, rule_set.decompositions["CostTestGate"])
+    assert costs[0]['gate_count'] == 1
+    assert costs[0]['cnot_count'] == 0
+
+
+def test_cost_chooser_custom_is_elementary():
+    rule_set = _make_rule_set(_cnot_heavy)
+    chooser = _cost_chooser.CostDecompositionChooser(
+        rule_set, is_elementary=lambda cmd: cmd.gate != Tdag)
+    eng = MainEngine(backend=DummyEngine(), engine_list=[])
+    qubit = eng.allocate_qubit()
+    assert chooser.estimate(Tdag.generate_command(qubit))['t_count'] == 1
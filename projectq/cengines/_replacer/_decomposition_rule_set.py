@@ -117,6 +117,7 @@ class _Decomposition(object):
         """
         self.decompose = replacement_fun
         self.check = recogn_fun
+        self._inverse = None
 
     def get_inverse_decomposition(self):
         """
@@ -130,13 +131,16 @@ class _Decomposition(object):
         (and will be done automatically by the framework).
 
         Returns:
-            Decomposition handling the inverse of the original command.
+            Decomposition handling the inverse of the original command (the
+            same object for all calls).
         """
-        def decomp(cmd):
-            with Dagger(cmd.engine):
-                self.decompose(cmd.get_inverse())
+        if self._inverse is None:
+            def decomp(cmd):
+                with Dagger(cmd.engine):
+                    self.decompose(cmd.get_inverse())
 
-        def recogn(cmd):
-            return self.check(cmd.get_inverse())
+            def recogn(cmd):
+                return self.check(cmd.get_inverse())
 
-        return _Decomposition(decomp, recogn)
+            self._inverse = _Decomposition(decomp, recogn)
+        return self._inverse
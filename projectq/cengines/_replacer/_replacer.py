@@ -32,6 +32,63 @@ class NoGateDecompositionError(Exception):
     pass
 
 
+def _find_decompositions(rule_set, cmd):
+    """
+    Return all decompositions in a rule set which can handle a command.
+
+    Args:
+        rule_set (DecompositionRuleSet): Rule set to search.
+        cmd (Command): Command to decompose.
+
+    Returns:
+        List of the decomposition objects which recognize the command (may be
+        empty).
+    """
+    decomp_list = []
+    potential_decomps = []
+
+    # First check for a decomposition rules of the gate class, then
+    # the gate class of the inverse gate. If nothing is found, do the
+    # same for the first parent class, etc.
+    gate_mro = type(cmd.gate).mro()[:-1]
+    # If gate does not have an inverse it's parent classes are
+    # DaggeredGate, BasicGate, object. Hence don't check the last two
+    inverse_mro = type(get_inverse(cmd.gate)).mro()[:-2]
+    rules = rule_set.decompositions
+    for level in range(max(len(gate_mro), len(inverse_mro))):
+        # Check for forward rules
+        if level < len(gate_mro):
+            class_name = gate_mro[level].__name__
+            try:
+                potential_decomps = [d for d in rules[class_name]]
+            except KeyError:
+                pass
+            # throw out the ones which don't recognize the command
+            for d in potential_decomps:
+                if d.check(cmd):
+                    decomp_list.append(d)
+            if len(decomp_list) != 0:
+                break
+        # Check for rules implementing the inverse gate
+        # and run them in reverse
+        if level < len(inverse_mro):
+            inv_class_name = inverse_mro[level].__name__
+            try:
+                potential_decomps += [
+                    d.get_inverse_decomposition()
+                    for d in rules[inv_class_name]
+                ]
+            except KeyError:
+                pass
+            # throw out the ones which don't recognize the command
+            for d in potential_decomps:
+                if d.check(cmd):
+                    decomp_list.append(d)
+            if len(decomp_list) != 0:
+                break
+    return decomp_list
+
+
 class InstructionFilter(BasicEngine):
     """
     The InstructionFilter is a compiler engine which changes the behavior of
@@ -126,48 +183,8 @@ class AutoReplacer(BasicEngine):
             self.send([cmd])
         else:
             # check for decomposition rules
-            decomp_list = []
-            potential_decomps = []
-
-            # First check for a decomposition rules of the gate class, then
-            # the gate class of the inverse gate. If nothing is found, do the
-            # same for the first parent class, etc.
-            gate_mro = type(cmd.gate).mro()[:-1]
-            # If gate does not have an inverse it's parent classes are
-            # DaggeredGate, BasicGate, object. Hence don't check the last two
-            inverse_mro = type(get_inverse(cmd.gate)).mro()[:-2]
-            rules = self.decompositionRuleSet.decompositions
-            for level in range(max(len(gate_mro), len(inverse_mro))):
-                # Check for forward rules
-                if level < len(gate_mro):
-                    class_name = gate_mro[level].__name__
-                    try:
-                        potential_decomps = [d for d in rules[class_name]]
-                    except KeyError:
-                        pass
-                    # throw out the ones which don't recognize the command
-                    for d in potential_decomps:
-                        if d.check(cmd):
-                            decomp_list.append(d)
-                    if len(decomp_list) != 0:
-                        break
-                # Check for rules implementing the inverse gate
-                # and run them in reverse
-                if level < len(inverse_mro):
-                    inv_class_name = inverse_mro[level].__name__
-                    try:
-                        potential_decomps += [
-                            d.get_inverse_decomposition()
-                            for d in rules[inv_class_name]
-                        ]
-                    except KeyError:
-                        pass
-                    # throw out the ones which don't recognize the command
-                    for d in potential_decomps:
-                        if d.check(cmd):
-                            decomp_list.append(d)
-                    if len(decomp_list) != 0:
-                        break
+            decomp_list = _find_decompositions(
+                self.decompositionRuleSet, cmd)
 
             if len(decomp_list) == 0:
                 raise NoGateDecompositionError("\nNo replacement found for " +
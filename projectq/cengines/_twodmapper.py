@@ -22,21 +22,169 @@ Output: Quantum circuit in which qubits are placed in 2-D square grid in which
         only nearest neighbour qubits can perform a 2 qubit gate. The mapper
         uses Swap gates in order to move qubits next to each other.
 """
+from collections import deque
 from copy import deepcopy
 import itertools
 import math
 import random
 
-import networkx as nx
+import numpy as np
 
 from projectq.cengines import (BasicMapperEngine, LinearMapper,
                                return_swap_depth)
+from projectq.cengines._linearmapper import (_return_layered_mapping,
+                                             _SwapCache)
 from projectq.meta import LogicalQubitIDTag
 from projectq.ops import (AllocateQubitGate, Command, DeallocateQubitGate,
                           FlushGate, Swap)
 from projectq.types import WeakQubitRef
 
 
+def _maximum_matching(graph, num_left):
+    """
+    Find a maximum matching of a bipartite graph (Hopcroft-Karp).
+
+    Args:
+        graph (dict): Adjacency of the graph, maps each node to a dict whose
+            keys are its neighbors. Nodes 0, ..., num_left - 1 form the left
+            part.
+        num_left (int): Number of nodes in the left part.
+
+    Returns:
+        Dict mapping each matched left node to its right node.
+    """
+    left = range(num_left)
+    left_matches = {node: None for node in left}
+    right_matches = {node: None for node in graph if node >= num_left}
+    distances = dict()
+    infinity = float('inf')
+
+    def breadth_first_search():
+        queue = deque()
+        for node in left:
+            if left_matches[node] is None:
+                distances[node] = 0
+                queue.append(node)
+            else:
+                distances[node] = infinity
+        distances[None] = infinity
+        while queue:
+            node = queue.popleft()
+            if distances[node] < distances[None]:
+                for neighbor in graph[node]:
+                    match = right_matches[neighbor]
+                    if distances[match] == infinity:
+                        distances[match] = distances[node] + 1
+                        queue.append(match)
+        return distances[None] != infinity
+
+    def depth_first_search(node):
+        if node is None:
+            return True
+        for neighbor in graph[node]:
+            match = right_matches[neighbor]
+            if (distances[match] == distances[node] + 1 and
+                    depth_first_search(match)):
+                right_matches[neighbor] = node
+                left_matches[node] = neighbor
+                return True
+        distances[node] = infinity
+        return False
+
+    while breadth_first_search():
+        for node in left:
+            if left_matches[node] is None:
+                depth_first_search(node)
+    return {node: match for node, match in left_matches.items()
+            if match is not None}
+
+
+def _decompose_into_matchings(num_columns, transfers):
+    """
+    Decompose the regular bipartite multigraph of the column transfers into
+    perfect matchings (i.e., color its edges using as many colors as the
+    degree of the nodes).
+
+    Args:
+        num_columns (int): Number of columns (nodes of each part).
+        transfers (list<tuple>): Tuples (current column, final column) of all
+            elements in row-major order (which determines the matchings).
+
+    Returns:
+        List of perfect matchings. Each matching is a list containing the
+        final column matched to each current column.
+    """
+    # Nodes are the current columns numbered (0, 1, ...) and the final
+    # columns numbered with an offset of num_columns (0 + offset, ...), the
+    # values of the adjacency dicts are the edge multiplicities
+    offset = num_columns
+    graph = {node: dict() for node in range(2 * num_columns)}
+    for column, final_column in transfers:
+        neighbors = graph[column]
+        if final_column + offset not in neighbors:
+            neighbors[final_column + offset] = 0
+            graph[final_column + offset][column] = 0
+        neighbors[final_column + offset] += 1
+    matchings = []
+    for _ in range(len(transfers) // num_columns):
+        matching = _maximum_matching(graph, num_columns)
+        for node in range(num_columns):
+            if graph[node][matching[node]] == 1:
+                del graph[node][matching[node]]
+                del graph[matching[node]][node]
+            else:
+                graph[node][matching[node]] -= 1
+        matchings.append([matching[node] - offset
+                          for node in range(num_columns)])
+    return matchings
+
+
+def _odd_even_sort(keys, carried, mapped_ids):
+    """
+    Sort the last axis of keys in place using odd-even transposition sort.
+    All candidates (first axis) and lines (second axis) are sorted at once.
+
+    Args:
+        keys (numpy.ndarray): Array of shape (num_candidates, num_lines,
+            line_length).
+        carried (list<numpy.ndarray>): Arrays with the same shape as keys
+            which are permuted together with keys.
+        mapped_ids (numpy.ndarray): Mapped qubit id of each position, shape
+            (num_lines, line_length).
+
+    Returns:
+        List containing the swap operations (tuples of two mapped ids) of
+        each candidate.
+    """
+    length = keys.shape[2]
+    swaps = [[] for _ in range(keys.shape[0])]
+    finished_sorting = False
+    while not finished_sorting:
+        finished_sorting = True
+        for start in (1, 0):
+            left = slice(start, length - 1, 2)
+            right = slice(start + 1, length, 2)
+            to_swap = keys[:, :, left] > keys[:, :, right]
+            if not to_swap.any():
+                continue
+            finished_sorting = False
+            candidates, lines, pairs = np.nonzero(to_swap)
+            positions = start + 2 * pairs
+            for candidate, mapped_id0, mapped_id1 in zip(
+                    candidates.tolist(),
+                    mapped_ids[lines, positions].tolist(),
+                    mapped_ids[lines, positions + 1].tolist()):
+                swaps[candidate].append((mapped_id0, mapped_id1))
+            for array in [keys] + carried:
+                left_values = array[:, :, left].copy()
+                right_values = array[:, :, right]
+                array[:, :, left] = np.where(to_swap, right_values,
+                                             left_values)
+                array[:, :, right] = np.where(to_swap, left_values,
+                                              right_values)
+    return swaps
+
+
 class GridMapper(BasicMapperEngine):
     """
     Mapper to a 2-D grid graph.
@@ -73,12 +221,19 @@ class GridMapper(BasicMapperEngine):
         num_of_swaps_per_mapping (dict): Key are the number of swaps per
                                          mapping, value is the number of such
                                          mappings which have been applied
+        num_swap_cache_hits (int): Number of (candidate) mappings whose swaps
+                                   were found in the swap cache
+        num_swap_cache_misses (int): Number of (candidate) mappings whose
+                                     swaps had to be computed
+        schedule_layers (bool): If True, the stored commands are scheduled
+                                into parallel layers to choose new mappings
 
     """
     def __init__(self, num_rows, num_columns, mapped_ids_to_backend_ids=None,
                  storage=1000,
                  optimization_function=lambda x: return_swap_depth(x),
-                 num_optimization_steps=50):
+                 num_optimization_steps=5040, swap_cache_size=100,
+                 schedule_layers=False):
         """
         Initialize a GridMapper compiler engine.
 
@@ -99,9 +254,23 @@ class GridMapper(BasicMapperEngine):
                                    returns a cost value. Mapper chooses a
                                    permutation which minimizes this cost.
                                    Default optimizes for circuit depth.
-            num_optimization_steps(int): Number of different permutations to
+            num_optimization_steps(int): Number of different permutations
                                          of the matching to try and minimize
-                                         the cost.
+                                         the cost. All num_rows! permutations
+                                         are tried if there are at most
+                                         num_optimization_steps of them,
+                                         otherwise num_optimization_steps
+                                         random ones are sampled. The default
+                                         of 5040 (= 7!) tries all
+                                         permutations for up to 7 rows.
+            swap_cache_size(int): Number of swap networks (per permutation of
+                                  the mapped ids) to keep, default is 100.
+            schedule_layers(bool): If True, the stored commands are scheduled
+                                   into parallel layers (as soon as possible)
+                                   and the new mapping is chosen to maximize
+                                   the number of executable two qubit gates
+                                   per layer of swaps. Default is False (first
+                                   come first served).
         Raises:
             RuntimeError: if incorrect `mapped_ids_to_backend_ids` parameter
         """
@@ -131,6 +300,7 @@ class GridMapper(BasicMapperEngine):
         self.storage = storage
         self.optimization_function = optimization_function
         self.num_optimization_steps = num_optimization_steps
+        self.schedule_layers = schedule_layers
         # Randomness to pick permutations if there are too many.
         # This creates an own instance of Random in order to not influence
         # the bound methods of the random module which might be used in other
@@ -163,6 +333,9 @@ class GridMapper(BasicMapperEngine):
         self.num_mappings = 0
         self.depth_of_swaps = dict()
         self.num_of_swaps_per_mapping = dict()
+        self._swap_cache = _SwapCache(swap_cache_size)
+        self.num_swap_cache_hits = 0
+        self.num_swap_cache_misses = 0
 
     @property
     def current_mapping(self):
@@ -199,6 +372,9 @@ class GridMapper(BasicMapperEngine):
         mapping to apply these gates on a first come first served basis.
         It reuses the function of a 1D mapper and creates a mapping for a
         1D linear chain and then wraps it like a snake onto the square grid.
+        If self.schedule_layers is True, it chooses the mapping for the
+        commands of the first few parallel layers which allows to apply the
+        most gates per layer of swaps.
 
         One might create better mappings by specializing this function for a
         square grid.
@@ -206,6 +382,17 @@ class GridMapper(BasicMapperEngine):
         Returns: A new mapping as a dict. key is logical qubit id,
                  value is mapped id
         """
+        if self.schedule_layers:
+            return _return_layered_mapping(self._stored_commands,
+                                           self._return_new_mapping_for,
+                                           self._return_swap_depth_to,
+                                           self._are_neighbours)
+        return self._return_new_mapping_for(self._stored_commands)
+
+    def _return_new_mapping_for(self, stored_commands):
+        """
+        Returns a new mapping for stored_commands (see _return_new_mapping).
+        """
         # Change old mapping to 1D in order to use LinearChain heuristic
         if self._current_row_major_mapping:
             old_mapping_1d = dict()
@@ -219,7 +406,7 @@ class GridMapper(BasicMapperEngine):
             num_qubits=self.num_qubits,
             cyclic=False,
             currently_allocated_ids=self._currently_allocated_ids,
-            stored_commands=self._stored_commands,
+            stored_commands=stored_commands,
             current_mapping=old_mapping_1d)
 
         new_mapping_2d = dict()
@@ -227,74 +414,148 @@ class GridMapper(BasicMapperEngine):
             new_mapping_2d[logical_id] = self._map_1d_to_2d[mapped_id]
         return new_mapping_2d
 
-    def _compare_and_swap(self, element0, element1, key):
+    def _return_swap_depth_to(self, new_row_major_mapping):
         """
-        If swapped (inplace), then return swap operation
-        so that key(element0) < key(element1)
+        Returns the depth of the swaps to go from the current mapping to
+        new_row_major_mapping.
+        """
+        return self._return_swaps_and_depth(new_row_major_mapping)[1]
+
+    def _return_swaps_and_depth(self, new_row_major_mapping):
         """
-        if key(element0) > key(element1):
-            mapped_id0 = (element0.current_column +
-                          element0.current_row * self.num_columns)
-            mapped_id1 = (element1.current_column +
-                          element1.current_row * self.num_columns)
-            swap_operation = (mapped_id0, mapped_id1)
-            # swap elements but update also current position:
-            tmp_0 = element0.final_row
-            tmp_1 = element0.final_column
-            tmp_2 = element0.row_after_step_1
-            element0.final_row = element1.final_row
-            element0.final_column = element1.final_column
-            element0.row_after_step_1 = element1.row_after_step_1
-            element1.final_row = tmp_0
-            element1.final_column = tmp_1
-            element1.row_after_step_1 = tmp_2
-            return swap_operation
+        Returns the swaps with the lowest cost (see optimization_function) to
+        go from the current mapping to new_row_major_mapping and their depth
+        (memoized per permutation of the mapped ids).
+
+        Returns:
+            Tuple (swaps, depth)
+        """
+        # Find permutation of matchings with lowest cost
+        permutation = tuple(self._return_final_ids(
+            self._current_row_major_mapping, new_row_major_mapping))
+        entry = self._swap_cache.get(permutation)
+        if entry is not None:
+            self.num_swap_cache_hits += 1
+            return entry
+        self.num_swap_cache_misses += 1
+        swaps = None
+        lowest_cost = None
+        matchings_numbers = list(range(self.num_rows))
+        if math.factorial(self.num_rows) <= self.num_optimization_steps:
+            permutations = list(itertools.permutations(
+                matchings_numbers, self.num_rows))
         else:
-            return None
+            permutations = []
+            for _ in range(self.num_optimization_steps):
+                permutations.append(self._rng.sample(matchings_numbers,
+                                                     self.num_rows))
+        for trial_swaps in self._return_swaps_candidates(
+                old_mapping=self._current_row_major_mapping,
+                new_mapping=new_row_major_mapping,
+                permutations=permutations):
+            cost = self.optimization_function(trial_swaps)
+            if swaps is None or lowest_cost > cost:
+                swaps = trial_swaps
+                lowest_cost = cost
+        return self._swap_cache.put(permutation, swaps,
+                                    return_swap_depth(swaps))
 
-    def _sort_within_rows(self, final_positions, key):
-        swap_operations = []
-        for row in range(self.num_rows):
-            finished_sorting = False
-            while not finished_sorting:
-                finished_sorting = True
-                for column in range(1, self.num_columns-1, 2):
-                    element0 = final_positions[row][column]
-                    element1 = final_positions[row][column+1]
-                    swap = self._compare_and_swap(element0, element1, key=key)
-                    if swap is not None:
-                        finished_sorting = False
-                        swap_operations.append(swap)
-                for column in range(0, self.num_columns-1, 2):
-                    element0 = final_positions[row][column]
-                    element1 = final_positions[row][column+1]
-                    swap = self._compare_and_swap(element0, element1, key=key)
-                    if swap is not None:
-                        finished_sorting = False
-                        swap_operations.append(swap)
-        return swap_operations
-
-    def _sort_within_columns(self, final_positions, key):
-        swap_operations = []
-        for column in range(self.num_columns):
-            finished_sorting = False
-            while not finished_sorting:
-                finished_sorting = True
-                for row in range(1, self.num_rows-1, 2):
-                    element0 = final_positions[row][column]
-                    element1 = final_positions[row+1][column]
-                    swap = self._compare_and_swap(element0, element1, key=key)
-                    if swap is not None:
-                        finished_sorting = False
-                        swap_operations.append(swap)
-                for row in range(0, self.num_rows-1, 2):
-                    element0 = final_positions[row][column]
-                    element1 = final_positions[row+1][column]
-                    swap = self._compare_and_swap(element0, element1, key=key)
-                    if swap is not None:
-                        finished_sorting = False
-                        swap_operations.append(swap)
-        return swap_operations
+    def _are_neighbours(self, mapped_id0, mapped_id1):
+        """
+        Returns True if the two mapped ids are nearest neighbours on the grid.
+        """
+        mapped_id0, mapped_id1 = sorted([mapped_id0, mapped_id1])
+        if mapped_id1 - mapped_id0 == self.num_columns:
+            return True
+        return (mapped_id1 - mapped_id0 == 1 and
+                mapped_id1 % self.num_columns != 0)
+
+    def _return_final_ids(self, old_mapping, new_mapping):
+        """
+        Returns the final mapped id of the qubit at each mapped id.
+
+        Mapped ids which are not used in both mappings are assigned to the
+        remaining positions in increasing order.
+        """
+        final_ids = [None] * self.num_qubits
+        used_mapped_ids = set()
+        for logical_id in old_mapping:
+            if logical_id in new_mapping:
+                used_mapped_ids.add(new_mapping[logical_id])
+                final_ids[old_mapping[logical_id]] = new_mapping[logical_id]
+        # exchange all remaining None with the not yet used mapped ids
+        not_used_mapped_ids = sorted(
+            set(range(self.num_qubits)).difference(used_mapped_ids),
+            reverse=True)
+        for mapped_id in range(self.num_qubits):
+            if final_ids[mapped_id] is None:
+                final_ids[mapped_id] = not_used_mapped_ids.pop()
+        return final_ids
+
+    def _return_swaps_candidates(self, old_mapping, new_mapping,
+                                 permutations):
+        """
+        Returns the swap operations to change the mapping for several
+        permutations of the perfect matchings at once.
+
+        Args:
+            old_mapping: dict: keys are logical ids and values are mapped
+                         qubit ids
+            new_mapping: dict: keys are logical ids and values are mapped
+                         qubit ids
+            permutations: list of permutations of 0, 1, ...,
+                          self.num_rows-1 (see return_swaps).
+        Returns:
+            List containing the list of swap operations for each
+            permutation.
+        """
+        num_rows = self.num_rows
+        num_columns = self.num_columns
+        # final_ids[row, column] is the final mapped id of the element which
+        # is currently at (row, column)
+        final_ids = np.array(self._return_final_ids(old_mapping, new_mapping))
+        final_ids = final_ids.reshape(num_rows, num_columns)
+        final_rows = final_ids // num_columns
+        final_columns = final_ids % num_columns
+        # 1. Assign row_after_step_1 for each element
+        # The multigraph with an edge from the current to the final column
+        # of each element is decomposed into num_rows perfect matchings.
+        matchings = _decompose_into_matchings(
+            num_columns, list(zip(list(range(num_columns)) * num_rows,
+                                  final_columns.ravel().tolist())))
+        # Rows of the elements in each column with a given destination
+        # column, elements with a smaller final row come first
+        elements = [[[] for _ in range(num_columns)]
+                    for _ in range(num_columns)]
+        for column in range(num_columns):
+            for row in np.argsort(final_rows[:, column], kind='stable'):
+                elements[column][final_columns[row, column]].append(row)
+        num_candidates = len(permutations)
+        rows_after_step_1 = np.empty((num_candidates, num_rows, num_columns),
+                                     dtype=int)
+        columns = range(num_columns)
+        for index, permutation in enumerate(permutations):
+            num_assigned = np.zeros((num_columns, num_columns), dtype=int)
+            for row_after_step_1 in range(num_rows):
+                matching = matchings[permutation[row_after_step_1]]
+                rows = [elements[column][matching[column]][
+                    num_assigned[column, matching[column]]]
+                        for column in columns]
+                rows_after_step_1[index, rows, columns] = row_after_step_1
+                num_assigned[columns, matching] += 1
+        final_ids = np.repeat(final_ids[np.newaxis], num_candidates, axis=0)
+        mapped_ids = np.arange(self.num_qubits).reshape(num_rows, num_columns)
+        # 2. Sort inside all the columns
+        swaps0 = _odd_even_sort(np.swapaxes(rows_after_step_1, 1, 2),
+                                [np.swapaxes(final_ids, 1, 2)], mapped_ids.T)
+        # 3. Sort inside all the rows
+        swaps1 = _odd_even_sort(final_ids % num_columns, [final_ids],
+                                mapped_ids)
+        # 4. Sort inside all the columns
+        swaps2 = _odd_even_sort(np.swapaxes(final_ids // num_columns, 1, 2),
+                                [], mapped_ids.T)
+        return [swaps0[i] + swaps1[i] + swaps2[i]
+                for i in range(num_candidates)]
 
     def return_swaps(self, old_mapping, new_mapping, permutation=None):
         """
@@ -314,120 +575,8 @@ class GridMapper(BasicMapperEngine):
         """
         if permutation is None:
             permutation = list(range(self.num_rows))
-        swap_operations = []
-
-        class Position(object):
-            """ Custom Container."""
-            def __init__(self, current_row, current_column, final_row,
-                         final_column, row_after_step_1=None):
-                self.current_row = current_row
-                self.current_column = current_column
-                self.final_row = final_row
-                self.final_column = final_column
-                self.row_after_step_1 = row_after_step_1
-
-        # final_positions contains info containers
-        # final_position[i][j] contains info container with
-        # current_row == i and current_column == j
-        final_positions = [[None for i in range(self.num_columns)]
-                           for j in range(self.num_rows)]
-        # move qubits which are in both mappings
-        used_mapped_ids = set()
-        for logical_id in old_mapping:
-            if logical_id in new_mapping:
-                used_mapped_ids.add(new_mapping[logical_id])
-                old_column = old_mapping[logical_id] % self.num_columns
-                old_row = old_mapping[logical_id] // self.num_columns
-                new_column = new_mapping[logical_id] % self.num_columns
-                new_row = new_mapping[logical_id] // self.num_columns
-                info_container = Position(current_row=old_row,
-                                          current_column=old_column,
-                                          final_row=new_row,
-                                          final_column=new_column)
-                final_positions[old_row][old_column] = info_container
-        # exchange all remaining None with the not yet used mapped ids
-        all_ids = set(range(self.num_qubits))
-        not_used_mapped_ids = list(all_ids.difference(used_mapped_ids))
-        not_used_mapped_ids = sorted(not_used_mapped_ids, reverse=True)
-        for row in range(self.num_rows):
-            for column in range(self.num_columns):
-                if final_positions[row][column] is None:
-                    mapped_id = not_used_mapped_ids.pop()
-                    new_column = mapped_id % self.num_columns
-                    new_row = mapped_id // self.num_columns
-                    info_container = Position(current_row=row,
-                                              current_column=column,
-                                              final_row=new_row,
-                                              final_column=new_column)
-                    final_positions[row][column] = info_container
-        assert len(not_used_mapped_ids) == 0
-        # 1. Assign column_after_step_1 for each element
-        # Matching contains the num_columns matchings
-        matchings = [None for i in range(self.num_rows)]
-        # Build bipartite graph. Nodes are the current columns numbered
-        # (0, 1, ...) and the destination columns numbered with an offset of
-        # self.num_columns (0 + offset, 1+offset, ...)
-        graph = nx.Graph()
-        offset = self.num_columns
-        graph.add_nodes_from(range(self.num_columns), bipartite=0)
-        graph.add_nodes_from(range(offset, offset + self.num_columns),
-                             bipartite=1)
-        # Add an edge to the graph from (i, j+offset) for every element
-        # currently in column i which should go to column j for the new
-        # mapping
-        for row in range(self.num_rows):
-            for column in range(self.num_columns):
-                destination_column = final_positions[row][column].final_column
-                if not graph.has_edge(column, destination_column + offset):
-                    graph.add_edge(column, destination_column + offset)
-                    # Keep manual track of multiple edges between nodes
-                    graph[column][destination_column + offset]['num'] = 1
-                else:
-                    graph[column][destination_column + offset]['num'] += 1
-        # Find perfect matching, remove those edges from the graph
-        # and do it again:
-        for i in range(self.num_rows):
-            top_nodes = range(self.num_columns)
-            matching = nx.bipartite.maximum_matching(graph, top_nodes)
-            matchings[i] = matching
-            # Remove all edges of the current perfect matching
-            for node in range(self.num_columns):
-                if graph[node][matching[node]]['num'] == 1:
-                    graph.remove_edge(node, matching[node])
-                else:
-                    graph[node][matching[node]]['num'] -= 1
-        # permute the matchings:
-        tmp = deepcopy(matchings)
-        for i in range(self.num_rows):
-            matchings[i] = tmp[permutation[i]]
-        # Assign row_after_step_1
-        for column in range(self.num_columns):
-            for row_after_step_1 in range(self.num_rows):
-                dest_column = matchings[row_after_step_1][column] - offset
-                best_element = None
-                for row in range(self.num_rows):
-                    element = final_positions[row][column]
-                    if element.row_after_step_1 is not None:
-                        continue
-                    elif element.final_column == dest_column:
-                        if best_element is None:
-                            best_element = element
-                        elif best_element.final_row > element.final_row:
-                            best_element = element
-                best_element.row_after_step_1 = row_after_step_1
-        # 2. Sort inside all the rows
-        swaps = self._sort_within_columns(final_positions=final_positions,
-                                          key=lambda x: x.row_after_step_1)
-        swap_operations += swaps
-        # 3. Sort inside all the columns
-        swaps = self._sort_within_rows(final_positions=final_positions,
-                                       key=lambda x: x.final_column)
-        swap_operations += swaps
-        # 4. Sort inside all the rows
-        swaps = self._sort_within_columns(final_positions=final_positions,
-                                          key=lambda x: x.final_row)
-        swap_operations += swaps
-        return swap_operations
+        return self._return_swaps_candidates(old_mapping, new_mapping,
+                                             [permutation])[0]
 
     def _send_possible_commands(self):
         """
@@ -495,12 +644,7 @@ class GridMapper(BasicMapperEngine):
                             self._current_row_major_mapping[qubit.id])
                 # Check that mapped ids are nearest neighbour on 2D grid
                 if len(mapped_ids) == 2:
-                    qb0, qb1 = sorted(list(mapped_ids))
-                    send_gate = False
-                    if qb1 - qb0 == self.num_columns:
-                        send_gate = True
-                    elif qb1 - qb0 == 1 and qb1 % self.num_columns != 0:
-                        send_gate = True
+                    send_gate = self._are_neighbours(*mapped_ids)
                 if send_gate:
                     # Note: This sends the cmd correctly with the backend ids
                     #       as it looks up the mapping in self.current_mapping
@@ -532,29 +676,7 @@ class GridMapper(BasicMapperEngine):
             if len(self._stored_commands) == 0:
                 return
         new_row_major_mapping = self._return_new_mapping()
-        # Find permutation of matchings with lowest cost
-        swaps = None
-        lowest_cost = None
-        matchings_numbers = list(range(self.num_rows))
-        if self.num_optimization_steps <= math.factorial(self.num_rows):
-            permutations = itertools.permutations(matchings_numbers,
-                                                  self.num_rows)
-        else:
-            permutations = []
-            for _ in range(self.num_optimization_steps):
-                permutations.append(self._rng.sample(matchings_numbers,
-                                                     self.num_rows))
-        for permutation in permutations:
-            trial_swaps = self.return_swaps(
-                old_mapping=self._current_row_major_mapping,
-                new_mapping=new_row_major_mapping,
-                permutation=permutation)
-            if swaps is None:
-                swaps = trial_swaps
-                lowest_cost = self.optimization_function(trial_swaps)
-            elif lowest_cost > self.optimization_function(trial_swaps):
-                swaps = trial_swaps
-                lowest_cost = self.optimization_function(trial_swaps)
+        swaps, depth = self._return_swaps_and_depth(new_row_major_mapping)
         if swaps:  # first mapping requires no swaps
             # Allocate all mapped qubit ids (which are not already allocated,
             # i.e., contained in self._currently_allocated_ids)
@@ -583,7 +705,6 @@ class GridMapper(BasicMapperEngine):
                 self.send([cmd])
             # Register statistics:
             self.num_mappings += 1
-            depth = return_swap_depth(swaps)
             if depth not in self.depth_of_swaps:
                 self.depth_of_swaps[depth] = 1
             else:
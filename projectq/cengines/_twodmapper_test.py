@@ -23,8 +23,8 @@ import pytest
 import projectq
 from projectq.cengines import DummyEngine, LocalOptimizer
 from projectq.meta import LogicalQubitIDTag
-from projectq.ops import (Allocate, BasicGate, Command, Deallocate, FlushGate,
-                          X)
+from projectq.ops import (Allocate, BasicGate, CNOT, Command, Deallocate,
+                          FlushGate, X)
 from projectq.types import WeakQubitRef
 
 from projectq.cengines import _twodmapper as two_d
@@ -158,6 +158,44 @@ def test_return_swaps_random(num_rows, num_columns, seed, none_old, none_new):
             assert test_chain[i] == new_chain[i]
 
 
+def test_decompose_into_matchings():
+    transfers = [(0, 0), (1, 1), (2, 2), (0, 0), (1, 2), (2, 1),
+                 (0, 1), (1, 2), (2, 0)]
+    matchings = two_d._decompose_into_matchings(3, transfers)
+    assert len(matchings) == 3
+    remaining = sorted(transfers)
+    for matching in matchings:
+        assert sorted(matching) == [0, 1, 2]
+        for column, final_column in enumerate(matching):
+            remaining.remove((column, final_column))
+    assert remaining == []
+
+
+def test_odd_even_sort():
+    import numpy as np
+    keys = np.array([[[2, 0, 1]], [[0, 1, 2]]])
+    carried = keys * 10
+    mapped_ids = np.array([[5, 6, 7]])
+    swaps = two_d._odd_even_sort(keys, [carried], mapped_ids)
+    assert swaps == [[(5, 6), (6, 7)], []]
+    assert keys.tolist() == [[[0, 1, 2]], [[0, 1, 2]]]
+    assert carried.tolist() == [[[0, 10, 20]], [[0, 10, 20]]]
+
+
+def test_return_swaps_candidates():
+    rng = random.Random(3)
+    mapper = two_d.GridMapper(num_rows=4, num_columns=5)
+    old_mapping = dict(zip(rng.sample(range(20), 20), range(20)))
+    new_mapping = dict(zip(rng.sample(range(20), 20), range(20)))
+    permutations = list(itertools.permutations(range(4)))
+    candidates = mapper._return_swaps_candidates(old_mapping, new_mapping,
+                                                 permutations)
+    assert len(candidates) == 24
+    for permutation, swaps in zip(permutations, candidates):
+        assert swaps == mapper.return_swaps(old_mapping, new_mapping,
+                                            permutation)
+
+
 @pytest.mark.parametrize("different_backend_ids", [False, True])
 def test_send_possible_commands(different_backend_ids):
     if different_backend_ids:
@@ -377,6 +415,108 @@ def test_run_and_receive(num_optimization_steps, different_backend_ids):
     assert mapper.num_mappings == 1
 
 
+def test_run_many_rows():
+    # the permutations of the matchings are sampled for many rows
+    mapper = two_d.GridMapper(num_rows=12, num_columns=2,
+                              num_optimization_steps=5)
+    backend = DummyEngine(save_commands=True)
+    backend.is_last_engine = True
+    eng = projectq.MainEngine(backend, [mapper])
+    qureg = eng.allocate_qureg(24)
+    rng = random.Random(1)
+    for _ in range(50):
+        qubit0, qubit1 = rng.sample(qureg, 2)
+        CNOT | (qubit0, qubit1)
+    eng.flush()
+    assert mapper.num_mappings > 0
+
+
+def test_run_swap_depth():
+    # pins the total depth and number of swaps on a 5x3 grid (by default,
+    # all 120 permutations of the matchings are tried)
+    depth = 0
+    num_swaps = 0
+    for seed in range(4):
+        mapper = two_d.GridMapper(num_rows=5, num_columns=3)
+        backend = DummyEngine(save_commands=True)
+        backend.is_last_engine = True
+        eng = projectq.MainEngine(backend, [mapper])
+        qureg = eng.allocate_qureg(15)
+        rng = random.Random(seed)
+        for _ in range(60):
+            qubit0, qubit1 = rng.sample(qureg, 2)
+            CNOT | (qubit0, qubit1)
+        eng.flush()
+        depth += sum(key * value
+                     for key, value in mapper.depth_of_swaps.items())
+        num_swaps += sum(key * value for key, value in
+                         mapper.num_of_swaps_per_mapping.items())
+    assert depth == 197
+    assert num_swaps == 645
+
+
+def test_run_swap_depth_default_steps():
+    # by default, all 720 permutations of the matchings are tried on a 6x3
+    # grid, which gives the total depth of the previous implementation (only
+    # sampling 50 permutations gives a total depth of 204)
+    depth = 0
+    for seed in range(4):
+        mapper = two_d.GridMapper(num_rows=6, num_columns=3)
+        backend = DummyEngine(save_commands=True)
+        backend.is_last_engine = True
+        eng = projectq.MainEngine(backend, [mapper])
+        qureg = eng.allocate_qureg(18)
+        rng = random.Random(seed)
+        for _ in range(60):
+            qubit0, qubit1 = rng.sample(qureg, 2)
+            CNOT | (qubit0, qubit1)
+        eng.flush()
+        depth += sum(key * value
+                     for key, value in mapper.depth_of_swaps.items())
+    assert depth == 196
+
+
+def test_run_schedule_layers_reduces_depth():
+    def _circuit_depth(mapper):
+        backend = DummyEngine(save_commands=True)
+        backend.is_last_engine = True
+        eng = projectq.MainEngine(backend, [mapper])
+        qureg = eng.allocate_qureg(9)
+        rng = random.Random(seed)
+        for _ in range(100):
+            qubit0, qubit1 = rng.sample(qureg, 2)
+            CNOT | (qubit0, qubit1)
+        eng.flush()
+        depth_of_qubits = dict()
+        for cmd in backend.received_commands:
+            qubit_ids = [qb.id for qureg in cmd.all_qubits for qb in qureg]
+            if len(qubit_ids) == 2:
+                assert mapper._are_neighbours(*qubit_ids)
+                depth = max(depth_of_qubits.get(qubit_ids[0], 0),
+                            depth_of_qubits.get(qubit_ids[1], 0)) + 1
+                depth_of_qubits[qubit_ids[0]] = depth
+                depth_of_qubits[qubit_ids[1]] = depth
+        return max(depth_of_qubits.values())
+
+    depth = 0
+    layered_depth = 0
+    for seed in range(4):
+        depth += _circuit_depth(two_d.GridMapper(num_rows=3, num_columns=3))
+        layered_mapper = two_d.GridMapper(num_rows=3, num_columns=3,
+                                          schedule_layers=True)
+        layered_depth += _circuit_depth(layered_mapper)
+        assert layered_mapper.num_mappings > 0
+    assert layered_depth < depth
+
+
+def test_are_neighbours():
+    mapper = two_d.GridMapper(num_rows=2, num_columns=3)
+    assert mapper._are_neighbours(0, 1)
+    assert mapper._are_neighbours(4, 1)
+    assert not mapper._are_neighbours(2, 3)
+    assert not mapper._are_neighbours(0, 4)
+
+
 def test_run_infinite_loop_detection():
     mapper = two_d.GridMapper(num_rows=2, num_columns=2)
     backend = DummyEngine(save_commands=True)
@@ -503,3 +643,29 @@ def test_check_that_local_optimizer_doesnt_merge():
     cmd5 = Command(engine=None, gate=Deallocate, qubits=([qb1],))
     mapper.receive([cmd3, cmd4, cmd5, cmd_flush])
     assert len(backend.received_commands) == 7
+
+
+def test_swap_cache_repeated_remappings():
+    def _trotter_steps(mapper):
+        backend = DummyEngine(save_commands=True)
+        backend.is_last_engine = True
+        eng = projectq.MainEngine(backend, [mapper])
+        qureg = eng.allocate_qureg(9)
+        for _ in range(3):
+            CNOT | (qureg[0], qureg[8])
+            CNOT | (qureg[2], qureg[6])
+            eng.flush()
+            for qubit0, qubit1 in zip(qureg[:-1], qureg[1:]):
+                CNOT | (qubit0, qubit1)
+            eng.flush()
+        return [str(cmd) for cmd in backend.received_commands]
+
+    mapper = two_d.GridMapper(num_rows=3, num_columns=3)
+    commands = _trotter_steps(mapper)
+    assert mapper.num_swap_cache_hits > 0
+    assert (mapper.num_swap_cache_hits + mapper.num_swap_cache_misses ==
+            mapper.num_mappings + 1)
+    no_cache_mapper = two_d.GridMapper(num_rows=3, num_columns=3,
+                                       swap_cache_size=0)
+    assert _trotter_steps(no_cache_mapper) == commands
+    assert no_cache_mapper.num_swap_cache_hits == 0
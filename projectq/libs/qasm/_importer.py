@@ -0,0 +1,690 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Contains the QASMImporter, which reads an OpenQASM 2.0 program and sends its
+commands to a compiler engine (e.g., a MainEngine) in batches.
+
+The program is parsed statement by statement using regular expressions. Gate
+definitions are compiled once (their parameter expressions are compiled to
+Python functions), and the commands of each distinct gate statement (e.g.,
+"cx q[0], q[1];") are only resolved once, such that large circuits mostly
+consist of dictionary lookups.
+"""
+
+import math
+import os
+import re
+
+from projectq.ops import (Allocate,
+                          Barrier,
+                          Command,
+                          FlushGate,
+                          H,
+                          Measure,
+                          R,
+                          Rx,
+                          Ry,
+                          Rz,
+                          S,
+                          Sdag,
+                          SqrtX,
+                          Swap,
+                          T,
+                          Tdag,
+                          X,
+                          Y,
+                          Z,
+                          get_inverse)
+from projectq.cengines import NotYetMeasuredError
+from projectq.types import WeakQubitRef
+
+
+class QASMParseError(Exception):
+    pass
+
+
+_ID = r'[a-zA-Z_][a-zA-Z0-9_]*'
+# parameter list (with up to two levels of nested parentheses)
+_PARAMS = r'\(((?:[^()]|\((?:[^()]|\([^()]*\))*\))*)\)'
+_COMMENT = re.compile(r'//[^\n]*')
+_WHITESPACE = re.compile(r'\s*')
+_WORD = re.compile(_ID)
+_STATEMENT = re.compile(r'(' + _ID + r')\s*(?:' + _PARAMS + r')?\s*'
+                        r'([^;{}]*);')
+_HEADER = re.compile(r'OPENQASM\s+([0-9.]+)\s*;')
+_INCLUDE = re.compile(r'include\s*"([^"]*)"\s*;')
+_REGISTER = re.compile(r'(qreg|creg)\s+(' + _ID + r')\s*\[\s*(\d+)\s*\]'
+                       r'\s*;')
+_GATE_DEFINITION = re.compile(r'(gate|opaque)\s+(' + _ID + r')\s*(?:' +
+                              _PARAMS + r')?\s*([^;{}]*?)\s*'
+                              r'(?:\{([^{}]*)\}|;)')
+_MEASURE = re.compile(r'measure\s+([^;]*?)\s*->\s*([^;]*?)\s*;')
+_BARRIER = re.compile(r'barrier\s+([^;]*);')
+_IF = re.compile(r'if\s*\(\s*(' + _ID + r')\s*==\s*(\d+)\s*\)')
+_ARGUMENT = re.compile(r'\s*(' + _ID + r')\s*(?:\[\s*(\d+)\s*\])?\s*$')
+_BODY_STATEMENT = re.compile(r'\s*(' + _ID + r')\s*(?:' + _PARAMS +
+                             r')?\s*(.*?)\s*$', re.S)
+_EXPRESSION_TOKEN = re.compile(r'\s*(?:((?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)'
+                               r'|(' + _ID + r')|([-+*/^()])|(\S))')
+_KEYWORDS = frozenset(['OPENQASM', 'include', 'qreg', 'creg', 'gate',
+                       'opaque', 'measure', 'reset', 'barrier', 'if'])
+
+_FUNCTIONS = {'sin': math.sin, 'cos': math.cos, 'tan': math.tan,
+              'exp': math.exp, 'ln': math.log, 'sqrt': math.sqrt}
+_NAMESPACE = dict(_FUNCTIONS, pi=math.pi, __builtins__={})
+
+# the commands of at most this many distinct gate statements are cached
+_MAX_CACHED_STATEMENTS = 100000
+
+
+def _op(gate, controls, *targets):
+    """
+    Return an operation of an expanded gate: the gate, the (local) indices of
+    its control qubits and the indices of its target qubits (one register
+    per target qubit).
+    """
+    return (gate, controls, tuple((target,) for target in targets))
+
+
+def _u3(theta, phi, lam):
+    # equal to the OpenQASM U gate up to a global phase
+    return [_op(Rz(lam), (), 0), _op(Ry(theta), (), 0), _op(Rz(phi), (), 0)]
+
+
+def _controlled(ops):
+    return [(gate, (0,) + tuple(c + 1 for c in controls),
+             tuple(tuple(q + 1 for q in qureg) for qureg in quregs))
+            for gate, controls, quregs in ops]
+
+
+def _fixed(*ops):
+    ops = list(ops)
+    return lambda: ops
+
+
+# builtin gates: name -> (number of parameters, number of qubits, function
+# which returns the operations of the gate given its parameters)
+_BUILTIN_GATES = {
+    'U': (3, 1, _u3),
+    'CX': (0, 2, _fixed(_op(X, (0,), 1))),
+}
+
+# gates of the standard header qelib1.inc (mapped to ProjectQ gates directly
+# instead of being expanded into U and CX)
+_QELIB1_GATES = {
+    'u3': (3, 1, _u3),
+    'u2': (2, 1, lambda phi, lam: _u3(math.pi / 2, phi, lam)),
+    'u1': (1, 1, lambda lam: [_op(R(lam), (), 0)]),
+    'p': (1, 1, lambda lam: [_op(R(lam), (), 0)]),
+    'u0': (1, 1, lambda gamma: []),
+    'id': (0, 1, _fixed()),
+    'cx': (0, 2, _fixed(_op(X, (0,), 1))),
+    'x': (0, 1, _fixed(_op(X, (), 0))),
+    'y': (0, 1, _fixed(_op(Y, (), 0))),
+    'z': (0, 1, _fixed(_op(Z, (), 0))),
+    'h': (0, 1, _fixed(_op(H, (), 0))),
+    's': (0, 1, _fixed(_op(S, (), 0))),
+    'sdg': (0, 1, _fixed(_op(Sdag, (), 0))),
+    't': (0, 1, _fixed(_op(T, (), 0))),
+    'tdg': (0, 1, _fixed(_op(Tdag, (), 0))),
+    'sx': (0, 1, _fixed(_op(SqrtX, (), 0))),
+    'sxdg': (0, 1, _fixed(_op(get_inverse(SqrtX), (), 0))),
+    'rx': (1, 1, lambda theta: [_op(Rx(theta), (), 0)]),
+    'ry': (1, 1, lambda theta: [_op(Ry(theta), (), 0)]),
+    'rz': (1, 1, lambda phi: [_op(Rz(phi), (), 0)]),
+    'cz': (0, 2, _fixed(_op(Z, (0,), 1))),
+    'cy': (0, 2, _fixed(_op(Y, (0,), 1))),
+    'ch': (0, 2, _fixed(_op(H, (0,), 1))),
+    'ccx': (0, 3, _fixed(_op(X, (0, 1), 2))),
+    'swap': (0, 2, _fixed(_op(Swap, (), 0, 1))),
+    'cswap': (0, 3, _fixed(_op(Swap, (0,), 1, 2))),
+    'crx': (1, 2, lambda theta: [_op(Rx(theta), (0,), 1)]),
+    'cry': (1, 2, lambda theta: [_op(Ry(theta), (0,), 1)]),
+    'crz': (1, 2, lambda lam: [_op(Rz(lam), (0,), 1)]),
+    'cu1': (1, 2, lambda lam: [_op(R(lam), (0,), 1)]),
+    'cp': (1, 2, lambda lam: [_op(R(lam), (0,), 1)]),
+    # (the phase of U3 becomes a relative phase on the control qubit)
+    'cu3': (3, 2, lambda theta, phi, lam:
+            [_op(R((phi + lam) / 2), (), 0)] +
+            _controlled(_u3(theta, phi, lam))),
+    'rzz': (1, 2, lambda theta: [_op(X, (0,), 1), _op(R(theta), (), 1),
+                                 _op(X, (0,), 1)]),
+}
+
+
+def _split(text):
+    """
+    Split a comma-separated list (and remove empty entries).
+    """
+    items = [item.strip() for item in text.split(',')]
+    return [item for item in items if item != '']
+
+
+def _compile_expression(expression, param_names=()):
+    """
+    Compile a parameter expression into a function of the gate parameters.
+
+    Args:
+        expression (str): Expression using numbers, pi, the parameters, the
+            operators + - * / ^ and the functions sin, cos, tan, exp, ln and
+            sqrt.
+        param_names (list<str>): Names of the parameters of the gate.
+    """
+    tokens = []
+    for match in _EXPRESSION_TOKEN.finditer(expression):
+        number, name, operator, other = match.groups()
+        if other is not None:
+            raise QASMParseError("Invalid character '{}' in expression "
+                                 "'{}'.".format(other, expression))
+        if number is not None:
+            tokens.append(number)
+        elif operator is not None:
+            tokens.append('**' if operator == '^' else operator)
+        elif name in param_names:
+            tokens.append('_p{}'.format(list(param_names).index(name)))
+        elif name == 'pi':
+            tokens.append(name)
+        elif name in _FUNCTIONS:
+            tokens.append(name)
+        else:
+            raise QASMParseError("Unknown parameter '{}' in expression "
+                                 "'{}'.".format(name, expression))
+    arguments = ", ".join("_p{}".format(i) for i in range(len(param_names)))
+    try:
+        return eval("lambda {}: {}".format(arguments, " ".join(tokens)),
+                    _NAMESPACE)
+    except SyntaxError:
+        raise QASMParseError("Invalid expression '{}'.".format(expression))
+
+
+def _evaluate(functions, params):
+    try:
+        return [function(*params) for function in functions]
+    except (ArithmeticError, ValueError, TypeError) as err:
+        raise QASMParseError("Failed to evaluate parameter: {}".format(err))
+
+
+def _evaluate_constant(expression):
+    """
+    Return the value of a parameter expression of a gate statement (which
+    cannot refer to gate parameters).
+    """
+    try:
+        # fast path for the most common case (a number)
+        return float(expression)
+    except ValueError:
+        return _evaluate([_compile_expression(expression)], [])[0]
+
+
+class QASMImporter(object):
+    """
+    QASMImporter reads an OpenQASM 2.0 program and sends its commands to a
+    compiler engine or back-end in batches (i.e., the program is never
+    converted into one list of commands).
+
+    The gates of qelib1.inc are mapped to the corresponding ProjectQ gates
+    (up to global phases); user-defined gates are expanded into these gates.
+    Quantum registers are allocated when they are declared and are not
+    deallocated at the end of the program.
+
+    Example:
+        .. code-block:: python
+
+            eng = MainEngine(Simulator(), [])
+            importer = QASMImporter("circuit.qasm")
+            importer.run(eng)
+            print(importer.get_creg_value("c"))
+
+        To record the program to a trace file (see TraceRecorder), use
+        MainEngine(TraceRecorder("circuit.pqtrace"), []).
+
+    Note:
+        The reset statement and opaque gates are not supported. The
+        condition of an if statement is evaluated by flushing the engine and
+        reading the measurement results from the main engine. The engine is
+        also flushed before a qubit is measured again whose previous
+        measurement result has not been read yet.
+
+    Attributes:
+        qregs (dict): Maps the names of the quantum registers to the ids of
+            their qubits (available after calling run).
+        cregs (dict): Maps the names of the classical registers to the
+            values of their bits (bits which have not been written are 0,
+            bits whose measurement has not been flushed yet are None).
+    """
+    def __init__(self, filename, batch_size=4096):
+        """
+        Initialize a QASMImporter.
+
+        Args:
+            filename (str or file object): Name of the OpenQASM file (or a
+                file object opened in text mode).
+            batch_size (int): Number of commands which are sent to the
+                engine at once.
+        """
+        self._filename = filename
+        self.batch_size = batch_size
+        self.qregs = dict()
+        self.cregs = dict()
+        self._owner = None
+        # measured bits whose results have not been read: (creg, index) ->
+        # qubit id, and the ids of these qubits
+        self._unread_bits = dict()
+        self._unread_qubits = set()
+
+    def run(self, engine, flush=True):
+        """
+        Send all commands of the program to an engine.
+
+        If the engine is a MainEngine, the qubit ids are requested from it,
+        such that they do not collide with qubits allocated by the user.
+
+        Args:
+            engine (BasicEngine): Engine to which to send the commands (e.g.,
+                a MainEngine). The commands are owned by its main engine.
+            flush (bool): If True, the engine is flushed at the end of the
+                program and the measurement results are copied into the
+                classical registers.
+
+        Returns:
+            Number of commands which have been sent (not counting flushes).
+
+        Raises:
+            QASMParseError: If the program is invalid or uses an unsupported
+                statement. The message contains the line of the statement.
+        """
+        self._engine = engine
+        self._owner = (engine.main_engine if engine.main_engine is not None
+                       else engine)
+        self._next_qubit_id = 0
+        self._gates = dict(_BUILTIN_GATES)
+        self._statements = dict()
+        self._batch = []
+        self.num_commands = 0
+        self.qregs = dict()
+        self.cregs = dict()
+        self._unread_bits = dict()
+        self._unread_qubits = set()
+
+        if hasattr(self._filename, 'read'):
+            text = self._filename.read()
+            directory = os.getcwd()
+            source = getattr(self._filename, 'name', '<program>')
+        else:
+            with open(self._filename) as qasm_file:
+                text = qasm_file.read()
+            directory = os.path.dirname(os.path.abspath(self._filename))
+            source = self._filename
+        self._parse(text, directory, source)
+        if flush:
+            self._flush()
+            if hasattr(self._owner, 'get_measurement_result'):
+                try:
+                    self._read_measurements()
+                except NotYetMeasuredError:
+                    # the back-end does not return measurement results
+                    pass
+        else:
+            self._send()
+        return self.num_commands
+
+    def get_qureg(self, name):
+        """
+        Return the qubits of a quantum register (as WeakQubitRefs).
+        """
+        return [WeakQubitRef(self._owner, qb_id) for qb_id in self.qregs[name]]
+
+    def get_creg_value(self, name):
+        """
+        Return the value of a classical register (bit i has weight 2^i).
+
+        The engine has to be flushed before (see run). Bits which have not
+        been written are 0.
+        """
+        self._read_measurements()
+        value = 0
+        for i, bit in enumerate(self.cregs[name]):
+            if bit is None:
+                raise NotYetMeasuredError("The result of bit {} of '{}' is "
+                                          "not available.".format(i, name))
+            value |= bit << i
+        return value
+
+    def _read_measurements(self):
+        """
+        Copy the (flushed) measurement results into the classical bits.
+        """
+        for (creg, i), qb_id in self._unread_bits.items():
+            self.cregs[creg][i] = int(self._owner.get_measurement_result(
+                WeakQubitRef(self._owner, qb_id)))
+        self._unread_bits = dict()
+        self._unread_qubits = set()
+
+    def _send(self):
+        if len(self._batch) > 0:
+            batch = self._batch
+            self._batch = []
+            self._engine.receive(batch)
+
+    def _flush(self):
+        self._batch.append(Command(self._owner, FlushGate(),
+                                   ([WeakQubitRef(self._owner, -1)],)))
+        self._send()
+
+    def _append(self, gate, quregs, controls=()):
+        self._batch.append(Command(self._owner, gate, quregs, controls))
+        self.num_commands += 1
+        if len(self._batch) >= self.batch_size:
+            self._send()
+
+    def _new_qubit_id(self):
+        if hasattr(self._owner, 'get_new_qubit_id'):
+            return self._owner.get_new_qubit_id()
+        self._next_qubit_id += 1
+        return self._next_qubit_id - 1
+
+    def _parse(self, text, directory, source):
+        """
+        Parse a program (or an included file) and send its commands.
+        """
+        text = _COMMENT.sub('', text)
+        pos = _WHITESPACE.match(text, 0).end()
+        while pos < len(text):
+            try:
+                pos = self._statement(text, pos, directory)
+            except QASMParseError as err:
+                if getattr(err, 'line', None) is not None:
+                    raise
+                line = text.count('\n', 0, pos) + 1
+                located = QASMParseError("{}, line {}: {}".format(source,
+                                                                  line, err))
+                located.line = line
+                raise located
+            pos = _WHITESPACE.match(text, pos).end()
+
+    def _statement(self, text, pos, directory, condition=None):
+        """
+        Parse the statement at position pos and send its commands (unless
+        the condition of an enclosing if statement is False).
+
+        Returns:
+            Position after the statement.
+        """
+        match = _STATEMENT.match(text, pos)
+        if match is not None and match.group(1) not in _KEYWORDS:
+            key = match.group(0)
+            operations = self._statements.get(key)
+            if operations is None:
+                operations = self._resolve(match.group(1), match.group(2),
+                                           match.group(3))
+                if len(self._statements) < _MAX_CACHED_STATEMENTS:
+                    self._statements[key] = operations
+            if condition is not False:
+                batch = self._batch
+                for gate, quregs, controls in operations:
+                    batch.append(Command(self._owner, gate, quregs,
+                                         controls))
+                self.num_commands += len(operations)
+                if len(batch) >= self.batch_size:
+                    self._send()
+            return match.end()
+
+        word = _WORD.match(text, pos)
+        word = word.group(0) if word is not None else None
+        # only quantum operations can be conditional
+        if word not in _KEYWORDS or (condition is not None and word not in
+                                     ('measure', 'reset', 'barrier')):
+            raise QASMParseError("Invalid statement '{}'.".format(
+                text[pos:pos + 40].split('\n')[0]))
+        handler = getattr(self, '_parse_' + word)
+        return handler(text, pos, directory, condition)
+
+    def _match(self, regex, text, pos, what):
+        match = regex.match(text, pos)
+        if match is None:
+            raise QASMParseError("Invalid {} statement.".format(what))
+        return match
+
+    def _parse_OPENQASM(self, text, pos, directory, condition):
+        match = self._match(_HEADER, text, pos, "OPENQASM")
+        if match.group(1) not in ('2', '2.0'):
+            raise QASMParseError("Unsupported OpenQASM version {}."
+                                 .format(match.group(1)))
+        return match.end()
+
+    def _parse_include(self, text, pos, directory, condition):
+        match = self._match(_INCLUDE, text, pos, "include")
+        name = match.group(1)
+        if name == "qelib1.inc":
+            self._gates.update(_QELIB1_GATES)
+        else:
+            path = os.path.join(directory, name)
+            try:
+                with open(path) as include_file:
+                    included = include_file.read()
+            except IOError:
+                raise QASMParseError("Cannot read included file '{}'."
+                                     .format(name))
+            self._parse(included, os.path.dirname(path), name)
+        return match.end()
+
+    def _parse_qreg(self, text, pos, directory, condition):
+        match = self._match(_REGISTER, text, pos, "register declaration")
+        kind, name, size = match.group(1), match.group(2), int(match.group(3))
+        if name in self.qregs or name in self.cregs:
+            raise QASMParseError("Register '{}' is already declared."
+                                 .format(name))
+        if kind == 'creg':
+            self.cregs[name] = [0] * size
+        else:
+            qubit_ids = [self._new_qubit_id() for _ in range(size)]
+            self.qregs[name] = qubit_ids
+            for qb_id in qubit_ids:
+                self._append(Allocate, ([WeakQubitRef(self._owner, qb_id)],))
+        return match.end()
+
+    _parse_creg = _parse_qreg
+
+    def _parse_gate(self, text, pos, directory, condition):
+        match = self._match(_GATE_DEFINITION, text, pos, "gate definition")
+        kind, name, params, args, body = match.groups()
+        if name in self._gates:
+            raise QASMParseError("Gate '{}' is already defined.".format(name))
+        param_names = _split(params or '')
+        arg_names = _split(args)
+        if len(arg_names) == 0 or len(set(arg_names)) != len(arg_names):
+            raise QASMParseError("Invalid qubit arguments of gate '{}'."
+                                 .format(name))
+        if kind == 'opaque' or body is None:
+            self._gates[name] = (len(param_names), len(arg_names), None)
+        else:
+            self._gates[name] = self._define(param_names, arg_names, body)
+        return match.end()
+
+    _parse_opaque = _parse_gate
+
+    def _define(self, param_names, arg_names, body):
+        """
+        Compile the body of a gate definition.
+
+        Returns:
+            Tuple (number of parameters, number of qubits, function which
+            returns the operations of the gate given its parameters).
+        """
+        entries = []
+        for statement in body.split(';'):
+            if statement.strip() == '':
+                continue
+            match = _BODY_STATEMENT.match(statement)
+            if match is None:
+                raise QASMParseError("Invalid statement '{}' in gate "
+                                     "definition.".format(statement.strip()))
+            name, params, args = match.groups()
+            try:
+                indices = [arg_names.index(arg) for arg in _split(args)]
+            except ValueError:
+                raise QASMParseError("Unknown qubit argument in '{}'."
+                                     .format(statement.strip()))
+            if name == 'barrier':
+                entries.append((_fixed((Barrier, (), (tuple(range(len(
+                    indices))),))), [], indices))
+                continue
+            num_params, num_qubits, expand = self._get_gate(name)
+            functions = [_compile_expression(expression, param_names)
+                         for expression in _split(params or '')]
+            if len(functions) != num_params or len(indices) != num_qubits:
+                raise QASMParseError("Wrong number of arguments of gate "
+                                     "'{}'.".format(name))
+            entries.append((expand, functions, indices))
+
+        def expand_definition(*params):
+            operations = []
+            for expand, functions, indices in entries:
+                for gate, controls, quregs in expand(*_evaluate(functions,
+                                                                params)):
+                    operations.append((gate,
+                                       tuple(indices[c] for c in controls),
+                                       tuple(tuple(indices[q] for q in qureg)
+                                             for qureg in quregs)))
+            return operations
+
+        if len(param_names) == 0:
+            # resolve the operations of gates without parameters only once
+            expand_definition = _fixed(*expand_definition())
+        return (len(param_names), len(arg_names), expand_definition)
+
+    def _get_gate(self, name):
+        if name not in self._gates:
+            raise QASMParseError("Unknown gate '{}'.".format(name))
+        num_params, num_qubits, expand = self._gates[name]
+        if expand is None:
+            raise QASMParseError("Opaque gate '{}' is not supported."
+                                 .format(name))
+        return num_params, num_qubits, expand
+
+    def _get_arguments(self, args, registers):
+        """
+        Return the arguments of a statement; each argument is a list of
+        (register name, index) tuples (containing one element if a single
+        qubit/bit is given).
+        """
+        arguments = []
+        for arg in args.split(','):
+            match = _ARGUMENT.match(arg)
+            if match is None:
+                raise QASMParseError("Invalid argument '{}'."
+                                     .format(arg.strip()))
+            name, index = match.groups()
+            if name not in registers:
+                raise QASMParseError("Unknown register '{}'.".format(name))
+            size = len(registers[name])
+            if index is None:
+                arguments.append([(name, i) for i in range(size)])
+            elif int(index) < size:
+                arguments.append([(name, int(index))])
+            else:
+                raise QASMParseError("Index {} is out of range for register "
+                                     "'{}'.".format(index, name))
+        return arguments
+
+    def _broadcast(self, arguments):
+        """
+        Return the lists of arguments of the individual applications of a
+        statement whose arguments may be registers.
+        """
+        sizes = set(len(arg) for arg in arguments if len(arg) > 1)
+        if len(sizes) > 1:
+            raise QASMParseError("Registers of different sizes.")
+        size = sizes.pop() if len(sizes) > 0 else 1
+        return [[arg[i] if len(arg) > 1 else arg[0] for arg in arguments]
+                for i in range(size)]
+
+    def _resolve(self, name, params, args):
+        """
+        Return the commands (gate, quregs, controls) of a gate statement.
+        """
+        num_params, num_qubits, expand = self._get_gate(name)
+        values = [_evaluate_constant(expression)
+                  for expression in _split(params or '')]
+        arguments = self._get_arguments(args, self.qregs)
+        if len(values) != num_params or len(arguments) != num_qubits:
+            raise QASMParseError("Wrong number of arguments of gate '{}'."
+                                 .format(name))
+        operations = expand(*values)
+        commands = []
+        for application in self._broadcast(arguments):
+            qubits = [WeakQubitRef(self._owner, self.qregs[reg][i])
+                      for reg, i in application]
+            if len(set(qubit.id for qubit in qubits)) != len(qubits):
+                raise QASMParseError("Gate '{}' is applied to the same qubit "
+                                     "twice.".format(name))
+            for gate, controls, quregs in operations:
+                commands.append((gate,
+                                 tuple([qubits[q] for q in qureg]
+                                       for qureg in quregs),
+                                 [qubits[c] for c in controls]))
+        return commands
+
+    def _parse_measure(self, text, pos, directory, condition):
+        match = self._match(_MEASURE, text, pos, "measure")
+        qubits = self._get_arguments(match.group(1), self.qregs)
+        bits = self._get_arguments(match.group(2), self.cregs)
+        if (len(qubits) != 1 or len(bits) != 1 or
+                len(qubits[0]) != len(bits[0])):
+            raise QASMParseError("Invalid arguments of measure.")
+        if condition is not False:
+            for (qreg, i), (creg, j) in zip(qubits[0], bits[0]):
+                qb_id = self.qregs[qreg][i]
+                # the main engine only keeps the last result of a qubit
+                if (qb_id in self._unread_qubits and
+                        hasattr(self._owner, 'get_measurement_result')):
+                    self._flush()
+                    try:
+                        self._read_measurements()
+                    except NotYetMeasuredError:
+                        # the back-end does not return measurement results
+                        self._unread_bits = dict()
+                        self._unread_qubits = set()
+                self._append(Measure, ([WeakQubitRef(self._owner, qb_id)],))
+                self.cregs[creg][j] = None
+                self._unread_bits[(creg, j)] = qb_id
+                self._unread_qubits.add(qb_id)
+        return match.end()
+
+    def _parse_barrier(self, text, pos, directory, condition):
+        match = self._match(_BARRIER, text, pos, "barrier")
+        qubit_ids = []
+        for arg in self._get_arguments(match.group(1), self.qregs):
+            qubit_ids.extend(self.qregs[reg][i] for reg, i in arg)
+        if condition is not False:
+            self._append(Barrier, ([WeakQubitRef(self._owner, qb_id)
+                                    for qb_id in qubit_ids],))
+        return match.end()
+
+    def _parse_reset(self, text, pos, directory, condition):
+        raise QASMParseError("The reset statement is not supported.")
+
+    def _parse_if(self, text, pos, directory, condition):
+        match = self._match(_IF, text, pos, "if")
+        name, value = match.group(1), int(match.group(2))
+        if name not in self.cregs:
+            raise QASMParseError("Unknown register '{}'.".format(name))
+        if not hasattr(self._owner, 'get_measurement_result'):
+            raise QASMParseError("The if statement requires a MainEngine.")
+        # the measurement results are only available after a flush
+        self._flush()
+        condition = self.get_creg_value(name) == value
+        pos = _WHITESPACE.match(text, match.end()).end()
+        return self._statement(text, pos, directory, condition)
@@ -0,0 +1,230 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Tests for libs.qasm._importer."""
+
+import numpy as np
+import pytest
+
+from projectq import MainEngine
+from projectq.backends import Simulator
+from projectq.cengines import DummyEngine
+from projectq.ops import (Allocate, Barrier, FlushGate, H, Measure, Rz, Swap,
+                          X)
+
+from projectq.libs.qasm import QASMImporter, QASMParseError
+
+_HEADER = "OPENQASM 2.0;\ninclude \"qelib1.inc\";\n"
+
+# definitions of qelib1.inc in terms of U and CX
+_REFERENCE_GATES = """
+gate ref_u1(lambda) q { U(0, 0, lambda) q; }
+gate ref_u2(phi, lambda) q { U(pi/2, phi, lambda) q; }
+gate ref_cu1(lambda) a, b {
+  ref_u1(lambda/2) a; CX a, b; ref_u1(-lambda/2) b; CX a, b;
+  ref_u1(lambda/2) b;
+}
+gate ref_crz(lambda) a, b {
+  ref_u1(lambda/2) b; CX a, b; ref_u1(-lambda/2) b; CX a, b;
+}
+gate ref_cu3(theta, phi, lambda) c, t {
+  ref_u1((lambda+phi)/2) c;
+  ref_u1((lambda-phi)/2) t;
+  CX c, t;
+  U(-theta/2, 0, -(phi+lambda)/2) t;
+  CX c, t;
+  U(theta/2, phi, 0) t;
+}
+gate ref_rzz(theta) a, b { CX a, b; ref_u1(theta) b; CX a, b; }
+gate ref_swap a, b { CX a, b; CX b, a; CX a, b; }
+"""
+
+
+def _write(tmpdir, program, name="circuit.qasm"):
+    path = tmpdir.join(name)
+    path.write(program)
+    return str(path)
+
+
+def _run(tmpdir, program, engine=None, **kwargs):
+    if engine is None:
+        engine = DummyEngine(save_commands=True)
+    eng = MainEngine(engine, [])
+    importer = QASMImporter(_write(tmpdir, program), **kwargs)
+    importer.run(eng)
+    return eng, importer
+
+
+def test_importer_commands(tmpdir):
+    program = _HEADER + """
+    // comments are ignored
+    qreg q[3];
+    creg c[3];
+    gate maj a, b, c { cx c, b; cx c, a; ccx a, b, c; }
+    h q;
+    cx q[0], q[1];
+    rz(pi / 2) q[2];
+    maj q[0], q[1], q[2];
+    swap q[0],q[2];
+    barrier q;
+    measure q[1] -> c[2];
+    """
+    backend = DummyEngine(save_commands=True)
+    eng, importer = _run(tmpdir, program, backend)
+    commands = [cmd for cmd in backend.received_commands
+                if not isinstance(cmd.gate, FlushGate)]
+    assert [cmd.gate for cmd in commands] == ([Allocate] * 3 + [H] * 3 +
+                                              [X, Rz(np.pi / 2), X, X, X,
+                                               Swap, Barrier, Measure])
+    assert importer.num_commands == len(commands)
+    q = importer.qregs["q"]
+    assert [cmd.control_qubits[0].id for cmd in commands[6:11]
+            if cmd.gate == X] == [q[0], q[2], q[2], q[0]]
+    assert ([qb.id for qb in commands[10].control_qubits] ==
+            [q[0], q[1]])
+    assert [len(qureg) for qureg in commands[12].qubits] == [3]
+    # the back-end does not return the result of the measurement
+    assert importer.cregs == {"c": [0, 0, None]}
+    assert isinstance(backend.received_commands[-1].gate, FlushGate)
+    # new qubits do not collide with the imported ones
+    assert eng.allocate_qubit()[0].id == 3
+    assert [qb.id for qb in importer.get_qureg("q")] == q
+
+
+def test_importer_batches(tmpdir):
+    batches = []
+
+    class Backend(DummyEngine):
+        def receive(self, command_list):
+            batches.append(len(command_list))
+
+    program = _HEADER + "qreg q[2];\n" + "cx q[0], q[1];\n" * 10
+    eng, importer = _run(tmpdir, program, Backend(), batch_size=4)
+    # 12 commands and the flush
+    assert batches == [4, 4, 4, 1]
+
+    batches[:] = []
+    with open(_write(tmpdir, program)) as qasm_file:
+        importer = QASMImporter(qasm_file, batch_size=5)
+        assert importer.run(eng, flush=False) == 12
+    assert batches == [5, 5, 2]
+
+
+@pytest.mark.parametrize("statement, reference", [
+    ("u1(0.3) q[0];", "ref_u1(0.3) q[0];"),
+    ("u2(0.3, -1.2) q[0];", "ref_u2(0.3, -1.2) q[0];"),
+    ("u3(0.3, 0.7, -1.2) q[0];", "U(0.3, 0.7, -1.2) q[0];"),
+    ("cu1(0.7) q[0], q[1];", "ref_cu1(0.7) q[0], q[1];"),
+    ("crz(0.7) q[1], q[0];", "ref_crz(0.7) q[1], q[0];"),
+    ("cu3(0.3, 0.7, -1.2) q[0], q[1];",
+     "ref_cu3(0.3, 0.7, -1.2) q[0], q[1];"),
+    ("rzz(0.4) q[0], q[1];", "ref_rzz(0.4) q[0], q[1];"),
+    ("swap q[0], q[1];", "ref_swap q[0], q[1];"),
+    ("rz(2*pi^2 - ln(2)) q[1];", "U(0, 0, 2*pi^2 - ln(2)) q[1];")])
+def test_importer_qelib1_gates(tmpdir, statement, reference):
+    # random initial state
+    prefix = (_HEADER + _REFERENCE_GATES + "qreg q[2];\n"
+              "U(0.5, 1.1, 0.2) q[0]; U(1.3, -0.4, 0.9) q[1];\n"
+              "CX q[0], q[1]; U(0.8, 0.1, -0.3) q[1];\n")
+    states = []
+    for program in [prefix + statement, prefix + reference]:
+        eng, _ = _run(tmpdir, program, Simulator())
+        states.append(np.array(eng.backend.cheat()[1]))
+    # equal up to a global phase
+    assert abs(np.vdot(states[0], states[1])) == pytest.approx(1.)
+
+
+def test_importer_measure_and_if(tmpdir):
+    program = _HEADER + """
+    qreg q[3];
+    creg c[2];
+    creg d[1];
+    x q[0];
+    measure q[0] -> c[0];
+    if (c == 1) x q[1];
+    if (c == 0) x q[2];
+    measure q[1] -> c[1];
+    if(c==3) measure q[2] -> d[0];
+    """
+    eng, importer = _run(tmpdir, program, Simulator())
+    # the results have been read when the program was flushed
+    assert importer.cregs == {"c": [1, 1], "d": [0]}
+    assert importer.get_creg_value("c") == 3
+    assert importer.get_creg_value("d") == 0
+    assert importer.cregs["d"] == [0]
+    assert [int(qubit) for qubit in importer.get_qureg("q")[:2]] == [1, 1]
+
+
+def test_importer_measure_same_qubit_twice(tmpdir):
+    program = _HEADER + """
+    qreg q[2];
+    creg c[2];
+    creg d[1];
+    measure q[0] -> c[0];
+    x q[0];
+    measure q[0] -> c[1];
+    if (c == 2) x q[1];
+    x q[0];
+    measure q[0] -> c[1];
+    measure q[1] -> d[0];
+    """
+    eng, importer = _run(tmpdir, program, Simulator())
+    assert importer.get_creg_value("c") == 0
+    assert importer.get_creg_value("d") == 1
+    assert importer.cregs == {"c": [0, 0], "d": [1]}
+
+
+def test_importer_include(tmpdir):
+    tmpdir.mkdir("lib").join("gates.inc").write(
+        "gate bell a, b { h a; cx a, b; }\n")
+    program = _HEADER + ("include \"lib/gates.inc\";\nqreg q[2];\n"
+                         "bell q[0], q[1];")
+    backend = DummyEngine(save_commands=True)
+    _run(tmpdir, program, backend)
+    assert [cmd.gate for cmd in backend.received_commands[2:4]] == [H, X]
+
+
+@pytest.mark.parametrize("program, line, message", [
+    ("qreg q[2];\nfoo q[0];", 2, "Unknown gate 'foo'"),
+    ("qreg q[2];\nCX q[0], q[0];", 2, "same qubit"),
+    ("qreg q[2];\n\nCX q[0], q[2];", 3, "out of range"),
+    ("qreg q[2];\nqreg r[3];\nCX q, r;", 3, "different sizes"),
+    ("qreg q[2];\nU(0, 0) q[0];", 2, "Wrong number of arguments"),
+    ("qreg q[2];\nU(0, 0, a) q[0];", 2, "Unknown parameter 'a'"),
+    ("qreg q[2];\nU(0, 0, 1/0) q[0];", 2, "Failed to evaluate"),
+    ("qreg q[2];\nU(0, 0, 1 +) q[0];", 2, "Invalid expression"),
+    ("qreg q[2];\nU(0, 0, 1 % 2) q[0];", 2, "Invalid character"),
+    ("qreg q[2];\nqreg q[1];", 2, "already declared"),
+    ("qreg q[1];\nreset q[0];", 2, "not supported"),
+    ("opaque magic a;\nqreg q[1];\nmagic q[0];", 3, "Opaque gate"),
+    ("gate g a { CX a, b; }", 1, "Unknown qubit argument"),
+    ("qreg q[1];\ncreg c[1];\nif (c == 0) qreg r[1];", 3,
+     "Invalid statement"),
+    ("qreg q[1]", 1, "Invalid register declaration"),
+    ("qreg q[1];\n{ x q[0]; }", 2, "Invalid statement"),
+    ("OPENQASM 3.0;", 1, "Unsupported OpenQASM version"),
+    ("include \"missing.inc\";", 1, "Cannot read")])
+def test_importer_errors(tmpdir, program, line, message):
+    with pytest.raises(QASMParseError) as excinfo:
+        _run(tmpdir, program)
+    assert excinfo.value.line == line
+    assert message in str(excinfo.value)
+    assert "circuit.qasm, line {}:".format(line) in str(excinfo.value)
+
+
+def test_importer_if_requires_main_engine(tmpdir):
+    program = "qreg q[1];\ncreg c[1];\nif (c == 0) CX q[0], q[0];"
+    importer = QASMImporter(_write(tmpdir, program))
+    with pytest.raises(QASMParseError):
+        importer.run(DummyEngine())
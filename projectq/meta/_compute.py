@@ -44,6 +44,7 @@ class ComputeTag(object):
     """
     Compute meta tag.
     """
+    __slots__ = ()
 
     def __eq__(self, other):
         return isinstance(other, ComputeTag)
@@ -56,6 +57,7 @@ class UncomputeTag(object):
     """
     Uncompute meta tag.
     """
+    __slots__ = ()
 
     def __eq__(self, other):
         return isinstance(other, UncomputeTag)
@@ -38,6 +38,8 @@ class LoopTag(object):
     """
     Loop meta tag
     """
+    __slots__ = ('num', 'id')
+
     def __init__(self, num):
         self.num = num
         self.id = LoopTag.loop_tag_id
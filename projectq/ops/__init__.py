@@ -31,6 +31,7 @@ from ._metagates import (DaggeredGate,
 from ._gates import *
 from ._qftgate import QFT, QFTGate
 from ._qubit_operator import QubitOperator
+from ._packed_qubit_operator import PackedQubitOperator
 from ._shortcuts import *
 from ._time_evolution import TimeEvolution
 from ._uniformly_controlled_rotation import (UniformlyControlledRy,
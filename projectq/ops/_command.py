@@ -58,6 +58,16 @@ def apply_command(cmd):
     engine.receive([cmd])
 
 
+def _copy_tags(tags):
+    """
+    Return a deep copy of a list of tags (most commands carry no tags, in
+    which case deepcopy is skipped).
+    """
+    if len(tags) == 0:
+        return []
+    return deepcopy(tags)
+
+
 class Command(object):
     """
     Class used as a container to store commands. If a gate is applied to
@@ -82,6 +92,7 @@ class Command(object):
           and hence adds its LoopTag to the end.
         all_qubits: A tuple of control_qubits + qubits
     """
+    __slots__ = ('gate', 'tags', '_qubits', '_control_qubits', '_engine')
 
     def __init__(self, engine, gate, qubits, controls=(), tags=()):
         """
@@ -130,7 +141,7 @@ class Command(object):
                        deepcopy(self.gate),
                        self.qubits,
                        list(self.control_qubits),
-                       deepcopy(self.tags))
+                       _copy_tags(self.tags))
 
     def get_inverse(self):
         """
@@ -147,7 +158,7 @@ class Command(object):
                        projectq.ops.get_inverse(self.gate),
                        self.qubits,
                        list(self.control_qubits),
-                       deepcopy(self.tags))
+                       _copy_tags(self.tags))
 
     def get_merged(self, other):
         """
@@ -167,7 +178,7 @@ class Command(object):
                            self.gate.get_merged(other.gate),
                            self.qubits,
                            self.control_qubits,
-                           deepcopy(self.tags))
+                           _copy_tags(self.tags))
         raise projectq.ops.NotMergeable("Commands not mergeable.")
 
     def _order_qubits(self, qubits):
@@ -180,9 +191,11 @@ class Command(object):
 
         Returns: Ordered tuple of quantum registers
         """
-        ordered_qubits = list(qubits)
         # e.g. [[0,4],[1,2,3]]
         interchangeable_qubit_indices = self.interchangeable_qubit_indices
+        if len(interchangeable_qubit_indices) == 0:
+            return tuple(qubits)
+        ordered_qubits = list(qubits)
         for old_positions in interchangeable_qubit_indices:
             new_positions = sorted(old_positions,
                                    key=lambda x: ordered_qubits[x][0].id)
@@ -219,9 +232,9 @@ class Command(object):
         Args:
             control_qubits (Qureg): quantum register
         """
-        self._control_qubits = ([WeakQubitRef(qubit.engine, qubit.id)
-                                 for qubit in qubits])
-        self._control_qubits = sorted(self._control_qubits, key=lambda x: x.id)
+        self._control_qubits = sorted([WeakQubitRef(qubit.engine, qubit.id)
+                                       for qubit in qubits],
+                                      key=lambda x: x.id)
 
     def add_control_qubits(self, qubits):
         """
@@ -88,6 +88,15 @@ def test_command_deepcopy(main_engine):
     assert copied_cmd.gate == gate
 
 
+def test_command_slots(main_engine):
+    qubit = Qureg([Qubit(main_engine, 0)])
+    cmd = _command.Command(main_engine, Rx(0.5), (qubit,))
+    assert not hasattr(cmd, '__dict__')
+    assert not hasattr(cmd.qubits[0][0], '__dict__')
+    copied_cmd = deepcopy(cmd)
+    assert copied_cmd.tags == [] and copied_cmd.tags is not cmd.tags
+
+
 def test_command_get_inverse(main_engine):
     qubit = main_engine.allocate_qubit()
     ctrl_qubit = main_engine.allocate_qubit()
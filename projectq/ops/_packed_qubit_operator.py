@@ -0,0 +1,358 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+PackedQubitOperator stores a sum of Pauli operators as bit masks (for fast
+arithmetic on operators with many terms).
+"""
+import numbers
+
+import numpy
+
+from ._qubit_operator import QubitOperator
+
+
+# number of bits set in each byte
+_POPCOUNT = numpy.array([bin(i).count('1') for i in range(256)],
+                        dtype=numpy.int64)
+
+# i ** k
+_PHASES = numpy.array([1., 1.j, -1., -1.j])
+
+# maximal number of products which are computed at once
+_BLOCK_SIZE = 1 << 18
+
+
+def _popcount(words):
+    """
+    Return the number of bits set in the last axis of a uint64 array.
+    """
+    words = numpy.ascontiguousarray(words, dtype=numpy.uint64)
+    num_bytes = _POPCOUNT[words.view(numpy.uint8)]
+    return num_bytes.reshape(words.shape + (8,)).sum(axis=(-2, -1))
+
+
+def _product_phases(x1, z1, x2, z2):
+    """
+    Return the exponents k such that the product of the Paulis (x1, z1) and
+    (x2, z2) is i ** k times the Pauli (x1 ^ x2, z1 ^ z2).
+
+    XY = iZ, YZ = iX and ZX = iY contribute i, the products in the reversed
+    order contribute -i.
+    """
+    pauli_x1, pauli_y1, pauli_z1 = x1 & ~z1, x1 & z1, z1 & ~x1
+    pauli_x2, pauli_y2, pauli_z2 = x2 & ~z2, x2 & z2, z2 & ~x2
+    plus = ((pauli_x1 & pauli_y2) | (pauli_y1 & pauli_z2) |
+            (pauli_z1 & pauli_x2))
+    minus = ((pauli_y1 & pauli_x2) | (pauli_z1 & pauli_y2) |
+             (pauli_x1 & pauli_z2))
+    return (_popcount(plus) - _popcount(minus)) % 4
+
+
+class PackedQubitOperator(object):
+    """
+    A sum of Pauli terms (see QubitOperator) stored as NumPy arrays.
+
+    Term k is coefficients[k] times the tensor product of the Pauli operators
+    given by the bits of x[k] and z[k]: qubit j is acted upon by I, X, Z or
+    Y if bit j of (x[k], z[k]) is (0, 0), (1, 0), (0, 1) or (1, 1),
+    respectively. The masks are arrays of 64-bit words (qubit j is bit j % 64
+    of word j // 64).
+
+    Multiplication, addition, compress and the commutation checks act on all
+    terms at once and are much faster than the corresponding operations of
+    QubitOperator for operators with many terms. Use from_qubit_operator and
+    to_qubit_operator to convert between the two representations.
+
+    Example:
+        .. code-block:: python
+
+            hamiltonian = PackedQubitOperator.from_qubit_operator(
+                QubitOperator('X0 X1', .5) + QubitOperator('Z1', .3))
+            square = (hamiltonian * hamiltonian).to_qubit_operator()
+    """
+    def __init__(self, x, z, coefficients):
+        """
+        Initialize a PackedQubitOperator.
+
+        Args:
+            x (numpy.ndarray): uint64 array of shape (num_terms, num_words)
+                with the X bits of the terms.
+            z (numpy.ndarray): uint64 array with the Z bits (same shape).
+            coefficients (numpy.ndarray): Complex coefficients of the terms.
+        """
+        self.x = numpy.asarray(x, dtype=numpy.uint64)
+        self.z = numpy.asarray(z, dtype=numpy.uint64)
+        self.coefficients = numpy.asarray(coefficients, dtype=complex)
+        if (self.x.ndim != 2 or self.x.shape != self.z.shape or
+                self.coefficients.shape != (self.x.shape[0],)):
+            raise ValueError("Inconsistent shapes of the bit masks and the "
+                             "coefficients.")
+
+    @staticmethod
+    def from_qubit_operator(qubit_operator, num_qubits=None):
+        """
+        Return the PackedQubitOperator representing a QubitOperator.
+
+        Args:
+            qubit_operator (QubitOperator): Operator to convert.
+            num_qubits (int): Number of qubits (by default, the number of
+                qubits the operator acts on).
+        """
+        if num_qubits is None:
+            num_qubits = 1 + max([index for term in qubit_operator.terms
+                                  for index, _ in term] + [-1])
+        num_words = max(1, (num_qubits + 63) // 64)
+        num_terms = len(qubit_operator.terms)
+        x = numpy.zeros((num_terms, num_words), dtype=numpy.uint64)
+        z = numpy.zeros((num_terms, num_words), dtype=numpy.uint64)
+        coefficients = numpy.zeros(num_terms, dtype=complex)
+        for k, (term, coefficient) in enumerate(qubit_operator.terms.items()):
+            x_words = [0] * num_words
+            z_words = [0] * num_words
+            for index, action in term:
+                if index >= num_qubits:
+                    raise ValueError("The operator acts on more than {} "
+                                     "qubits.".format(num_qubits))
+                bit = 1 << (index % 64)
+                if action in 'XY':
+                    x_words[index // 64] |= bit
+                if action in 'YZ':
+                    z_words[index // 64] |= bit
+            x[k] = x_words
+            z[k] = z_words
+            coefficients[k] = coefficient
+        return PackedQubitOperator(x, z, coefficients)
+
+    def to_qubit_operator(self):
+        """
+        Return the QubitOperator representing this operator.
+        """
+        qubit_operator = QubitOperator()
+        for x_words, z_words, coefficient in zip(self.x.tolist(),
+                                                 self.z.tolist(),
+                                                 self.coefficients.tolist()):
+            term = []
+            for word, (x_word, z_word) in enumerate(zip(x_words, z_words)):
+                bits = x_word | z_word
+                while bits:
+                    bit = bits & -bits
+                    bits ^= bit
+                    index = 64 * word + bit.bit_length() - 1
+                    if not z_word & bit:
+                        term.append((index, 'X'))
+                    elif x_word & bit:
+                        term.append((index, 'Y'))
+                    else:
+                        term.append((index, 'Z'))
+            if coefficient.imag == 0:
+                coefficient = coefficient.real
+            qubit_operator.terms[tuple(term)] = coefficient
+        return qubit_operator
+
+    @property
+    def num_words(self):
+        return self.x.shape[1]
+
+    def __len__(self):
+        return len(self.coefficients)
+
+    def _padded(self, num_words):
+        """
+        Return the bit masks with num_words words.
+        """
+        padding = ((0, 0), (0, num_words - self.num_words))
+        return (numpy.pad(self.x, padding, 'constant'),
+                numpy.pad(self.z, padding, 'constant'))
+
+    def _aligned(self, other):
+        """
+        Return the bit masks of this operator and of the operator other with
+        the same number of words.
+        """
+        num_words = max(self.num_words, other.num_words)
+        return self._padded(num_words) + other._padded(num_words)
+
+    @staticmethod
+    def _deduplicated(x, z, coefficients):
+        """
+        Return the operator with the given terms, where the coefficients of
+        identical terms have been added up.
+        """
+        if len(coefficients) == 0:
+            return PackedQubitOperator(x, z, coefficients)
+        keys = numpy.concatenate([x, z], axis=1)
+        # sort the terms (lexsort is much faster than numpy.unique(axis=0))
+        order = numpy.lexsort(keys.T[::-1])
+        keys = keys[order]
+        first = numpy.ones(len(keys), dtype=bool)
+        first[1:] = numpy.any(keys[1:] != keys[:-1], axis=1)
+        starts = numpy.flatnonzero(first)
+        sums = numpy.add.reduceat(coefficients[order], starts)
+        num_words = x.shape[1]
+        return PackedQubitOperator(keys[starts, :num_words],
+                                   keys[starts, num_words:], sums)
+
+    def simplify(self):
+        """
+        Return the operator in which the coefficients of identical terms
+        have been added up (and terms with coefficient 0 were removed).
+        """
+        result = self._deduplicated(self.x, self.z, self.coefficients)
+        nonzero = result.coefficients != 0
+        return PackedQubitOperator(result.x[nonzero], result.z[nonzero],
+                                   result.coefficients[nonzero])
+
+    def compress(self, abs_tol=1e-12):
+        """
+        Eliminates all terms with coefficients close to zero and removes
+        imaginary parts of coefficients that are close to zero (see
+        QubitOperator.compress).
+
+        Args:
+            abs_tol(float): Absolute tolerance, must be at least 0.0
+        """
+        coefficients = self.coefficients.copy()
+        real = numpy.abs(coefficients.imag) <= abs_tol
+        coefficients[real] = coefficients[real].real
+        keep = numpy.abs(coefficients) > abs_tol
+        self.x = self.x[keep]
+        self.z = self.z[keep]
+        self.coefficients = coefficients[keep]
+
+    def __add__(self, addend):
+        """
+        Return self + addend for a PackedQubitOperator.
+        """
+        if not isinstance(addend, PackedQubitOperator):
+            raise TypeError('Cannot add invalid type to PackedQubitOperator.')
+        x1, z1, x2, z2 = self._aligned(addend)
+        return PackedQubitOperator(
+            numpy.concatenate([x1, x2]), numpy.concatenate([z1, z2]),
+            numpy.concatenate([self.coefficients,
+                               addend.coefficients])).simplify()
+
+    def __neg__(self):
+        return -1. * self
+
+    def __sub__(self, subtrahend):
+        """
+        Return self - subtrahend for a PackedQubitOperator.
+        """
+        if not isinstance(subtrahend, PackedQubitOperator):
+            raise TypeError('Cannot subtract invalid type from '
+                            'PackedQubitOperator.')
+        return self + (-subtrahend)
+
+    def _products(self, other, mask=None):
+        """
+        Return the sum of the products of all pairs of terms of self and
+        other (for which mask is True).
+        """
+        x1, z1, x2, z2 = self._aligned(other)
+        num_words = x1.shape[1]
+        # the products of each block are deduplicated before they are
+        # combined, such that the memory is bounded by the number of distinct
+        # products (plus one block)
+        blocks = []
+        block = max(1, _BLOCK_SIZE // max(1, len(other)))
+        for start in range(0, len(self), block):
+            stop = min(start + block, len(self))
+            left_x, left_z = x1[start:stop, None], z1[start:stop, None]
+            phases = _product_phases(left_x, left_z, x2[None], z2[None])
+            coefficients = (self.coefficients[start:stop, None] *
+                            other.coefficients[None] * _PHASES[phases])
+            x = left_x ^ x2[None]
+            z = left_z ^ z2[None]
+            if mask is None:
+                x = x.reshape(-1, num_words)
+                z = z.reshape(-1, num_words)
+                coefficients = coefficients.reshape(-1)
+            else:
+                selected = mask[start:stop]
+                x, z, coefficients = (x[selected], z[selected],
+                                      coefficients[selected])
+            blocks.append(self._deduplicated(x, z, coefficients))
+        if len(blocks) == 0:
+            return PackedQubitOperator(numpy.zeros((0, num_words)),
+                                       numpy.zeros((0, num_words)), [])
+        return self._deduplicated(
+            numpy.concatenate([result.x for result in blocks]),
+            numpy.concatenate([result.z for result in blocks]),
+            numpy.concatenate([result.coefficients for result in blocks]))
+
+    def __mul__(self, multiplier):
+        """
+        Return self * multiplier for a scalar, or a PackedQubitOperator.
+        """
+        if isinstance(multiplier, numbers.Number):
+            return PackedQubitOperator(self.x, self.z,
+                                       self.coefficients * multiplier)
+        if isinstance(multiplier, PackedQubitOperator):
+            return self._products(multiplier)
+        raise TypeError('Cannot multiply PackedQubitOperator with invalid '
+                        'type.')
+
+    def __rmul__(self, multiplier):
+        """
+        Return multiplier * self for a scalar.
+        """
+        if not isinstance(multiplier, numbers.Number):
+            raise TypeError('Cannot multiply PackedQubitOperator with invalid '
+                            'type.')
+        return self * multiplier
+
+    def commuting_terms(self, other):
+        """
+        Return a boolean array whose entry [j, k] is True if term j of self
+        commutes with term k of other.
+        """
+        x1, z1, x2, z2 = self._aligned(other)
+        overlap = ((x1[:, None] & z2[None]) ^ (z1[:, None] & x2[None]))
+        return _popcount(overlap) % 2 == 0
+
+    def qubitwise_commuting_terms(self, other):
+        """
+        Return a boolean array whose entry [j, k] is True if term j of self
+        and term k of other act with the same Pauli operator on every qubit
+        they both act on (such that they are diagonalized by the same
+        single-qubit basis changes).
+        """
+        x1, z1, x2, z2 = self._aligned(other)
+        overlap = (x1 | z1)[:, None] & (x2 | z2)[None]
+        differ = (x1[:, None] ^ x2[None]) | (z1[:, None] ^ z2[None])
+        return ~numpy.any(overlap & differ, axis=-1)
+
+    def commutator(self, other):
+        """
+        Return the commutator self * other - other * self.
+
+        Only the anti-commuting pairs of terms contribute (twice their
+        product).
+        """
+        return 2 * self._products(other, ~self.commuting_terms(other))
+
+    def commutes_with(self, other, abs_tol=1e-12):
+        """
+        Return True if the commutator of self and other vanishes (up to
+        coefficients with absolute value abs_tol).
+        """
+        return bool(numpy.all(numpy.abs(self.commutator(other).coefficients)
+                              <= abs_tol))
+
+    def __str__(self):
+        return str(self.to_qubit_operator())
+
+    def __repr__(self):
+        return str(self)
@@ -0,0 +1,159 @@
+#   Copyright 2018 ProjectQ-Framework (www.projectq.ch)
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Tests for _packed_qubit_operator.py."""
+import random
+
+import numpy
+import pytest
+
+from projectq.ops import _packed_qubit_operator as pqo
+from projectq.ops import PackedQubitOperator, QubitOperator
+from projectq.ops._qubit_operator import _PAULI_OPERATOR_PRODUCTS
+
+
+def _random_operator(rng, num_terms, num_qubits):
+    operator = QubitOperator()
+    for _ in range(num_terms):
+        indices = sorted(rng.sample(range(num_qubits),
+                                    rng.randint(0, min(4, num_qubits))))
+        term = tuple((index, rng.choice('XYZ')) for index in indices)
+        operator += QubitOperator(term, complex(rng.gauss(0, 1),
+                                                rng.gauss(0, 1)))
+    return operator
+
+
+def test_packed_qubit_operator_conversion():
+    operator = (QubitOperator('X0 Y3 Z70', 0.5) + QubitOperator('', 2.j) +
+                QubitOperator('Y64', -1.))
+    packed = PackedQubitOperator.from_qubit_operator(operator)
+    assert packed.num_words == 2
+    assert len(packed) == 3
+    assert packed.to_qubit_operator() == operator
+    assert str(packed) == str(packed.to_qubit_operator())
+    empty = PackedQubitOperator.from_qubit_operator(QubitOperator())
+    assert len(empty) == 0 and empty.num_words == 1
+    with pytest.raises(ValueError):
+        PackedQubitOperator.from_qubit_operator(operator, num_qubits=64)
+    with pytest.raises(ValueError):
+        PackedQubitOperator(numpy.zeros((2, 1)), numpy.zeros((2, 1)), [1.])
+
+
+@pytest.mark.parametrize("left, right", list(_PAULI_OPERATOR_PRODUCTS))
+def test_packed_qubit_operator_pauli_products(left, right):
+    packed = [PackedQubitOperator.from_qubit_operator(
+        QubitOperator('' if pauli == 'I' else pauli + '0'), num_qubits=1)
+        for pauli in (left, right)]
+    scalar, pauli = _PAULI_OPERATOR_PRODUCTS[(left, right)]
+    expected = QubitOperator('' if pauli == 'I' else pauli + '0', scalar)
+    assert (packed[0] * packed[1]).to_qubit_operator() == expected
+
+
+@pytest.mark.parametrize("num_qubits", [5, 130])
+def test_packed_qubit_operator_arithmetic(monkeypatch, num_qubits):
+    # several blocks of products
+    monkeypatch.setattr(pqo, "_BLOCK_SIZE", 100)
+    rng = random.Random(num_qubits)
+    left = _random_operator(rng, 40, num_qubits)
+    right = _random_operator(rng, 30, num_qubits)
+    packed_left = PackedQubitOperator.from_qubit_operator(left)
+    packed_right = PackedQubitOperator.from_qubit_operator(
+        right, num_qubits=num_qubits + 64)
+    assert (packed_left * packed_right).to_qubit_operator().isclose(
+        left * right)
+    assert (packed_left + packed_right).to_qubit_operator().isclose(
+        left + right)
+    assert (packed_left - packed_right).to_qubit_operator().isclose(
+        left - right)
+    assert (2 * packed_left * 1.j).to_qubit_operator().isclose(left * 2.j)
+    assert (numpy.int64(2) * packed_left * numpy.float64(.5)
+            ).to_qubit_operator().isclose(left)
+    assert (-packed_left).to_qubit_operator().isclose(-left)
+    assert packed_left.commutator(packed_right).to_qubit_operator().isclose(
+        left * right - right * left)
+    # terms are deduplicated and cancelling terms are removed
+    assert len(packed_left + packed_left) == len(left.terms)
+    assert len(packed_left - packed_left) == 0
+
+
+def test_packed_qubit_operator_commutation():
+    terms = [QubitOperator('X0 X1'), QubitOperator('Z0'),
+             QubitOperator('Y0 Y1'), QubitOperator('X2')]
+    packed = [PackedQubitOperator.from_qubit_operator(term)
+              for term in terms]
+    operator = packed[0] + packed[1] + packed[2] + packed[3]
+    commuting = operator.commuting_terms(operator)
+    ordered = list(operator.to_qubit_operator().terms)
+    expected = [[_commutes(a, b) for b in ordered] for a in ordered]
+    assert commuting.tolist() == expected
+    assert packed[0].commutes_with(packed[2])
+    assert not packed[0].commutes_with(packed[1])
+    # the commutators of the terms cancel
+    total_z = PackedQubitOperator.from_qubit_operator(QubitOperator('Z0') +
+                                                      QubitOperator('Z1'))
+    assert (packed[0] + packed[2]).commutes_with(total_z)
+    assert not packed[0].commutes_with(total_z)
+    # X0 X1 and Y0 Y1 commute, but not qubit-wise
+    qubitwise = operator.qubitwise_commuting_terms(operator)
+    assert qubitwise.tolist() == [[_qubitwise_commutes(a, b) for b in ordered]
+                                  for a in ordered]
+
+
+def _commutes(left_term, right_term):
+    left, right = QubitOperator(left_term), QubitOperator(right_term)
+    return (left * right - right * left).isclose(QubitOperator())
+
+
+def _qubitwise_commutes(left_term, right_term):
+    left, right = dict(left_term), dict(right_term)
+    return all(left[index] == right[index]
+               for index in set(left) & set(right))
+
+
+def test_packed_qubit_operator_empty_operands():
+    operator = PackedQubitOperator.from_qubit_operator(
+        QubitOperator('X0 Y1') + QubitOperator('Z2'))
+    empty = PackedQubitOperator.from_qubit_operator(QubitOperator(),
+                                                    num_qubits=3)
+    assert operator.commuting_terms(empty).shape == (2, 0)
+    assert empty.commuting_terms(operator).shape == (0, 2)
+    assert operator.commutes_with(empty)
+    assert empty.commutes_with(operator)
+    assert len(operator.commutator(empty)) == 0
+    assert len(empty.commutator(empty)) == 0
+    assert len(operator * empty) == 0
+    assert len(empty * operator) == 0
+    assert pqo._popcount(numpy.zeros((0, 2), dtype=numpy.uint64)).shape == (
+        0,)
+
+
+def test_packed_qubit_operator_compress():
+    operator = (QubitOperator('X0', 1e-13) + QubitOperator('Z1', 1. + 1e-14j)
+                + QubitOperator('Y2', 1.j))
+    packed = PackedQubitOperator.from_qubit_operator(operator)
+    packed.compress()
+    operator.compress()
+    assert packed.to_qubit_operator().terms == operator.terms
+
+
+def test_packed_qubit_operator_invalid_types():
+    packed = PackedQubitOperator.from_qubit_operator(QubitOperator('X0'))
+    with pytest.raises(TypeError):
+        packed + QubitOperator('X0')
+    with pytest.raises(TypeError):
+        packed - 1
+    with pytest.raises(TypeError):
+        packed * "a"
+    with pytest.raises(TypeError):
+        "a" * packed
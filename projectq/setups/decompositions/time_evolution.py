@@ -18,13 +18,104 @@ Registers decomposition for the TimeEvolution gates.
 
 An exact straight forward decomposition of a TimeEvolution gate is possible
 if the hamiltonian has only one term or if all the terms commute with each
-other in which case one can implement each term individually.
+other in which case one can implement each term individually. Commuting
+terms which act with the same Pauli operators on their common qubits
+(qubit-wise commuting terms) share the basis changes which diagonalize them.
+
+A hamiltonian with non-commuting terms can be approximated by a first-,
+second- or fourth-order Trotter-Suzuki product of its commuting groups of
+terms (see get_trotter_rule and trotter_gate_counts). These rules are not
+registered by default, as they are not exact; add them to the rule set, e.g.,
+
+.. code-block:: python
+
+    rule_set = DecompositionRuleSet(
+        modules=[projectq.setups.decompositions],
+        rules=[time_evolution.get_trotter_rule(num_steps=4, order=2)])
 """
 import math
 
+import numpy
+
 from projectq.cengines import DecompositionRule
 from projectq.meta import Control, Compute, Uncompute
-from projectq.ops import TimeEvolution, QubitOperator, H, Y, CNOT, Rz, Rx, Ry
+from projectq.ops import (TimeEvolution, QubitOperator, PackedQubitOperator,
+                          H, Y, CNOT, Ph, Rz, Rx, Ry)
+
+
+#: Two terms whose commutator has a coefficient of at most this absolute
+#: value are considered to commute.
+_COMMUTATOR_TOLERANCE = 1e-9
+_CACHE_SIZE = 128
+_cache = dict()
+
+
+def _color_graph(conflicts):
+    """
+    Partition the vertices of a graph into groups of non-adjacent vertices.
+
+    The vertices are colored greedily in the order of decreasing degree
+    (Welsh-Powell).
+
+    Args:
+        conflicts (numpy.ndarray): Boolean adjacency matrix.
+
+    Returns:
+        List of groups (lists of vertex indices).
+    """
+    order = numpy.argsort(-conflicts.sum(axis=1), kind='mergesort')
+    groups = []
+    for vertex in order:
+        for group in groups:
+            if not conflicts[vertex, group].any():
+                group.append(vertex)
+                break
+        else:
+            groups.append([vertex])
+    return [sorted(group) for group in groups]
+
+
+class _TermCommutation(object):
+    """
+    Commutation relations between the terms of a hamiltonian, which are
+    computed with the symplectic product of their packed Pauli strings.
+    """
+    def __init__(self, hamiltonian):
+        self.terms = list(hamiltonian.terms)
+        self._packed = PackedQubitOperator.from_qubit_operator(hamiltonian)
+        magnitudes = numpy.abs(self._packed.coefficients)
+        self.commuting = (self._packed.commuting_terms(self._packed) |
+                          (2 * numpy.outer(magnitudes, magnitudes) <=
+                           _COMMUTATOR_TOLERANCE))
+        self.all_commute = bool(self.commuting.all())
+        self._groups = dict()
+
+    def groups(self, qubitwise):
+        """
+        Return a partition of the terms into groups of (qubit-wise, if
+        qubitwise is True) commuting terms.
+        """
+        if qubitwise not in self._groups:
+            if qubitwise:
+                commuting = self._packed.qubitwise_commuting_terms(
+                    self._packed)
+            else:
+                commuting = self.commuting
+            self._groups[qubitwise] = _color_graph(~commuting)
+        return [[self.terms[k] for k in group]
+                for group in self._groups[qubitwise]]
+
+
+def _get_term_commutation(hamiltonian):
+    """
+    Return the (cached) _TermCommutation of a hamiltonian.
+    """
+    key = frozenset(hamiltonian.terms.items())
+    if key not in _cache:
+        if len(_cache) >= _CACHE_SIZE:
+            _cache.clear()
+        _cache[key] = _TermCommutation(hamiltonian)
+    return _cache[key]
 
 
 def _recognize_time_evolution_commuting_terms(cmd):
@@ -34,18 +125,7 @@ def _recognize_time_evolution_commuting_terms(cmd):
     hamiltonian = cmd.gate.hamiltonian
     if len(hamiltonian.terms) == 1:
         return False
-    else:
-        id_op = QubitOperator((), 0.0)
-        for term in hamiltonian.terms:
-            test_op = QubitOperator(term, hamiltonian.terms[term])
-            for other in hamiltonian.terms:
-                other_op = QubitOperator(other, hamiltonian.terms[other])
-                commutator = test_op * other_op - other_op * test_op
-                if not commutator.isclose(id_op,
-                                          rel_tol=1e-9,
-                                          abs_tol=1e-9):
-                    return False
-    return True
+    return _get_term_commutation(hamiltonian).all_commute
 
 
 def _decompose_time_evolution_commuting_terms(cmd):
@@ -59,6 +139,318 @@ def _decompose_time_evolution_commuting_terms(cmd):
             TimeEvolution(time, ind_operator) | qureg
 
 
+def _build_parity_tree(terms):
+    """
+    Arrange terms (which are not the identity) in a tree of their parity
+    computations.
+
+    The parity of a term acting on the qubits i_1 < ... < i_k is computed
+    onto qubit i_k by the CNOTs (i_1, i_2), ..., (i_{k-1}, i_k). Terms whose
+    qubits start with the same indices share these CNOTs, which is why the
+    terms are stored in a trie of their qubit indices.
+
+    Returns:
+        Dict mapping the first qubit index to the pair (term or None, subtree)
+    """
+    tree = dict()
+    for term in terms:
+        node = tree
+        indices = [index for index, _ in term]
+        for index in indices[:-1]:
+            node = node.setdefault(index, [None, dict()])[1]
+        node.setdefault(indices[-1], [None, dict()])[0] = term
+    return tree
+
+
+def _count_parity_tree(tree):
+    """
+    Return the number of CNOTs which compute the parities of a parity tree.
+    """
+    return sum(len(children) + _count_parity_tree(children)
+               for _, children in tree.values())
+
+
+def _apply_parity_tree(eng, qureg, tree, parent, time, hamiltonian):
+    """
+    Apply exp(-i * time * coefficient * Z...Z) for all terms of a parity tree
+    by traversing it depth first, i.e., with the terms sorted by their qubit
+    indices, such that consecutive terms only differ in few CNOTs.
+    """
+    for index in sorted(tree):
+        term, children = tree[index]
+        if parent is not None:
+            with Compute(eng):
+                CNOT | (qureg[parent], qureg[index])
+        if term is not None:
+            Rz(time * hamiltonian.terms[term] * 2.) | qureg[index]
+        _apply_parity_tree(eng, qureg, children, index, time, hamiltonian)
+        if parent is not None:
+            Uncompute(eng)
+
+
+def _get_basis(group):
+    """
+    Return a dict mapping the qubit indices to the Pauli operators which act
+    on them in the terms of a group (of qubit-wise commuting terms) with more
+    than one Pauli operator, i.e., the qubits which need a basis change.
+    """
+    basis = dict()
+    for term in group:
+        if len(term) > 1:
+            basis.update(term)
+    return basis
+
+
+def _get_diagonalized_terms(group, basis):
+    """
+    Return the terms of a group which are applied as Z...Z terms after the
+    basis change, i.e., all terms except for the identity and the
+    single-qubit terms on qubits without a basis change.
+    """
+    return [term for term in group
+            if len(term) > 1 or len(term) == 1 and term[0][0] in basis]
+
+
+def _decompose_time_evolution_commuting_groups(cmd):
+    """
+    Implements a TimeEvolution gate with a hamiltonian whose terms commute.
+
+    The terms are partitioned into groups of qubit-wise commuting terms. The
+    terms of a group are diagonalized by the same single-qubit basis changes,
+    which are therefore applied only once per group (instead of once per
+    term as in the decomposition into individual terms). Within a group, the
+    terms share the CNOTs of their parity computations (see
+    _build_parity_tree). Single-qubit terms on qubits which need no basis
+    change for the other terms are applied as Rx, Ry or Rz gates (as in the
+    decomposition into individual terms).
+    """
+    qureg = cmd.qubits[0]
+    eng = cmd.engine
+    time = cmd.gate.time
+    hamiltonian = cmd.gate.hamiltonian
+    groups = _get_term_commutation(hamiltonian).groups(qubitwise=True)
+    rotations = {'X': Rx, 'Y': Ry, 'Z': Rz}
+    with Control(eng, cmd.control_qubits):
+        for group in groups:
+            basis = _get_basis(group)
+            for term in group:
+                if len(term) == 1 and term[0][0] not in basis:
+                    index, action = term[0]
+                    rotations[action](time * hamiltonian.terms[term] *
+                                      2.) | qureg[index]
+            with Compute(eng):
+                # Apply local basis rotations
+                for index, action in sorted(basis.items()):
+                    if action == 'X':
+                        H | qureg[index]
+                    elif action == 'Y':
+                        Rx(math.pi / 2.) | qureg[index]
+            if () in group:
+                Ph(-time * hamiltonian.terms[()]) | qureg[0]
+            tree = _build_parity_tree(_get_diagonalized_terms(group, basis))
+            _apply_parity_tree(eng, qureg, tree, None, time, hamiltonian)
+            Uncompute(eng)
+
+
+def _trotter_sequence(num_groups, num_steps, order):
+    """
+    Return the exponentials of a Trotter-Suzuki product formula.
+
+    Consecutive exponentials of the same group (e.g., the last half step of
+    a second-order step and the first half step of the next one) are merged.
+
+    Args:
+        num_groups (int): Number of groups of commuting terms.
+        num_steps (int): Number of Trotter steps.
+        order (int): Order of the product formula (1, 2 or 4).
+
+    Returns:
+        List of pairs (group index, fraction of the total time).
+    """
+    def second_order_step(fraction):
+        half_steps = [(group, fraction / 2.)
+                      for group in range(num_groups - 1)]
+        return (half_steps + [(num_groups - 1, fraction)] +
+                half_steps[::-1])
+
+    fraction = 1. / num_steps
+    if order == 1:
+        step = [(group, fraction) for group in range(num_groups)]
+    elif order == 2:
+        step = second_order_step(fraction)
+    else:
+        # Suzuki's fourth-order formula
+        p = 1. / (4. - 4. ** (1. / 3.))
+        step = (2 * second_order_step(p * fraction) +
+                second_order_step((1. - 4. * p) * fraction) +
+                2 * second_order_step(p * fraction))
+    sequence = []
+    for group, group_fraction in num_steps * step:
+        if sequence and sequence[-1][0] == group:
+            sequence[-1] = (group, sequence[-1][1] + group_fraction)
+        else:
+            sequence.append((group, group_fraction))
+    return sequence
+
+
+def _check_trotter_parameters(num_steps, order):
+    if order not in (1, 2, 4):
+        raise ValueError("The order of the Trotter-Suzuki formula has to be "
+                         "1, 2 or 4.")
+    if int(num_steps) != num_steps or num_steps < 1:
+        raise ValueError("The number of Trotter steps has to be a positive "
+                         "integer.")
+
+
+def _group_hamiltonians(hamiltonian):
+    """
+    Return the hamiltonians of the groups of commuting terms of hamiltonian.
+    """
+    group_hamiltonians = []
+    for group in _get_term_commutation(hamiltonian).groups(qubitwise=False):
+        group_hamiltonian = QubitOperator()
+        for term in group:
+            group_hamiltonian.terms[term] = hamiltonian.terms[term]
+        group_hamiltonians.append(group_hamiltonian)
+    return group_hamiltonians
+
+
+def get_trotter_rule(num_steps=1, order=1):
+    """
+    Return a decomposition rule which approximates TimeEvolution gates with
+    non-commuting terms by a Trotter-Suzuki product formula.
+
+    The terms of the hamiltonian H are partitioned into groups H_1, ..., H_m
+    of commuting terms (by coloring the graph of non-commuting terms).
+    exp(-i * t * H) is then approximated by n = num_steps steps of
+
+    * order 1: exp(-i t/n H_1) ... exp(-i t/n H_m),
+    * order 2: exp(-i t/2n H_1) ... exp(-i t/n H_m) ... exp(-i t/2n H_1),
+    * order 4: Suzuki's recursion S(p t/n)^2 S((1-4p) t/n) S(p t/n)^2 of
+      the second-order step S, where p = 1 / (4 - 4^(1/3)),
+
+    whose error decreases as (t/n)^order * t. The time evolution under each
+    group is decomposed further by the exact decomposition rules. See
+    trotter_gate_counts for the size of the resulting circuit.
+
+    Args:
+        num_steps (int): Number of Trotter steps n.
+        order (int): Order of the product formula (1, 2 or 4).
+
+    Returns:
+        A DecompositionRule (which is not exact).
+
+    Raises:
+        ValueError: If the order or the number of steps is invalid.
+    """
+    _check_trotter_parameters(num_steps, order)
+
+    def recognize(cmd):
+        hamiltonian = cmd.gate.hamiltonian
+        return (len(hamiltonian.terms) > 1 and
+                not _get_term_commutation(hamiltonian).all_commute)
+
+    def decompose(cmd):
+        qureg = cmd.qubits
+        eng = cmd.engine
+        hamiltonian = cmd.gate.hamiltonian
+        group_hamiltonians = _group_hamiltonians(hamiltonian)
+        sequence = _trotter_sequence(len(group_hamiltonians), num_steps,
+                                     order)
+        with Control(eng, cmd.control_qubits):
+            for group, fraction in sequence:
+                TimeEvolution(cmd.gate.time * fraction,
+                              group_hamiltonians[group]) | qureg
+
+    return DecompositionRule(gate_class=TimeEvolution,
+                             gate_decomposer=decompose,
+                             gate_recognizer=recognize)
+
+
+def _add_gate_counts(hamiltonian, counts, multiplicity=1):
+    """
+    Add the numbers of gates of the exact decomposition of a TimeEvolution
+    gate with a hamiltonian whose terms commute to counts.
+    """
+    terms = list(hamiltonian.terms)
+    if len(terms) == 1:
+        term = terms[0]
+        if term == ():
+            counts['Ph'] += multiplicity
+        elif len(term) == 1:
+            counts['R' + term[0][1].lower()] += multiplicity
+        else:
+            for _, action in term:
+                if action == 'X':
+                    counts['H'] += 2 * multiplicity
+                elif action == 'Y':
+                    counts['Rx'] += 2 * multiplicity
+            counts['CNOT'] += 2 * (len(term) - 1) * multiplicity
+            counts['Rz'] += multiplicity
+        return
+    groups = _get_term_commutation(hamiltonian).groups(qubitwise=True)
+    for group in groups:
+        basis = _get_basis(group)
+        for action in basis.values():
+            if action == 'X':
+                counts['H'] += 2 * multiplicity
+            elif action == 'Y':
+                counts['Rx'] += 2 * multiplicity
+        if () in group:
+            counts['Ph'] += multiplicity
+        diagonalized_terms = _get_diagonalized_terms(group, basis)
+        for term in group:
+            if len(term) == 1 and term not in diagonalized_terms:
+                counts['R' + term[0][1].lower()] += multiplicity
+        tree = _build_parity_tree(diagonalized_terms)
+        counts['CNOT'] += 2 * _count_parity_tree(tree) * multiplicity
+        counts['Rz'] += len(diagonalized_terms) * multiplicity
+
+
+def trotter_gate_counts(hamiltonian, num_steps=1, order=1):
+    """
+    Return the numbers of gates of the decomposition of a TimeEvolution gate.
+
+    The gates are counted for the decomposition with the rules
+    get_trotter_rule(num_steps, order) (if the terms of the hamiltonian do
+    not commute), rule_commuting_groups and rule_individual_terms. If the
+    gate is controlled, the rotations and phase gates are controlled.
+
+    Example:
+        .. code-block:: python
+
+            for num_steps in [1, 2, 4, 8]:
+                print(trotter_gate_counts(hamiltonian, num_steps, order=2))
+
+    Args:
+        hamiltonian (QubitOperator): Hamiltonian of the TimeEvolution gate.
+        num_steps (int): Number of Trotter steps.
+        order (int): Order of the product formula (1, 2 or 4).
+
+    Returns:
+        Dict mapping gate names ('H', 'Rx', 'Ry', 'Rz', 'CNOT' and 'Ph') to
+        the number of such gates.
+
+    Raises:
+        ValueError: If the order or the number of steps is invalid.
+    """
+    _check_trotter_parameters(num_steps, order)
+    counts = dict((name, 0) for name in ['H', 'Rx', 'Ry', 'Rz', 'CNOT', 'Ph'])
+    if (len(hamiltonian.terms) == 1 or
+            _get_term_commutation(hamiltonian).all_commute):
+        _add_gate_counts(hamiltonian, counts)
+        return counts
+    group_hamiltonians = _group_hamiltonians(hamiltonian)
+    sequence = _trotter_sequence(len(group_hamiltonians), num_steps, order)
+    multiplicities = [0] * len(group_hamiltonians)
+    for group, _ in sequence:
+        multiplicities[group] += 1
+    for group_hamiltonian, multiplicity in zip(group_hamiltonians,
+                                               multiplicities):
+        _add_gate_counts(group_hamiltonian, counts, multiplicity)
+    return counts
+
+
 def _recognize_time_evolution_individual_terms(cmd):
     return len(cmd.gate.hamiltonian.terms) == 1
 
@@ -131,6 +523,12 @@ rule_commuting_terms = DecompositionRule(
     gate_recognizer=_recognize_time_evolution_commuting_terms)
 
 
+rule_commuting_groups = DecompositionRule(
+    gate_class=TimeEvolution,
+    gate_decomposer=_decompose_time_evolution_commuting_groups,
+    gate_recognizer=_recognize_time_evolution_commuting_terms)
+
+
 rule_individual_terms = DecompositionRule(
     gate_class=TimeEvolution,
     gate_decomposer=_decompose_time_evolution_individual_terms,
@@ -138,5 +536,6 @@ rule_individual_terms = DecompositionRule(
 
 
 #: Decomposition rules
-all_defined_decomposition_rules = [rule_commuting_terms,
+all_defined_decomposition_rules = [rule_commuting_groups,
+                                   rule_commuting_terms,
                                    rule_individual_terms]
@@ -244,3 +244,202 @@ def test_decompose_individual_terms():
     print(final_wavefunction5)
 
     assert numpy.allclose(step5, final_wavefunction5)
+
+
+def test_recognize_commuting_terms_cached():
+    te._cache.clear()
+    hamiltonian = (QubitOperator("X0 X1", 0.5) + QubitOperator("Y0 Y1", 0.3) +
+                   QubitOperator("Z2", 0.1))
+    saving_backend = DummyEngine(save_commands=True)
+    eng = MainEngine(backend=saving_backend, engine_list=[])
+    qureg = eng.allocate_qureg(3)
+    TimeEvolution(1., hamiltonian) | qureg
+    TimeEvolution(2., hamiltonian) | qureg
+    cmd1 = saving_backend.received_commands[3]
+    cmd2 = saving_backend.received_commands[4]
+    assert te.rule_commuting_terms.gate_recognizer(cmd1)
+    assert te.rule_commuting_groups.gate_recognizer(cmd2)
+    # the commutation relations are computed only once
+    assert len(te._cache) == 1
+    assert (te._get_term_commutation(cmd1.gate.hamiltonian) is
+            te._get_term_commutation(cmd2.gate.hamiltonian))
+    # X0 X1 and Y0 Y1 commute, but need different basis changes
+    assert (sorted(te._get_term_commutation(hamiltonian).groups(True)) ==
+            [[((0, 'X'), (1, 'X')), ((2, 'Z'),)], [((0, 'Y'), (1, 'Y'))]])
+
+
+def _hamiltonian_matrix(hamiltonian, qureg, qubit_to_bit_map):
+    paulis = {'X': numpy.array([[0., 1.], [1., 0.]]),
+              'Y': numpy.array([[0., -1.j], [1.j, 0.]]),
+              'Z': numpy.array([[1., 0.], [0., -1.]])}
+    matrix = 0
+    for term, coefficient in hamiltonian.terms.items():
+        matrices = [numpy.eye(2)] * len(qureg)
+        for index, action in term:
+            matrices[qubit_to_bit_map[qureg[index].id]] = paulis[action]
+        term_matrix = numpy.ones((1, 1))
+        for single_matrix in reversed(matrices):
+            term_matrix = numpy.kron(term_matrix, single_matrix)
+        matrix = matrix + coefficient * term_matrix
+    return matrix
+
+
+def _no_time_evolution(self, cmd):
+    return not isinstance(cmd.gate, TimeEvolution)
+
+
+def _run_time_evolution(rules, hamiltonian, time):
+    eng = MainEngine(backend=Simulator(),
+                     engine_list=[AutoReplacer(DecompositionRuleSet(rules)),
+                                  InstructionFilter(_no_time_evolution)])
+    qureg = eng.allocate_qureg(5)
+    for qubit, angle in zip(qureg, [0.1, 0.7, 0.45, 1.6, 0.77]):
+        Rx(angle) | qubit
+        Ry(2 * angle) | qubit
+    eng.flush()
+    qubit_to_bit_map, init_wavefunction = copy.deepcopy(eng.backend.cheat())
+    with Control(eng, qureg[4]):
+        TimeEvolution(time, hamiltonian) | qureg[:4]
+    eng.flush()
+    final_wavefunction = copy.deepcopy(eng.backend.cheat()[1])
+    # the evolution is controlled on qureg[4]
+    matrix = _hamiltonian_matrix(hamiltonian, qureg, qubit_to_bit_map)
+    projector = numpy.diag([(k >> qubit_to_bit_map[qureg[4].id]) & 1
+                            for k in range(2 ** 5)])
+    expected = scipy.linalg.expm(-1.j * time * projector.dot(matrix)).dot(
+        init_wavefunction)
+    All(Measure) | qureg
+    return numpy.array(final_wavefunction), expected
+
+
+def test_decompose_commuting_groups():
+    saving_backend = DummyEngine(save_commands=True)
+    hamiltonian = (QubitOperator("X0 X1", 0.7) + QubitOperator("Y0 Y1", -0.4) +
+                   QubitOperator("Z0 Z1", 0.3) +
+                   QubitOperator("Z0 Z1 X3", 0.2) + QubitOperator("X3", 0.5) +
+                   QubitOperator((), 0.6))
+    final, expected = _run_time_evolution([te.rule_commuting_groups],
+                                          hamiltonian, 1.3)
+    assert numpy.allclose(final, expected)
+
+    eng = MainEngine(backend=saving_backend,
+                     engine_list=[AutoReplacer(DecompositionRuleSet(
+                         [te.rule_commuting_groups])),
+                         InstructionFilter(_no_time_evolution)])
+    qureg = eng.allocate_qureg(4)
+    TimeEvolution(1., hamiltonian) | qureg
+    # groups {X0 X1, X3, identity}, {Y0 Y1}, {Z0 Z1, Z0 Z1 X3}
+    assert len(te._get_term_commutation(hamiltonian).groups(True)) == 3
+    gates = [str(cmd.gate) for cmd in saving_backend.received_commands]
+    # X3 needs no basis change in its group, it is applied as Rx(2 * 0.5)
+    assert gates.count("H") == 2 * 3
+    assert gates.count("Rx(1.0)") == 1
+    assert len([gate for gate in gates if gate.startswith("Rz")]) == 4
+    assert len([gate for gate in gates if gate.startswith("Ph")]) == 1
+
+
+@pytest.mark.parametrize("hamiltonian, expected_gates", [
+    (QubitOperator("X0") + QubitOperator("X1"), ["Rx", "Rx"]),
+    (QubitOperator("Y0") + QubitOperator("Z1"), ["Ry", "Rz"])])
+def test_decompose_single_qubit_terms(hamiltonian, expected_gates):
+    # single-qubit terms are not rotated into a shared basis
+    saving_backend = DummyEngine(save_commands=True)
+    rule_set = DecompositionRuleSet(te.all_defined_decomposition_rules)
+    eng = MainEngine(backend=saving_backend,
+                     engine_list=[AutoReplacer(rule_set),
+                                  InstructionFilter(_no_time_evolution)])
+    qureg = eng.allocate_qureg(2)
+    TimeEvolution(1., hamiltonian) | qureg
+    gates = sorted(type(cmd.gate).__name__
+                   for cmd in saving_backend.received_commands[2:])
+    assert gates == expected_gates
+    counts = te.trotter_gate_counts(hamiltonian)
+    assert sum(counts.values()) == 2
+    assert all(counts[name] == gates.count(name) for name in gates)
+
+
+def test_trotter_rule():
+    hamiltonian = (QubitOperator("X0 X1", 0.7) + QubitOperator("Z0", -0.4) +
+                   QubitOperator("Y1 Z2", 0.3) + QubitOperator("X2 X3", 0.2))
+    commuting = QubitOperator("X0 X1", 0.7) + QubitOperator("Z2", -0.4)
+    rule = te.get_trotter_rule(num_steps=40)
+    assert rule not in te.all_defined_decomposition_rules
+
+    saving_backend = DummyEngine(save_commands=True)
+    eng = MainEngine(backend=saving_backend, engine_list=[])
+    qureg = eng.allocate_qureg(4)
+    TimeEvolution(1., hamiltonian) | qureg
+    TimeEvolution(1., commuting) | qureg
+    assert rule.gate_recognizer(saving_backend.received_commands[4])
+    assert not rule.gate_recognizer(saving_backend.received_commands[5])
+
+    errors = dict()
+    for order, num_steps in [(1, 1), (1, 40), (2, 2), (4, 2)]:
+        rules = [te.get_trotter_rule(num_steps, order),
+                 te.rule_commuting_groups, te.rule_individual_terms]
+        final, expected = _run_time_evolution(rules, hamiltonian, 0.9)
+        errors[order, num_steps] = numpy.linalg.norm(final - expected)
+    assert errors[1, 1] > 1e-2
+    assert 1e-6 < errors[1, 40] < 1e-2
+    assert errors[4, 2] < errors[2, 2] < errors[1, 1]
+    assert errors[4, 2] < 1e-4
+
+
+def test_trotter_rule_invalid_parameters():
+    with pytest.raises(ValueError):
+        te.get_trotter_rule(order=3)
+    with pytest.raises(ValueError):
+        te.get_trotter_rule(num_steps=0)
+    with pytest.raises(ValueError):
+        te.trotter_gate_counts(QubitOperator("X0"), num_steps=1.5)
+
+
+def test_trotter_sequence():
+    # the half steps at the boundaries of second-order steps are merged
+    sequence = te._trotter_sequence(2, 3, 2)
+    assert [group for group, _ in sequence] == [0, 1, 0, 1, 0, 1, 0]
+    assert [fraction for _, fraction in sequence] == pytest.approx(
+        [1. / 6, 1. / 3, 1. / 3, 1. / 3, 1. / 3, 1. / 3, 1. / 6])
+    for order in [1, 2, 4]:
+        sequence = te._trotter_sequence(3, 2, order)
+        for group in range(3):
+            assert sum(fraction for index, fraction in sequence
+                       if index == group) == pytest.approx(1.)
+
+
+def test_commuting_groups_share_parities():
+    hamiltonian = (QubitOperator("Z0 Z1", 0.1) + QubitOperator("Z0 Z1 Z2", 0.2)
+                   + QubitOperator("Z0 Z1 Z3", 0.3))
+    # CNOT(0, 1) is computed once for all three terms
+    assert te.trotter_gate_counts(hamiltonian) == {
+        'H': 0, 'Rx': 0, 'Ry': 0, 'Rz': 3, 'CNOT': 2 * 3, 'Ph': 0}
+    final, expected = _run_time_evolution([te.rule_commuting_groups],
+                                          hamiltonian, 1.7)
+    assert numpy.allclose(final, expected)
+
+
+@pytest.mark.parametrize("num_steps, order", [(1, 1), (3, 1), (1, 2),
+                                              (3, 2), (2, 4)])
+def test_trotter_gate_counts(num_steps, order):
+    hamiltonian = (QubitOperator("X0 X1", 0.7) + QubitOperator("Z0", -0.4) +
+                   QubitOperator("Y1 Z2", 0.3) + QubitOperator("X2 X3", 0.2) +
+                   QubitOperator("Y3", 0.1) + QubitOperator("Z0 Z1 Z2", 0.5) +
+                   QubitOperator((), 0.6))
+    saving_backend = DummyEngine(save_commands=True)
+    rules = [te.get_trotter_rule(num_steps, order), te.rule_commuting_groups,
+             te.rule_individual_terms]
+    eng = MainEngine(backend=saving_backend,
+                     engine_list=[AutoReplacer(DecompositionRuleSet(rules)),
+                                  InstructionFilter(_no_time_evolution)])
+    qureg = eng.allocate_qureg(5)
+    with Control(eng, qureg[4]):
+        TimeEvolution(1., hamiltonian) | qureg[:4]
+    counts = te.trotter_gate_counts(hamiltonian, num_steps, order)
+    names = []
+    for cmd in saving_backend.received_commands:
+        gate = cmd.gate
+        names.append(type(getattr(gate, "_gate", gate)).__name__)
+    for name in counts:
+        gate_name = {"H": "HGate", "CNOT": "XGate"}.get(name, name)
+        assert names.count(gate_name) == counts[name]
+    assert len(names) == 5 + sum(counts.values())
@@ -36,6 +36,16 @@ def test_mapper_present_and_correct_params():
     assert mapper.num_columns == 2
 
 
+def test_schedule_layers():
+    for schedule_layers in [False, True]:
+        engine_list = grid_setup.get_engine_list(
+            num_rows=3, num_columns=2, schedule_layers=schedule_layers)
+        mappers = [engine for engine in engine_list
+                   if isinstance(engine, GridMapper)]
+        assert len(mappers) == 1
+        assert mappers[0].schedule_layers == schedule_layers
+
+
 def test_parameter_any():
     engine_list = grid_setup.get_engine_list(num_rows=3, num_columns=2,
                                              one_qubit_gates="any",
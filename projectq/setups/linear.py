@@ -59,7 +59,7 @@ def one_and_two_qubit_gates(eng, cmd):
 
 
 def get_engine_list(num_qubits, cyclic=False, one_qubit_gates="any",
-                    two_qubit_gates=(CNOT, Swap)):
+                    two_qubit_gates=(CNOT, Swap), schedule_layers=False):
     """
     Returns an engine list to compile to a linear chain of qubits.
 
@@ -96,6 +96,9 @@ def get_engine_list(num_qubits, cyclic=False, one_qubit_gates="any",
                          which are equal to it. If the gate is a class, it
                          allows all instances of this class.
                          Default is (CNOT, Swap).
+        schedule_layers(bool): If True, the mapper schedules the gates into
+                               parallel layers to choose new mappings which
+                               reduce the circuit depth. Default is False.
     Raises:
         TypeError: If input is for the gates is not "any" or a tuple.
 
@@ -160,7 +163,8 @@ def get_engine_list(num_qubits, cyclic=False, one_qubit_gates="any",
             TagRemover(),
             InstructionFilter(one_and_two_qubit_gates),
             LocalOptimizer(5),
-            LinearMapper(num_qubits=num_qubits, cyclic=cyclic),
+            LinearMapper(num_qubits=num_qubits, cyclic=cyclic,
+                         schedule_layers=schedule_layers),
             AutoReplacer(rule_set),
             TagRemover(),
             InstructionFilter(low_level_gates),
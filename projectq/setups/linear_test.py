@@ -36,6 +36,16 @@ def test_mapper_present_and_correct_params():
     assert mapper.cyclic
 
 
+def test_schedule_layers():
+    for schedule_layers in [False, True]:
+        engine_list = linear_setup.get_engine_list(
+            num_qubits=10, cyclic=True, schedule_layers=schedule_layers)
+        mappers = [engine for engine in engine_list
+                   if isinstance(engine, LinearMapper)]
+        assert len(mappers) == 1
+        assert mappers[0].schedule_layers == schedule_layers
+
+
 def test_parameter_any():
     engine_list = linear_setup.get_engine_list(num_qubits=10, cyclic=False,
                                                one_qubit_gates="any",
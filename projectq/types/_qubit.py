@@ -41,6 +41,8 @@ class BasicQubit(object):
 
     They have an id and a reference to the owning engine.
     """
+    __slots__ = ('id', 'engine', '__weakref__')
+
     def __init__(self, engine, idx):
         """
         Initialize a BasicQubit object.
@@ -118,6 +120,8 @@ class Qubit(BasicQubit):
     Thus the qubit is not copyable; only returns a reference to the same
     object.
     """
+    __slots__ = ()
+
     def __del__(self):
         """
         Destroy the qubit and deallocate it (automatically).
@@ -165,7 +169,7 @@ class WeakQubitRef(BasicQubit):
     garbage-collected (and, thus, cleaned up early). Otherwise there is no
     difference between a WeakQubitRef and a Qubit object.
     """
-    pass
+    __slots__ = ()
 
 
 class Qureg(list):
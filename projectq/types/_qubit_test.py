@@ -86,6 +86,15 @@ def test_basic_qubit_hash():
     assert x != y and hash(x) != hash(y)
 
 
+def test_qubit_slots():
+    qubit = _qubit.Qubit("Fake", -1)
+    weak_qubit = _qubit.WeakQubitRef("Fake", 1)
+    assert not hasattr(qubit, '__dict__')
+    assert not hasattr(weak_qubit, '__dict__')
+    with pytest.raises(AttributeError):
+        weak_qubit.name = "q1"
+
+
 @pytest.fixture
 def mock_main_engine():
     class MockMainEngine(object):